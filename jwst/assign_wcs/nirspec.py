@@ -23,6 +23,8 @@ from .util import (
     MissingMSAFileError,
     NoDataOnDetectorError,
     not_implemented_mode,
+    pipeline_transforms,
+    same_transforms,
     velocity_correction
 )
 from . import pointing
@@ -1521,13 +1523,26 @@ def nrs_ifu_wcs(input_model):
     ----------
     input_model : jwst.datamodels.DataModel
         The data model. Must have been through the assign_wcs step.
+
+    Notes
+    -----
+    The WCSs are kept with the WCS of the exposure, and are shared by the
+    steps calling this function until the exposure WCS is changed.  They
+    should not be modified.
     """
     _, wrange = spectral_order_wrange_from_model(input_model)
+    wcsobj = input_model.meta.wcs
+    cached = getattr(wcsobj, '_ifu_slice_wcs', None)
+    if (cached is not None and cached[0] == wrange and
+            same_transforms(cached[1], wcsobj)):
+        return list(cached[2])
+
     wcs_list = []
     # loop over all IFU slits
     for i in range(30):
         wcs_list.append(nrs_wcs_set_input(input_model, i, wrange))
-    return wcs_list
+    wcsobj._ifu_slice_wcs = (wrange, pipeline_transforms(wcsobj), wcs_list)
+    return list(wcs_list)
 
 
 def _create_ifupost_transform(ifupost_slice):
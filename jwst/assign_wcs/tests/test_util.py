@@ -2,14 +2,19 @@
 Test the utility functions
 """
 
+import copy
 import os
 
+import numpy as np
+from astropy.modeling.models import Mapping, Scale, Shift
 from astropy.table import QTable
+from gwcs.wcstools import grid_from_bounding_box
 
 from ...lib.catalog_utils import SkyObject
 from ... import datamodels
 
-from ..util import get_object_info, bounding_box_from_shape
+from ..util import (get_object_info, bounding_box_from_shape,
+                    evaluate_slit_wcs)
 
 from . import data
 
@@ -58,3 +63,75 @@ def test_create_grism_objects():
     tempcat = QTable.read(source_catalog, format='ascii.ecsv')
     grism_object_from_table = read_catalog(tempcat)
     assert isinstance(grism_object_from_table, list), "return grism objects were not a list"
+
+
+class FakeWCS:
+    """The parts of a slit WCS used to evaluate it"""
+    def __init__(self, bounding_box):
+        det2slit = Mapping((0, 1, 0)) | Shift(-10.) & Scale(0.1) & Scale(1.e-7)
+        slit2world = Shift(30.) & Shift(-5.) & Scale(1.e6)
+        self.pipeline = [('detector', det2slit), ('slit_frame', slit2world),
+                         ('world', None)]
+        self.bounding_box = bounding_box
+        self.calls = 0
+
+    def get_transform(self, from_frame, to_frame):
+        assert (from_frame, to_frame) == ('detector', 'slit_frame')
+        return self.pipeline[0][1]
+
+    def set_transform(self, from_frame, to_frame, transform):
+        frames = [frame for frame, _ in self.pipeline]
+        index = frames.index(from_frame)
+        self.pipeline[index] = (from_frame, transform)
+
+    def __call__(self, x, y):
+        self.calls += 1
+        return (self.pipeline[0][1] | self.pipeline[1][1])(x, y)
+
+
+def test_evaluate_slit_wcs():
+    wcs = FakeWCS(((-0.5, 9.5), (1.5, 4.5)))
+    evaluation = evaluate_slit_wcs(wcs)
+
+    x, y = grid_from_bounding_box(wcs.bounding_box)
+    assert np.array_equal(evaluation.x, x)
+    assert np.array_equal(evaluation.y, y)
+    ra, dec, lam = evaluation.world
+    assert np.allclose(ra, x + 20.)
+    assert np.allclose(dec, 0.1 * y - 5.)
+    assert np.allclose(lam, 0.1 * x)
+    xslit, yslit, lam_slit = evaluation.slit_frame
+    assert np.allclose(yslit, 0.1 * y)
+    assert np.allclose(lam_slit, 1.e-7 * x)
+    assert not lam.flags.writeable
+
+    # The WCS is evaluated once.
+    assert evaluate_slit_wcs(wcs) is evaluation
+    evaluation.world
+    assert wcs.calls == 1
+
+
+def test_evaluate_slit_wcs_changed():
+    wcs = FakeWCS(((-0.5, 9.5), (1.5, 4.5)))
+    evaluation = evaluate_slit_wcs(wcs)
+
+    # Other pixels are evaluated separately.
+    other = evaluate_slit_wcs(wcs, bounding_box_from_shape((3, 10)))
+    assert other is not evaluation
+    assert other.world[0].shape == (3, 10)
+    assert evaluate_slit_wcs(wcs) is evaluation
+
+    # A copy of the WCS carries its evaluation along.
+    wcs_copy = copy.deepcopy(wcs)
+    copied = evaluate_slit_wcs(wcs_copy)
+    assert copied is not evaluation
+    assert copied.wcs is wcs_copy
+    assert np.array_equal(copied.world[2], evaluation.world[2])
+    assert wcs_copy.calls == wcs.calls
+
+    # The evaluation is discarded when the WCS changes.
+    wcs.set_transform('slit_frame', 'world',
+                      Shift(30.) & Shift(-5.) & Scale(1.e9))
+    changed = evaluate_slit_wcs(wcs)
+    assert changed is not evaluation
+    assert np.allclose(changed.world[2], 1.e3 * evaluation.world[2])
@@ -657,6 +657,116 @@ def bounding_box_from_shape(shape):
     return bbox
 
 
+def pipeline_transforms(wcsobj):
+    """The transforms between the frames of a WCS object.
+
+    WCS objects modified with ``set_transform`` or ``insert_transform``
+    have different transforms; a copy of a WCS object made together
+    with the values computed from it (e.g. a deep copy of a data model)
+    has the copies of the transforms.
+    """
+    return tuple(step[1] for step in wcsobj.pipeline)
+
+
+def same_transforms(transforms, wcsobj):
+    """True if the WCS object still has the transforms in ``transforms``."""
+    current = pipeline_transforms(wcsobj)
+    return (len(transforms) == len(current) and
+            all(a is b for (a, b) in zip(transforms, current)))
+
+
+def _readonly(arrays):
+    arrays = tuple(np.asarray(a) for a in arrays)
+    for a in arrays:
+        a.flags.writeable = False
+    return arrays
+
+
+class SlitEvaluation:
+    """
+    The coordinates of the pixels of a slit WCS, computed once.
+
+    The WCS is evaluated on the grid of pixels in the bounding box the
+    first time the coordinates are used, and the results are kept with
+    the WCS object by `evaluate_slit_wcs`, so that the steps processing
+    a slit after ``extract_2d`` share them.  The arrays are read-only.
+
+    Parameters
+    ----------
+    wcsobj : `~gwcs.wcs.WCS`
+        The WCS of one slit, slice or shutter.
+    bounding_box : tuple
+        The bounding box of the pixel grid, in X, Y order.
+
+    Attributes
+    ----------
+    x, y : ndarray
+        The pixel coordinates of the grid.
+    """
+    def __init__(self, wcsobj, bounding_box):
+        self.wcs = wcsobj
+        self.bounding_box = bounding_box
+        self.transforms = pipeline_transforms(wcsobj)
+        self.x, self.y = _readonly(
+            grid_from_bounding_box(bounding_box, step=(1, 1)))
+        self._world = None
+        self._slit_frame = None
+
+    def is_current(self, wcsobj, bounding_box):
+        """True if the WCS has not been changed since it was evaluated."""
+        return (self.wcs is wcsobj and self.bounding_box == bounding_box and
+                same_transforms(self.transforms, wcsobj))
+
+    @property
+    def world(self):
+        """The (ra, dec, wavelength) of each pixel, NaN outside the bounding box."""
+        if self._world is None:
+            self._world = _readonly(self.wcs(self.x, self.y))
+        return self._world
+
+    @property
+    def slit_frame(self):
+        """The (x, y, wavelength) of each pixel in the ``slit_frame``."""
+        if self._slit_frame is None:
+            det2slit = self.wcs.get_transform('detector', 'slit_frame')
+            self._slit_frame = _readonly(det2slit(self.x, self.y))
+        return self._slit_frame
+
+
+def evaluate_slit_wcs(wcsobj, bounding_box=None):
+    """Return the coordinates of the pixels of a slit WCS.
+
+    The evaluation is attached to the WCS object, and is reused as long
+    as neither the bounding box nor the transforms of the WCS change.
+    A copy of a data model carries the evaluation of its WCS along.
+
+    Parameters
+    ----------
+    wcsobj : `~gwcs.wcs.WCS`
+        The WCS of one slit, slice or shutter.
+    bounding_box : tuple, optional
+        The bounding box of the pixels, in X, Y order.  The default is
+        the bounding box of the WCS.
+
+    Returns
+    -------
+    evaluation : `SlitEvaluation`
+        The pixel grid and its world and ``slit_frame`` coordinates.
+    """
+    if bounding_box is None:
+        bounding_box = wcsobj.bounding_box
+    bounding_box = tuple(tuple(axis) for axis in bounding_box)
+    evaluations = getattr(wcsobj, '_slit_evaluations', None)
+    if evaluations is None:
+        evaluations = {}
+        wcsobj._slit_evaluations = evaluations
+    evaluation = evaluations.get(bounding_box)
+    if evaluation is None or not evaluation.is_current(wcsobj, bounding_box):
+        evaluation = SlitEvaluation(wcsobj, bounding_box)
+        evaluations[bounding_box] = evaluation
+    return evaluation
+
+
 def update_s_region_imaging(model):
     """
     Update the ``S_REGION`` keyword using ``WCS.footprint``.
@@ -736,7 +846,10 @@ def update_s_region_nrs_ifu(output_model, mod):
     ra_total = []
     dec_total = []
     for wcsobj in wcs_list:
-        rmin, rmax, dmin, dmax = _nanminmax(wcsobj)
+        # The coordinates of the slices are kept for the later steps.
+        ra, dec, lam = evaluate_slit_wcs(wcsobj).world
+        rmin, rmax, dmin, dmax = (np.nanmin(ra), np.nanmax(ra),
+                                  np.nanmin(dec), np.nanmax(dec))
         ra_total.append((rmin, rmax))
         dec_total.append((dmin, dmax))
     ra_max = np.asarray(ra_total)[:, 1].max()
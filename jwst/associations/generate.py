@@ -1,8 +1,20 @@
+from collections import (
+    OrderedDict,
+    deque
+)
 import logging
 
+from numpy.ma import masked
+
 from .association import (
     make_timestamp
 )
+from .exceptions import AssociationError
+from .lib.association_index import (
+    AssociationIndex,
+    literal_value,
+    shared_sources,
+)
 from .lib.process_list import (
     ProcessList,
     ProcessQueueSorted
@@ -13,7 +25,7 @@ logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
 
-def generate(pool, rules, version_id=None):
+def generate(pool, rules, version_id=None, num_processes=1):
     """Generate associations in the pool according to the rules.
 
     Parameters
@@ -30,6 +42,16 @@ def generate(pool, rules, version_id=None):
         If True, use a timestamp
         If a string, the string.
 
+    num_processes: int
+        The number of processes to use. If more than one,
+        the pool is split by `partition_pool` and the partitions
+        are matched in parallel. The associations are identical
+        to those found by a single process. If any association
+        found could include items from other partitions, or if
+        matching the partitions again in pool order does not repeat
+        what was found in parallel, the pool is matched again by
+        a single process.
+
     Returns
     -------
     associations: [association[,...]]
@@ -40,39 +62,44 @@ def generate(pool, rules, version_id=None):
     Refer to the :ref:`Association Generator <association-generator>`
     documentation for a full description.
     """
-    associations = []
     if type(version_id) is bool:
         version_id = make_timestamp()
-    process_queue = ProcessQueueSorted([
-        ProcessList(
-            items=pool,
-            rules=[rule for _, rule in rules.items()]
-        )
-    ])
 
-    for process_list in process_queue:
-        for item in process_list.items:
+    keys, partitions = [], []
+    if num_processes > 1:
+        keys, partitions = partition_pool(pool, rules)
 
-            existing_asns, new_asns, to_process = generate_from_item(
-                item,
-                version_id,
-                associations,
-                rules,
-                process_list
+    if len(partitions) > 1:
+        from ..lib.pipe_utils import run_tasks
+
+        logger.debug(
+            'Matching {} partitions of the pool by {}'.format(
+                len(partitions), keys
             )
-            associations.extend(new_asns)
+        )
+        tasks = [
+            (_trace_partition, (pool, rules, version_id, rows))
+            for rows in partitions
+        ]
+        steps = list(run_tasks(tasks, num_processes))
+        if None in steps:
+            logger.debug(
+                'Associations span the partitions. Matching in one process.'
+            )
+            partitions = []
+        else:
+            replay = _PartitionReplay(rules, keys, pool, partitions, steps)
+            try:
+                associations = _generate(pool, replay, version_id, replay)
+            except AssociationError as exception:
+                logger.debug(
+                    'Matching the partitions diverged: {}.'
+                    ' Matching in one process.'.format(exception)
+                )
+                partitions = []
 
-            # If working on a process list EXISTING
-            # remove any new `to_process` that is
-            # also EXISTING. Prevent infinite loops.
-            if process_list.work_over in (ProcessList.EXISTING, ProcessList.NONSCIENCE):
-                to_process = [
-                    to_process_list
-                    for to_process_list in to_process
-                    if to_process_list.work_over != process_list.work_over
-                ]
-            process_queue.extend(to_process)
-            pass
+    if len(partitions) <= 1:
+        associations = _generate(pool, rules, version_id, AssociationIndex())
 
     # Finalize found associations
     try:
@@ -83,12 +110,86 @@ def generate(pool, rules, version_id=None):
     return finalized_asns
 
 
+def partition_pool(pool, rules):
+    """Split a pool into partitions that no association can span
+
+    Most rules fix some constraints, such as the program and
+    instrument, to the values of the item that creates an
+    association. Items with different values for any of these
+    sources can never be in the same association, and can be
+    matched separately. Associations that do not share these
+    values, such as those of rules that fix none of them, can
+    only be detected once found; see `generate`.
+
+    Parameters
+    ----------
+    pool: AssociationPool
+        The pool to split.
+
+    rules: AssociationRegistry
+        The association rules.
+
+    Returns
+    -------
+    (keys, partitions): 2-tuple where
+        keys: [str[,...]]
+            The sources the pool is split by.
+        partitions: [[int[,...]][,...]]
+            The rows of the pool in each partition.
+            If the pool cannot be split, there is one partition.
+    """
+    keys = partition_keys(rules)
+    if not keys:
+        return keys, [list(range(len(pool)))]
+
+    partitions = OrderedDict()
+    for row, item in enumerate(pool):
+        key = _partition_key(item, keys)
+        if key is None:
+            return keys, [list(range(len(pool)))]
+        partitions.setdefault(key, []).append(row)
+
+    return keys, list(partitions.values())
+
+
+def partition_keys(rules):
+    """Sources whose values the members of an association share
+
+    Parameters
+    ----------
+    rules: AssociationRegistry
+        The association rules.
+
+    Returns
+    -------
+    keys: [str[,...]]
+        The sorted source names shared by all the rules that
+        share any. Sources that any rule evaluates are excluded,
+        since evaluation creates new items with different values.
+    """
+    keys = None
+    evaluated = set()
+    for rule in rules.values():
+        asn = rule()
+        sources = shared_sources(asn)
+        if sources:
+            keys = sources if keys is None else keys & sources
+        for constraint in asn.constraints:
+            if getattr(constraint, 'evaluate', False):
+                evaluated.update(constraint.sources)
+
+    if keys is None:
+        return []
+    return sorted(keys - evaluated)
+
+
 def generate_from_item(
         item,
         version_id,
         associations,
         rules,
-        process_list):
+        process_list,
+        index=None):
     """Either match or generate a new assocation
 
     Parameters
@@ -112,6 +213,11 @@ def generate_from_item(
     process_list: ProcessList
         The `ProcessList` from which the current item belongs to.
 
+    index: AssociationIndex or None
+        Index of `associations`. If given, the item is only
+        checked against the associations the index finds
+        it could belong to.
+
     Returns
     -------
     (associations, process_list): 3-tuple where
@@ -138,13 +244,15 @@ def generate_from_item(
             ProcessList.EXISTING,
             ProcessList.NONSCIENCE,
     ):
+        if index is not None:
+            associations = index.candidates(item)
         associations = [
             asn
             for asn in associations
             if type(asn) in allowed_rules
         ]
         existing_asns, reprocess_list = match_item(
-            item, associations
+            item, associations, index=index
         )
 
     # Now see if this item will create new associatons.
@@ -168,7 +276,7 @@ def generate_from_item(
     return existing_asns, new_asns, reprocess_list
 
 
-def match_item(item, associations):
+def match_item(item, associations, index=None):
     """Match item to a list of associations
 
     Parameters
@@ -181,6 +289,11 @@ def match_item(item, associations):
         If the item matches any of these, it will be added
         to them.
 
+    index: AssociationIndex or None
+        Index to update with the constraints of
+        the associations the item is added to, or
+        that ask for the item to be reprocessed.
+
     Returns
     -------
     (associations, process_list): 2-tuple where
@@ -198,4 +311,240 @@ def match_item(item, associations):
         process_list.extend(reprocess)
         if matches:
             item_associations.append(asn)
+        if index is not None and (matches or reprocess):
+            index.update(asn)
     return item_associations, process_list
+
+
+# ---------
+# Utilities
+# ---------
+def _generate(items, rules, version_id, index):
+    """Match items to associations
+
+    Parameters
+    ----------
+    items: [item[,...]]
+        The pool items.
+
+    rules: AssociationRegistry
+        The association rules.
+
+    version_id: str or None
+        Version id to use with association creation.
+
+    index: AssociationIndex
+        Index of the associations found.
+
+    Returns
+    -------
+    associations: [association[,...]]
+        The associations found, before finalization.
+    """
+    associations = []
+    process_queue = ProcessQueueSorted([
+        ProcessList(
+            items=items,
+            rules=[rule for _, rule in rules.items()]
+        )
+    ])
+
+    for process_list in process_queue:
+        for item in process_list.items:
+
+            existing_asns, new_asns, to_process = generate_from_item(
+                item,
+                version_id,
+                associations,
+                rules,
+                process_list,
+                index=index
+            )
+            associations.extend(new_asns)
+            index.extend(new_asns)
+
+            # If working on a process list EXISTING
+            # remove any new `to_process` that is
+            # also EXISTING. Prevent infinite loops.
+            if process_list.work_over in (ProcessList.EXISTING, ProcessList.NONSCIENCE):
+                to_process = [
+                    to_process_list
+                    for to_process_list in to_process
+                    if to_process_list.work_over != process_list.work_over
+                ]
+            process_queue.extend(to_process)
+
+    return associations
+
+
+def _partition_key(item, keys):
+    """The values of an item that determine its partition
+
+    Returns
+    -------
+    key: (str or None[,...]) or None
+        The lower-cased values, with None for missing values.
+        None if any value cannot be compared as text.
+    """
+    values = []
+    for key in keys:
+        try:
+            value = item[key]
+        except KeyError:
+            value = masked
+        if value is masked:
+            values.append(None)
+            continue
+        value = literal_value(value)
+        if value is None:
+            return None
+        values.append(value)
+    return tuple(values)
+
+
+def _trace_partition(pool, rules, version_id, rows):
+    """Match a partition of the pool, recording each step
+
+    Returns
+    -------
+    steps: [(positions, rule_names, n_new)[,...]] or None
+        See `_PartitionTrace`. None if any association
+        found could include items of other partitions.
+    """
+    trace = _PartitionTrace(rules)
+    keys = set(partition_keys(rules))
+    associations = _generate(
+        [pool[row] for row in rows], trace, version_id, trace
+    )
+    for asn in associations:
+        try:
+            forced = asn.constraints['force_match'].value
+        except (KeyError, TypeError):
+            forced = None
+        if forced or not keys <= shared_sources(asn):
+            return None
+    return trace.steps
+
+
+class _PartitionTrace(AssociationIndex):
+    """Record which associations and rules respond to each item
+
+    Stands in for both the rule registry and the association index
+    while matching a partition. For every item processed, a step
+    is recorded with the positions of the existing associations
+    that matched the item or asked for it to be reprocessed, the
+    names of the rules that created an association or asked for
+    reprocessing, and the number of associations created.
+    Anything else the item was checked against had no effect.
+    """
+    def __init__(self, rules):
+        super(_PartitionTrace, self).__init__()
+        self.rules = rules
+        self.steps = []
+        self._positions_matched = []
+        self._rules_matched = []
+
+    def items(self):
+        return self.rules.items()
+
+    def values(self):
+        return self.rules.values()
+
+    def match(self, item, version_id=None, allow=None, ignore=None):
+        """Match the rules one at a time. See `AssociationRegistry.match`"""
+        associations = []
+        process_list = []
+        for name, rule in self.rules.items():
+            if allow is not None and rule not in allow:
+                continue
+            asns, reprocess = self.rules.match(
+                item, version_id=version_id, allow=[rule], ignore=ignore
+            )
+            if asns or reprocess:
+                self._rules_matched.append(name)
+            associations.extend(asns)
+            process_list.extend(reprocess)
+        return associations, process_list
+
+    def update(self, asn):
+        self._positions_matched.append(self._positions[id(asn)])
+        super(_PartitionTrace, self).update(asn)
+
+    def extend(self, associations):
+        self.steps.append((
+            tuple(self._positions_matched),
+            tuple(self._rules_matched),
+            len(associations)
+        ))
+        self._positions_matched = []
+        self._rules_matched = []
+        super(_PartitionTrace, self).extend(associations)
+
+
+class _PartitionReplay:
+    """Repeat the matching of all partitions in a single process
+
+    Stands in for both the rule registry and the association index.
+    Items are processed in the same order as by a single process,
+    but each item is only checked against the associations and
+    rules recorded by `_PartitionTrace` for its partition, so that
+    the associations are created, and numbered, in the same order.
+    """
+    def __init__(self, rules, keys, pool, partitions, steps):
+        self.rules = rules
+        self.keys = keys
+        self._partition_of = {
+            _partition_key(pool[rows[0]], keys): partition
+            for partition, rows in enumerate(partitions)
+        }
+        self._steps = [deque(partition_steps) for partition_steps in steps]
+        self._associations = [[] for _ in partitions]
+        self._step = None
+
+    def items(self):
+        return self.rules.items()
+
+    def values(self):
+        return self.rules.values()
+
+    def _current_step(self, item):
+        if self._step is None:
+            key = _partition_key(item, self.keys)
+            try:
+                partition = self._partition_of[key]
+                self._step = (partition, self._steps[partition].popleft())
+            except (KeyError, IndexError):
+                raise AssociationError(
+                    'No step recorded for an item of partition {}'.format(key)
+                )
+        return self._step
+
+    def candidates(self, item):
+        partition, (positions, _, _) = self._current_step(item)
+        associations = self._associations[partition]
+        return [associations[position] for position in positions]
+
+    def match(self, item, version_id=None, allow=None, ignore=None):
+        _, (_, names, _) = self._current_step(item)
+        rules = [self.rules[name] for name in names]
+        if allow is not None:
+            rules = [rule for rule in rules if rule in allow]
+        if not rules:
+            return [], []
+        return self.rules.match(
+            item, version_id=version_id, allow=rules, ignore=ignore
+        )
+
+    def update(self, asn):
+        pass
+
+    def extend(self, associations):
+        partition, (_, _, n_new) = self._step
+        if len(associations) != n_new:
+            raise AssociationError(
+                'Partition {} created {} associations instead of {}'.format(
+                    partition, len(associations), n_new
+                )
+            )
+        self._associations[partition].extend(associations)
+        self._step = None
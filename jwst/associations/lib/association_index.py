@@ -0,0 +1,346 @@
+"""Index of associations by their fixed constraint values"""
+from collections import defaultdict
+import re
+
+from .constraint import (
+    AttrConstraint,
+    Constraint,
+    always_true,
+    meets_conditions,
+)
+from .utilities import getattr_from_list
+
+__all__ = [
+    'AssociationIndex',
+    'literal_value',
+    'shared_sources',
+]
+
+# Marker for items that have none of the sources of a constraint.
+_MISSING = object()
+
+
+class AssociationIndex:
+    """Index associations by the values their constraints require
+
+    Once an association has been created, most of its constraints
+    have been fixed to the values of the item that created it:
+    the program, instrument, optical elements, target, etc.
+    Each new item can only be added to associations whose fixed
+    values it shares. The index keeps, for each combination of
+    fixed values, the associations requiring them, so that an item
+    need only be checked against the associations it could possibly
+    be added to.
+
+    Only constraints whose failure is certain to fail the whole
+    association are indexed: required `AttrConstraint`\\s reached
+    through `Constraint.all` reductions that do not reprocess on
+    failure. Associations that cannot be indexed, such as those
+    with a `force_match` constraint, are always candidates.
+
+    Parameters
+    ----------
+    associations: [association[,...]]
+        The initial associations to index.
+    """
+    def __init__(self, associations=None):
+        self.associations = []
+        self._positions = {}
+        self._entries = []
+        self._unindexed = set()
+        self._shapes = {}
+
+        if associations is not None:
+            self.extend(associations)
+
+    def __len__(self):
+        return len(self.associations)
+
+    def append(self, asn):
+        """Add an association to the index"""
+        position = len(self.associations)
+        self.associations.append(asn)
+        self._positions[id(asn)] = position
+        self._entries.append(None)
+        self._insert(position)
+
+    def extend(self, associations):
+        """Add a list of associations to the index"""
+        for asn in associations:
+            self.append(asn)
+
+    def update(self, asn):
+        """Re-index an association whose constraints have changed
+
+        Parameters
+        ----------
+        asn: Association
+            An association already in the index.
+        """
+        position = self._positions[id(asn)]
+        self._remove(position)
+        self._insert(position)
+
+    def candidates(self, item):
+        """Associations the item could possibly be added to
+
+        Parameters
+        ----------
+        item: dict
+            The item to match.
+
+        Returns
+        -------
+        associations: [association[,...]]
+            The candidate associations, in the order they were
+            added to the index.
+        """
+        positions = set(self._unindexed)
+        values = {}
+        tests = {}
+        for (literals, patterns), keys in self._shapes.items():
+            key = []
+            for slot in literals:
+                value = _item_value(item, slot, values)
+                if value is _MISSING:
+                    break
+                value = literal_value(value)
+                if value is None:
+                    key = None
+                    break
+                key.append(value)
+            else:
+                for slot, pattern in patterns:
+                    value = _item_value(item, slot, values)
+                    if value is _MISSING:
+                        break
+                    if not isinstance(value, str):
+                        key = None
+                        break
+                    try:
+                        passed = tests[(slot, pattern)]
+                    except KeyError:
+                        passed = meets_conditions(value, pattern)
+                        tests[(slot, pattern)] = passed
+                    if not passed:
+                        break
+                else:
+                    positions.update(keys.get(tuple(key), ()))
+                    continue
+
+            # Values that the index cannot compare
+            # leave all the associations as candidates.
+            if key is None:
+                for shape_positions in keys.values():
+                    positions.update(shape_positions)
+
+        return [
+            self.associations[position]
+            for position in sorted(positions)
+        ]
+
+    def _insert(self, position):
+        """Index the association at the given position"""
+        entry = _index_entry(self.associations[position])
+        self._entries[position] = entry
+        if entry is None:
+            self._unindexed.add(position)
+            return
+        shape, key = entry
+        keys = self._shapes.setdefault(shape, defaultdict(set))
+        keys[key].add(position)
+
+    def _remove(self, position):
+        """Remove the association at the given position from the index"""
+        entry = self._entries[position]
+        self._entries[position] = None
+        if entry is None:
+            self._unindexed.discard(position)
+            return
+        shape, key = entry
+        keys = self._shapes[shape]
+        keys[key].discard(position)
+        if not keys[key]:
+            del keys[key]
+        if not keys:
+            del self._shapes[shape]
+
+
+# ---------
+# Utilities
+# ---------
+def _index_entry(asn):
+    """Determine the shape and key of an association
+
+    Returns
+    -------
+    (shape, key) or None
+        The shape is a 2-tuple of the literal slots and the pattern
+        tests of the association's fixed constraints. The key is
+        the lower-cased literal values. None if the association
+        cannot be indexed.
+    """
+    constraints = getattr(asn, 'constraints', None)
+    if not isinstance(constraints, Constraint) or _is_forced(constraints):
+        return None
+
+    literals = []
+    patterns = []
+    for constraint in _fixed_constraints(constraints):
+        if not isinstance(constraint.value, str):
+            continue
+        slot = (
+            tuple(constraint.sources),
+            tuple(constraint.invalid_values)
+        )
+        value = _literal(constraint.value)
+        if value is None:
+            patterns.append((slot, constraint.value))
+        else:
+            literals.append((slot, value))
+    if not literals and not patterns:
+        return None
+
+    literals.sort(key=lambda literal: (repr(literal[0]), literal[1]))
+    patterns.sort(key=repr)
+    shape = (
+        tuple(slot for slot, _ in literals),
+        tuple(patterns)
+    )
+    key = tuple(value for _, value in literals)
+    try:
+        hash(shape)
+    except TypeError:
+        return None
+    return shape, key
+
+
+def shared_sources(asn):
+    """Item sources whose value all members of an association share
+
+    These are the sources of the fixed constraints that either
+    have a plain text value, or take their value from the item
+    that creates the association. Items with different values
+    for any of these sources can never be added to the same
+    association.
+
+    Parameters
+    ----------
+    asn: Association
+        The association, or a new instance of a rule.
+
+    Returns
+    -------
+    sources: set(str[,...])
+        The source names.
+    """
+    constraints = getattr(asn, 'constraints', None)
+    if not isinstance(constraints, Constraint):
+        return set()
+    sources = set()
+    for constraint in _fixed_constraints(constraints):
+        if len(constraint.sources) != 1:
+            continue
+        if constraint.value is None:
+            if constraint.force_unique:
+                sources.add(constraint.sources[0])
+        elif isinstance(constraint.value, str) and \
+                _literal(constraint.value) is not None:
+            sources.add(constraint.sources[0])
+    return sources
+
+
+def _is_forced(constraints):
+    """True if the constraints contain a `force_match` constraint"""
+    try:
+        constraints['force_match']
+    except (KeyError, TypeError):
+        return False
+    return True
+
+
+def _fixed_constraints(constraint):
+    """Constraints whose failure fails the whole constraint
+
+    Parameters
+    ----------
+    constraint: Constraint or SimpleConstraint
+        The constraint to search.
+
+    Returns
+    -------
+    constraints: generator of AttrConstraint
+        The required constraints that are checked
+        on every item.
+    """
+    if isinstance(constraint, Constraint):
+        if type(constraint).check_and_set is not Constraint.check_and_set or \
+           constraint.reduce is not Constraint.all or \
+           constraint.reprocess_on_fail:
+            return
+        for sub_constraint in constraint.constraints:
+            yield from _fixed_constraints(sub_constraint)
+    elif type(constraint).check_and_set is AttrConstraint.check_and_set:
+        if isinstance(constraint.sources, (list, tuple)) and \
+           constraint.required and \
+           not constraint.force_undefined and \
+           not constraint.evaluate and \
+           constraint.onlyif is always_true:
+            yield constraint
+
+
+def _literal(value):
+    """The plain text of an escaped constraint value
+
+    Constraint values are regular expressions. Values fixed by a
+    match are the escaped item values. For such values, return
+    the lower-cased text to compare items against. Otherwise,
+    return None.
+    """
+    text = re.sub(r'\\(.)', r'\1', value, flags=re.DOTALL)
+    if re.escape(text) != value:
+        return None
+    return literal_value(text)
+
+
+def literal_value(value):
+    """The lower-cased text of an item value, if it is plain text
+
+    Values with non-ASCII characters or newlines may match
+    a pattern other than by case-insensitive equality.
+
+    Parameters
+    ----------
+    value: object
+        The item value.
+
+    Returns
+    -------
+    text: str or None
+        The lower-cased value, or None if the value
+        cannot be compared as text.
+    """
+    if not isinstance(value, str) or '\n' in value:
+        return None
+    try:
+        value.encode('ascii')
+    except UnicodeEncodeError:
+        return None
+    return value.lower()
+
+
+def _item_value(item, slot, values):
+    """Retrieve, and remember, an item's value for a slot"""
+    try:
+        return values[slot]
+    except KeyError:
+        pass
+    sources, invalid_values = slot
+    try:
+        _, value = getattr_from_list(
+            item, sources, invalid_values=invalid_values
+        )
+    except KeyError:
+        value = _MISSING
+    values[slot] = value
+    return value
@@ -363,7 +363,7 @@ class AttrConstraint(SimpleConstraintABC):
         if invalid_values is None:
             self.invalid_values = []
         if onlyif is None:
-            self.onlyif = lambda item: True
+            self.onlyif = always_true
 
         # Haven't actually matched anything yet.
         self.found_values = set()
@@ -715,6 +715,11 @@ class Constraint:
 # ---------
 # Utilities
 # ---------
+def always_true(item):
+    """Default `AttrConstraint.onlyif` condition: always check the item"""
+    return True
+
+
 def meets_conditions(value, conditions):
     """Check whether value meets any of the provided conditions
 
@@ -17,6 +17,7 @@ from jwst.associations.lib.constraint import (
     ConstraintTrue,
 )
 from jwst.associations.lib.log_config import (log_config, DMS_config)
+from jwst.lib.pipe_utils import get_num_processes
 
 # Configure logging
 logger = log_config(name=__package__)
@@ -176,6 +177,15 @@ class Main():
             '--no-merge', action='store_true',
             help='Do not merge Level2 associations into one'
         )
+        parser.add_argument(
+            '--maximum-cores', dest='maximum_cores',
+            choices=('none', 'quarter', 'half', 'all'), default='none',
+            help=(
+                'Fraction of the available cores used to match'
+                ' independent parts of the pool in parallel.'
+                ' Default: "%(default)s"'
+            )
+        )
 
         parsed = parser.parse_args(args=args)
 
@@ -243,7 +253,8 @@ class Main():
 
         logger.info('Generating associations.')
         self.associations = generate(
-            self.pool, self.rules, version_id=parsed.version_id
+            self.pool, self.rules, version_id=parsed.version_id,
+            num_processes=get_num_processes(parsed.maximum_cores)
         )
 
         if parsed.discover:
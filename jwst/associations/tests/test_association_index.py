@@ -0,0 +1,96 @@
+"""Test indexing of associations by constraint values"""
+import re
+
+from ..lib.association_index import AssociationIndex
+from ..lib.constraint import (
+    AttrConstraint,
+    Constraint,
+    SimpleConstraint,
+)
+
+
+class Asn:
+    """Minimal association holding only constraints"""
+    def __init__(self, *constraints, **kwargs):
+        self.constraints = Constraint(list(constraints), **kwargs)
+
+
+def attr(source, value, **kwargs):
+    return AttrConstraint(sources=[source], value=value, **kwargs)
+
+
+def test_literal_values():
+    """Items are only matched to associations with the same values"""
+    asns = [
+        Asn(attr('program', '99009'), attr('instrume', 'miri')),
+        Asn(attr('program', '99009'), attr('instrume', 'nircam')),
+        Asn(attr('program', '00034'), attr('instrume', 'miri')),
+    ]
+    index = AssociationIndex(asns)
+
+    item = {'program': '99009', 'instrume': 'MIRI'}
+    assert index.candidates(item) == [asns[0]]
+    assert index.candidates({'program': '99009'}) == []
+    assert index.candidates({'program': '1', 'instrume': 'miri'}) == []
+
+
+def test_escaped_values():
+    """Values fixed by a match are escaped"""
+    asn = Asn(attr('targname', re.escape('ngc 104 (47 tuc)')))
+    index = AssociationIndex([asn])
+
+    assert index.candidates({'targname': 'NGC 104 (47 Tuc)'}) == [asn]
+    assert index.candidates({'targname': 'ngc 104 47 tuc'}) == []
+
+
+def test_pattern_values():
+    """Regular expression values are tested against the item"""
+    asn = Asn(attr('program', '99009'), attr('exp_type', 'nrc_image|mir_image'))
+    index = AssociationIndex([asn])
+
+    assert index.candidates({'program': '99009', 'exp_type': 'mir_image'}) == [asn]
+    assert index.candidates({'program': '99009', 'exp_type': 'mir_lrs'}) == []
+
+
+def test_unindexed():
+    """Constraints that may not fail the association are not indexed"""
+    asns = [
+        Asn(attr('program', '99009', required=False)),
+        Asn(attr('program', '99009', onlyif=lambda item: False)),
+        Asn(attr('program', '99009'), SimpleConstraint(value='x')),
+        Asn(attr('program', '99009'), reduce=Constraint.any),
+        Asn(attr('program', '99009'), reprocess_on_fail=True),
+        Asn(
+            attr('program', '99009'),
+            SimpleConstraint(value=True, name='force_match')
+        ),
+    ]
+    index = AssociationIndex(asns)
+
+    assert index.candidates({'program': '1'}) == asns[:2] + asns[3:]
+
+
+def test_nonstring_values():
+    """Item values that cannot be compared match everything"""
+    asn = Asn(attr('program', '99009'))
+    index = AssociationIndex([asn])
+
+    assert index.candidates({'program': 99009}) == [asn]
+    assert index.candidates({'program': 'progràm'}) == [asn]
+
+
+def test_update():
+    """Associations are re-indexed when their constraints are set"""
+    asns = [
+        Asn(attr('program', '99009'), attr('instrume', None)),
+        Asn(attr('program', '99009'), attr('instrume', 'miri')),
+    ]
+    index = AssociationIndex(asns)
+    item = {'program': '99009', 'instrume': 'nircam'}
+    assert index.candidates(item) == [asns[0]]
+
+    match, reprocess = asns[0].constraints.check_and_set(item)
+    assert match
+    index.update(asns[0])
+    assert index.candidates(item) == [asns[0]]
+    assert index.candidates({'program': '99009', 'instrume': 'miri'}) == [asns[1]]
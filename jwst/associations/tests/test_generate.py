@@ -11,6 +11,11 @@ from .. import (
     generate,
     load_asn
 )
+from ..generate import (
+    _PartitionReplay,
+    partition_keys,
+    partition_pool
+)
 
 
 def test_simple():
@@ -39,6 +44,57 @@ def test_generate(full_pool_rules):
         assert len(schemas) > 0
 
 
+@pytest.mark.slow
+def test_generate_parallel(full_pool_rules):
+    """Test parallel generate finds the same associations"""
+    pool, rules, pool_fname = full_pool_rules
+    asns = generate(pool, rules)
+    parallel_asns = generate(pool, rules, num_processes=2)
+    assert len(parallel_asns) == len(asns)
+    for asn, parallel_asn in zip(asns, parallel_asns):
+        assert type(parallel_asn) is type(asn)
+        assert parallel_asn['asn_id'] == asn['asn_id']
+        assert parallel_asn['products'] == asn['products']
+
+
+@pytest.mark.slow
+def test_generate_parallel_diverged(full_pool_rules, monkeypatch):
+    """Test parallel generate falls back to one process on divergence"""
+    pool, rules, pool_fname = full_pool_rules
+    asns = generate(pool, rules)
+
+    # Record one more association than the partition created
+    replays = []
+    replay_init = _PartitionReplay.__init__
+
+    def diverged_init(self, rules, keys, pool, partitions, steps):
+        replay_init(self, rules, keys, pool, partitions, steps)
+        positions, names, n_new = self._steps[0][0]
+        self._steps[0][0] = (positions, names, n_new + 1)
+        replays.append(self)
+
+    monkeypatch.setattr(_PartitionReplay, '__init__', diverged_init)
+    parallel_asns = generate(pool, rules, num_processes=2)
+    assert len(replays) == 1
+    assert len(parallel_asns) == len(asns)
+    for asn, parallel_asn in zip(asns, parallel_asns):
+        assert type(parallel_asn) is type(asn)
+        assert parallel_asn['asn_id'] == asn['asn_id']
+        assert parallel_asn['products'] == asn['products']
+
+
+def test_partition_pool():
+    """Test splitting pools by the values rules require"""
+    rules = AssociationRegistry()
+    assert partition_keys(rules) == ['program']
+
+    pool = AssociationPool()
+    pool['program'] = ['99009', '00034', '99009', '00034', '99010']
+    keys, partitions = partition_pool(pool, rules)
+    assert keys == ['program']
+    assert partitions == [[0, 2], [1, 3], [4]]
+
+
 @pytest.mark.slow
 def test_serialize(full_pool_rules):
     pool, rules, pool_fname = full_pool_rules
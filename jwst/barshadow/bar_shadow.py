@@ -4,7 +4,7 @@
 
 import numpy as np
 import logging
-from gwcs import wcstools
+from ..assign_wcs import util
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
@@ -61,12 +61,11 @@ def do_correction(input_model, barshadow_model):
                 shadow = create_shadow(shutter_elements, shutter_status)
                 #
                 # For each pixel in the slit subarray
-                #   Make a grid of indices for pixels in the subarray
-                x, y = wcstools.grid_from_bounding_box(slitlet.meta.wcs.bounding_box, step=(1,1))
-                #   Create the transformation from slit_frame to detector
-                det2slit = slitlet.meta.wcs.get_transform('detector', 'slit_frame')
-                #   Use this transformation to calculate x, y and wavelength
-                xslit, yslit, wavelength = det2slit(x, y)
+                #   Use the transformation from detector to slit_frame,
+                #   evaluated on the grid of pixels in the subarray,
+                #   to get x, y and wavelength
+                evaluation = util.evaluate_slit_wcs(slitlet.meta.wcs)
+                xslit, yslit, wavelength = evaluation.slit_frame
                 #   The returned y values are scaled to where the slit height is 1
                 # (i.e. a slit goes from -0.5 to 0.5).  The barshadow array is scaled
                 # so that the separation between the slit centers is 1, i.e. slit height
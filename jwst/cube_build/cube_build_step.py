@@ -5,6 +5,7 @@ from . import cube_build
 from . import ifu_cube
 from . import data_types
 from ..assign_wcs.util import update_s_region_keyword
+from ..lib import pipe_utils
 
 
 __all__ = ["CubeBuildStep"]
@@ -39,6 +40,7 @@ class CubeBuildStep (Step):
          output_type = option('band','channel','grating','multi',default='band') # Type IFUcube to create. Options=band,channel,grating,multi
          search_output_file = boolean(default=false)
          output_use_model = boolean(default=true) # Use filenames in the output models
+         maximum_cores = option('none','quarter','half','all',default='none') # Number of processes used to build the cubes
        """
     reference_file_types = ['cubepar', 'resol']
 
@@ -247,6 +249,7 @@ class CubeBuildStep (Step):
                                           num_cubes)
 
         cube_container = datamodels.ModelContainer() # ModelContainer of ifucubes
+        cubes = [] # IFUCubeData of the standard cubes to build
 
         for i in range(num_cubes):
             icube = str(i + 1)
@@ -293,10 +296,16 @@ class CubeBuildStep (Step):
 
 # Else standard IFU cube building
             else:
-                result = thiscube.build_ifucube()
+                cubes.append(thiscube)
+
+# The standard cubes are independent, so they are built together: with
+# maximum_cores set the input files of all the cubes are mapped in parallel
+        if cubes:
+            num_processes = pipe_utils.get_num_processes(self.maximum_cores)
+            for result in ifu_cube.build_ifucubes(cubes, num_processes):
                 cube_container.append(result)
-            if self.debug_pixel == 1:
-                self.spaxel_debug.close()
+        if self.debug_pixel == 1:
+            self.spaxel_debug.close()
         for cube in cube_container:
             footprint = cube.meta.wcs.footprint(axis_type="spatial")
             update_s_region_keyword(cube, footprint)
@@ -4,6 +4,10 @@ import logging
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
+
+# Maximum number of candidate (point cloud member, spaxel) pairs tested at once
+MAX_PAIRS = 1000000
+
 #________________________________________________________________________________
 def match_det2cube_msm(naxis1, naxis2, naxis3,
                        cdelt1, cdelt2,
@@ -45,76 +49,149 @@ def match_det2cube_msm(naxis1, naxis2, naxis3,
     detector pixels that fall within the roi if the spaxel center.
     """
 
-    nplane = naxis1 * naxis2
+    for ipt, icube_index, weight_distance in match_pairs_msm(naxis1, naxis2, naxis3,
+                                                             cdelt1, cdelt2,
+                                                             zcdelt3,
+                                                             xcenters, ycenters, zcoord,
+                                                             coord1, coord2, wave,
+                                                             rois_pixel, roiw_pixel,
+                                                             weight_pixel, softrad_pixel):
+        weighted_flux = weight_distance * flux[ipt]
+
+        # a spaxel may be matched to several points of the chunk: sum the
+        # pairs of each spaxel before adding them to the cube
+        spaxels, ipair = np.unique(icube_index, return_inverse=True)
+        spaxel_flux[spaxels] += np.bincount(ipair, weighted_flux)
+        spaxel_weight[spaxels] += np.bincount(ipair, weight_distance)
+        spaxel_iflux[spaxels] += np.bincount(ipair)
 
-# now loop over the pixel values for this region and find the spaxels that fall
-# withing the region of interest.
-    nn = coord1.size
-
-#    ilow = 0
-#    ihigh = 0
-#    imatch  = 0
-#    print('looping over n points mapping to cloud',nn)
 #________________________________________________________________________________
-    for ipt in range(0, nn - 1):
-#________________________________________________________________________________
-        # xcenters, ycenters is a flattened 1-D array of the 2 X 2 xy plane
-        # cube coordinates.
-        # find the spaxels that fall withing ROI of point cloud defined  by
-        # coord1,coord2,wave
-        lower_limit = softrad_pixel[ipt]
-        xdistance = (xcenters - coord1[ipt])
-        ydistance = (ycenters - coord2[ipt])
-        radius = np.sqrt(xdistance * xdistance + ydistance * ydistance)
-        indexr = np.where(radius <= rois_pixel[ipt])
-        indexz = np.where(abs(zcoord - wave[ipt]) <= roiw_pixel[ipt])
+def match_pairs_msm(naxis1, naxis2, naxis3,
+                    cdelt1, cdelt2,
+                    zcdelt3,
+                    xcenters, ycenters, zcoord,
+                    coord1, coord2, wave,
+                    rois_pixel, roiw_pixel, weight_pixel, softrad_pixel,
+                    max_pairs=MAX_PAIRS):
 
-        # on the wavelength boundaries the point cloud may not be in the IFUCube
-        # the edge cases are skipped and not included in final IFUcube.
-        # Left commented code for checking later for NIRSPEC the spectral size
-        # in the reference file may be too small
-#        if len(indexz[0]) == 0:
-#            if wave[ipt] < zcoord[0]:
-#               ilow = ilow + 1
-#            elif wave[ipt] > zcoord[-1]: 
-#               ihigh = ihigh + 1
-#            else:
-#                imatch = imatch + 1
-#                print(' no z match found ',wave[ipt],roiw_pixel[ipt])
-#                print(zcoord[naxis3-11:naxis3])
-#                diff = abs(zcoord[naxis3-11:naxis3] - wave[ipt])
-#                print(diff)
-#                exit()
-        if len(indexz[0]) > 0:
-            d1 = np.array(coord1[ipt] - xcenters[indexr]) / cdelt1
-            d2 = np.array(coord2[ipt] - ycenters[indexr]) / cdelt2
-            d3 = np.array(wave[ipt] - zcoord[indexz]) / zcdelt3[indexz]
-
-            dxy = (d1 * d1) + (d2 * d2)
-
-        # shape of dxy is #indexr or number of overlaps in spatial plane
-        # shape of d3 is #indexz or number of overlaps in spectral plane
-        # shape of dxy_matrix & d3_matrix  (#indexr, #indexz)
-        # rows = number of overlaps in spatial plane
-        # cols = number of overlaps in spectral plane
-            dxy_matrix = np.tile(dxy[np.newaxis].T, [1, d3.shape[0]])
-            d3_matrix = np.tile(d3 * d3, [dxy_matrix.shape[0], 1])
-
-            wdistance = dxy_matrix + d3_matrix
-            weight_distance = np.power(np.sqrt(wdistance), weight_pixel[ipt])
-            weight_distance[weight_distance < lower_limit] = lower_limit
-            weight_distance = 1.0 / weight_distance
-            weight_distance = weight_distance.flatten('F')
-            weighted_flux = weight_distance * flux[ipt]
-
-            icube_index = [iz * nplane + ir for iz in indexz[0] for ir in indexr[0]]
-            spaxel_flux[icube_index] = spaxel_flux[icube_index] + weighted_flux
-            spaxel_weight[icube_index] = spaxel_weight[icube_index] + weight_distance
-            spaxel_iflux[icube_index] = spaxel_iflux[icube_index] + 1
-
-#    print('Number of pixels not in ifu cube too low wavelength', ilow)
-#    print('Number of pixels not in ifu cube too high wavelength', ihigh)
-#    print('Number of pixels not in ifu cube not match', imatch)
+    """
+    Short Summary
+    -------------
+    Find the spaxel centers that fall in the ROI of each point cloud member and the
+    modified shepard method weight of each (point cloud member, spaxel) pair.
+
+    The spaxel centers form a regular grid in the spatial plane (xcenters, ycenters
+    are a flattened naxis2 X naxis1 grid with spacing cdelt1, cdelt2) and zcoord
+    increases along the wavelength axis. This grid is used as the spatial index:
+    only the spaxels in the box of columns, rows and wavelength planes around the
+    ROI of each point are tested. The points are processed in chunks, holding at
+    most max_pairs candidate pairs at a time.
+
+    Parameters
+    ----------
+    see match_det2cube_msm
+    max_pairs: maximum number of candidate pairs tested at once
+
+    Returns
+    -------
+    Generates (ipt, icube_index, weight_distance) for each chunk of points:
+    ipt: index of the point cloud member of each pair
+    icube_index: index of the spaxel of each pair in the flattened ifucube
+    weight_distance: weight of each pair
+    """
+
+    nplane = naxis1 * naxis2
+    good = np.where(np.isfinite(coord1) & np.isfinite(coord2) & np.isfinite(wave))[0]
+
+    # range of candidate columns, rows and planes of each point, widened by one
+    # spaxel so that rounding in the edges of the box never drops a spaxel
+    # the exact ROI tests below are the same as for a search over all spaxels
+    x1 = coord1[good]
+    y1 = coord2[good]
+    w1 = wave[good]
+    ix_start = np.floor((x1 - rois_pixel[good] - xcenters[0]) / cdelt1) - 1
+    ix_stop = np.ceil((x1 + rois_pixel[good] - xcenters[0]) / cdelt1) + 2
+    iy_start = np.floor((y1 - rois_pixel[good] - ycenters[0]) / cdelt2) - 1
+    iy_stop = np.ceil((y1 + rois_pixel[good] - ycenters[0]) / cdelt2) + 2
+    ix_start = np.clip(ix_start, 0, naxis1).astype(int)
+    ix_stop = np.clip(ix_stop, 0, naxis1).astype(int)
+    iy_start = np.clip(iy_start, 0, naxis2).astype(int)
+    iy_stop = np.clip(iy_stop, 0, naxis2).astype(int)
+    iz_start = np.clip(np.searchsorted(zcoord, w1 - roiw_pixel[good]) - 1, 0, naxis3)
+    iz_stop = np.clip(np.searchsorted(zcoord, w1 + roiw_pixel[good], side='right') + 1,
+                      0, naxis3)
+
+    nx = ix_stop - ix_start
+    ny = iy_stop - iy_start
+    nz = iz_stop - iz_start
+    inside = np.where((nx > 0) & (ny > 0) & (nz > 0))[0]
+    if inside.size == 0:
+        return
+
+    # the points on the wavelength boundaries or outside of the cube have no
+    # candidate spaxels and are not included in the final IFUcube
+    good = good[inside]
+    ix_start = ix_start[inside]
+    iy_start = iy_start[inside]
+    iz_start = iz_start[inside]
+    nx = nx[inside]
+    ny = ny[inside]
+    nz = nz[inside]
+    nxmax = nx.max()
+    nymax = ny.max()
+    nzmax = nz.max()
+    chunk = max(1, max_pairs // (nxmax * nymax * nzmax))
+
+    for i in range(0, good.size, chunk):
+        ipt = good[i:i + chunk]
+        c1 = coord1[ipt]
+        c2 = coord2[ipt]
+        w = wave[ipt]
+
+        # candidate columns, rows and planes of each point: (npt, nxmax) ...
+        offset = np.arange(nxmax)
+        validx = offset < nx[i:i + chunk, np.newaxis]
+        ix = np.minimum(ix_start[i:i + chunk, np.newaxis] + offset, naxis1 - 1)
+        offset = np.arange(nymax)
+        validy = offset < ny[i:i + chunk, np.newaxis]
+        iy = np.minimum(iy_start[i:i + chunk, np.newaxis] + offset, naxis2 - 1)
+        offset = np.arange(nzmax)
+        validz = offset < nz[i:i + chunk, np.newaxis]
+        iz = np.minimum(iz_start[i:i + chunk, np.newaxis] + offset, naxis3 - 1)
+
+        # spatial candidates: (npt, nymax, nxmax)
+        ixy = iy[:, :, np.newaxis] * naxis1 + ix[:, np.newaxis, :]
+        xdistance = xcenters[ixy] - c1[:, np.newaxis, np.newaxis]
+        ydistance = ycenters[ixy] - c2[:, np.newaxis, np.newaxis]
+        radius = np.sqrt(xdistance * xdistance + ydistance * ydistance)
+        match_xy = (validy[:, :, np.newaxis] & validx[:, np.newaxis, :] &
+                    (radius <= rois_pixel[ipt, np.newaxis, np.newaxis]))
+
+        # spectral candidates: (npt, nzmax)
+        match_z = validz & (abs(zcoord[iz] - w[:, np.newaxis]) <= roiw_pixel[ipt, np.newaxis])
+
+        # matched pairs: (npt, nzmax, nymax, nxmax)
+        jpt, jz, jy, jx = np.nonzero(match_z[:, :, np.newaxis, np.newaxis] &
+                                     match_xy[:, np.newaxis, :, :])
+        if jpt.size == 0:
+            continue
+
+        ixy = ixy[jpt, jy, jx]
+        iz = iz[jpt, jz]
+        d1 = (c1[jpt] - xcenters[ixy]) / cdelt1
+        d2 = (c2[jpt] - ycenters[ixy]) / cdelt2
+        d3 = (w[jpt] - zcoord[iz]) / zcdelt3[iz]
+
+        dxy = (d1 * d1) + (d2 * d2)
+        wdistance = dxy + d3 * d3
+        weight_distance = np.power(np.sqrt(wdistance), weight_pixel[ipt[jpt]])
+        lower_limit = softrad_pixel[ipt[jpt]]
+        weight_distance = np.where(weight_distance < lower_limit,
+                                   lower_limit, weight_distance)
+        weight_distance = 1.0 / weight_distance
+
+        icube_index = iz * nplane + ixy
+        yield ipt[jpt], icube_index, weight_distance
 #_______________________________________________________________________
 def match_det2cube_miripsf(alpha_resol, beta_resol, wave_resol,
                            naxis1, naxis2, naxis3,
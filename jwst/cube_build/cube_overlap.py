@@ -1,7 +1,10 @@
 # Routines used in Spectral Cube Building
 import numpy as np
-import math
 from ..datamodels import dqflags
+
+# Maximum number of (detector pixel, cube pixel) pairs clipped at once
+MAX_PAIRS = 100000
+
 #________________________________________________________________________________
 def FindAreaPoly(nVertices, xpixel, ypixel):
     """
@@ -326,6 +329,135 @@ def SH_FindOverlap(xcenter, ycenter, xlength, ylength, xp_corner, yp_corner):
 
     return areaClipped;
 
+#________________________________________________________________________________
+def FindOverlapAreas(xcenter, ycenter, xlength, ylength, xp_corner, yp_corner):
+    """
+    Summary
+    -------
+    Batched version of SH_FindOverlap: clip many detector pixel quadrilaterals
+    by rectangular cube pixels at once using the Sutherland_hedgeman Polygon
+    Clipping Algorithm and find the overlap areas.
+
+    Each of the 4 sides of the cube pixel is clipped for all the pairs in a single
+    pass over the polygon vertices, with the same intersection rules as
+    solveIntersection.
+
+    Parameters
+    ---------
+    xcenter: center grid point in x dimension for each cube pixel, shape (n,)
+    ycenter: center grid point in y dimension for each cube pixel, shape (n,)
+    xlength : width of spaxels in x dimesion (along slice- alpha)
+    ylength : width of spaxels in y dimesion (lambda)
+    xp_corner: alpha pixel corner values, shape (n, 4)
+    yp_corner: lambda pixel corner values, shape (n, 4)
+
+    Returns
+    -------
+    AreaOverlap, shape (n,)
+    """
+
+    MaxVertices = 9
+    top = ycenter + 0.5 * ylength
+    bottom = ycenter - 0.5 * ylength
+    left = xcenter - 0.5 * xlength
+    right = xcenter + 0.5 * xlength
+
+    npairs = len(xcenter)
+    index = np.arange(npairs)
+    xPixel = np.asarray(xp_corner, dtype=np.float64)
+    yPixel = np.asarray(yp_corner, dtype=np.float64)
+    nVertices = np.full(npairs, 4)
+
+    for edge in range(0, 4):     # 0:left, 1: right, 2: bottom, 3: top
+        # each side of the polygon adds at most 2 vertices
+        xnew = np.zeros((npairs, 2 * xPixel.shape[1]))
+        ynew = np.zeros((npairs, 2 * xPixel.shape[1]))
+        nVertices2 = np.zeros(npairs, dtype=int)
+        last = np.maximum(nVertices, 1)
+
+        for j in range(0, xPixel.shape[1]):
+            active = j < nVertices
+            x1 = xPixel[:, j]
+            y1 = yPixel[:, j]
+            x2 = xPixel[index, (j + 1) % last]
+            y2 = yPixel[index, (j + 1) % last]
+
+            if edge == 0:
+                stat1 = x1 > left
+                stat2 = x2 > left
+            elif edge == 1:
+                stat1 = x1 < right
+                stat2 = x2 < right
+            elif edge == 2:
+                stat1 = y1 > bottom
+                stat2 = y2 > bottom
+            else:
+                stat1 = y1 < top
+                stat2 = y2 < top
+
+            # condition 1: outside -> inside, add intersection and second point
+            # condition 2: inside -> inside, add second point
+            # condition 3: inside -> outside, add intersection
+            add_intersection = active & (stat1 != stat2)
+            add_second = active & stat2
+
+            if np.any(add_intersection):
+                x, y = _solve_intersections(edge, x1, y1, x2, y2,
+                                            left, right, top, bottom)
+                _add_points(x, y, xnew, ynew, nVertices2, add_intersection)
+            _add_points(x2, y2, xnew, ynew, nVertices2, add_second)
+
+        if np.any(nVertices2 > MaxVertices - 1):
+            raise Error2DPolygon(" Failure in finding the clipped polygon, nVertices2 > 9 ")
+
+        ncols = max(nVertices2.max(), 1) if npairs > 0 else 1
+        xPixel = xnew[:, :ncols]
+        yPixel = ynew[:, :ncols]
+        nVertices = nVertices2
+
+    # area of the clipped polygons, relative to the minimum x, y of each polygon
+    ncols = xPixel.shape[1]
+    valid = np.arange(ncols) < nVertices[:, np.newaxis]
+    xmin = np.where(valid, xPixel, np.inf).min(axis=1)
+    ymin = np.where(valid, yPixel, np.inf).min(axis=1)
+    xmin[nVertices == 0] = 0.0
+    ymin[nVertices == 0] = 0.0
+    xrel = np.where(valid, xPixel - xmin[:, np.newaxis], 0.0)
+    yrel = np.where(valid, yPixel - ymin[:, np.newaxis], 0.0)
+
+    # close the polygons
+    inext = (np.arange(ncols) + 1) % np.maximum(nVertices, 1)[:, np.newaxis]
+    xnext = xrel[index[:, np.newaxis], inext]
+    ynext = yrel[index[:, np.newaxis], inext]
+    area = np.where(valid, xrel * ynext - xnext * yrel, 0.0).sum(axis=1)
+
+    return np.abs(0.5 * area)
+
+
+def _solve_intersections(edge, x1, y1, x2, y2, left, right, top, bottom):
+    """Array version of solveIntersection for one edge of the cube pixels"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vertical = x2 == x1
+        m = np.where(vertical, 0.0, (y2 - y1) / np.where(vertical, 1.0, x2 - x1))
+        if edge == 0 or edge == 1:
+            x = left if edge == 0 else right
+            x = np.broadcast_to(x, x1.shape)
+            y = y1 + m * (x - x1)
+        else:
+            y = bottom if edge == 2 else top
+            y = np.broadcast_to(y, y1.shape)
+            x = np.where(vertical, x1, x1 + (1.0 / m) * (y - y1))
+    return x, y
+
+
+def _add_points(x, y, xnew, ynew, nVertices2, mask):
+    """Array version of addpoint: add x, y to the polygons selected by mask"""
+    rows = np.where(mask)[0]
+    cols = nVertices2[rows]
+    xnew[rows, cols] = x[rows]
+    ynew[rows, cols] = y[rows]
+    nVertices2[rows] += 1
+
 #________________________________________________________________________________
 def match_det2cube(x, y, sliceno, start_slice, input_model, transform,
                    spaxel_flux,
@@ -360,7 +492,7 @@ def match_det2cube(x, y, sliceno, start_slice, input_model, transform,
     """
     nxc = len(xcoord)
     nzc = len(zcoord)
-
+    nplane = naxis1 * naxis2
 
     sliceno_use = sliceno - start_slice + 1
 # 1-1 mapping in beta
@@ -388,80 +520,70 @@ def match_det2cube(x, y, sliceno, start_slice, input_model, transform,
     xx_left = x
     xx_right = x + 1
 
-    alpha, beta, lam = transform(x, y)
     alpha1, beta1, lam1 = transform(xx_left, yy_bot)
     alpha2, beta2, lam2 = transform(xx_right, yy_bot)
     alpha3, beta3, lam3 = transform(xx_right, yy_top)
     alpha4, beta4, lam4 = transform(xx_left, yy_top)
 
-    nn = len(x)
-    # Loop over all pixels in slice
-    for ipixel in range(0, nn - 1):
-
-        # detector pixel -> 4 corners
-        # In alpha,wave space
-        # in beta space: beta center + width
-
-        alpha_corner = []
-        wave_corner = []
-
-        alpha_corner.append(alpha1[ipixel])
-        alpha_corner.append(alpha2[ipixel])
-        alpha_corner.append(alpha3[ipixel])
-        alpha_corner.append(alpha4[ipixel])
-
-        wave_corner.append(lam1[ipixel])
-        wave_corner.append(lam2[ipixel])
-        wave_corner.append(lam3[ipixel])
-        wave_corner.append(lam4[ipixel])
-
-#________________________________________________________________________________
-# Now it does not matter the WCS method used
-        alpha_min = min(alpha_corner)
-        alpha_max = max(alpha_corner)
-        wave_min = min(wave_corner)
-        wave_max = max(wave_corner)
-        #_______________________________________________________________________
-
-        Area = FindAreaQuad(alpha_min, wave_min, alpha_corner, wave_corner)
-
-        # estimate the where the pixel overlaps in the cube
-        # find the min and max values in the cube xcoord,ycoord and zcoord
-
-        MinA = (alpha_min - crval1) / cdelt1
-        MaxA = (alpha_max - crval1) / cdelt1
-        ix1 = max(0, int(math.trunc(MinA)))
-        ix2 = int(math.ceil(MaxA))
-        if ix2 >= nxc:
-            ix2 = nxc - 1
-
-        MinW = (wave_min - crval3) / cdelt3
-        MaxW = (wave_max - crval3) / cdelt3
-        iz1 = int(math.trunc(MinW))
-        iz2 = int(math.ceil(MaxW))
-        if iz2 >= nzc:
-            iz2 = nzc - 1
-        #_______________________________________________________________________
-        # loop over possible overlapping cube pixels
-#        noverlap = 0
-        nplane = naxis1 * naxis2
-
-        for zz in range(iz1, iz2 + 1):
-            zcenter = zcoord[zz]
-            istart = zz * nplane
-
-            for xx in range(ix1, ix2 + 1):
-                cube_index = istart + yy * naxis1 + xx #yy = slice # -1
-                xcenter = xcoord[xx]
-                AreaOverlap = SH_FindOverlap(xcenter, zcenter,
-                                             cdelt1, cdelt3,
-                                             alpha_corner, wave_corner)
-
-                if AreaOverlap > 0.0:
-                    AreaRatio = AreaOverlap / Area
-                    spaxel_flux[cube_index] = spaxel_flux[cube_index] + (AreaRatio * pixel_flux[ipixel])
-                    spaxel_weight[cube_index] = spaxel_weight[cube_index] + AreaRatio
-                    spaxel_iflux[cube_index] = spaxel_iflux[cube_index] + 1
+    # detector pixel -> 4 corners
+    # In alpha,wave space
+    # in beta space: beta center + width
+    alpha_corner = np.stack([alpha1, alpha2, alpha3, alpha4], axis=1)
+    wave_corner = np.stack([lam1, lam2, lam3, lam4], axis=1)
+    alpha_min = alpha_corner.min(axis=1)
+    alpha_max = alpha_corner.max(axis=1)
+    wave_min = wave_corner.min(axis=1)
+    wave_max = wave_corner.max(axis=1)
+
+    # area of the detector pixels (see FindAreaQuad)
+    px = alpha_corner - alpha_min[:, np.newaxis]
+    py = wave_corner - wave_min[:, np.newaxis]
+    Area = np.abs(0.5 * np.sum(px * np.roll(py, -1, axis=1) -
+                               np.roll(px, -1, axis=1) * py, axis=1))
+
+    # estimate the where the pixel overlaps in the cube
+    # find the min and max values in the cube xcoord,ycoord and zcoord
+    with np.errstate(invalid='ignore'):
+        ix1 = np.maximum(0, np.trunc((alpha_min - crval1) / cdelt1))
+        ix2 = np.minimum(np.ceil((alpha_max - crval1) / cdelt1), nxc - 1)
+        iz1 = np.maximum(0, np.trunc((wave_min - crval3) / cdelt3))
+        iz2 = np.minimum(np.ceil((wave_max - crval3) / cdelt3), nzc - 1)
+    usable = np.isfinite(Area) & np.isfinite(ix1 + ix2 + iz1 + iz2) & (Area > 0)
+    nx = np.where(usable, ix2 - ix1 + 1, 0).clip(0).astype(int)
+    nz = np.where(usable, iz2 - iz1 + 1, 0).clip(0).astype(int)
+    ix1 = np.where(usable, ix1, 0).astype(int)
+    iz1 = np.where(usable, iz1, 0).astype(int)
+
+    # the (detector pixel, cube pixel) pairs that may overlap, in chunks of
+    # detector pixels holding at most MAX_PAIRS pairs
+    npairs = nx * nz
+    ends = np.cumsum(npairs)
+    first = 0
+    while first < len(npairs):
+        last = max(np.searchsorted(ends, ends[first] - npairs[first] + MAX_PAIRS,
+                                   side='right'), first + 1)
+        chunk_pairs = npairs[first:last]
+        ipixel = np.repeat(np.arange(first, last), chunk_pairs)
+        if ipixel.size > 0:
+            # position of each pair in the nz x nx box of its detector pixel
+            ibox = np.arange(ipixel.size) - np.repeat(np.cumsum(chunk_pairs) - chunk_pairs,
+                                                      chunk_pairs)
+            xx = ix1[ipixel] + ibox % nx[ipixel]
+            zz = iz1[ipixel] + ibox // nx[ipixel]
+
+            AreaOverlap = FindOverlapAreas(xcoord[xx], zcoord[zz],
+                                           cdelt1, cdelt3,
+                                           alpha_corner[ipixel], wave_corner[ipixel])
+            overlap = AreaOverlap > 0.0
+            ipixel = ipixel[overlap]
+            AreaRatio = AreaOverlap[overlap] / Area[ipixel]
+            cube_index = zz[overlap] * nplane + yy * naxis1 + xx[overlap] #yy = slice # -1
+
+            spaxels, ipair = np.unique(cube_index, return_inverse=True)
+            spaxel_flux[spaxels] += np.bincount(ipair, AreaRatio * pixel_flux[ipixel])
+            spaxel_weight[spaxels] += np.bincount(ipair, AreaRatio)
+            spaxel_iflux[spaxels] += np.bincount(ipair)
+        first = last
 #________________________________________________________________________________
 class Error2DPolygon(Exception):
     pass
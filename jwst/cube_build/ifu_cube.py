@@ -12,6 +12,7 @@ from astropy import units as u
 from gwcs import wcstools
 from ..assign_wcs import nirspec
 from ..datamodels import dqflags
+from ..lib.pipe_utils import run_tasks
 from . import cube_build_wcs_util
 from . import cube_overlap
 # from . import cube_cloud_quick
@@ -482,169 +483,240 @@ class IFUCubeData():
 
         """
 
-        self.output_name = self.define_cubename()
+        self.spaxel_flux, self.spaxel_weight, self.spaxel_iflux = \
+            self.new_spaxel_arrays()
+
+        # now need to loop over every file that covers this channel/subchannel (MIRI)
+        # or Grating/filter(NIRSPEC)
+        #and map the detector pixels to the cube spaxel
+        for this_par1, this_par2, k in self.file_tasks():
+            self.map_file_to_cube(this_par1, this_par2, k,
+                                  self.spaxel_flux,
+                                  self.spaxel_weight,
+                                  self.spaxel_iflux)
+
+        return self.finish_ifucube()
+
+#********************************************************************************
+
+    def new_spaxel_arrays(self):
+
+        """
+        Short Summary
+        -------------
+        Create empty spaxel accumulators for the IFU cube
+
+        Returns
+        -------
+        spaxel_flux, spaxel_weight, spaxel_iflux: arrays of zeros, one value per spaxel
+        """
+
         total_num = self.naxis1 * self.naxis2 * self.naxis3
-        self.spaxel_flux = np.zeros(total_num)
-        self.spaxel_weight = np.zeros(total_num)
-        self.spaxel_iflux = np.zeros(total_num)
+        return np.zeros(total_num), np.zeros(total_num), np.zeros(total_num)
 
-        spaxel_ra = None
-        spaxel_dec = None
-        spaxel_wave = None
-#________________________________________________________________________________
-# Only preformed if weighting = MIRIPSF, first convert xi,eta cube to
-# v2,v3,wave. This information if past to cube_cloud and for each
-# input_model the v2,v3, wave is converted to alpha,beta in detector plane
-# ra,dec, wave is independent of input_model
-# v2,v3, alpha,beta depends on the input_model
-        if self.weighting == 'miripsf':
-            spaxel_ra = np.zeros(total_num)
-            spaxel_dec = np.zeros(total_num)
-            spaxel_wave = np.zeros(total_num)
+#********************************************************************************
 
-            nxy = self.xcenters.size
-            nz = self.zcoord.size
-            for iz in range(nz):
-                istart = iz * nxy
-                for ixy in range(nxy):
-                    ii = istart + ixy
-                    spaxel_ra[ii], spaxel_dec[ii] = coord.std2radec(self.crval1,
-                                                                    self.crval2,
-                                                                    self.xcenters[ixy],
-                                                                    self.ycenters[ixy])
-                    spaxel_wave[ii] = self.zcoord[iz]
-#________________________________________________________________________________
+    def file_tasks(self):
 
-        subtract_background = True
+        """
+        Short Summary
+        -------------
+        List the files that are mapped to the IFU cube: every file that covers
+        each channel/subchannel (MIRI) or grating/filter (NIRSPEC) of the cube
 
-        # now need to loop over every file that covers this channel/subchannel (MIRI)
-        # or Grating/filter(NIRSPEC)
-        #and map the detector pixels to the cube spaxel
+        Returns
+        -------
+        list of (this_par1, this_par2, k), where k is the index of the file
+        in master_table.FileMap[instrument][this_par1][this_par2]
+        """
 
+        self.output_name = self.define_cubename()
+        tasks = []
         number_bands = len(self.list_par1)
-        t0 = time.time()
         for i in range(number_bands):
             this_par1 = self.list_par1[i]
             this_par2 = self.list_par2[i]
-            nfiles = len(self.master_table.FileMap[self.instrument][this_par1][this_par2])
-#________________________________________________________________________________
-# loop over the files that cover the spectral range the cube is for
-            for k in range(nfiles):
-                ifile = self.master_table.FileMap[self.instrument][this_par1][this_par2][k]
+            filemap = self.master_table.FileMap[self.instrument][this_par1][this_par2]
+            for k, ifile in enumerate(filemap):
                 self.this_cube_filenames.append(ifile)
-                log.debug("Working on Band defined by:%s %s ", this_par1, this_par2)
+                tasks.append((this_par1, this_par2, k))
+        return tasks
+
+#********************************************************************************
+
+    def map_file_to_cube(self, this_par1, this_par2, k,
+                         spaxel_flux, spaxel_weight, spaxel_iflux):
+
+        """
+        Short Summary
+        -------------
+        Map the detector pixels of one input file to the IFU cube and add their
+        weighted fluxes to the spaxel accumulators
+
+        Parameters
+        ----------
+        this_par1, this_par2: channel/subchannel (MIRI) or grating/filter (NIRSPEC)
+        k: index of the file in master_table.FileMap[instrument][this_par1][this_par2]
+        spaxel_flux, spaxel_weight, spaxel_iflux: spaxel accumulators
+
+        Returns
+        -------
+        spaxel_flux, spaxel_weight and spaxel_iflux updated with the information from
+        the detector pixels of the file
+        """
+
+        subtract_background = True
+        ifile = self.master_table.FileMap[self.instrument][this_par1][this_par2][k]
+        log.debug("Working on Band defined by:%s %s ", this_par1, this_par2)
 #--------------------------------------------------------------------------------
-                if self.interpolation == 'pointcloud':
-                    t0 = time.time()
-                    pixelresult = self.map_detector_to_outputframe(this_par1,
-                                                                   this_par2,
-                                                                   subtract_background,
-                                                                   ifile)
-
-                    coord1, coord2, wave, flux, rois_pixel, roiw_pixel, weight_pixel,\
-                        softrad_pixel, alpha_det, beta_det = pixelresult
-                    t1 = time.time()
-                    log.info("Time to transform pixels to output frame = %.1f.s" % (t1 - t0,))
-                    if self.weighting == 'msm':
-                        t0 = time.time()
-#                        if self.new_code:
-#                            print('calling new cube_cloud')
-#                            cube_cloud_quick.match_det2cube_msm(self.naxis1,self.naxis2,self.naxis3,
-#                                                              self.cdelt1,self.cdelt2,self.cdelt3,
-#                                                              self.rois,self.roiw,self.weight_power,
-#                                                              self.xcoord,self.ycoord,self.zcoord,
-#                                                              self.spaxel_flux,
-#                                                              self.spaxel_weight,
-#                                                              self.spaxel_iflux,
-#                                                              flux,
-#                                                              coord1,coord2,wave)
-#                        else:
-#                            print('calling old cube_cloud')
-                        cube_cloud.match_det2cube_msm(self.naxis1, self.naxis2, self.naxis3,
-                                                      self.cdelt1, self.cdelt2,
-                                                      self.cdelt3_normal,
+        if self.interpolation == 'pointcloud':
+            t0 = time.time()
+            pixelresult = self.map_detector_to_outputframe(this_par1,
+                                                           this_par2,
+                                                           subtract_background,
+                                                           ifile)
+
+            coord1, coord2, wave, flux, rois_pixel, roiw_pixel, weight_pixel,\
+                softrad_pixel, alpha_det, beta_det = pixelresult
+            t1 = time.time()
+            log.info("Time to transform pixels to output frame = %.1f.s" % (t1 - t0,))
+            if self.weighting == 'msm':
+                t0 = time.time()
+                cube_cloud.match_det2cube_msm(self.naxis1, self.naxis2, self.naxis3,
+                                              self.cdelt1, self.cdelt2,
+                                              self.cdelt3_normal,
+                                              self.xcenters, self.ycenters, self.zcoord,
+                                              spaxel_flux,
+                                              spaxel_weight,
+                                              spaxel_iflux,
+                                              flux,
+                                              coord1, coord2, wave,
+                                              rois_pixel, roiw_pixel, weight_pixel,
+                                              softrad_pixel)
+
+                t1 = time.time()
+                log.info("Time to match file to ifucube = %.1f.s" % (t1 - t0,))
+#________________________________________________________________________________
+            elif self.weighting == 'miripsf':
+                spaxel_ra, spaxel_dec, spaxel_wave = self.spaxel_world()
+                with datamodels.IFUImageModel(ifile) as input_model:
+                    wave_resol = self.instrument_info.Get_RP_ave_Wave(this_par1,
+                                                                      this_par2)
+
+                    alpha_resol = self.instrument_info.Get_psf_alpha_parameters()
+                    beta_resol = self.instrument_info.Get_psf_beta_parameters()
+
+                    worldtov23 = input_model.meta.wcs.get_transform("world", "v2v3")
+                    v2ab_transform = input_model.meta.wcs.get_transform('v2v3',
+                                                                        'alpha_beta')
+
+                    spaxel_v2, spaxel_v3, zl = worldtov23(spaxel_ra,
+                                                          spaxel_dec,
+                                                          spaxel_wave)
+
+                    spaxel_alpha, spaxel_beta, spaxel_wave = v2ab_transform(spaxel_v2,
+                                                                            spaxel_v3,
+                                                                            zl)
+                    cube_cloud.match_det2cube_miripsf(alpha_resol,
+                                                      beta_resol,
+                                                      wave_resol,
+                                                      self.naxis1, self.naxis2, self.naxis3,
                                                       self.xcenters, self.ycenters, self.zcoord,
-                                                      self.spaxel_flux,
-                                                      self.spaxel_weight,
-                                                      self.spaxel_iflux,
+                                                      spaxel_flux,
+                                                      spaxel_weight,
+                                                      spaxel_iflux,
+                                                      spaxel_alpha, spaxel_beta, spaxel_wave,
                                                       flux,
                                                       coord1, coord2, wave,
+                                                      alpha_det, beta_det,
                                                       rois_pixel, roiw_pixel, weight_pixel,
                                                       softrad_pixel)
-
-
-                        t1 = time.time()
-                        log.info("Time to match file to ifucube = %.1f.s" % (t1 - t0,))
-#________________________________________________________________________________
-                    elif self.weighting == 'miripsf':
-                        with datamodels.IFUImageModel(ifile) as input_model:
-                            wave_resol = self.instrument_info.Get_RP_ave_Wave(this_par1,
-                                                                              this_par2)
-
-                            alpha_resol = self.instrument_info.Get_psf_alpha_parameters()
-                            beta_resol = self.instrument_info.Get_psf_beta_parameters()
-
-                            worldtov23 = input_model.meta.wcs.get_transform("world", "v2v3")
-                            v2ab_transform = input_model.meta.wcs.get_transform('v2v3',
-                                                                'alpha_beta')
-
-                            spaxel_v2, spaxel_v3, zl = worldtov23(spaxel_ra,
-                                                                  spaxel_dec,
-                                                                  spaxel_wave)
-
-                            spaxel_alpha, spaxel_beta, spaxel_wave = v2ab_transform(spaxel_v2,
-                                                                                    spaxel_v3,
-                                                                                    zl)
-                            cube_cloud.match_det2cube_miripsf(alpha_resol,
-                                                              beta_resol,
-                                                              wave_resol,
-                                                              self.naxis1, self.naxis2, self.naxis3,
-                                                              self.xcenters, self.ycenters, self.zcoord,
-                                                              self.spaxel_flux,
-                                                              self.spaxel_weight,
-                                                              self.spaxel_iflux,
-                                                              spaxel_alpha, spaxel_beta, spaxel_wave,
-                                                              flux,
-                                                              coord1, coord2, wave,
-                                                              alpha_det, beta_det,
-                                                              rois_pixel, roiw_pixel, weight_pixel,
-                                                              softrad_pixel)
 #--------------------------------------------------------------------------------
 #2D area method - only works for single files and coord_system = 'alpha-beta'
 #--------------------------------------------------------------------------------
-                elif self.interpolation == 'area':
-                    with datamodels.IFUImageModel(ifile) as input_model:
-                        det2ab_transform = input_model.meta.wcs.get_transform('detector',
-                                                                              'alpha_beta')
-                        start_region = self.instrument_info.GetStartSlice(this_par1)
-                        end_region = self.instrument_info.GetEndSlice(this_par1)
-                        regions = list(range(start_region, end_region + 1))
-                        t0 = time.time()
-                        for i in regions:
-                            log.info('Working on Slice # %d', i)
-                            y, x = (det2ab_transform.label_mapper.mapper == i).nonzero()
+        elif self.interpolation == 'area':
+            with datamodels.IFUImageModel(ifile) as input_model:
+                det2ab_transform = input_model.meta.wcs.get_transform('detector',
+                                                                      'alpha_beta')
+                start_region = self.instrument_info.GetStartSlice(this_par1)
+                end_region = self.instrument_info.GetEndSlice(this_par1)
+                regions = list(range(start_region, end_region + 1))
+                t0 = time.time()
+                for i in regions:
+                    log.info('Working on Slice # %d', i)
+                    y, x = (det2ab_transform.label_mapper.mapper == i).nonzero()
 
 # getting pixel corner - ytop = y + 1 (routine fails for y = 1024)
-                            index = np.where(y < 1023)
-                            y = y[index]
-                            x = x[index]
-                            cube_overlap.match_det2cube(x, y, i,
-                                                        start_region,
-                                                        input_model,
-                                                        det2ab_transform,
-                                                        self.spaxel_flux,
-                                                        self.spaxel_weight,
-                                                        self.spaxel_iflux,
-                                                        self.xcoord, self.zcoord,
-                                                        self.crval1, self.crval3,
-                                                        self.cdelt1, self.cdelt3,
-                                                        self.naxis1, self.naxis2)
-                        t1 = time.time()
-
-                        log.info("Time Map All slices on Detector to Cube = %.1f.s" % (t1 - t0,))
-#_______________________________________________________________________
-# Mapped all data to cube or Point Cloud
-# now determine Cube Spaxel flux
+                    index = np.where(y < 1023)
+                    y = y[index]
+                    x = x[index]
+                    cube_overlap.match_det2cube(x, y, i,
+                                                start_region,
+                                                input_model,
+                                                det2ab_transform,
+                                                spaxel_flux,
+                                                spaxel_weight,
+                                                spaxel_iflux,
+                                                self.xcoord, self.zcoord,
+                                                self.crval1, self.crval3,
+                                                self.cdelt1, self.cdelt3,
+                                                self.naxis1, self.naxis2)
+                t1 = time.time()
+
+                log.info("Time Map All slices on Detector to Cube = %.1f.s" % (t1 - t0,))
+
+#********************************************************************************
+
+    def spaxel_world(self):
+
+        """
+        Short Summary
+        -------------
+        Only used if weighting = MIRIPSF: convert the xi,eta cube spaxel centers to
+        ra,dec, wave. This information is passed to cube_cloud and for each
+        input_model the v2,v3, wave is converted to alpha,beta in detector plane.
+        ra,dec, wave is independent of input_model, so it is computed once per cube
+
+        Returns
+        -------
+        spaxel_ra, spaxel_dec, spaxel_wave: world coordinates of each spaxel
+        """
+
+        if getattr(self, '_spaxel_world', None) is None:
+            total_num = self.naxis1 * self.naxis2 * self.naxis3
+            spaxel_ra = np.zeros(total_num)
+            spaxel_dec = np.zeros(total_num)
+            spaxel_wave = np.zeros(total_num)
+
+            nxy = self.xcenters.size
+            nz = self.zcoord.size
+            for iz in range(nz):
+                istart = iz * nxy
+                for ixy in range(nxy):
+                    ii = istart + ixy
+                    spaxel_ra[ii], spaxel_dec[ii] = coord.std2radec(self.crval1,
+                                                                    self.crval2,
+                                                                    self.xcenters[ixy],
+                                                                    self.ycenters[ixy])
+                    spaxel_wave[ii] = self.zcoord[iz]
+            self._spaxel_world = (spaxel_ra, spaxel_dec, spaxel_wave)
+        return self._spaxel_world
+
+#********************************************************************************
+
+    def finish_ifucube(self):
+
+        """
+        Short Summary
+        -------------
+        Once all the data are mapped to the cube, find the flux of each spaxel
+        from the spaxel accumulators and fill in the final IFU cube.
+        The accumulators are released once the cube is filled in.
+
+        Returns
+        -------
+        Returns an ifu cube
+        """
 
         t0 = time.time()
         self.find_spaxel_flux()
@@ -656,6 +728,7 @@ class IFUCubeData():
 #_______________________________________________________________________
 # shove Flux and iflux in the  final IFU cube
         self.update_ifucube(ifucube_model)
+        self.spaxel_flux = self.spaxel_weight = self.spaxel_iflux = None
         return ifucube_model
 
 #********************************************************************************
@@ -1464,6 +1537,73 @@ class IFUCubeData():
         output_file = IFUCube.meta.filename
         blendmeta.blendmodels(IFUCube, inputs=self.input_models,
                               output=output_file)
+#********************************************************************************
+def build_ifucubes(cubes, num_processes=1):
+
+    """
+    Short Summary
+    -------------
+    Build a list of IFU cubes, whose parameters and wcs are already set up.
+
+    With one process the cubes are built one after another. Otherwise the
+    input files of all the cubes are mapped to their cubes concurrently: the
+    (cube, file) pairs are spread over the worker processes, each worker adds
+    the detector fluxes to its own spaxel accumulators, and the accumulators
+    of all the workers are summed for each cube before finding the spaxel flux.
+
+    Parameters
+    ----------
+    cubes: list of IFUCubeData
+    num_processes: number of worker processes to use
+
+    Returns
+    -------
+    list of ifu cubes, in the order of cubes
+    """
+
+    if num_processes <= 1:
+        return [cube.build_ifucube() for cube in cubes]
+
+    tasks = []
+    for icube, cube in enumerate(cubes):
+        for task in cube.file_tasks():
+            tasks.append((icube,) + task)
+    num_processes = max(min(num_processes, len(tasks)), 1)
+
+    log.info("Mapping %i files to %i IFU cubes using %i processes",
+             len(tasks), len(cubes), num_processes)
+# interleave the tasks so the files of each cube are shared by all the workers
+    worker_tasks = [(_map_files_to_cubes, (cubes, tasks[i::num_processes]))
+                    for i in range(num_processes)]
+    worker_results = list(run_tasks(worker_tasks, num_processes))
+
+    # Finish each cube before summing the accumulators of the next one
+    ifucubes = []
+    for icube, cube in enumerate(cubes):
+        cube.spaxel_flux, cube.spaxel_weight, cube.spaxel_iflux = \
+            cube.new_spaxel_arrays()
+        for result in worker_results:
+            if icube in result:
+                flux, weight, iflux = result.pop(icube)
+                cube.spaxel_flux += flux
+                cube.spaxel_weight += weight
+                cube.spaxel_iflux += iflux
+        ifucubes.append(cube.finish_ifucube())
+
+    return ifucubes
+
+
+def _map_files_to_cubes(cubes, tasks):
+    """Map files to the cubes, returning the spaxel accumulators of each cube"""
+    accumulators = {}
+    for icube, this_par1, this_par2, k in tasks:
+        cube = cubes[icube]
+        if icube not in accumulators:
+            accumulators[icube] = cube.new_spaxel_arrays()
+        cube.map_file_to_cube(this_par1, this_par2, k, *accumulators[icube])
+    return accumulators
+
+
 class IncorrectInput(Exception):
     pass
 
@@ -0,0 +1,133 @@
+"""Test matching point cloud members to spaxels"""
+import numpy as np
+import pytest
+
+from .. import cube_cloud
+
+
+def make_cube():
+    """Spaxel centers of a small cube, on a grid of exact binary fractions"""
+    naxis1, naxis2, naxis3 = 7, 5, 9
+    cdelt1, cdelt2 = 0.25, 0.5
+    ycenters, xcenters = np.mgrid[:naxis2, :naxis1]
+    xcenters = -0.75 + cdelt1 * xcenters.ravel()
+    ycenters = 1.5 + cdelt2 * ycenters.ravel()
+    zcoord = 2. + 0.125 * np.array([0., 1., 2., 4., 5., 7., 8., 10., 11.])
+    zcdelt3 = np.gradient(zcoord)
+    return (naxis1, naxis2, naxis3, cdelt1, cdelt2, zcdelt3,
+            xcenters, ycenters, zcoord)
+
+
+def make_cloud(cube, npt=300, seed=0):
+    """Points in and around the cube, some undefined"""
+    naxis1, naxis2, naxis3, cdelt1, cdelt2, zcdelt3, xcenters, ycenters, zcoord = cube
+    rng = np.random.RandomState(seed)
+    coord1 = rng.uniform(xcenters.min() - 1., xcenters.max() + 1., npt)
+    coord2 = rng.uniform(ycenters.min() - 1., ycenters.max() + 1., npt)
+    wave = rng.uniform(zcoord[0] - 0.5, zcoord[-1] + 0.5, npt)
+    coord1[:5] = np.nan
+    wave[5:10] = np.nan
+    rois_pixel = rng.uniform(0.2, 0.6, npt)
+    roiw_pixel = rng.uniform(0.1, 0.3, npt)
+    weight_pixel = rng.choice([1., 2.], npt)
+    softrad_pixel = np.full(npt, 0.01)
+
+    # the last point is on the spatial and spectral boundaries of the ROI
+    # of spaxel (3, 2) in plane 4, and the point before it is beyond the last
+    # plane of the cube, on the boundary of its ROI
+    coord1[-1] = xcenters[2 * naxis1 + 3] + 0.5
+    coord2[-1] = ycenters[2 * naxis1 + 3]
+    wave[-1] = zcoord[4] + 0.25
+    rois_pixel[-1] = 0.5
+    roiw_pixel[-1] = 0.25
+    coord1[-2] = xcenters[0]
+    coord2[-2] = ycenters[0]
+    wave[-2] = zcoord[-1] + 0.125
+    rois_pixel[-2] = 0.125
+    roiw_pixel[-2] = 0.125
+    return coord1, coord2, wave, rois_pixel, roiw_pixel, weight_pixel, softrad_pixel
+
+
+def brute_force_pairs(cube, cloud):
+    """The weight of each (point, spaxel) pair, testing every spaxel"""
+    naxis1, naxis2, naxis3, cdelt1, cdelt2, zcdelt3, xcenters, ycenters, zcoord = cube
+    coord1, coord2, wave, rois_pixel, roiw_pixel, weight_pixel, softrad_pixel = cloud
+    nplane = naxis1 * naxis2
+    pairs = {}
+    for ipt in range(coord1.size):
+        for iz in range(naxis3):
+            if not abs(zcoord[iz] - wave[ipt]) <= roiw_pixel[ipt]:
+                continue
+            for ixy in range(nplane):
+                xdistance = xcenters[ixy] - coord1[ipt]
+                ydistance = ycenters[ixy] - coord2[ipt]
+                radius = np.sqrt(xdistance * xdistance + ydistance * ydistance)
+                if not radius <= rois_pixel[ipt]:
+                    continue
+                d1 = (coord1[ipt] - xcenters[ixy]) / cdelt1
+                d2 = (coord2[ipt] - ycenters[ixy]) / cdelt2
+                d3 = (wave[ipt] - zcoord[iz]) / zcdelt3[iz]
+                weight = np.power(np.sqrt(d1 * d1 + d2 * d2 + d3 * d3),
+                                  weight_pixel[ipt])
+                weight = max(weight, softrad_pixel[ipt])
+                pairs[ipt, iz * nplane + ixy] = 1.0 / weight
+    return pairs
+
+
+@pytest.mark.parametrize('max_pairs', [cube_cloud.MAX_PAIRS, 200, 1])
+def test_match_pairs_msm(max_pairs):
+    """The pairs and weights are those of a search over all spaxels"""
+    cube = make_cube()
+    cloud = make_cloud(cube)
+    expected = brute_force_pairs(cube, cloud)
+
+    chunks = list(cube_cloud.match_pairs_msm(*cube, *cloud, max_pairs=max_pairs))
+    if max_pairs == 1:
+        # one point at a time
+        assert all(np.unique(ipt).size == 1 for ipt, _, _ in chunks)
+    elif max_pairs == 200:
+        assert 1 < len(chunks) < len(cloud[0])
+    ipt = np.concatenate([chunk[0] for chunk in chunks])
+    icube_index = np.concatenate([chunk[1] for chunk in chunks])
+    weight_distance = np.concatenate([chunk[2] for chunk in chunks])
+
+    pairs = list(zip(ipt.tolist(), icube_index.tolist()))
+    assert len(set(pairs)) == len(pairs)
+    assert set(pairs) == set(expected)
+    np.testing.assert_allclose(weight_distance,
+                               [expected[pair] for pair in pairs], rtol=1e-12)
+
+    # the last points are matched on the ROI boundaries
+    naxis1, naxis2 = cube[:2]
+    npt = len(cloud[0])
+    nplane = naxis1 * naxis2
+    last = [index for i, index in pairs if i == npt - 1]
+    assert 4 * nplane + 2 * naxis1 + 3 in last
+    assert 5 * nplane + 2 * naxis1 + 5 in last
+    assert [index for i, index in pairs if i == npt - 2] == [(cube[2] - 1) * nplane]
+
+
+def test_match_det2cube_msm():
+    """The spaxels sum the weighted fluxes of all their pairs"""
+    cube = make_cube()
+    cloud = make_cloud(cube)
+    naxis1, naxis2, naxis3 = cube[:3]
+    size = naxis1 * naxis2 * naxis3
+    flux = np.random.RandomState(1).uniform(1., 10., cloud[0].size)
+    spaxel_flux = np.zeros(size)
+    spaxel_weight = np.zeros(size)
+    spaxel_iflux = np.zeros(size)
+
+    cube_cloud.match_det2cube_msm(*cube, spaxel_flux, spaxel_weight, spaxel_iflux,
+                                  flux, *cloud)
+
+    expected_flux = np.zeros(size)
+    expected_weight = np.zeros(size)
+    expected_iflux = np.zeros(size)
+    for (ipt, index), weight in brute_force_pairs(cube, cloud).items():
+        expected_flux[index] += weight * flux[ipt]
+        expected_weight[index] += weight
+        expected_iflux[index] += 1
+    np.testing.assert_allclose(spaxel_flux, expected_flux, rtol=1e-12)
+    np.testing.assert_allclose(spaxel_weight, expected_weight, rtol=1e-12)
+    np.testing.assert_array_equal(spaxel_iflux, expected_iflux)
@@ -0,0 +1,202 @@
+"""Test the overlap of detector pixels and cube spaxels"""
+import numpy as np
+import pytest
+
+from ... import datamodels
+from ...datamodels import dqflags
+from .. import cube_overlap
+
+
+def random_pixels(rng, npixels, size=1.0):
+    """Convex quadrilaterals, with their corners in counterclockwise order"""
+    xcenter = rng.uniform(-2., 2., npixels)
+    ycenter = rng.uniform(-2., 2., npixels)
+    angle = (np.array([0.25, 0.75, 1.25, 1.75]) * np.pi +
+             rng.uniform(-0.2, 0.2, (npixels, 4)))
+    radius = size * rng.uniform(0.5, 1.0, (npixels, 4))
+    xp_corner = xcenter[:, np.newaxis] + radius * np.cos(angle)
+    yp_corner = ycenter[:, np.newaxis] + radius * np.sin(angle)
+    return xp_corner, yp_corner
+
+
+def overlap_areas(xcenter, ycenter, xlength, ylength, xp_corner, yp_corner):
+    """The overlap areas found one pair at a time"""
+    return np.array([cube_overlap.SH_FindOverlap(xc, yc, xlength, ylength,
+                                                 list(xp), list(yp))
+                     for xc, yc, xp, yp in zip(xcenter, ycenter,
+                                               xp_corner, yp_corner)])
+
+
+@pytest.mark.parametrize('size', [0.1, 1.0, 5.0])
+def test_find_overlap_areas(size):
+    """The vectorized areas are those of the clipping of each pair"""
+    rng = np.random.RandomState(1)
+    npairs = 500
+    xp_corner, yp_corner = random_pixels(rng, npairs, size)
+    # spaxels near the pixels, for both overlapping and separate pairs
+    xcenter = xp_corner.mean(axis=1) + rng.uniform(-1., 1., npairs) * (size + 0.65)
+    ycenter = yp_corner.mean(axis=1) + rng.uniform(-1., 1., npairs) * (size + 0.35)
+
+    areas = cube_overlap.FindOverlapAreas(xcenter, ycenter, 1.3, 0.7,
+                                          xp_corner, yp_corner)
+    expected = overlap_areas(xcenter, ycenter, 1.3, 0.7,
+                             xp_corner, yp_corner)
+
+    assert areas.shape == (npairs,)
+    assert np.count_nonzero(expected) > npairs // 10
+    assert np.count_nonzero(expected == 0.) > npairs // 10
+    np.testing.assert_allclose(areas, expected, rtol=1e-10, atol=1e-14)
+
+
+def test_find_overlap_areas_edges():
+    """Pixels on the spaxel edges, degenerate pixels and nested polygons"""
+    unit_x = [0., 1., 1., 0.]
+    unit_y = [0., 0., 1., 1.]
+    pixels = [
+        # pixel edges on the spaxel edges
+        (unit_x, unit_y, 0.5, 0.5, 0.25),
+        (unit_x, unit_y, 0.5, 0.5, 1.0),
+        (unit_x, unit_y, 0.25, 0.5, 1.0),
+        (unit_x, unit_y, 1.5, 0.5, 1.0),
+        (unit_x, unit_y, 0.5, 1.5, 1.0),
+        (unit_x, unit_y, -0.5, 0.5, 1.0),
+        # corners on the spaxel edges
+        ([0.5, 1., 0.5, 0.], [0., 0.5, 1., 0.5], 0.5, 0.5, 1.0),
+        ([0.5, 1., 0.5, 0.], [0., 0.5, 1., 0.5], 1.0, 0.5, 1.0),
+        # pixel inside the spaxel, spaxel inside the pixel
+        (unit_x, unit_y, 0.5, 0.5, 3.0),
+        (unit_x, unit_y, 0.5, 0.5, 0.2),
+        # pixel outside the spaxel
+        (unit_x, unit_y, 3.0, 3.0, 1.0),
+        # zero-area pixels: a point and a line
+        ([0.5] * 4, [0.5] * 4, 0.5, 0.5, 1.0),
+        ([0., 1., 1., 0.], [0.5] * 4, 0.5, 0.5, 1.0),
+        ([0.5] * 4, [0., 0., 1., 1.], 0.5, 0.5, 1.0),
+        # vertical and horizontal edges crossing the spaxel
+        ([0.2, 0.2, 0.8, 0.8], [-1., 2., 2., -1.], 0.5, 0.5, 1.0),
+        ([-1., 2., 2., -1.], [0.2, 0.2, 0.8, 0.8], 0.5, 0.5, 1.0),
+    ]
+    xp_corner = np.array([pixel[0] for pixel in pixels])
+    yp_corner = np.array([pixel[1] for pixel in pixels])
+    xcenter = np.array([pixel[2] for pixel in pixels])
+    ycenter = np.array([pixel[3] for pixel in pixels])
+    length = np.array([pixel[4] for pixel in pixels])
+
+    areas = cube_overlap.FindOverlapAreas(xcenter, ycenter, length, length,
+                                          xp_corner, yp_corner)
+    expected = np.array([cube_overlap.SH_FindOverlap(xc, yc, dx, dx,
+                                                     list(xp), list(yp))
+                         for xc, yc, dx, xp, yp in zip(xcenter, ycenter, length,
+                                                       xp_corner, yp_corner)])
+
+    np.testing.assert_allclose(areas, expected, atol=1e-14)
+    np.testing.assert_allclose(
+        areas, [0.0625, 1., 0.75, 0., 0., 0., 0.5, 0.25, 1., 0.04, 0.,
+                0., 0., 0., 0.6, 0.6], atol=1e-14)
+
+
+def test_find_overlap_areas_empty():
+    """No pairs, no areas"""
+    areas = cube_overlap.FindOverlapAreas(np.zeros(0), np.zeros(0), 1., 1.,
+                                          np.zeros((0, 4)), np.zeros((0, 4)))
+    assert areas.shape == (0,)
+
+
+@pytest.mark.parametrize('edge', [0, 1, 2, 3])
+def test_solve_intersections(edge):
+    """The intersections are those of solveIntersection"""
+    rng = np.random.RandomState(edge)
+    x1, y1, x2, y2 = rng.uniform(-2., 2., (4, 100))
+    # vertical segments
+    x2[:10] = x1[:10]
+    left, right, bottom, top = -0.5, 0.7, -0.3, 0.9
+
+    x, y = cube_overlap._solve_intersections(edge, x1, y1, x2, y2,
+                                             left, right, top, bottom)
+    expected = np.array([cube_overlap.solveIntersection(
+        edge, *segment, left, right, top, bottom)
+        for segment in zip(x1, y1, x2, y2)])
+
+    if edge < 2:
+        # no intersection of vertical segments with the left and right sides
+        x, y, expected = x[10:], y[10:], expected[10:]
+    np.testing.assert_allclose(x, expected[:, 0], rtol=1e-12)
+    np.testing.assert_allclose(y, expected[:, 1], rtol=1e-12)
+
+
+def slice_transform(x, y):
+    """A rotated and stretched mapping of detector pixels to alpha, beta, lambda"""
+    alpha = np.where(x < 10, 0.11 * (x - 3.) + 0.03 * y, np.nan)
+    lam = 5. + 0.013 * y - 0.002 * x
+    beta = np.zeros_like(alpha)
+    return alpha, beta, lam
+
+
+@pytest.mark.parametrize('max_pairs', [100000, 7, 1])
+def test_match_det2cube(monkeypatch, max_pairs):
+    """The spaxels sum the fluxes of all the pixels overlapping them"""
+    monkeypatch.setattr(cube_overlap, 'MAX_PAIRS', max_pairs)
+    rng = np.random.RandomState(0)
+    input_model = datamodels.ImageModel((12, 10))
+    input_model.data = rng.uniform(1., 10., (12, 10)).astype(np.float32)
+    input_model.dq[3, 4] = dqflags.pixel['DO_NOT_USE']
+    input_model.dq[7, 2] = dqflags.pixel['HOT']
+    y, x = np.mgrid[:11, :10]
+    x = x.ravel()
+    y = y.ravel()
+
+    naxis1, naxis2, naxis3 = 6, 3, 8
+    crval1, cdelt1 = -0.25, 0.13
+    crval3, cdelt3 = 5.02, 0.017
+    xcoord = crval1 + cdelt1 * np.arange(naxis1)
+    zcoord = crval3 + cdelt3 * np.arange(naxis3)
+    sliceno, start_slice = 3, 2
+    size = naxis1 * naxis2 * naxis3
+    spaxel_flux = np.zeros(size)
+    spaxel_weight = np.zeros(size)
+    spaxel_iflux = np.zeros(size)
+
+    cube_overlap.match_det2cube(x, y, sliceno, start_slice, input_model,
+                                slice_transform,
+                                spaxel_flux, spaxel_weight, spaxel_iflux,
+                                xcoord, zcoord, crval1, crval3, cdelt1, cdelt3,
+                                naxis1, naxis2)
+
+    # every good pixel is clipped by every spaxel of the slice
+    expected_flux = np.zeros((naxis3, naxis1))
+    expected_weight = np.zeros((naxis3, naxis1))
+    expected_iflux = np.zeros((naxis3, naxis1))
+    for xx, yy in zip(x, y):
+        if input_model.dq[yy, xx] != 0:
+            continue
+        corners = [slice_transform(xx + dx, yy + dy)
+                   for dx, dy in ((0, 0), (1, 0), (1, 1), (0, 1))]
+        alpha = [float(corner[0]) for corner in corners]
+        lam = [float(corner[2]) for corner in corners]
+        if not np.all(np.isfinite(alpha)):
+            continue
+        area = cube_overlap.FindAreaQuad(min(alpha), min(lam), alpha, lam)
+        for iz in range(naxis3):
+            for ix in range(naxis1):
+                overlap = cube_overlap.SH_FindOverlap(xcoord[ix], zcoord[iz],
+                                                      cdelt1, cdelt3,
+                                                      alpha, lam)
+                if overlap > 0.:
+                    ratio = overlap / area
+                    expected_flux[iz, ix] += ratio * input_model.data[yy, xx]
+                    expected_weight[iz, ix] += ratio
+                    expected_iflux[iz, ix] += 1
+
+    shape = (naxis3, naxis2, naxis1)
+    yslice = sliceno - start_slice
+    assert np.count_nonzero(expected_iflux) > naxis1 * naxis3 // 2
+    np.testing.assert_allclose(spaxel_flux.reshape(shape)[:, yslice],
+                               expected_flux, rtol=1e-10)
+    np.testing.assert_allclose(spaxel_weight.reshape(shape)[:, yslice],
+                               expected_weight, rtol=1e-10)
+    np.testing.assert_array_equal(spaxel_iflux.reshape(shape)[:, yslice],
+                                  expected_iflux)
+    # the other slices are untouched
+    others = np.delete(np.arange(naxis2), yslice)
+    assert not np.any(spaxel_flux.reshape(shape)[:, others])
+    assert not np.any(spaxel_iflux.reshape(shape)[:, others])
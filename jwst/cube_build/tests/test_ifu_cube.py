@@ -0,0 +1,50 @@
+"""Test building IFU cubes in worker processes"""
+import numpy as np
+import pytest
+
+from ... import datamodels
+from .. import ifu_cube
+
+
+class FakeCube(ifu_cube.IFUCubeData):
+    """A cube whose files add random fluxes to random spaxels"""
+
+    def __init__(self, nfiles, shape=(3, 4, 5), seed=0):
+        self.naxis3, self.naxis2, self.naxis1 = shape
+        self.interpolation = 'pointcloud'
+        rng = np.random.RandomState(seed)
+        size = np.prod(shape)
+        self.files = [(rng.randint(0, size, 20), rng.uniform(0., 10., 20),
+                       rng.uniform(0.1, 1., 20)) for k in range(nfiles)]
+
+    def file_tasks(self):
+        return [('1', 'short', k) for k in range(len(self.files))]
+
+    def map_file_to_cube(self, this_par1, this_par2, k,
+                         spaxel_flux, spaxel_weight, spaxel_iflux):
+        spaxels, flux, weight = self.files[k]
+        np.add.at(spaxel_flux, spaxels, flux * weight)
+        np.add.at(spaxel_weight, spaxels, weight)
+        np.add.at(spaxel_iflux, spaxels, 1)
+
+    def setup_ifucube(self, j):
+        return datamodels.IFUCubeModel()
+
+
+@pytest.mark.parametrize('num_processes', [2, 3])
+def test_build_ifucubes(num_processes):
+    """Cubes built by worker processes are those built one at a time"""
+    serial = ifu_cube.build_ifucubes([FakeCube(4, seed=1), FakeCube(1)])
+    cubes = [FakeCube(4, seed=1), FakeCube(1)]
+    parallel = ifu_cube.build_ifucubes(cubes, num_processes)
+
+    assert len(parallel) == 2
+    for expected, result in zip(serial, parallel):
+        assert result.data.shape == (3, 4, 5)
+        np.testing.assert_allclose(result.data, expected.data)
+        np.testing.assert_array_equal(result.weightmap, expected.weightmap)
+    # the spaxel accumulators are released once each cube is finished
+    for cube in cubes:
+        assert cube.spaxel_flux is None
+        assert cube.spaxel_weight is None
+        assert cube.spaxel_iflux is None
@@ -45,9 +45,11 @@ class DarkCurrentStep(Step):
             # Open the dark ref file data model - based on Instrument
             instrument = input_model.meta.instrument.name
             if(instrument == 'MIRI'):
-                dark_model = datamodels.DarkMIRIModel(self.dark_name)
+                dark_model = self.open_reference_model(
+                    datamodels.DarkMIRIModel, self.dark_name)
             else:
-                dark_model = datamodels.DarkModel(self.dark_name)
+                dark_model = self.open_reference_model(
+                    datamodels.DarkModel, self.dark_name)
 
             # Do the dark correction
             result = dark_sub.do_correction(
@@ -83,8 +83,11 @@ def do_correction(input_model, dark_model, dark_output=None):
         input_model.meta.cal_step.dark_sub = 'SKIPPED'
         return input_model.copy()
 
-    # Replace NaN's in the dark with zeros
-    dark_model.data[np.isnan(dark_model.data)] = 0.0
+    # Replace NaN's in the dark with zeros, without modifying the
+    # (possibly read-only) reference arrays
+    dark_nan = np.isnan(dark_model.data)
+    if dark_nan.any():
+        dark_model.data = np.where(dark_nan, 0.0, dark_model.data)
 
     # Check whether the dark and science data have matching
     # nframes and groupgap settings.
@@ -109,7 +112,8 @@ def do_correction(input_model, dark_model, dark_output=None):
 
         if instrument == 'MIRI':
             averaged_dark = average_MIRIdark_frames(
-                dark_model, sci_nints, sci_ngroups, sci_nframes, sci_groupgap
+                dark_model, first_integration(input_model) + sci_nints,
+                sci_ngroups, sci_nframes, sci_groupgap
             )
         else:
             averaged_dark = average_dark_frames(
@@ -284,6 +288,31 @@ def average_MIRIdark_frames(input_dark, nints, ngroups, nframes, groupgap):
     return avg_dark
 
 
+def first_integration(input_model):
+    """
+    Index of the first integration of the science data in the exposure.
+
+    The data may start after the first integration of the exposure, e.g.
+    an exposure segment or an integration tile of a streamed exposure, as
+    given by the one-indexed ``meta.exposure.integration_start``.
+
+    Parameters
+    ----------
+    input_model: data model object
+        the input science data
+
+    Returns
+    -------
+    first: int
+        zero-indexed number of the first integration of the data
+
+    """
+    int_start = input_model.meta.exposure.integration_start
+    if int_start is None:
+        return 0
+    return int_start - 1
+
+
 def subtract_dark(input, dark):
     """
     Subtracts dark current data from science arrays, combines
@@ -308,6 +337,7 @@ def subtract_dark(input, dark):
     instrument = input.meta.instrument.name
     if instrument == 'MIRI':
         dark_nints = dark.data.shape[0]
+        first = first_integration(input)
     else:
         dark_nints = 1
 
@@ -335,8 +365,9 @@ def subtract_dark(input, dark):
     for i in range(input.data.shape[0]):
 
         if instrument == 'MIRI':
-            if i < dark_nints:
-                dark_int = dark.data[i]
+            # MIRI darks are matched by integration number in the exposure
+            if first + i < dark_nints:
+                dark_int = dark.data[first + i]
             else:
                 dark_int = dark.data[dark_nints - 1]
 
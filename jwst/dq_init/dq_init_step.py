@@ -56,7 +56,8 @@ class DQInitStep(Step):
             return result
 
         # Load the reference file
-        mask_model = datamodels.MaskModel(self.mask_filename)
+        mask_model = self.open_reference_model(datamodels.MaskModel,
+                                                self.mask_filename)
 
         # Apply the step
         result = dq_initialization.correct_model(input_model, mask_model)
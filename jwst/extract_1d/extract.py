@@ -30,6 +30,10 @@ FILE_TYPE_OTHER = "N/A"
 # multi-integration data.
 OFFSET_NOT_ASSIGNED_YET = "not assigned yet"
 
+# This is passed to extract_one_slit, instead of an integration number, to
+# extract spectra from all integrations of multi-integration data at once.
+ALL_INTEGRATIONS = "all integrations"
+
 # For full-frame input data, keyword SLTNAME may not be populated, so use
 # the following string to indicate that the first slit in the reference
 # file should be used.
@@ -62,7 +66,6 @@ DUMMY = "dummy"
 
 Aperture = namedtuple('Aperture', ['xstart', 'ystart', 'xstop', 'ystop'])
 
-
 class Extract1dError(Exception):
     pass
 
@@ -384,39 +387,10 @@ def find_dispaxis(input_model, slit, spectral_order, extract_params):
             wl_00 == 0 or wl_01 == 0 or wl_10 == 0):
                 log.warning("wavelength from WCS is NaN or 0 "
                             "within the bounding box")
-                if input_model.meta.exposure.type in WFSS_EXPTYPES:
-                    wl_wcs = np.zeros(shape, dtype=np.float64)
-                    log.debug("Starting to compute wavelengths ...")
-                    if n_inputs > 2:
-                        for j in range(shape[0]):
-                            for i in range(shape[1]):
-                                stuff = transform(i, j, spectral_order)
-                                if stuff[2] == 0.:
-                                    wl_wcs[j, i] = np.nan
-                                else:
-                                    wl_wcs[j, i] = stuff[2]
-                    else:
-                        for j in range(shape[0]):
-                            for i in range(shape[1]):
-                                stuff = transform(i, j)
-                                if stuff[2] == 0.:
-                                    wl_wcs[j, i] = np.nan
-                                else:
-                                    wl_wcs[j, i] = stuff[2]
-                    log.debug("... finished computing wavelengths")
-                else:
-                    grid = np.indices(shape, dtype=np.float64)
-                    if n_inputs > 2:
-                        stuff = transform(grid[1], grid[0], spectral_order)
-                    else:
-                        stuff = transform(grid[1], grid[0])
-                    wl_wcs = stuff[2].copy()
-                    del grid, stuff
-                    # Flag wavelength = 0 as invalid.
-                    mask = (wl_wcs == 0)
-                    if np.any(mask):
-                        wl_wcs[mask] = np.nan
-                    del mask
+                log.debug("Starting to compute wavelengths ...")
+                wl_wcs = wcs_wavelengths(transform, shape,
+                                         spectral_order, n_inputs)
+                log.debug("... finished computing wavelengths")
                 dwlx = wl_wcs[:, 1:] - wl_wcs[:, 0:-1]
                 dwly = wl_wcs[1:, :] - wl_wcs[0:-1, :]
                 dwlx = np.nanmean(dwlx)
@@ -449,6 +423,81 @@ def find_dispaxis(input_model, slit, spectral_order, extract_params):
             "from wavelengths = %s", str(initial_value), str(dispaxis))
 
 
+def wcs_wavelengths(transform, shape, spectral_order, n_inputs):
+    """Compute the wavelength at each pixel of a slit from the WCS.
+
+    The WCS is evaluated on the full pixel grid at once.
+
+    Parameters
+    ----------
+    transform: astropy model
+        The forward transform of the WCS, from pixel coordinates (and
+        possibly spectral order) to world coordinates and wavelength.
+
+    shape: tuple
+        The shape (2-D) of the slit data.
+
+    spectral_order: int
+        The spectral order number.
+
+    n_inputs: int
+        The number of inputs to `transform`, 2 or 3.  If 3, the last
+        input is the spectral order.
+
+    Returns
+    -------
+    ndarray, 2-D
+        The wavelength at each pixel, with zero values (meaning that the
+        pixel is outside the spectrum) replaced by NaN.
+    """
+
+    grid = np.indices(shape, dtype=np.float64)
+    if n_inputs > 2:
+        stuff = transform(grid[1], grid[0], spectral_order)
+    else:
+        stuff = transform(grid[1], grid[0])
+    wl_wcs = np.array(np.broadcast_to(stuff[2], shape), dtype=np.float64)
+    del grid, stuff
+    # Flag wavelength = 0 as invalid.
+    wl_wcs[wl_wcs == 0.] = np.nan
+
+    return wl_wcs
+
+
+def wfss_coordinates(transform, n_inputs, x_array, y_array, spectral_order):
+    """Evaluate a WFSS forward transform along a spectral trace.
+
+    Parameters
+    ----------
+    transform: astropy model
+        The forward transform of the WCS, taking two (x and y) or three
+        (x, y, spectral order) inputs.
+
+    n_inputs: int
+        The number of inputs to `transform`, 2 or 3.
+
+    x_array, y_array: ndarray, 1-D
+        Pixel coordinates of the spectral trace.
+
+    spectral_order: int
+        The spectral order number, used if `n_inputs` is 3.
+
+    Returns
+    -------
+    tuple (ra, dec, wavelength)
+        1-D arrays of the first three outputs of `transform`, the same
+        shape as `x_array`.
+    """
+
+    if n_inputs == 2:
+        stuff = transform(x_array, y_array)
+    else:
+        stuff = transform(x_array, y_array, spectral_order)
+    return tuple(np.array(np.broadcast_to(value, x_array.shape),
+                          dtype=np.float64)
+                 for value in stuff[0:3])
+
+
 def log_initial_parameters(extract_params):
     """Log some of the initial extraction parameters."""
 
@@ -1434,8 +1483,9 @@ class ExtractModel(ExtractBase):
 
         Parameters
         ----------
-        data: array_like (2-D)
-            Data array.
+        data: array_like (2-D or 3-D)
+            Data array.  If 3-D, the first axis is the integration number,
+            and a spectrum is extracted from each integration.
 
         wl_array: array_like (2-D) or None
             Wavelengths corresponding to `data`, or None if no WAVELENGTH
@@ -1446,14 +1496,15 @@ class ExtractModel(ExtractBase):
 
         Returns
         -------
-        (ra, dec, wavelength, net, background)
+        (ra, dec, wavelength, net, background, dq)
             ra and dec are floats, and the others are 1-D arrays.
             ra and dec are the right ascension and declination at the
             nominal center of the slit.  `wavelength` is the wavelength in
             micrometers at each pixel.  `net` is the count rate
             (counts / s) minus the background at each pixel.  `background`
             is the background count rate that was subtracted from the total
-            source count rate to get `net`.
+            source count rate to get `net`.  If `data` is 3-D, `net`,
+            `background` and `dq` are 2-D, with one row per integration.
         """
 
         # If the wavelength attribute exists and is populated, use it
@@ -1513,25 +1564,22 @@ class ExtractModel(ExtractBase):
             if self.exp_type in WFSS_EXPTYPES:
                 # We expect two (x and y) or three (x, y, spectral order).
                 n_inputs = self.wcs.forward_transform.n_inputs
-                ra = np.zeros(nelem, dtype=np.float64)
-                dec = np.zeros(nelem, dtype=np.float64)
-                # Temporary variable so as not to clobber `wavelength`.
-                wcs_wl = np.zeros(nelem, dtype=np.float64)
                 transform = self.wcs.forward_transform
-                if n_inputs == 2:
-                    for i in range(nelem):
-                        ra[i], dec[i], wcs_wl[i], _ = transform(
-                                        x_array[i], y_array[i])
-                elif n_inputs == 3:
-                    for i in range(nelem):
-                        ra[i], dec[i], wcs_wl[i], _ = transform(
-                                x_array[i], y_array[i], self.spectral_order)
+                if n_inputs == 2 or n_inputs == 3:
+                    # Temporary variable wcs_wl so as not to clobber
+                    # `wavelength`.
+                    (ra, dec, wcs_wl) = wfss_coordinates(
+                                transform, n_inputs, x_array, y_array,
+                                self.spectral_order)
                 else:
                     if verbose:
                         log.warning("n_inputs for wcs function is %d",
                                     n_inputs)
                         log.warning("WCS function was expected to take "
                                     "either 2 or 3 arguments.")
+                    ra = np.zeros(nelem, dtype=np.float64)
+                    dec = np.zeros(nelem, dtype=np.float64)
+                    wcs_wl = np.zeros(nelem, dtype=np.float64)
                     ra[:] = -999.
                     dec[:] = -999.
                     wcs_wl[:] = -999.
@@ -1575,7 +1623,7 @@ class ExtractModel(ExtractBase):
         if self.dispaxis == HORIZONTAL:
             image = data
         else:
-            image = np.transpose(data, (1, 0))
+            image = np.swapaxes(data, -2, -1)
         if wavelength is None:
             if verbose:
                 log.warning("Wavelengths could not be determined.")
@@ -1852,25 +1900,22 @@ class ImageExtractModel(ExtractBase):
             if self.exp_type in WFSS_EXPTYPES:
                 # We expect two (x and y) or three (x, y, spectral order).
                 n_inputs = self.wcs.forward_transform.n_inputs
-                ra = np.zeros(nelem, dtype=np.float)
-                dec = np.zeros(nelem, dtype=np.float)
-                # Temporary variable so as not to clobber `wavelength`.
-                wcs_wl = np.zeros(nelem, dtype=np.float)
                 transform = self.wcs.forward_transform
-                if n_inputs == 2:
-                    for i in range(nelem):
-                        ra[i], dec[i], wcs_wl[i], _ = transform(
-                                        x_array[i], y_array[i])
-                elif n_inputs == 3:
-                    for i in range(nelem):
-                        ra[i], dec[i], wcs_wl[i], _ = transform(
-                                x_array[i], y_array[i], self.spectral_order)
+                if n_inputs == 2 or n_inputs == 3:
+                    # Temporary variable wcs_wl so as not to clobber
+                    # `wavelength`.
+                    (ra, dec, wcs_wl) = wfss_coordinates(
+                                transform, n_inputs, x_array, y_array,
+                                self.spectral_order)
                 else:
                     if verbose:
                         log.warning("n_inputs for wcs function is %d",
                                     n_inputs)
                         log.warning("WCS function was expected to take "
                                     "either 2 or 3 arguments.")
+                    ra = np.zeros(nelem, dtype=np.float)
+                    dec = np.zeros(nelem, dtype=np.float)
+                    wcs_wl = np.zeros(nelem, dtype=np.float)
                     ra[:] = -999.
                     dec[:] = -999.
                     wcs_wl[:] = -999.
@@ -2269,6 +2314,12 @@ def do_extract1d(input_model, refname, smoothing_length, bkg_order,
                     log.warning("No relsens for input file, "
                                 "so can't compute flux.")
 
+                # With a reference file in JSON format (or none), the
+                # extraction region is the same for every integration, so
+                # the spectra are extracted from all integrations at once.
+                batched = (extract_params['ref_file_type'] !=
+                           FILE_TYPE_IMAGE)
+
                 # Loop over each integration in the input model
                 verbose = True          # for just the first integration
                 if input_model.data.shape[0] == 1:
@@ -2279,15 +2330,28 @@ def do_extract1d(input_model, refname, smoothing_length, bkg_order,
                 for integ in range(input_model.data.shape[0]):
                     # Extract spectrum
                     try:
-                        (ra, dec, wavelength, net, background, dq,
-                         prev_offset) = extract_one_slit(
+                        if not batched:
+                            (ra, dec, wavelength, net, background, dq,
+                             prev_offset) = extract_one_slit(
                                         input_model, slit, integ,
                                         prev_offset, verbose, extract_params)
+                        elif integ == 0:
+                            (ra, dec, wavelength, all_net, all_background,
+                             all_dq, prev_offset) = extract_one_slit(
+                                        input_model, slit, ALL_INTEGRATIONS,
+                                        prev_offset, verbose, extract_params)
                     except InvalidSpectralOrderNumberError as e:
                         log.info(str(e) + ", skipping ...")
                         break
+                    if batched:
+                        net = all_net[integ]
+                        background = all_background[integ]
+                        dq = all_dq[integ]
                     if got_relsens:
-                        r_factor = interpolate_response(
+                        # The wavelengths are the same for all integrations
+                        # that were extracted together.
+                        if integ == 0 or not batched:
+                            r_factor = interpolate_response(
                                         wavelength, input_model.relsens,
                                         verbose)
                         flux = net / r_factor
@@ -2608,10 +2672,11 @@ def extract_one_slit(input_model, slit, integ,
         In the former case, if `integ` is zero or larger, the spectrum
         will be extracted from the 2-D slice input_model.data[integ].
 
-    integ: int
+    integ: int or str
         For the case that input_model is a SlitModel or a CubeModel,
-        `integ` is the integration number.  If the integration number is
-        not relevant (i.e. the data array is 2-D), `integ` should be -1.
+        `integ` is the integration number, or ALL_INTEGRATIONS to extract
+        spectra from every integration at once.  If the integration number
+        is not relevant (i.e. the data array is 2-D), `integ` should be -1.
 
     prev_offset: float or str
         When extracting from multi-integration data, the nod/dither offset
@@ -2636,7 +2701,9 @@ def extract_one_slit(input_model, slit, integ,
         micrometers at each pixel.  `net` is the count rate (counts / s)
         minus the background at each pixel.  `background` is the background
         count rate that was subtracted from the total source count rate
-        to get `net`.  `dq` is the data quality array.
+        to get `net`.  `dq` is the data quality array.  If `integ` is
+        ALL_INTEGRATIONS, `net`, `background` and `dq` are 2-D, with one
+        row per integration.
         `offset` is the nod/dither offset in the cross-dispersion
         direction, either computed by calling offset_from_offset in this
         function, or copied from the input `prev_offset`.
@@ -2646,7 +2713,15 @@ def extract_one_slit(input_model, slit, integ,
         log_initial_parameters(extract_params)
 
     input_dq = None                             # possibly replaced below
-    if integ > -1:
+    if integ == ALL_INTEGRATIONS:
+        data = input_model.data
+        if hasattr(input_model, 'dq'):
+            input_dq = input_model.dq
+        try:
+            wl_array = input_model.wavelength
+        except AttributeError:
+            wl_array = None
+    elif integ > -1:
         data = input_model.data[integ]
         if hasattr(input_model, 'dq'):
             input_dq = input_model.dq[integ]
@@ -2746,7 +2821,9 @@ def replace_bad_values(data, input_dq, fill=0.):
 def nans_at_endpoints(wavelength, net, background, dq, verbose):
     """Flag NaNs in the wavelength array.
 
-    All five input arrays should be 1-D and the same shape.
+    All four input arrays should be 1-D and the same shape, except that
+    `net`, `background` and `dq` may be 2-D (one row per integration), in
+    which case the last axis corresponds to `wavelength`.
     If NaNs are present at endpoints of `wavelength`, the arrays will be
     trimmed to remove the NaNs.  NaNs at interior elements of `wavelength`
     will be left in place, but they will be flagged with DO_NOT_USE in the
@@ -2785,8 +2862,8 @@ def nans_at_endpoints(wavelength, net, background, dq, verbose):
 
     nan_mask = np.isnan(wavelength)
 
-    new_dq[nan_mask] = np.bitwise_or(new_dq[nan_mask],
-                                     dqflags.pixel['DO_NOT_USE'])
+    new_dq[..., nan_mask] = np.bitwise_or(new_dq[..., nan_mask],
+                                          dqflags.pixel['DO_NOT_USE'])
     not_nan = np.logical_not(nan_mask)
     flag = np.where(not_nan)
     if len(flag[0]) > 0:
@@ -2797,9 +2874,9 @@ def nans_at_endpoints(wavelength, net, background, dq, verbose):
                          n_trimmed)
             slc = slice(flag[0][0], flag[0][-1] + 1)
             new_wl = new_wl[slc]
-            new_net = new_net[slc]
-            new_bkg = new_bkg[slc]
-            new_dq = new_dq[slc]
+            new_net = new_net[..., slc]
+            new_bkg = new_bkg[..., slc]
+            new_dq = new_dq[..., slc]
     else:
         new_dq |= dqflags.pixel['DO_NOT_USE']
 
@@ -32,9 +32,11 @@ def extract1d(image, lambdas, disp_range,
 
     Parameters:
     -----------
-    image: 2-D ndarray
+    image: 2-D or 3-D ndarray
         The array may have been transposed so that the dispersion direction
-        is the second index (i.e. the more rapidly varying direction).
+        is the last index (i.e. the more rapidly varying direction).
+        If the array is 3-D, the first index is the integration number,
+        and a spectrum will be extracted from each integration.
     lambdas: 1-D array
         Wavelength at each pixel within `disp_range`.  For example,
         lambdas[0] is the wavelength for image[:, disp_range[0]].
@@ -50,13 +52,16 @@ def extract1d(image, lambdas, disp_range,
         If this is greater than one, the background regions will be boxcar
         smoothed by this length (must be an odd integer).
     bkg_order: int
-    weights:
+    weights: function or None
+        If not None, a function of wavelength and pixel number, giving
+        the weight of each pixel in the source extraction region.
 
     Returns:
     --------
     (countrate, background): tuple of 1-D ndarrays
         countrate is the extracted spectrum in units of counts / s.
         background is the background that was subtracted from the source
+        If `image` is 3-D, these are 2-D, with one row per integration.
     """
 
     nl = lambdas.shape[0]
@@ -92,6 +97,7 @@ def extract1d(image, lambdas, disp_range,
 
     if p_bkg is None:
         nbkglim = 0
+        bkglim = []
     else:
         nbkglim = len(p_bkg)
         bkglim = []             # this will be a list of lists, like p_bkg
@@ -107,7 +113,7 @@ def extract1d(image, lambdas, disp_range,
     # or a lower limit that's above the upper limit (limit curves just
     # swapped, or crossing each other).
     # Truncate extraction limits that are out of bounds, but log a warning.
-    shape = image.shape
+    shape = image.shape[-2:]
     for i in range(n_srclim):
         lower = srclim[i][0]
         upper = srclim[i][1]
@@ -170,6 +176,36 @@ def extract1d(image, lambdas, disp_range,
     ##         Perform spectral extraction:        ##
     #################################################
 
+    if weights is None:
+        if image.ndim == 2:
+            (countrate, background) = _extract_batched(
+                image[np.newaxis], temp_image[np.newaxis], lambdas,
+                disp_range, srclim, bkglim, bkg_order)
+            return (countrate[0], background[0])
+        return _extract_batched(image, temp_image, lambdas, disp_range,
+                                srclim, bkglim, bkg_order)
+
+    if image.ndim == 2:
+        return _extract_columns(image, temp_image, lambdas, disp_range,
+                                srclim, bkglim, bkg_order, weights)
+    results = [_extract_columns(image[k], temp_image[k], lambdas,
+                                disp_range, srclim, bkglim, bkg_order,
+                                weights)
+               for k in range(image.shape[0])]
+    return (np.array([r[0] for r in results]),
+            np.array([r[1] for r in results]))
+
+
+def _extract_columns(image, temp_image, lambdas, disp_range,
+                     srclim, bkglim, bkg_order, weights):
+    """Extract the spectrum one column at a time.
+
+    This is used for weighted extraction, for which the weights are
+    computed separately for each column.
+    """
+
+    nl = lambdas.shape[0]
+    nbkglim = len(bkglim)
     bkg_model = None
 
     countrate = np.zeros(nl, dtype=np.float32)
@@ -218,6 +254,223 @@ def extract1d(image, lambdas, disp_range,
 
     return (countrate, background)
 
+def _extract_batched(image, temp_image, lambdas, disp_range,
+                     srclim, bkglim, bkg_order):
+    """Extract the spectrum for all columns and integrations at once.
+
+    The fractional area of each pixel within the source and background
+    regions does not depend on the data, so these are computed once, as
+    arrays of weights.  The source flux is then the weighted sum over the
+    cross-dispersion direction, and the background is fit with a
+    polynomial by linear least squares, for all columns together.
+
+    Parameters:
+    -----------
+    image: 3-D ndarray
+        The data, with the integration number as the first index and the
+        dispersion direction as the last index.
+    temp_image: 3-D ndarray
+        The (optionally smoothed) data from which to fit the background.
+    lambdas: 1-D array
+        Wavelength at each pixel within `disp_range`.
+    disp_range: two-element list
+        Limits of a slice for extracting the spectrum from `image`.
+    srclim, bkglim: list of two-element lists of 1-D arrays
+        Lower and upper limits of the source and background regions.
+    bkg_order: int
+        Polynomial order for fitting the background.
+
+    Returns:
+    --------
+    (countrate, background): tuple of 2-D ndarrays
+        One row for each integration, one element for each column.
+    """
+
+    nl = lambdas.shape[0]
+    data = image[:, :, disp_range[0]:disp_range[0] + nl]
+    (nint, ny) = data.shape[0:2]
+    nbkglim = len(bkglim)
+
+    (src_wht, _) = _aperture_weights(srclim, ny, nl)
+    good = np.isfinite(data)
+
+    countrate = np.zeros((nint, nl), dtype=np.float64)
+    background = np.zeros((nint, nl), dtype=np.float64)
+
+    if nbkglim > 0:
+        bkg_data = temp_image[:, :, disp_range[0]:disp_range[0] + nl]
+        bkg_good = np.isfinite(bkg_data)
+        (bkg_wht, _) = _aperture_weights(bkglim, ny, nl)
+        # Powers of the pixel number, scaled to the interval [-1, 1] to
+        # keep the least-squares fit well conditioned.
+        half = (ny - 1) / 2.
+        t = (np.arange(ny, dtype=np.float64) - half) / max(half, 1.)
+        tpow = t[:, np.newaxis] ** np.arange(bkg_order + 1)
+        n_nobkg = 0
+        n_lowered = 0
+    else:
+        bkg_good = np.ones((nint, 1, 1), dtype=np.bool_)
+
+    # Integrations with the same bad pixels share the same fit, so they
+    # are processed together.
+    for (src_mask, bkg_mask, integrations) in _mask_groups(good, bkg_good):
+        values = data[integrations]
+        wht = src_wht
+        if not src_mask.all():
+            values = np.where(src_mask, values, 0.)
+            wht = np.where(src_mask, src_wht, 0.)
+        countrate[integrations] = np.einsum("iyx,yx->ix", values, wht)
+
+        if nbkglim == 0:
+            continue
+
+        # Compute polynomial fits to the background for these columns,
+        # using the (optionally) smoothed background, and evaluate them
+        # within the source region of the unsmoothed image.
+        (coeff, no_bkg, lowered) = _fit_background(
+            bkg_data[integrations], bkg_mask, bkg_wht, bkg_order, tpow)
+        src_moments = np.einsum("yx,yp->xp", wht, tpow)
+        bkg_flux = np.einsum("xp,ixp->ix", src_moments, coeff)
+        countrate[integrations] -= bkg_flux
+        background[integrations] = bkg_flux
+        n_nobkg = max(n_nobkg, no_bkg)
+        n_lowered = max(n_lowered, lowered)
+
+    if nbkglim > 0:
+        if n_nobkg > 0:
+            log.warning("Not enough valid pixels to determine background "
+                        "for %d columns", n_nobkg)
+        if n_lowered > 0:
+            log.warning("Not enough valid pixels to determine background "
+                        "with the required order for %d columns; "
+                        "the background order was lowered", n_lowered)
+
+    return (countrate.astype(np.float32), background.astype(np.float32))
+
+
+def _mask_groups(good, bkg_good):
+    """Group integrations that have the same valid pixels.
+
+    Returns
+    -------
+    list of tuples (src_mask, bkg_mask, integrations)
+        The valid pixels for the source and background, and an index
+        (array or slice) of the integrations that have those valid pixels.
+    """
+
+    nint = good.shape[0]
+    if good.all() and bkg_good.all():
+        return [(good[0], bkg_good[0], slice(None))]
+
+    bkg_good = np.broadcast_to(bkg_good, (nint,) + bkg_good.shape[1:])
+    masks = np.concatenate((good.reshape((nint, -1)),
+                            bkg_good.reshape((nint, -1))), axis=1)
+    (_, first, inverse) = np.unique(masks, axis=0, return_index=True,
+                                    return_inverse=True)
+    inverse = inverse.ravel()
+    return [(good[k], bkg_good[k], np.where(inverse == inverse[k])[0])
+            for k in np.sort(first)]
+
+
+def _aperture_weights(limits, ny, nl):
+    """Compute the fractional area of each pixel within the limits.
+
+    The limits are coalesced in the same way as for `_extract_colpix`.
+
+    Returns
+    -------
+    (weights, count): tuple of 2-D ndarrays, shape (ny, nl)
+        `weights` is the fraction of each pixel that is within the limits.
+        `count` is the number of times each pixel was extracted, which is
+        one for pixels within the limits, even if only at an edge.
+    """
+
+    weights = np.zeros((ny, nl), dtype=np.float64)
+    count = np.zeros((ny, nl), dtype=np.intp)
+    if len(limits) == 0:
+        return (weights, count)
+
+    lower = np.array([np.broadcast_to(lim[0], (nl,)) for lim in limits],
+                     dtype=np.float64)
+    upper = np.array([np.broadcast_to(lim[1], (nl,)) for lim in limits],
+                     dtype=np.float64)
+    # Sort the regions in increasing order of lower limit.
+    columns = np.arange(nl)
+    order = np.argsort(lower, axis=0, kind="mergesort")
+    lower = lower[order, columns]
+    upper = upper[order, columns]
+
+    y = np.arange(ny, dtype=np.float64)[:, np.newaxis]
+    ns = ny - 1
+    use_all = np.ones(nl, dtype=np.bool_)
+
+    def add_interval(i1, i2, use):
+        ii1 = np.clip(np.floor(i1 + 0.5), 0, ns)
+        ii2 = np.minimum(ns, np.floor(i2 + 0.5))
+        inside = (y >= ii1) & (y <= ii2) & use
+        area = np.minimum(i2, y + 0.5) - np.maximum(i1, y - 0.5)
+        weights[inside] += area[inside]
+        count[inside] += 1
+
+    # Coalesce overlapping regions.  As in `_coalesce_bounds`, a region
+    # that overlaps the previous one replaces its upper limit.
+    i1 = lower[0]
+    i2 = upper[0]
+    for k in range(1, len(limits)):
+        overlap = (lower[k] <= i2)
+        add_interval(i1, i2, np.logical_not(overlap))
+        i1 = np.where(overlap, i1, lower[k])
+        i2 = upper[k]
+    add_interval(i1, i2, use_all)
+
+    return (weights, count)
+
+
+def _fit_background(bkg_data, bkg_mask, bkg_wht, bkg_order, tpow):
+    """Fit polynomials to the background of each column.
+
+    All the integrations in `bkg_data` must have the same valid pixels,
+    `bkg_mask`, so that the least-squares solution can be computed once
+    for each column and applied to every integration.
+
+    Returns
+    -------
+    (coeff, no_bkg, lowered)
+        `coeff` is a 3-D array of the polynomial coefficients (in powers
+        of the scaled pixel number), for each integration and column.
+        `no_bkg` and `lowered` are the numbers of columns for which no
+        background could be determined, or for which the order of the
+        fit had to be lowered, respectively.
+    """
+
+    (nint, ny, nl) = bkg_data.shape
+    if bkg_mask.all():
+        wht = bkg_wht
+        values = wht * bkg_data
+    else:
+        wht = np.where(bkg_mask, bkg_wht, 0.)
+        values = wht * np.where(bkg_mask, bkg_data, 0.)
+    # The order of the fit is limited by the number of valid pixels with
+    # a non-zero weight, not by the size of the background region.
+    npts = (wht > 0).sum(axis=0)
+    degree = np.minimum(bkg_order, npts - 1)
+    valid = npts > 0
+
+    coeff = np.zeros((nint, nl, bkg_order + 1), dtype=np.float64)
+    for d in np.unique(degree[valid]):
+        columns = np.where(valid & (degree == d))[0]
+        lhs = wht[:, columns].T[:, :, np.newaxis] * tpow[:, 0:d + 1]
+        # Weighted least-squares solutions for all columns and integrations.
+        lsq = np.linalg.pinv(lhs)
+        coeff[:, columns, 0:d + 1] = np.einsum("xpy,iyx->ixp", lsq,
+                                               values[:, :, columns])
+
+    no_bkg = nl - valid.sum(dtype=np.intp)
+    lowered = (valid & (degree < bkg_order)).sum(dtype=np.intp)
+
+    return (coeff, no_bkg, lowered)
+
+
 def bxcar(image, smoothing_length):
     """Smooth with a 1-D interval, along the last axis."""
 
@@ -294,10 +547,10 @@ def _fit_background_model(image, x, j, bkglim, bkg_order):
     y, val, wht = _extract_colpix(image, x, j, bkglim)
 
     # find indices of "good" (finite) values:
-    good = np.isfinite(val)
-    npts = good.shape[0]
+    good = np.isfinite(val) & (wht > 0)
+    npts = good.sum()
 
-    if npts == 0 or not np.any(good):
+    if npts == 0:
         return (models.Polynomial1D(0), 0)
 
     # filter-out bad values:
@@ -351,6 +604,7 @@ def _extract_colpix(image_data, x, j, limits):
         # special case: ii1 == ii2:
         if ii1 == ii2:
             v = image_data[ii1, x]
+            y[k] = ii1
             val[k] = v
             wht[k] = i2 - i1
             k += 1
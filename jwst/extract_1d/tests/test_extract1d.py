@@ -0,0 +1,115 @@
+"""
+Test for extract_1d.extract1d
+"""
+import numpy as np
+from astropy.modeling import polynomial
+import pytest
+
+from jwst.extract_1d import extract1d
+
+
+def poly(*coeff):
+    """A polynomial function of the independent variable"""
+    return polynomial.Polynomial1D(
+        len(coeff) - 1, **{'c{}'.format(i): c for i, c in enumerate(coeff)})
+
+
+def unit_weights(lam, y):
+    """Weights that select the column-by-column extraction"""
+    return np.ones_like(y, dtype=np.float64)
+
+
+@pytest.fixture
+def image():
+    rng = np.random.RandomState(42)
+    data = rng.normal(10., 1., (40, 120)).astype(np.float32)
+    data += np.linspace(0., 3., 40, dtype=np.float32)[:, np.newaxis]
+    data[3, 10] = np.nan
+    return data
+
+
+def test_aperture_weights():
+
+    limits = [[np.array([2.3, 2.5]), np.array([4.2, 2.5])],
+              [np.array([3.5, 6.8]), np.array([5.0, 7.1])]]
+    (weights, count) = extract1d._aperture_weights(limits, 10, 2)
+
+    assert np.allclose(weights[:, 0], [0., 0., 0.2, 1., 1., 0.5, 0., 0.,
+                                       0., 0.])
+    assert count[:, 0].tolist() == [0, 0, 1, 1, 1, 1, 0, 0, 0, 0]
+    assert np.allclose(weights[:, 1], [0., 0., 0., 0., 0., 0., 0., 0.3,
+                                       0., 0.])
+    assert count[:, 1].tolist() == [0, 0, 0, 1, 0, 0, 0, 1, 0, 0]
+
+
+@pytest.mark.parametrize('bkg_order', [0, 1, 2])
+@pytest.mark.parametrize('smoothing_length', [0, 3])
+def test_batched_extraction(image, bkg_order, smoothing_length):
+    """All columns at once give the same spectrum as one at a time"""
+    lambdas = np.linspace(1., 5., 100)
+    p_src = [[poly(10.3, 0.01), poly(20.7, 0.01)]]
+    p_bkg = [[poly(-0.5), poly(5.2)], [poly(30.1), poly(39.5)]]
+    args = (lambdas, [10, 110], p_src, p_bkg, "pixel",
+            smoothing_length, bkg_order)
+
+    (net, background) = extract1d.extract1d(image, *args)
+    (net_ref, background_ref) = extract1d.extract1d(
+        image, *args, weights=unit_weights)
+
+    assert net.dtype == np.float32
+    assert np.allclose(net, net_ref, rtol=1.e-5, atol=1.e-5)
+    assert np.allclose(background, background_ref, rtol=1.e-5, atol=1.e-5)
+
+
+def test_integrations(image):
+    """Each integration of a cube is extracted separately"""
+    lambdas = np.linspace(1., 5., 100)
+    cube = np.array([image, image + 1., image * 2.])
+    cube[1, 20, 50] = np.inf
+    args = (lambdas, [10, 110], [[poly(10.3), poly(20.7)]],
+            [[poly(2.), poly(6.)]], "pixel", 0, 1)
+
+    (net, background) = extract1d.extract1d(cube, *args)
+
+    assert net.shape == (3, 100)
+    for k in range(3):
+        (net_k, background_k) = extract1d.extract1d(cube[k], *args)
+        assert np.allclose(net[k], net_k, rtol=1.e-6, atol=1.e-6)
+        assert np.allclose(background[k], background_k, rtol=1.e-6,
+                           atol=1.e-6)
+
+
+def test_narrow_background_with_nans(image):
+    """The background order is limited by the number of valid pixels"""
+    lambdas = np.linspace(1., 5., 100)
+    image[5, 30] = np.nan
+    image[5:7, 40] = np.nan
+    args = (lambdas, [10, 110], [[poly(10.3), poly(20.7)]],
+            [[poly(4.6), poly(6.4)]], "pixel", 0, 2)
+
+    (net, background) = extract1d.extract1d(image, *args)
+    (net_ref, background_ref) = extract1d.extract1d(
+        image, *args, weights=unit_weights)
+
+    assert np.isfinite(background).all()
+    assert np.allclose(background[20], image[6, 30] * 10.4, rtol=1.e-5)
+    assert background[30] == 0.
+    assert np.allclose(net, net_ref, rtol=1.e-5, atol=1.e-5)
+    assert np.allclose(background, background_ref, rtol=1.e-5, atol=1.e-5)
+
+
+@pytest.mark.parametrize('bkg_order', [0, 1])
+def test_one_pixel_background(image, bkg_order):
+    """Background regions within one pixel are fit at that pixel"""
+    lambdas = np.linspace(1., 5., 100)
+    args = (lambdas, [10, 110], [[poly(10.3), poly(20.7)]],
+            [[poly(5.6), poly(6.2)], [poly(30.7), poly(31.3)]], "pixel", 0,
+            bkg_order)
+
+    (net, background) = extract1d.extract1d(image, *args)
+    (net_ref, background_ref) = extract1d.extract1d(
+        image, *args, weights=unit_weights)
+
+    assert np.isfinite(background).all()
+    assert np.allclose(net, net_ref, rtol=1.e-5, atol=1.e-5)
+    assert np.allclose(background, background_ref, rtol=1.e-5, atol=1.e-5)
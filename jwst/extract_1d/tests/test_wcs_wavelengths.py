@@ -0,0 +1,52 @@
+"""
+Test for extract_1d.extract.wcs_wavelengths
+"""
+import numpy as np
+from astropy.modeling.models import Mapping, Polynomial2D
+
+from jwst.extract_1d import extract
+
+
+class FakeWCS:
+    """A WCS holding just a forward transform"""
+    def __init__(self, transform):
+        self.forward_transform = transform
+
+
+def make_wcs():
+    # The wavelength is zero (outside the spectrum) at x = 10.
+    wavelength = Polynomial2D(1, c0_0=-1., c1_0=0.1, c0_1=0.001)
+    transform = Mapping((0, 1, 0, 1, 0, 1)) | (
+        Polynomial2D(1, c1_0=1.) & Polynomial2D(1, c0_1=1.) & wavelength)
+    return FakeWCS(transform)
+
+
+def test_wcs_wavelengths():
+
+    wcs = make_wcs()
+    transform = wcs.forward_transform
+    shape = (5, 20)
+
+    wl = extract.wcs_wavelengths(transform, shape, 1, 2)
+
+    expected = np.zeros(shape)
+    for j in range(shape[0]):
+        for i in range(shape[1]):
+            expected[j, i] = transform(i, j)[2]
+    expected[expected == 0.] = np.nan
+    assert np.array_equal(wl, expected, equal_nan=True)
+    assert np.isnan(wl[0, 10])
+
+
+def test_wfss_coordinates():
+
+    wcs = make_wcs()
+    x = np.arange(5., 15.)
+    y = np.full(x.shape, 2.5)
+
+    (ra, dec, wavelength) = extract.wfss_coordinates(
+        wcs.forward_transform, 2, x, y, 1)
+
+    assert np.allclose(ra, x)
+    assert np.allclose(dec, y)
+    assert np.allclose(wavelength, -1. + 0.1 * x + 0.0025)
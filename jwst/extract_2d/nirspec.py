@@ -248,9 +248,9 @@ def extract_slit(input_model, slit, exp_type):
 
     slit_wcs.bounding_box = util.bounding_box_from_shape(ext_data.shape)
 
-    # compute wavelengths
-    x, y = wcstools.grid_from_bounding_box(slit_wcs.bounding_box, step=(1, 1))
-    ra, dec, lam = slit_wcs(x, y)
+    # compute wavelengths; the coordinates are kept with the WCS
+    # for the steps that follow
+    ra, dec, lam = util.evaluate_slit_wcs(slit_wcs).world
     lam = lam.astype(np.float32)
     new_model = datamodels.SlitModel(data=ext_data, err=ext_err, dq=ext_dq, wavelength=lam,
                                      var_rnoise=ext_var_rnoise, var_poisson=ext_var_poisson,
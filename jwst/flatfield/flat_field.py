@@ -2,6 +2,7 @@
 #  Module for applying flat fielding
 #
 
+from collections import OrderedDict
 import logging
 import math
 
@@ -11,6 +12,7 @@ from .. import datamodels
 from .. datamodels import dqflags
 from .. lib import reffile_utils
 from .. assign_wcs import nirspec       # for NIRSpec IFU data
+from .. assign_wcs import util
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
@@ -25,6 +27,11 @@ FIXED_SLIT_TYPES = ["NRS_LAMP", "NRS_BRIGHTOBJ", "NRS_FIXEDSLIT"]
 HORIZONTAL = 1
 VERTICAL = 2
 
+# Wavelength plane indexes of the NIRSpec flat field reference cubes,
+# keyed by (reference file name, quadrant).  See get_wavelength_planes.
+MAX_CACHED_PLANES = 32
+_planes_cache = OrderedDict()
+
 
 def do_correction(input_model, flat_model,
                   f_flat_model, s_flat_model,
@@ -166,8 +173,8 @@ def apply_flat_field(science, flat):
 
     # Extract subarray from reference data, if necessary
     if reffile_utils.ref_matches_sci(science, flat):
-        flat_data = flat.data
-        flat_dq = flat.dq
+        flat_data = reffile_utils.writeable_array(flat.data)
+        flat_dq = reffile_utils.writeable_array(flat.dq)
     else:
         log.info("Extracting matching subarray from flat")
         sub_flat = reffile_utils.get_subarray_model(science, flat)
@@ -324,10 +331,9 @@ def do_NIRSpec_flat_field(output_model,
             if got_wcs:
                 log.warning("so using wcs instead of the wavelength array.")
                 # Pixels with respect to the cutout
-                grid = np.indices((ysize, xsize), dtype=np.float64)
-                # The arguments are the X and Y pixel coordinates.
-                (ra, dec, wl) = slit.meta.wcs(grid[1], grid[0])
-                del ra, dec, grid
+                evaluation = util.evaluate_slit_wcs(
+                    slit.meta.wcs, util.bounding_box_from_shape((ysize, xsize)))
+                wl = evaluation.world[2].copy()
             else:
                 log.warning("and this slit does not have a 'wcs' attribute")
                 if output_model.meta.cal_step.assign_wcs == 'COMPLETE':
@@ -488,9 +494,10 @@ def NIRSpec_brightobj(output_model,
         log.warning("The wavelength array has not been populated,")
         if got_wcs:
             log.warning("so using wcs instead of the wavelength array.")
-            grid = np.indices((ysize, xsize), dtype=np.float64)
-            (ra, dec, wl) = output_model.meta.wcs(grid[1], grid[0])
-            del ra, dec, grid
+            evaluation = util.evaluate_slit_wcs(
+                output_model.meta.wcs,
+                util.bounding_box_from_shape((ysize, xsize)))
+            wl = evaluation.world[2].copy()
         else:
             log.warning("and there is no 'wcs' attribute,")
             if output_model.meta.cal_step.assign_wcs == 'COMPLETE':
@@ -649,13 +656,13 @@ def NIRSpec_IFU(output_model,
         ystart = int(math.ceil(ystart))
         ystop = int(math.floor(ystop)) + 1
 
-        dx = xstop - xstart
-        dy = ystop - ystart
-        ind = np.indices((dy, dx))
-        x = ind[1] + xstart
-        y = ind[0] + ystart
-        coords = ifu_wcs(x, y)
-        wl = coords[2]
+        # The pixels are within the grid of the bounding box, whose
+        # coordinates are shared with the other steps.
+        evaluation = util.evaluate_slit_wcs(ifu_wcs)
+        x0 = int(evaluation.x[0, 0])
+        y0 = int(evaluation.y[0, 0])
+        wl = evaluation.world[2][ystart - y0:ystop - y0,
+                                 xstart - x0:xstop - x0].copy()
         nan_flag = np.isnan(wl)
         good_flag = np.logical_not(nan_flag)
         if wl[good_flag].max() < MICRONS_100:
@@ -962,11 +969,12 @@ def spectrograph_flat(wl, s_flat_model,
         image_flat = full_array_flat[:, ystart:ystop, xstart:xstop]
         image_dq = full_array_dq[:, ystart:ystop, xstart:xstop]
         # Get the wavelength corresponding to each plane in the image.
-        image_wl = read_image_wl(s_flat_model, quadrant)
+        planes = get_wavelength_planes(s_flat_model, quadrant)
+        image_wl = planes.wavelength
         if image_wl.max() < MICRONS_100:
             log.warning("Wavelengths in s_flat image appear to be in meters")
         (flat_2d, s_flat_dq) = interpolate_flat(image_flat, image_dq,
-                                                image_wl, wl)
+                                                image_wl, wl, planes)
     else:
         flat_2d = full_array_flat[ystart:ystop, xstart:xstop]
         s_flat_dq = full_array_dq[ystart:ystop, xstart:xstop]
@@ -1038,12 +1046,13 @@ def detector_flat(wl, d_flat_model,
     else:
         image_dq = full_array_dq[:, ystart:ystop, xstart:xstop]
     # Get the wavelength corresponding to each plane in the image.
-    image_wl = read_image_wl(d_flat_model, quadrant)
+    planes = get_wavelength_planes(d_flat_model, quadrant)
+    image_wl = planes.wavelength
     if image_wl.max() < MICRONS_100:
         log.warning("Wavelengths in d_flat image appear to be in meters.")
 
     (flat_2d, d_flat_dq) = interpolate_flat(image_flat, image_dq,
-                                            image_wl, wl)
+                                            image_wl, wl, planes)
 
     d_flat = combine_fast_slow(wl, flat_2d, tab_wl, tab_flat, dispaxis)
 
@@ -1110,12 +1119,11 @@ def read_image_wl(flat_model, quadrant=None):
 
     Returns
     -------
+    ndarray, 1-D
+        The wavelength of each plane, skipping NaNs and non-positive values.
     """
 
-    if quadrant is not None:                    # NRS_MSASPEC
-        wavelength = flat_model.quadrants[quadrant].wavelength["wavelength"]
-    else:
-        wavelength = flat_model.wavelength["wavelength"]
+    wavelength = _raw_image_wl(flat_model, quadrant)
 
     if len(wavelength.shape) > 1:
         n = wavelength.shape[-1]
@@ -1141,6 +1149,154 @@ def read_image_wl(flat_model, quadrant=None):
     return wavelength
 
 
+def _raw_image_wl(flat_model, quadrant=None):
+    """The wavelength column of the image, as read from the model."""
+
+    if quadrant is not None:                    # NRS_MSASPEC
+        return flat_model.quadrants[quadrant].wavelength["wavelength"]
+    else:
+        return flat_model.wavelength["wavelength"]
+
+
+class WavelengthPlanes:
+    """Locate wavelengths between the planes of a flat field image.
+
+    The planes of a 3-D flat field reference image are images of the
+    flat field at increasing wavelengths.  For each pixel of a 2-D
+    extracted spectrum, the flat field is interpolated between the two
+    planes that bracket the wavelength at that pixel.
+
+    Parameters
+    ----------
+    image_wl: ndarray, 1-D
+        The wavelength for each plane of the flat field reference image.
+    """
+
+    def __init__(self, image_wl):
+        self.wavelength = image_wl
+        # np.searchsorted requires the wavelengths to be sorted.
+        self.increasing = bool(np.all(image_wl[1:] >= image_wl[:-1]))
+
+    def locate(self, wl, nz):
+        """Find the bracketing planes and interpolation weights.
+
+        Parameters
+        ----------
+        wl: ndarray, 2-D
+            The wavelength at each pixel of the 2-D extracted spectrum.
+
+        nz: int
+            The number of planes in the flat field image, at least 2.
+
+        Returns
+        -------
+        tuple (k, p)
+        k: ndarray, 2-D, int
+            Index of the plane at or below the wavelength at each pixel.
+            Wavelengths outside the range of the planes are assigned the
+            first or last interval, and NaNs are assigned -1.
+        p: ndarray, 2-D, float
+            The weight of plane k + 1; the weight of plane k is 1 - p.
+        """
+
+        image_wl = self.wavelength[:nz]
+        wl_first = image_wl[0]
+        wl_last = image_wl[nz - 1]
+
+        if self.increasing:
+            with np.errstate(invalid="ignore"):
+                k = np.searchsorted(image_wl, wl, side="right") - 1
+                # Truncate the index for wavelengths that are outside the
+                # range of image_wl.  We interpolate using elements k and
+                # k + 1, so the upper limit of k is nz - 2.
+                k = np.where(wl <= wl_first, 0, k)
+                k = np.where(wl >= wl_last, nz - 2, k)
+            k[np.isnan(wl)] = -1
+        else:
+            k = _search_planes(image_wl, wl, nz)
+
+        # Use linear interpolation within the 3-D flat field to get a 2-D
+        # flat field.
+        denom = image_wl[k + 1] - image_wl[k]
+        zero_denom = (denom == 0.)
+        denom = np.where(zero_denom, 1., denom)
+        p = np.where(zero_denom, 0., (wl - image_wl[k]) / denom)
+
+        return (k, p)
+
+
+def _search_planes(image_wl, wl, nz):
+    """Find the interval for linear interpolation, one plane at a time.
+
+    This is used if the wavelengths of the planes are not sorted.
+    """
+
+    # The initial value of -1 is a flag to indicate that elements have not
+    # been assigned valid values yet.
+    k = np.zeros(wl.shape, dtype=np.intp) - 1
+
+    # Truncate the index for wavelengths that are outside the range of
+    # image_wl.  The indices need to be assigned harmless values to avoid
+    # indexing out of bounds.
+    k[:, :] = np.where(wl <= image_wl[0], 0, k)
+    k[:, :] = np.where(wl >= image_wl[nz - 1], nz - 2, k)
+
+    for k_test in range(nz - 1):
+        test1 = np.logical_and(wl >= image_wl[k_test],
+                               wl < image_wl[k_test + 1])
+        # If an element of k is not -1, it has already been assigned, and
+        # I don't want to clobber it.
+        test2 = np.logical_and(k == -1, test1)
+        k[:, :] = np.where(test2, k_test, k)
+        if np.all(k >= 0):
+            break
+
+    return k
+
+
+def get_wavelength_planes(flat_model, quadrant=None):
+    """Get the wavelength plane index for a flat field reference image.
+
+    The index depends only on the reference file, so it is built once
+    per reference file and quadrant, and reused for every slit and every
+    exposure that use the same reference file.
+
+    Parameters
+    ----------
+    flat_model: NirspecFlatModel or NirspecQuadFlatModel object
+        Flat field for the current component.
+
+    quadrant: int (0, 1, 2, or 3)
+        The quadrant of the micro-shutter array.  This is only needed for
+        fore-optics for MSA (MOS) data.
+
+    Returns
+    -------
+    WavelengthPlanes
+        The index of the wavelengths of the image planes.
+    """
+
+    filename = flat_model.meta.filename
+    raw_wl = _raw_image_wl(flat_model, quadrant)
+    key = (filename, quadrant)
+
+    if filename is not None and key in _planes_cache:
+        (cached_wl, planes) = _planes_cache[key]
+        # A file by the same name may have different contents.
+        if np.array_equal(cached_wl, raw_wl):
+            _planes_cache.move_to_end(key)
+            return planes
+
+    planes = WavelengthPlanes(read_image_wl(flat_model, quadrant))
+    if filename is not None:
+        _planes_cache[key] = (np.array(raw_wl), planes)
+        _planes_cache.move_to_end(key)
+        while len(_planes_cache) > MAX_CACHED_PLANES:
+            _planes_cache.popitem(last=False)
+
+    return planes
+
+
 def read_flat_table(flat_model, exposure_type,
                     slit_name=None, quadrant=None):
     """Read the table (the "fast" variation).
@@ -1316,23 +1472,19 @@ def combine_fast_slow(wl, flat_2d, tab_wl, tab_flat, dispaxis):
         dwl[0:-1, :] = wl_c[1:, :] - wl_c[0:-1, :]
         dwl[-1, :] = dwl[-2, :]
 
-    # Values averaged within tab_flat.
-    values = np.zeros_like(wl_c)
-    (ny, nx) = wl_c.shape
     # Abscissas and weights for 3-point Gaussian integration, but taking
     # the width of the interval to be 1, so the result will be the average
     # over the interval.
     d = math.sqrt(0.6) / 2.
     dx = np.array([-d, 0., d])
     wgt = np.array([5., 8., 5.]) / 18.
-    for j in range(ny):
-        for i in range(nx):
-            if wl[j, i] <= 0.:          # note:  wl, not wl_c
-                values[j, i] = 1.
-            else:
-                # average the tabular data over the range of wavelengths
-                values[j, i] = g_average(wl_c[j, i], dwl[j, i],
-                                         tab_wl, tab_flat, dx, wgt)
+
+    # Average the tabular data over the range of wavelengths of each
+    # pixel, for all pixels at once.
+    values = g_average(wl_c, dwl, tab_wl, tab_flat, dx, wgt)
+    values = values.astype(wl_c.dtype, copy=False)
+    with np.errstate(invalid='ignore'):
+        values[wl <= 0.] = 1.           # note:  wl, not wl_c
 
     return flat_2d * values
 
@@ -1406,11 +1558,12 @@ def g_average(wl0, dwl0, tab_wl, tab_flat, dx, wgt):
 
     Parameters
     ----------
-    wl0: float
-        Wavelength at the center of the current pixel.
+    wl0: float or ndarray
+        Wavelength at the center of the current pixel, or of each pixel.
 
-    dwl0: float
-        Width (in wavelength units) of the current pixel.
+    dwl0: float or ndarray
+        Width (in wavelength units) of the current pixel, or of each
+        pixel.  This must have the same shape as `wl0`.
 
     tab_wl: ndarray, 1-D
         Array of wavelengths corresponding to `tab_flat` flat-field values.
@@ -1426,17 +1579,21 @@ def g_average(wl0, dwl0, tab_wl, tab_flat, dx, wgt):
 
     Returns
     -------
-    float
-        The average value of `tab_flat` over the current pixel.
+    float or ndarray
+        The average value of `tab_flat` over the current pixel, or over
+        each pixel.
     """
 
+    wl0 = np.asarray(wl0, dtype=np.float64)
+    dwl0 = np.asarray(dwl0, dtype=np.float64)
     npts = len(dx)
-    wavelengths = wl0 + dwl0 * dx
-    sum = 0.
+    sum = np.zeros_like(wl0)
     for k in range(npts):
-        value = wl_interpolate(wavelengths[k], tab_wl, tab_flat)
+        value = wl_interpolate(wl0 + dwl0 * dx[k], tab_wl, tab_flat)
         sum += (value * wgt[k])
 
+    if sum.ndim == 0:
+        return float(sum)
     return sum
 
 
@@ -1447,8 +1604,9 @@ def wl_interpolate(wavelength, tab_wl, tab_flat):
 
     Parameters
     ----------
-    wavelength: float
-        The wavelength (microns) at which to find the flat-field value.
+    wavelength: float or ndarray
+        The wavelength (microns) at which to find the flat-field value,
+        or an array of wavelengths.
 
     tab_wl: ndarray, 1-D
         Array of wavelengths corresponding to `tab_flat` flat-field values.
@@ -1459,23 +1617,28 @@ def wl_interpolate(wavelength, tab_wl, tab_flat):
 
     Returns
     -------
-    float
+    float or ndarray
         The flat-field value (from `tab_flat`) at `wavelength`.
     """
 
-    if wavelength < tab_wl[0]:
-        return tab_flat[0]
-    if wavelength > tab_wl[-1]:
-        return tab_flat[-1]
+    wavelength = np.asarray(wavelength, dtype=np.float64)
 
     n0 = np.searchsorted(tab_wl, wavelength) - 1
+    n0 = np.clip(n0, 0, len(tab_wl) - 2)
     p = (wavelength - tab_wl[n0]) / (tab_wl[n0 + 1] - tab_wl[n0])
     q = 1. - p
+    value = q * tab_flat[n0] + p * tab_flat[n0 + 1]
 
-    return q * tab_flat[n0] + p * tab_flat[n0 + 1]
+    # Wavelengths outside the table take the values at the ends.
+    value = np.where(wavelength < tab_wl[0], tab_flat[0], value)
+    value = np.where(wavelength > tab_wl[-1], tab_flat[-1], value)
 
+    if value.ndim == 0:
+        return float(value)
+    return value
 
-def interpolate_flat(image_flat, image_dq, image_wl, wl):
+
+def interpolate_flat(image_flat, image_dq, image_wl, wl, planes=None):
     """
 
     Short Summary
@@ -1500,6 +1663,10 @@ def interpolate_flat(image_flat, image_dq, image_wl, wl):
     wl: ndarray, 2-D
         The wavelength at each pixel of the 2-D extracted science spectrum.
 
+    planes: WavelengthPlanes, or None
+        The index of `image_wl`, from `get_wavelength_planes`.  If None,
+        an index will be created for `image_wl`.
+
     Returns
     -------
     tuple, two 2-D ndarrays
@@ -1526,35 +1693,10 @@ def interpolate_flat(image_flat, image_dq, image_wl, wl):
     ixpixel = grid[1]
     iypixel = grid[0]
 
-    # The initial value of -1 is a flag to indicate that elements have not
-    # been assigned valid values yet.
-    k = np.zeros(wl.shape, dtype=np.intp) - 1
-
-    # Truncate the index for wavelengths that are outside the range of
-    # image_wl.  The indices need to be assigned harmless values to avoid
-    # indexing out of bounds.
-    #   Why do we set the upper limit of k to nz - 2?
-    #   Because we interpolate using elements k and k + 1.
-    k[:, :] = np.where(wl <= image_wl[0], 0, k)
-    k[:, :] = np.where(wl >= image_wl[nz - 1], nz - 2, k)
-
     # Look for the correct interval for linear interpolation.
-    for k_test in range(nz - 1):
-        test1 = np.logical_and(wl >= image_wl[k_test],
-                               wl < image_wl[k_test + 1])
-        # If an element of k is not -1, it has already been assigned, and
-        # I don't want to clobber it.
-        test2 = np.logical_and(k == -1, test1)
-        k[:, :] = np.where(test2, k_test, k)
-        if np.all(k >= 0):
-            break
-
-    # Use linear interpolation within the 3-D flat field to get a 2-D
-    # flat field.
-    denom = image_wl[k + 1] - image_wl[k]
-    zero_denom = (denom == 0.)
-    denom = np.where(zero_denom, 1., denom)
-    p = np.where(zero_denom, 0., (wl - image_wl[k]) / denom)
+    if planes is None:
+        planes = WavelengthPlanes(image_wl)
+    (k, p) = planes.locate(wl, nz)
     q = 1. - p
     flat_2d = q * image_flat[k, iypixel, ixpixel] + \
               p * image_flat[k + 1, iypixel, ixpixel]
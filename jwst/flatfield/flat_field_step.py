@@ -142,7 +142,8 @@ class FlatFieldStep(Step):
                 d_flat_model = datamodels.NirspecFlatModel(self.d_flat_filename)
         else:
             self.log.debug('Opening flat as FlatModel')
-            flat_model = datamodels.FlatModel(self.flat_filename)
+            flat_model = self.open_reference_model(datamodels.FlatModel,
+                                                    self.flat_filename)
             f_flat_model = None
             s_flat_model = None
             d_flat_model = None
@@ -0,0 +1,56 @@
+"""
+Test for flat_field.combine_fast_slow
+"""
+import math
+
+import numpy as np
+
+from jwst.flatfield import flat_field
+
+
+def test_wl_interpolate():
+
+    tab_wl = np.array([1., 2., 4.])
+    tab_flat = np.array([1., 3., 2.])
+
+    wavelengths = np.array([0.5, 1., 1.5, 2., 3., 4., 4.5])
+    expected = np.array([1., 1., 2., 3., 2.5, 2., 2.])
+    values = flat_field.wl_interpolate(wavelengths, tab_wl, tab_flat)
+    assert np.allclose(values, expected, atol=0., rtol=1.e-12)
+
+    # Scalars give scalars.
+    assert flat_field.wl_interpolate(1.5, tab_wl, tab_flat) == 2.
+
+
+def test_combine_fast_slow():
+
+    # The dispersion direction is horizontal.
+    wl = np.tile(np.linspace(1., 5., 9), (4, 1))
+    wl[1, 2] = 0.
+    wl[2, :] = 0.
+    flat_2d = np.full(wl.shape, 2., dtype=np.float64)
+
+    # A linear table is averaged exactly by Gaussian integration.
+    tab_wl = np.linspace(0.5, 6., 12)
+    tab_flat = 1. + 0.1 * tab_wl
+
+    result = flat_field.combine_fast_slow(wl, flat_2d, tab_wl, tab_flat, 1)
+
+    wl_c = flat_field.clean_wl(wl, 1)
+    expected = 2. * (1. + 0.1 * wl_c)
+    expected[wl <= 0.] = 2.
+    assert np.allclose(result, expected, atol=0., rtol=1.e-12)
+
+    # The same values are found one pixel at a time.
+    d = math.sqrt(0.6) / 2.
+    dx = np.array([-d, 0., d])
+    wgt = np.array([5., 8., 5.]) / 18.
+    for j, i in [(0, 0), (1, 4), (3, 8)]:
+        value = flat_field.g_average(wl_c[j, i], 0.5, tab_wl, tab_flat,
+                                     dx, wgt)
+        assert math.isclose(2. * value, result[j, i], rel_tol=1.e-12)
+
+    # The dispersion direction is vertical.
+    result_v = flat_field.combine_fast_slow(wl.T.copy(), flat_2d.T,
+                                            tab_wl, tab_flat, 2)
+    assert np.allclose(result_v, result.T, atol=0., rtol=1.e-12)
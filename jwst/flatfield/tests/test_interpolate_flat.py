@@ -0,0 +1,106 @@
+"""
+Test for flat_field.interpolate_flat
+"""
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from jwst import datamodels
+from jwst.flatfield import flat_field
+
+
+def make_flat_model(wavelengths, filename=None):
+    """A NIRSpec flat with the given plane wavelengths"""
+    model = datamodels.NirspecFlatModel()
+    table = np.zeros(len(wavelengths), dtype=[('wavelength', '<f4')])
+    table['wavelength'] = wavelengths
+    model.wavelength = table
+    model.meta.filename = filename
+    return model
+
+
+def test_locate():
+
+    image_wl = np.array([1., 2., 2., 4.])
+    wl = np.array([[0.5, 1., 1.5, 2., 3., 4., 4.5, np.nan]])
+
+    assert not flat_field.WavelengthPlanes(image_wl[::-1]).increasing
+
+    planes = flat_field.WavelengthPlanes(image_wl)
+    assert planes.increasing
+    (k, p) = planes.locate(wl, 4)
+    assert k.tolist() == [[0, 0, 0, 2, 2, 2, 2, -1]]
+    assert np.allclose(p[:, :-1], [[-0.5, 0., 0.5, 0., 0.5, 1., 1.25]],
+                       atol=0., rtol=1.e-12)
+
+
+def test_interpolate_flat():
+
+    rng = np.random.RandomState(42)
+    (nz, ny, nx) = (20, 6, 50)
+    image_wl = np.sort(rng.uniform(1., 5., nz))
+    image_flat = rng.uniform(0.5, 1.5, (nz, ny, nx)).astype(np.float32)
+    image_dq = np.zeros((nz, ny, nx), dtype=np.uint32)
+    image_dq[rng.uniform(size=image_dq.shape) < 0.2] = 4
+    wl = rng.uniform(0.5, 5.5, (ny, nx))
+    wl[0, :4] = 0.
+    wl[1, :len(image_wl)] = image_wl[:nx]
+
+    # The planes are found the same way as one plane at a time.
+    (flat_2d, flat_dq) = flat_field.interpolate_flat(
+        image_flat, image_dq, image_wl, wl)
+    planes = flat_field.WavelengthPlanes(image_wl)
+    planes.increasing = False
+    (flat_ref, dq_ref) = flat_field.interpolate_flat(
+        image_flat, image_dq, image_wl, wl, planes)
+    assert flat_2d.dtype == image_flat.dtype
+    assert np.array_equal(flat_2d, flat_ref)
+    assert np.array_equal(flat_dq, dq_ref)
+    assert np.all(flat_dq[0, :4] & datamodels.dqflags.pixel['NO_FLAT_FIELD'])
+
+    # Interpolate one pixel by hand.
+    (j, i) = (3, 7)
+    k = np.searchsorted(image_wl, wl[j, i]) - 1
+    k = min(max(k, 0), nz - 2)
+    p = (wl[j, i] - image_wl[k]) / (image_wl[k + 1] - image_wl[k])
+    expected = ((1. - p) * image_flat[k, j, i] +
+                p * image_flat[k + 1, j, i])
+    image_dq[k:k + 2, j, i] = 0
+    (flat_2d, flat_dq) = flat_field.interpolate_flat(
+        image_flat, image_dq, image_wl, wl, planes)
+    assert flat_dq[j, i] == 0
+    assert np.isclose(flat_2d[j, i], expected, rtol=1.e-6)
+
+
+def test_get_wavelength_planes(monkeypatch):
+
+    monkeypatch.setattr(flat_field, '_planes_cache', OrderedDict())
+
+    model = make_flat_model([1., 2., 3., 0.], 'nrs_dflat.fits')
+    planes = flat_field.get_wavelength_planes(model)
+    assert planes.wavelength.tolist() == [1., 2., 3.]
+
+    # The index is reused for the same reference file.
+    same = make_flat_model([1., 2., 3., 0.], 'nrs_dflat.fits')
+    assert flat_field.get_wavelength_planes(same) is planes
+
+    # but not if the file has changed, or there is no file name.
+    changed = make_flat_model([1., 2., 4., 0.], 'nrs_dflat.fits')
+    assert flat_field.get_wavelength_planes(changed) is not planes
+    unnamed = make_flat_model([1., 2., 3., 0.])
+    assert flat_field.get_wavelength_planes(unnamed) is not planes
+    assert len(flat_field._planes_cache) == 1
+
+
+@pytest.mark.parametrize('nz', [1, 2])
+def test_few_planes(nz):
+
+    image_wl = np.arange(1., nz + 1.)
+    image_flat = np.full((nz, 2, 3), 2., dtype=np.float32)
+    image_dq = np.zeros((nz, 2, 3), dtype=np.uint32)
+    wl = np.full((2, 3), 1.5)
+    (flat_2d, flat_dq) = flat_field.interpolate_flat(
+        image_flat, image_dq, image_wl, wl)
+    assert flat_2d.shape == wl.shape
+    assert np.all(flat_2d == 2.)
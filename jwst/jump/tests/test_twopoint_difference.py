@@ -1,7 +1,8 @@
 import pytest
 import numpy as np
 
-from jwst.jump.twopoint_difference import find_crs
+from jwst.jump.twopoint_difference import find_crs, return_clipped_median, \
+    return_clipped_median_pixels
 from jwst.datamodels import dqflags
 
 
@@ -481,6 +482,42 @@ def test_10grps_satat8_crsat3and6(setup_cube):
                             0,dqflags.group['SATURATED'],dqflags.group['SATURATED'],dqflags.group['SATURATED']], gdq[0, :, 100, 100]))
 
 
+def test_10grps_multiple_crs_manypixels(setup_cube):
+    ngroups = 10
+    data, gdq, nframes, read_noise, rej_threshold = setup_cube(ngroups, readnoise=5)
+    jump = dqflags.group['JUMP_DET']
+    ramp = np.arange(ngroups) * 100.
+    # pixels with one, two and three CRs, all processed together
+    crs = {(100, 100): [3], (100, 101): [2, 7], (200, 300): [2, 5, 8]}
+    for (row, col), groups in crs.items():
+        data[0, :, row, col] = ramp
+        for group in groups:
+            data[0, group:, row, col] += 1000.
+    median_diff = find_crs(data, gdq, read_noise, rej_threshold, nframes)
+    for (row, col), groups in crs.items():
+        expected = np.zeros(ngroups, dtype=gdq.dtype)
+        expected[groups] = jump
+        assert np.array_equal(expected, gdq[0, :, row, col])
+        assert median_diff[0, row, col] == 100.
+    assert np.count_nonzero(gdq) == 6
+
+
+def test_clipped_median_pixels():
+    rng = np.random.RandomState(42)
+    ndiffs = 9
+    differences = rng.normal(0., 100., (20, ndiffs)).astype(np.float32)
+    sorted_index = np.argsort(np.abs(differences), axis=1)
+    diffs_to_ignore = rng.randint(1, ndiffs - 1, 20)
+    med, poisson_2 = return_clipped_median_pixels(ndiffs, diffs_to_ignore,
+                                                  differences, sorted_index)
+    for i in range(20):
+        expected = return_clipped_median(ndiffs, diffs_to_ignore[i],
+                                         differences[i], sorted_index[i])
+        poisson_noise = np.sqrt(np.abs(expected))
+        assert med[i] == expected
+        assert poisson_2[i] == poisson_noise * poisson_noise
+
+
 @pytest.fixture(scope='function')
 def setup_cube():
 
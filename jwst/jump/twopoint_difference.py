@@ -3,8 +3,8 @@ Two-Point Difference method for finding outliers in a 3-d ramp data cube.
 The scheme used in this variation of the method uses numpy array methods
 to compute first-differences and find the max outlier in each pixel while
 still working in the full 3-d data array. This makes detection of the first
-outlier very fast. We then iterate pixel-by-pixel over only those pixels
-that are already known to contain an outlier, to look for any additional
+outlier very fast. We then iterate over only those pixels that are already
+known to contain an outlier, all of them at once, to look for any additional
 outliers and set the appropriate DQ mask for all outliers in the pixel.
 This is MUCH faster than doing all the work on a pixel-by-pixel basis.
 """
@@ -110,44 +110,65 @@ def find_crs(data, gdq, read_noise, rej_threshold, nframes):
         row1, col1 = np.where(ratio[r, c, max_index1] > rej_threshold)
         log.debug('From highest outlier Twopt found %d pixels with at least one CR' % (len(row1)))
         number_pixels_with_cr = len(row1)
-        for j in range(number_pixels_with_cr):
-            pixel_masked_diffs = first_diffs[row1[j], col1[j]]
-            pixel_rn2 = read_noise_2[row1[j], col1[j]]
-            pixel_sat_groups = number_sat_groups[row1[j], col1[j]]
-
-            # Create a CR mask and set 1st CR to be found
-            # cr_mask=0 designates a CR
-            pixel_cr_mask = np.ones(pixel_masked_diffs.shape, dtype=bool)
-            number_CRs_found = 1
-            pixel_sorted_index = sort_index[row1[j], col1[j], :]
-            pixel_cr_mask[pixel_sorted_index[ndiffs - pixel_sat_groups - 1]] = 0
-            new_CR_found = True
-
-            # Loop over all the found CRs and see if there is more than one CR, setting the mask as you go
-            while new_CR_found and ((ndiffs - number_CRs_found - pixel_sat_groups) > 1):
-                new_CR_found = False
-                pixel_med_diff = return_clipped_median(ndiffs, number_CRs_found + pixel_sat_groups,
-                                                       pixel_masked_diffs, pixel_sorted_index)
-                poisson_noise = np.sqrt(np.abs(pixel_med_diff))
-                sigma = np.sqrt(poisson_noise * poisson_noise + pixel_rn2 / nframes)
-                ratio = np.abs(pixel_masked_diffs - pixel_med_diff) / sigma
-
-                # Check if largest remaining difference is above threshold
-                if ratio[pixel_sorted_index[ndiffs - number_CRs_found - pixel_sat_groups - 1]] > rej_threshold:
-                    new_CR_found = True
-                    pixel_cr_mask[pixel_sorted_index[ndiffs - number_CRs_found - pixel_sat_groups - 1]] = 0
-                    number_CRs_found += 1
-
-            # Found all CRs. Set CR flags in input DQ array for this pixel
-            gdq[integration, 1:, row1[j], col1[j]] = \
-                np.bitwise_or(gdq[integration, 1:, row1[j], col1[j]],
-                              dqflags.group['JUMP_DET'] * np.invert(pixel_cr_mask))
-
-            # Save the CR-cleaned median slope for this pixel
-            if not new_CR_found: # the loop ran at least one time
-                median_slopes[integration, row1[j], col1[j]] = pixel_med_diff
-
-        # Next pixel with an outlier (j loop)
+        if number_pixels_with_cr == 0:
+            continue
+
+        # Look for additional CRs in all the pixels having at least one CR.
+        # These pixels are all processed together: each pass through the
+        # while loop computes the clipped median of every pixel still being
+        # checked, and flags the largest remaining difference of the pixels
+        # where it is above the threshold.
+        pixel_index = np.arange(number_pixels_with_cr)
+        pixel_masked_diffs = first_diffs[row1, col1]
+        pixel_rn2 = read_noise_2[row1, col1].astype(np.float64)
+        pixel_sat_groups = number_sat_groups[row1, col1]
+        pixel_sorted_index = sort_index[row1, col1]
+
+        # Create a CR mask and set 1st CR to be found
+        # cr_mask=0 designates a CR
+        pixel_cr_mask = np.ones(pixel_masked_diffs.shape, dtype=bool)
+        number_CRs_found = np.ones(number_pixels_with_cr, dtype=np.int32)
+        pixel_cr_mask[pixel_index, pixel_sorted_index[
+            pixel_index, ndiffs - pixel_sat_groups - 1]] = 0
+        new_CR_found = np.ones(number_pixels_with_cr, dtype=bool)
+
+        # Loop over all the found CRs and see if there is more than one CR,
+        # setting the mask as you go
+        checking = new_CR_found & \
+            ((ndiffs - number_CRs_found - pixel_sat_groups) > 1)
+        while checking.any():
+            chk = pixel_index[checking]
+            diffs_to_ignore = number_CRs_found[chk] + pixel_sat_groups[chk]
+            pixel_med_diff, pixel_poisson_2 = return_clipped_median_pixels(
+                ndiffs, diffs_to_ignore, pixel_masked_diffs[chk],
+                pixel_sorted_index[chk])
+            sigma = np.sqrt(pixel_poisson_2 + pixel_rn2[chk] / nframes)
+
+            # Check if largest remaining difference is above threshold
+            largest = pixel_sorted_index[chk, ndiffs - diffs_to_ignore - 1]
+            largest_diff = pixel_masked_diffs[chk, largest]
+            ratio = np.abs(largest_diff -
+                           pixel_med_diff.astype(largest_diff.dtype)) / \
+                sigma.astype(largest_diff.dtype)
+            found = ratio > rej_threshold
+
+            new_CR_found[chk] = found
+            pixel_cr_mask[chk[found], largest[found]] = 0
+            number_CRs_found[chk[found]] += 1
+
+            # Save the CR-cleaned median slope for the pixels done
+            done = chk[~found]
+            median_slopes[integration, row1[done], col1[done]] = \
+                pixel_med_diff[~found]
+
+            checking = new_CR_found & \
+                ((ndiffs - number_CRs_found - pixel_sat_groups) > 1)
+
+        # Found all CRs. Set CR flags in input DQ array for these pixels
+        gdq[integration, 1:, row1, col1] = \
+            np.bitwise_or(gdq[integration, 1:, row1, col1],
+                          dqflags.group['JUMP_DET'] * np.invert(pixel_cr_mask))
+
     # Next integration (integration loop)
 
     return median_slopes
@@ -191,3 +212,44 @@ def return_clipped_median(num_differences, diffs_to_ignore, differences, sorted_
             pixel_med_diff = (pixel_med_diff + differences[pixel_med_index2]) / 2.0
 
     return pixel_med_diff
+
+
+def return_clipped_median_pixels(num_differences, diffs_to_ignore, differences,
+                                 sorted_index):
+
+    """
+    This routine returns the clipped median for each of a set of pixels,
+    computed exactly as the 1-D case of return_clipped_median does for a
+    single pixel, along with the square of the corresponding Poisson noise.
+    The differences and sorted_index arrays are 2-D, with the differences of
+    each pixel along the second axis, and diffs_to_ignore has one value per
+    pixel.
+
+    For a single pixel the median of an even number of differences is the
+    average of the two central values, which is computed in double precision,
+    while a single central value keeps the precision of the differences; the
+    Poisson noise is computed in the same precision as the median. The
+    returned values are double precision arrays holding those results.
+    """
+
+    pixel_index = np.arange(differences.shape[0])
+    num_remaining = num_differences - 1 - diffs_to_ignore
+
+    # ignore largest value and number of CRs found when finding new median
+    pixel_med_index = sorted_index[pixel_index, num_remaining // 2]
+    single_med_diff = differences[pixel_index, pixel_med_index]
+
+    poisson_noise = np.sqrt(np.abs(single_med_diff))
+    pixel_med_diff = single_med_diff.astype(np.float64)
+    pixel_poisson_2 = (poisson_noise * poisson_noise).astype(np.float64)
+
+    # even number of groups; average together the two central values
+    even = np.where(num_remaining % 2 == 0)[0]
+    if len(even) > 0:
+        pixel_med_index2 = sorted_index[even, num_remaining[even] // 2 - 1]
+        pixel_med_diff[even] = (single_med_diff[even] +
+                                differences[even, pixel_med_index2]) / 2.0
+        poisson_noise = np.sqrt(np.abs(pixel_med_diff[even]))
+        pixel_poisson_2[even] = poisson_noise * poisson_noise
+
+    return pixel_med_diff, pixel_poisson_2
@@ -1,5 +1,7 @@
 """Pipeline utilities objects"""
 
+import multiprocessing
+
 from ..associations.lib.dms_base import TSO_EXP_TYPES
 from ..datamodels import CubeModel
 
@@ -39,3 +41,95 @@ def is_tso(model):
 
     # We've checked everything.
     return is_tso
+
+
+def get_num_processes(max_cores):
+    """Determine the number of worker processes to use
+
+    Parameters
+    ----------
+    max_cores: str
+        Fraction of the available cores to use. One of
+        'none', 'quarter', 'half' or 'all'. 'none' means that
+        no additional processes are created and all work is done
+        in the calling process.
+
+    Returns
+    -------
+    num_processes: int
+        The number of processes to use, always at least 1.
+    """
+    if max_cores is None or max_cores == 'none':
+        return 1
+
+    num_cores = multiprocessing.cpu_count()
+    if max_cores == 'quarter':
+        num_processes = num_cores // 4
+    elif max_cores == 'half':
+        num_processes = num_cores // 2
+    elif max_cores == 'all':
+        num_processes = num_cores
+    else:
+        raise ValueError(
+            'Unknown value for max_cores: {}'.format(max_cores)
+        )
+
+    return max(num_processes, 1)
+
+
+def run_tasks(tasks, num_processes):
+    """Run a list of tasks, yielding their results in order
+
+    With more than one process the tasks are run by a pool of worker
+    processes, forked from the calling process, otherwise they are run in
+    the calling process. The workers inherit the tasks when they are
+    forked, so the task functions and arguments, such as WCS objects and
+    data models, are not pickled; only the results are. Where processes
+    cannot be forked, the tasks are run in the calling process.
+
+    Parameters
+    ----------
+    tasks: [(function, arguments), ...]
+        The functions to call and their tuples of arguments.
+
+    num_processes: int
+        The number of processes to use, e.g. from `get_num_processes`.
+
+    Returns
+    -------
+    results: generator
+        The return values of the tasks.
+    """
+    context = _fork_context() if num_processes > 1 else None
+    if context is None:
+        for func, args in tasks:
+            yield func(*args)
+        return
+
+    with context.Pool(processes=num_processes, initializer=_init_worker,
+                      initargs=(tasks,)) as pool:
+        for result in pool.imap(_run_task, range(len(tasks))):
+            yield result
+
+
+def _fork_context():
+    """The multiprocessing context forking new processes, or None"""
+    try:
+        return multiprocessing.get_context('fork')
+    except ValueError:
+        return None
+
+
+# The tasks run by the worker processes, set in each worker by _init_worker.
+_worker_tasks = None
+
+
+def _init_worker(tasks):
+    global _worker_tasks
+    _worker_tasks = tasks
+
+
+def _run_task(index):
+    """Run task `index` of the tasks given to _init_worker"""
+    func, args = _worker_tasks[index]
+    return func(*args)
@@ -0,0 +1,298 @@
+"""Integration tiles of 4-D ramp exposures
+
+Support for running the ramp-level calibration steps over a few
+integrations at a time.  The input exposure is memory-mapped and read one
+tile of integrations at a time, and the processed tiles are collected into
+disk-backed (memory-mapped) arrays, so that only a few tiles are ever held
+in memory.
+"""
+import os
+import tempfile
+
+import numpy as np
+from astropy.io import fits
+
+from .. import datamodels
+
+# Extensions that are sliced along the integration axis
+TILED_EXTENSIONS = ('SCI', 'GROUPDQ', 'ERR')
+
+# RampModel arrays that are collected into memory-mapped output arrays
+TILED_ARRAYS = ('data', 'groupdq', 'err')
+
+
+def integration_arrays(model):
+    """Names of the arrays of a ramp that have one plane per integration.
+
+    Along with the data, groupdq and err arrays, these are the zeroframe
+    and the arrays of other extensions (e.g. REFOUT) with more than two
+    dimensions and one plane per integration.
+
+    Parameters
+    ----------
+    model : `~jwst.datamodels.RampModel`
+        The exposure, or a tile of it.
+
+    Returns
+    -------
+    names : list of str
+        The dotted names of the arrays in the model.
+    """
+    nints = model.data.shape[0]
+    names = list(TILED_ARRAYS)
+    if model.hasattr('zeroframe'):
+        names.append('zeroframe')
+    if model.hasattr('extra_fits'):
+        for key, value in model.extra_fits.items():
+            if key.endswith('.data') and _is_per_integration(value, nints):
+                names.append('extra_fits.' + key)
+    return names
+
+
+def _is_per_integration(array, nints):
+    return (isinstance(array, np.ndarray) and array.ndim > 2 and
+            array.shape[0] == nints)
+
+
+def integration_tiles(nints, tile_nints):
+    """Split the integrations of an exposure into tiles.
+
+    Parameters
+    ----------
+    nints : int
+        Number of integrations in the exposure.
+
+    tile_nints : int
+        Maximum number of integrations in each tile.
+
+    Returns
+    -------
+    tiles : list of tuple
+        The (start, stop) integration range of each tile.
+    """
+    if tile_nints < 1:
+        raise ValueError("tile_nints must be at least 1, got {}"
+                         .format(tile_nints))
+
+    return [(start, min(start + tile_nints, nints))
+            for start in range(0, nints, tile_nints)]
+
+
+class RampTileSource:
+    """
+    Read integration tiles of a ramp exposure.
+
+    If the exposure is given as a file name, the file is memory-mapped and
+    only the integrations of the requested tile are read from the SCI,
+    GROUPDQ and ERR extensions, and from the other extensions with one
+    plane per integration (e.g. ZEROFRAME and REFOUT).
+    """
+
+    def __init__(self, input):
+        """
+        Parameters
+        ----------
+        input : str, `~astropy.io.fits.HDUList` or `~jwst.datamodels.RampModel`
+            The exposure to read.
+        """
+        self.filename = None
+        self._model = None
+        self._hdulist = None
+
+        if isinstance(input, str):
+            self.filename = input
+            self._hdulist = fits.open(input, memmap=True,
+                                      do_not_scale_image_data=True)
+        elif isinstance(input, fits.HDUList):
+            self._hdulist = input
+        else:
+            self._model = datamodels.RampModel(input)
+
+        if self._model is not None:
+            self.nints = self._model.data.shape[0]
+        else:
+            self.nints = self._hdulist['SCI'].header['NAXIS4']
+
+    def read(self, start, stop):
+        """Read the integrations [start:stop] as a new RampModel.
+
+        Parameters
+        ----------
+        start, stop : int
+            Integration range of the tile.
+
+        Returns
+        -------
+        tile : `~jwst.datamodels.RampModel`
+            A model holding copies of the tile's arrays, along with the
+            metadata and tables of the full exposure.  The integration
+            numbers of the tile in the exposure are set in
+            ``meta.exposure.integration_start`` and ``integration_end``.
+        """
+        if self._model is not None:
+            tile = self._read_model(start, stop)
+        else:
+            tile = self._read_hdulist(start, stop)
+
+        # Number the integrations of the tile (one-indexed) in the exposure
+        first = tile.meta.exposure.integration_start or 1
+        tile.meta.exposure.integration_start = first + start
+        tile.meta.exposure.integration_end = first + stop - 1
+
+        return tile
+
+    def _read_model(self, start, stop):
+        model = self._model
+        tile = datamodels.RampModel(np.array(model.data[start:stop]))
+        tile.update(model)
+        if model.hasattr('extra_fits'):
+            tile.extra_fits = _copy_extra_fits(model.extra_fits)
+        for name in integration_arrays(model):
+            if name != 'data':
+                tile[name] = np.array(model[name][start:stop])
+        tile.pixeldq = model.pixeldq.copy()
+        tile.group = model.group
+        tile.int_times = model.int_times
+
+        return tile
+
+    def _read_hdulist(self, start, stop):
+        tile_hdulist = fits.HDUList()
+        for hdu in self._hdulist:
+            if hdu.name in TILED_EXTENSIONS or _has_integration_planes(
+                    hdu, self.nints):
+                if self.filename is not None:
+                    tile_hdu = _read_planes(hdu, start, stop)
+                else:
+                    tile_hdu = fits.ImageHDU(hdu.data[start:stop],
+                                             header=hdu.header,
+                                             name=hdu.name)
+                tile_hdulist.append(tile_hdu)
+            else:
+                tile_hdulist.append(hdu.copy())
+
+        tile = datamodels.RampModel(tile_hdulist)
+        if self.filename is not None:
+            tile.meta.filename = os.path.basename(self.filename)
+
+        return tile
+
+    def close(self):
+        """Close the memory-mapped input file, if this object opened it."""
+        if self.filename is not None:
+            self._hdulist.close()
+
+
+def _has_integration_planes(hdu, nints):
+    """True if an image extension has one plane per integration."""
+    if not isinstance(hdu, fits.ImageHDU):
+        return False
+    naxis = hdu.header['NAXIS']
+    return naxis > 2 and hdu.header['NAXIS{}'.format(naxis)] == nints
+
+
+def _copy_extra_fits(extra_fits):
+    """The extensions of a model that are not in its schema, as a tree."""
+    tree = {}
+    for key, value in extra_fits.items():
+        hdu_name, part = key.split('.', 1)
+        if part == 'header':
+            value = [list(card) for card in value]
+        tree.setdefault(hdu_name, {})[part] = value
+    return tree
+
+
+def _read_planes(hdu, start, stop):
+    """Read and scale the integrations [start:stop] of an image extension.
+
+    Only the requested integrations are read from the memory-mapped file;
+    the data are opened unscaled so that astropy does not scale (and load)
+    the whole extension.
+    """
+    header = hdu.header.copy()
+    data = hdu.section[start:stop]
+
+    bscale = header.pop('BSCALE', 1)
+    bzero = header.pop('BZERO', 0)
+    if bscale != 1 or bzero != 0:
+        data = data * bscale + bzero
+
+    return fits.ImageHDU(data, header=header, name=hdu.name)
+
+
+class RampTileWriter:
+    """
+    Collect processed integration tiles into memory-mapped arrays.
+
+    The data, groupdq and err arrays of the full exposure, and the other
+    arrays with one plane per integration, are kept in anonymous
+    temporary files, which are removed when the arrays are
+    released.  The pixeldq arrays of all the tiles are combined with a
+    bitwise OR.
+    """
+
+    def __init__(self, nints, dirname=None):
+        """
+        Parameters
+        ----------
+        nints : int
+            Number of integrations in the exposure.
+
+        dirname : str or None
+            Directory for the temporary files.  If None, the default
+            temporary directory is used.
+        """
+        self.nints = nints
+        self.dirname = dirname
+        self.arrays = None
+        self.pixeldq = None
+        self.integration_start = None
+        self.model = None
+
+    def write(self, tile, start, stop):
+        """Copy a processed tile into the output arrays.
+
+        Parameters
+        ----------
+        tile : `~jwst.datamodels.RampModel`
+            The processed integrations [start:stop].  If the tile also
+            holds integrations before `start` (e.g. one read for the steps
+            that need the preceding integration), they are not written.
+
+        start, stop : int
+            Integration range of the tile.
+        """
+        skip = tile.data.shape[0] - (stop - start)
+        if self.arrays is None:
+            self.arrays = {}
+            for name in integration_arrays(tile):
+                array = tile[name]
+                self.arrays[name] = np.memmap(
+                    tempfile.TemporaryFile(dir=self.dirname),
+                    dtype=array.dtype, mode='w+',
+                    shape=(self.nints,) + array.shape[1:])
+            self.pixeldq = tile.pixeldq.copy()
+            self.integration_start = tile.meta.exposure.integration_start
+        else:
+            self.pixeldq |= tile.pixeldq
+
+        for name, array in self.arrays.items():
+            array[start:stop] = tile[name][skip:]
+
+        self.model = tile
+
+    def to_model(self):
+        """Return the full exposure as a RampModel.
+
+        The metadata and tables are taken from the last tile that was
+        written, and the arrays are the memory-mapped output arrays.  The
+        integration range is that of all the tiles.
+        """
+        model = self.model
+        for name, array in self.arrays.items():
+            array.flush()
+            model[name] = array
+        model.pixeldq = self.pixeldq
+        model.meta.exposure.integration_start = self.integration_start
+
+        return model
@@ -392,3 +392,28 @@ def get_subarray_model(sci_model, ref_model):
         sub_model = None
 
     return sub_model
+
+
+def writeable_array(array):
+
+    """
+    Return a reference file array that may be modified in place.
+
+    The arrays of reference models opened through the reference model
+    cache (see `jwst.stpipe.reference_cache`) are shared and read-only,
+    so those are copied; other arrays are returned as they are.
+
+    Parameters
+    ----------
+    array: ndarray
+        reference file data array
+
+    Returns
+    -------
+    array: ndarray
+        the input array, or a copy of it if it is read-only
+    """
+
+    if array.flags.writeable:
+        return array
+    return array.copy()
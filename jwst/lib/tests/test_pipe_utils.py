@@ -1,5 +1,6 @@
 """Test utilities"""
 import inspect
+import multiprocessing
 import pytest
 
 from .. import pipe_utils
@@ -78,3 +79,57 @@ def test_is_tso_from_tsoflag(tsovisit, expected):
     model = datamodels.DataModel()
     model.meta.observation.tsovisit = tsovisit
     assert pipe_utils.is_tso(model) is expected
+
+
+@pytest.mark.parametrize(
+    'max_cores, divisor',
+    [
+        ('quarter', 4),
+        ('half', 2),
+        ('all', 1),
+    ]
+)
+def test_get_num_processes(max_cores, divisor):
+    """Test the number of processes derived from max_cores"""
+    expected = max(multiprocessing.cpu_count() // divisor, 1)
+    assert pipe_utils.get_num_processes(max_cores) == expected
+
+
+@pytest.mark.parametrize('max_cores', ['none', None])
+def test_get_num_processes_none(max_cores):
+    """No extra processes unless requested"""
+    assert pipe_utils.get_num_processes(max_cores) == 1
+
+
+def test_get_num_processes_bad():
+    """Unknown values are an error"""
+    with pytest.raises(ValueError):
+        pipe_utils.get_num_processes('most')
+
+
+@pytest.mark.parametrize('num_processes', [1, 2])
+def test_run_tasks(num_processes):
+    """Task results are returned in order"""
+    tasks = [(pow, (i, 2)) for i in range(5)]
+    results = pipe_utils.run_tasks(tasks, num_processes)
+    assert list(results) == [0, 1, 4, 9, 16]
+
+
+@pytest.mark.parametrize('num_processes', [1, 2])
+def test_run_tasks_not_pickled(num_processes):
+    """The tasks are inherited by the workers, not pickled"""
+    tasks = [(lambda x: x + 1, (i,)) for i in range(5)]
+    results = pipe_utils.run_tasks(tasks, num_processes)
+    assert list(results) == [1, 2, 3, 4, 5]
+
+
+def test_run_tasks_no_fork(monkeypatch):
+    """The tasks are run in the calling process if it cannot fork"""
+    def get_context(method=None):
+        raise ValueError('cannot find context for {!r}'.format(method))
+    monkeypatch.setattr(multiprocessing, 'get_context', get_context)
+
+    calls = []
+    tasks = [(calls.append, (i,)) for i in range(3)]
+    assert list(pipe_utils.run_tasks(tasks, 2)) == [None] * 3
+    assert calls == [0, 1, 2]
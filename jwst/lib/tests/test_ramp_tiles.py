@@ -0,0 +1,157 @@
+"""Test integration tiles of ramp exposures"""
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from .. import ramp_tiles
+from ... import datamodels
+from ...firstframe.firstframe_sub import do_correction
+
+
+@pytest.fixture
+def ramp():
+    """A small multi-integration ramp with random data"""
+    nints, ngroups, ny, nx = 5, 4, 6, 7
+    model = datamodels.RampModel((nints, ngroups, ny, nx))
+    model.meta.instrument.name = 'MIRI'
+    model.meta.exposure.nints = nints
+    model.meta.exposure.ngroups = ngroups
+    model.data[...] = np.random.uniform(0., 1000., model.data.shape)
+    model.pixeldq[0, 0] = 1
+    return model
+
+
+@pytest.mark.parametrize(
+    'nints, tile_nints, expected',
+    [
+        (1, 1, [(0, 1)]),
+        (5, 2, [(0, 2), (2, 4), (4, 5)]),
+        (4, 4, [(0, 4)]),
+        (3, 10, [(0, 3)]),
+    ]
+)
+def test_integration_tiles(nints, tile_nints, expected):
+    """Tiles cover all the integrations"""
+    assert ramp_tiles.integration_tiles(nints, tile_nints) == expected
+
+
+def test_integration_tiles_bad():
+    """Empty tiles are an error"""
+    with pytest.raises(ValueError):
+        ramp_tiles.integration_tiles(3, 0)
+
+
+def test_read_model_tile(ramp):
+    """Tiles of a model copy the integrations and keep the metadata"""
+    source = ramp_tiles.RampTileSource(ramp)
+    assert source.nints == 5
+
+    tile = source.read(1, 3)
+    assert tile.meta.instrument.name == 'MIRI'
+    assert tile.data.shape == (2,) + ramp.data.shape[1:]
+    np.testing.assert_array_equal(tile.data, ramp.data[1:3])
+    np.testing.assert_array_equal(tile.pixeldq, ramp.pixeldq)
+    assert not tile.hasattr('zeroframe')
+
+    ramp.zeroframe = ramp.data[:, 0].copy()
+    ramp.extra_fits = {'REFOUT': {'data': ramp.data[..., :2].copy(),
+                                  'header': [['REFKEY', 1, '']]}}
+    tile = ramp_tiles.RampTileSource(ramp).read(1, 3)
+    np.testing.assert_array_equal(tile.zeroframe, ramp.zeroframe[1:3])
+    np.testing.assert_array_equal(tile.extra_fits.REFOUT.data,
+                                  ramp.data[1:3, ..., :2])
+    assert tile.extra_fits.REFOUT.header[0][0] == 'REFKEY'
+
+    tile.data[...] = 0.
+    assert np.all(ramp.data[1:3] != 0.)
+
+
+@pytest.mark.parametrize('from_file', [False, True])
+def test_read_hdulist_tile(tmpdir, from_file):
+    """Tiles of a FITS file are scaled and slice other per-integration data"""
+    raw = np.random.randint(0, 65535, (3, 2, 4, 5)).astype(np.uint16)
+    primary = fits.PrimaryHDU()
+    primary.header['INSTRUME'] = 'NIRCAM'
+    zeroframe = raw[:, 0].astype(np.float32)
+    refout = raw[..., :2].astype(np.float32)
+    hdulist = fits.HDUList([
+        primary,
+        fits.ImageHDU(raw, name='SCI'),
+        fits.ImageHDU(zeroframe, name='ZEROFRAME'),
+        fits.ImageHDU(refout, name='REFOUT'),
+    ])
+
+    if from_file:
+        filename = str(tmpdir.join('ramp_uncal.fits'))
+        hdulist.writeto(filename)
+        source = ramp_tiles.RampTileSource(filename)
+    else:
+        source = ramp_tiles.RampTileSource(hdulist)
+    assert source.nints == 3
+
+    tile = source.read(2, 3)
+    assert tile.meta.instrument.name == 'NIRCAM'
+    assert tile.data.dtype == np.float32
+    np.testing.assert_array_equal(tile.data, raw[2:3])
+    assert tile.groupdq.shape == (1, 2, 4, 5)
+    np.testing.assert_array_equal(tile.zeroframe, zeroframe[2:3])
+    np.testing.assert_array_equal(tile.extra_fits.REFOUT.data, refout[2:3])
+
+    # The per-integration arrays are collected from all the tiles.
+    writer = ramp_tiles.RampTileWriter(source.nints)
+    for start, stop in ramp_tiles.integration_tiles(source.nints, 2):
+        writer.write(source.read(start, stop), start, stop)
+    result = writer.to_model()
+    np.testing.assert_array_equal(result.data, raw)
+    np.testing.assert_array_equal(result.zeroframe, zeroframe)
+    np.testing.assert_array_equal(result.extra_fits.REFOUT.data, refout)
+    source.close()
+
+
+@pytest.mark.parametrize('tile_nints', [1, 2, 5])
+def test_tiled_correction(ramp, tile_nints):
+    """Tiled processing matches processing the whole exposure"""
+    expected = do_correction(ramp.copy())
+
+    source = ramp_tiles.RampTileSource(ramp)
+    writer = ramp_tiles.RampTileWriter(source.nints)
+    for start, stop in ramp_tiles.integration_tiles(source.nints, tile_nints):
+        tile = source.read(start, stop)
+        tile.pixeldq[start, 1] = 2
+        writer.write(do_correction(tile), start, stop)
+    result = writer.to_model()
+
+    assert isinstance(result.data, np.memmap)
+    assert result.meta.instrument.name == 'MIRI'
+    np.testing.assert_array_equal(result.data, expected.data)
+    np.testing.assert_array_equal(result.groupdq, expected.groupdq)
+    np.testing.assert_array_equal(result.err, expected.err)
+
+    # pixeldq flags from every tile are kept
+    assert result.pixeldq[0, 0] == 1
+    for start, stop in ramp_tiles.integration_tiles(5, tile_nints):
+        assert result.pixeldq[start, 1] == 2
+
+
+@pytest.mark.parametrize('integration_start', [None, 11])
+def test_tile_integration_numbers(ramp, integration_start):
+    """Tiles are numbered in the exposure and overlapping reads are dropped"""
+    ramp.meta.exposure.integration_start = integration_start
+    first = integration_start or 1
+
+    source = ramp_tiles.RampTileSource(ramp)
+    tile = source.read(1, 3)
+    assert tile.meta.exposure.integration_start == first + 1
+    assert tile.meta.exposure.integration_end == first + 2
+
+    # Each tile is read with the integration before it
+    writer = ramp_tiles.RampTileWriter(source.nints)
+    for start, stop in ramp_tiles.integration_tiles(source.nints, 2):
+        tile = source.read(max(start - 1, 0), stop)
+        tile.data += 1.
+        writer.write(tile, start, stop)
+    result = writer.to_model()
+
+    np.testing.assert_array_equal(result.data, ramp.data + 1.)
+    assert result.meta.exposure.integration_start == first
+    assert result.meta.exposure.integration_end == first + 4
@@ -102,7 +102,7 @@ def apply_linearity(input, linearity_ref_model):
 
     # Check for subarray mode
     if reffile_utils.ref_matches_sci(input, linearity_ref_model):
-        lin_coeffs = linearity_ref_model.coeffs
+        lin_coeffs = reffile_utils.writeable_array(linearity_ref_model.coeffs)
         lin_dq = linearity_ref_model.dq
     else:
         sub_lin_model = reffile_utils.get_subarray_model(input, linearity_ref_model)
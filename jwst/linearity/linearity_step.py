@@ -32,7 +32,8 @@ class LinearityStep(Step):
                 return result
 
             # Open the linearity reference file data model
-            lin_model = datamodels.LinearityModel(self.lin_name)
+            lin_model = self.open_reference_model(datamodels.LinearityModel,
+                                                  self.lin_name)
 
             # Do the linearity correction
             result = linearity.do_correction(input_model, lin_model)
@@ -10,6 +10,7 @@ from scipy import ndimage
 from .. import datamodels
 from ..resample import resample, gwcs_blot
 from ..resample.resample_utils import build_driz_weight
+from ..lib.pipe_utils import get_num_processes, run_tasks
 from ..stpipe.step import Step
 
 import logging
@@ -258,9 +259,15 @@ class OutlierDetection:
         following ways:
         - type of combination: fixed to 'median'
         - 'minmed' not implemented as an option
-        - does not use buffers to try to minimize memory usage
         - `astropy.stats.sigma_clipped_stats` replaces `stsci.imagestats.ImageStats`
         - `stsci.image.median` replaces `stsci.image.numcombine.numCombine`
+
+        If the ``buffer_size`` parameter (in MB) is set, the median is
+        computed over sections of rows of all the resampled images, sized so
+        that the SCI, WHT and mask sections of the stack fit in the buffer.
+        Only one section is read at a time, so with memory-mapped resampled
+        images the stack is never held in memory. Otherwise, the whole stack
+        is combined at once.
         """
         resampled_sci = [i.data for i in resampled_models]
         resampled_wht = [i.wht for i in resampled_models]
@@ -268,23 +275,48 @@ class OutlierDetection:
         nlow = self.outlierpars.get('nlow', 0)
         nhigh = self.outlierpars.get('nhigh', 0)
         maskpt = self.outlierpars.get('maskpt', 0.7)
+        buffer_size = self.outlierpars.get('buffer_size')
 
-        badmasks = []
+        weight_thresholds = []
         for w in resampled_wht:
             mean_weight, _, _ = sigma_clipped_stats(w,
                                                     sigma=3.0, mask_value=0.)
-            weight_threshold = mean_weight * maskpt
             # Mask pixels were weight falls below
             #   MASKPT percent of the mean weight
-            mask = np.less(w, weight_threshold)
-            log.debug("Number of pixels with low weight: {}".format(
-                np.sum(mask)))
-            badmasks.append(mask)
+            weight_thresholds.append(mean_weight * maskpt)
 
-        # Compute median of stack os images using BADMASKS to remove low weight
-        # values
-        median_image = median(resampled_sci, nlow=nlow, nhigh=nhigh,
-                              badmasks=badmasks)
+        if buffer_size is None:
+            sections = [(0, resampled_sci[0].shape[0])]
+        else:
+            sections = _row_sections(resampled_sci, resampled_wht,
+                                     buffer_size)
+            log.info("Computing median in {} sections".format(len(sections)))
+
+        median_image = None
+        nlowweight = np.zeros(len(resampled_wht), dtype=int)
+        for start, stop in sections:
+            badmasks = []
+            for i, (w, weight_threshold) in enumerate(zip(resampled_wht,
+                                                          weight_thresholds)):
+                mask = np.less(w[start:stop], weight_threshold)
+                nlowweight[i] += np.sum(mask)
+                badmasks.append(mask)
+
+            # Compute median of stack os images using BADMASKS to remove low
+            # weight values
+            section = median([sci[start:stop] for sci in resampled_sci],
+                             nlow=nlow, nhigh=nhigh, badmasks=badmasks)
+            if len(sections) == 1:
+                median_image = section
+            else:
+                if median_image is None:
+                    median_image = np.empty(resampled_sci[0].shape,
+                                            dtype=section.dtype)
+                median_image[start:stop] = section
+            del badmasks, section
+
+        for count in nlowweight:
+            log.debug("Number of pixels with low weight: {}".format(count))
 
         return median_image
 
@@ -292,14 +324,30 @@ class OutlierDetection:
         """Blot resampled median image back to the detector images."""
         interp = self.outlierpars.get('interp', 'poly5')
         sinscl = self.outlierpars.get('sinscl', 1.0)
+        pixmap_error = self.outlierpars.get('pixmap_error')
 
         # Initialize container for output blot images
         blot_models = datamodels.ModelContainer()
 
         log.info("Blotting median...")
+        num_processes = get_num_processes(
+            self.outlierpars.get('maximum_cores', 'none'))
+        num_processes = min(num_processes, len(self.input_models))
         blot = gwcs_blot.GWCSBlot(median_model)
+        if num_processes > 1:
+            # Only the WCS and shape of the input images are needed to blot
+            tasks = [(blot.extract, (model.meta.wcs, model.shape,
+                                     model.meta.wcsinfo.cdelt1,
+                                     interp, sinscl, pixmap_error))
+                     for model in self.input_models]
+            blotted_data = run_tasks(tasks, num_processes)
+        else:
+            blotted_data = (blot.extract_image(model, interp=interp,
+                                               sinscl=sinscl,
+                                               pixmap_error=pixmap_error)
+                            for model in self.input_models)
 
-        for model in self.input_models:
+        for model, data in zip(self.input_models, blotted_data):
             blotted_median = model.copy()
             blot_root = '_'.join(model.meta.filename.replace(
                 '.fits', '').split('_')[:-1])
@@ -309,8 +357,7 @@ class OutlierDetection:
             blotted_median.err = None
             blotted_median.dq = None
             # apply blot to re-create model.data from median image
-            blotted_median.data = blot.extract_image(model, interp=interp,
-                                                     sinscl=sinscl)
+            blotted_median.data = data
             blot_models.append(blotted_median)
 
         return blot_models
@@ -348,6 +395,32 @@ class OutlierDetection:
                 self.inputs.dq[i, :, :] = self.input_models[i].dq
 
 
+def _row_sections(sci_arrays, wht_arrays, buffer_size):
+    """Split a stack of images into sections of rows that fit in a buffer.
+
+    Parameters
+    ----------
+    sci_arrays, wht_arrays : list of 2D arrays
+        The images of the stack and their weights.
+
+    buffer_size : float
+        Size of the buffer, in MB, holding the SCI, WHT and mask sections
+        of all the images.
+
+    Returns
+    -------
+    sections : list of tuple
+        The (start, stop) rows of each section.
+    """
+    nrows, ncols = sci_arrays[0].shape
+    row_bytes = ncols * sum(sci.itemsize + wht.itemsize + 1
+                            for sci, wht in zip(sci_arrays, wht_arrays))
+    section_rows = max(1, min(nrows, int(buffer_size * 1024 * 1024 //
+                                         row_bytes)))
+    return [(start, min(start + section_rows, nrows))
+            for start in range(0, nrows, section_rows)]
+
+
 def flag_cr(sci_image, blot_image, **pars):
     """Masks outliers in science image.
 
@@ -62,6 +62,10 @@ class OutlierDetectionStep(Step):
         good_bits = integer(default=4)
         scale_detection = boolean(default=False)
         search_output_file = boolean(default=False)
+        maximum_cores = option('none','quarter','half','all',default='none') # Number of processes for drizzle and blot
+        in_memory = boolean(default=True) # Keep the resampled images in memory, else in scratch files
+        buffer_size = float(default=None) # Size in MB of the image sections used to compute the median
+        pixmap_error = float(default=None) # Maximum error in output pixels of interpolated pixel maps
     """
 
     def process(self, input):
@@ -107,6 +111,10 @@ class OutlierDetectionStep(Step):
                 'resample_data': self.resample_data,
                 'good_bits': self.good_bits,
                 'make_output_path': self.make_output_path,
+                'maximum_cores': self.maximum_cores,
+                'in_memory': self.in_memory,
+                'buffer_size': self.buffer_size,
+                'pixmap_error': self.pixmap_error,
             }
 
             # Add logic here to select which version of OutlierDetection
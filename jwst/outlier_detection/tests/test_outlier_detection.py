@@ -0,0 +1,144 @@
+"""Test the imaging outlier detection"""
+import numpy as np
+import pytest
+
+from ... import datamodels
+from ...resample import resample, resample_utils
+from .. import outlier_detection
+from ..outlier_detection import OutlierDetection
+
+
+def make_wcs(shift):
+    """An imaging WCS, shifted by a number of pixels"""
+    from astropy import coordinates as coord
+    from astropy import units as u
+    from astropy.modeling import models
+    from gwcs import wcs, coordinate_frames as cf
+
+    scale = 0.1 / 3600
+    transform = (models.Shift(-shift) & models.Shift(-shift)) | \
+        (models.Scale(scale) & models.Scale(scale)) | \
+        models.Pix2Sky_TAN() | models.RotateNative2Celestial(10., 20., 180.)
+    detector = cf.Frame2D(name='detector', axes_order=(0, 1))
+    sky = cf.CelestialFrame(reference_frame=coord.ICRS(), name='world',
+                            unit=(u.deg, u.deg))
+    return wcs.WCS(transform, input_frame=detector, output_frame=sky)
+
+
+def shifted_pixmap(in_wcs, out_wcs, shape, max_error=None):
+    """The pixel map between two `make_wcs` WCS objects"""
+    shift = (out_wcs.forward_transform[0].offset.value -
+             in_wcs.forward_transform[0].offset.value)
+    y, x = np.indices(shape, dtype=np.float64)
+    return np.dstack([x + shift, y + shift])
+
+
+@pytest.fixture
+def shifted_frames(monkeypatch):
+    """Resample and blot with pixel maps of shifted WCS objects"""
+    output_wcs = make_wcs(0.)
+    output_wcs.data_size = (40, 40)
+    monkeypatch.setattr(resample_utils, 'make_output_wcs',
+                        lambda models: output_wcs)
+    monkeypatch.setattr(resample_utils, 'calc_gwcs_pixmap', shifted_pixmap)
+    monkeypatch.setattr(resample.ResampleData, 'update_fits_wcs',
+                        lambda self, model: None)
+
+
+def make_images(seed=0):
+    """Dithered images of a flat sky, with cosmic rays"""
+    rng = np.random.RandomState(seed)
+    images = datamodels.ModelContainer()
+    for n, shift in enumerate((0., 3., 6., 9.)):
+        img = datamodels.ImageModel((30, 30))
+        img.data[...] = rng.normal(10., 0.5, img.data.shape)
+        img.err[...] = 0.5
+        img.data[rng.randint(0, 30, 5), rng.randint(0, 30, 5)] += 1000.
+        img.meta.wcs = make_wcs(shift)
+        img.meta.wcsinfo.cdelt1 = 1.
+        img.meta.filename = 'image{}_cal.fits'.format(n)
+        img.meta.observation.program_number = '1'
+        img.meta.observation.observation_number = '1'
+        img.meta.observation.visit_number = '1'
+        img.meta.observation.visit_group = '1'
+        img.meta.observation.sequence_id = '1'
+        img.meta.observation.activity_id = '1'
+        img.meta.observation.exposure_number = str(n + 1)
+        img.meta.exposure.exposure_time = 10.
+        img.meta.exposure.start_time = float(n)
+        img.meta.exposure.end_time = n + 1.
+        img.meta.background.subtracted = False
+        img.meta.background.level = 0.
+        images.append(img)
+    return images
+
+
+def detection_pars(**pars):
+    """The step parameters, with the defaults of the step"""
+    defaults = dict(weight_type='exptime', pixfrac=1.0, kernel='square',
+                    fillval='INDEF', nlow=0, nhigh=0, maskpt=0.7, grow=1,
+                    snr='4.0 3.0', scale='0.5 0.4', backg=0.0,
+                    save_intermediate_results=False, resample_data=True,
+                    good_bits=4, maximum_cores='none', in_memory=True,
+                    buffer_size=None, pixmap_error=None)
+    defaults.update(pars)
+    return defaults
+
+
+@pytest.mark.parametrize('pars', [dict(maximum_cores='all'),
+                                  dict(in_memory=False),
+                                  dict(maximum_cores='all', in_memory=False,
+                                       buffer_size=0.01)])
+def test_detection_modes(monkeypatch, shifted_frames, pars):
+    """Worker processes and scratch files flag the same outliers"""
+    monkeypatch.setattr(resample, 'get_num_processes',
+                        lambda max_cores: 1 if max_cores == 'none' else 2)
+    monkeypatch.setattr(outlier_detection, 'get_num_processes',
+                        lambda max_cores: 1 if max_cores == 'none' else 2)
+
+    expected = make_images()
+    OutlierDetection(expected, reffiles={},
+                     **detection_pars()).do_detection()
+    result = make_images()
+    OutlierDetection(result, reffiles={},
+                     **detection_pars(**pars)).do_detection()
+
+    flagged = [np.count_nonzero(img.dq & outlier_detection.CRBIT)
+               for img in expected]
+    assert all(flagged)
+    for img, img_expected in zip(result, expected):
+        np.testing.assert_array_equal(img.dq, img_expected.dq)
+
+
+@pytest.mark.parametrize('buffer_size', [1e-4, 0.002, 100.])
+def test_median_sections(buffer_size):
+    """The median computed in sections of rows is the whole median"""
+    rng = np.random.RandomState(1)
+    models = []
+    for k in range(5):
+        model = datamodels.DrizProductModel((20, 15))
+        model.data[...] = rng.normal(5., 1., model.data.shape)
+        model.wht[...] = rng.uniform(0., 1., model.wht.shape)
+        models.append(model)
+
+    step = OutlierDetection(datamodels.ModelContainer(), reffiles={},
+                            **detection_pars(nlow=1))
+    expected = step.create_median(models)
+    step.outlierpars['buffer_size'] = buffer_size
+    result = step.create_median(models)
+
+    assert result.shape == (20, 15)
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_row_sections():
+    """Sections of rows are sized to fit in the buffer"""
+    sci = [np.zeros((10, 100), dtype=np.float32)] * 2
+    wht = [np.zeros((10, 100), dtype=np.float32)] * 2
+    # 1800 bytes per row of the stack
+    buffer_size = 6000. / (1024 * 1024)
+    sections = outlier_detection._row_sections(sci, wht, buffer_size)
+    assert sections == [(0, 3), (3, 6), (6, 9), (9, 10)]
+    assert outlier_detection._row_sections(sci, wht, 1.) == [(0, 10)]
+    assert outlier_detection._row_sections(sci, wht, 0.) == [
+        (i, i + 1) for i in range(10)]
@@ -5,7 +5,6 @@ import math
 import numpy as np
 import logging
 from jwst.assign_wcs import nirspec, util
-from gwcs import wcstools
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
@@ -326,14 +325,14 @@ def do_correction(input_model, pathloss_model):
         # Create the 2-d pathloss arrays, initialize with NaNs
         wavelength_array = np.zeros(input_model.shape, dtype=np.float32)
         wavelength_array.fill(np.nan)
-        for slice in NIRSPEC_IFU_SLICES:
-            slice_wcs = nirspec.nrs_wcs_set_input(input_model, slice)
-            x, y = wcstools.grid_from_bounding_box(slice_wcs.bounding_box)
+        for slice_wcs in nirspec.nrs_ifu_wcs(input_model):
+            evaluation = util.evaluate_slit_wcs(slice_wcs)
+            x, y = evaluation.x, evaluation.y
             xmin = int(x.min())
             xmax = int(x.max())
             ymin = int(y.min())
             ymax = int(y.max())
-            ra, dec, wavelength = slice_wcs(x, y)
+            ra, dec, wavelength = evaluation.world
             wavelength_array[ymin:ymax+1, xmin:xmax+1] = wavelength
         pathloss_pointsource_2d = interpolate_onto_grid(wavelength_array,
                                                         wavelength_pointsource,
@@ -166,6 +166,13 @@ class DataSet():
         else:
             log.debug("The input is not a subarray.")
 
+        # If the input continues the integrations for which input
+        # traps_filled was computed (e.g. the integration tiles of a streamed
+        # exposure), the correction picks up where it left off.
+        int_offset = self.continued_integrations()
+        if int_offset > 0:
+            log.debug("Continuing after integration %d", int_offset)
+
         if not self.traps_filled:
             have_traps_filled = False
             self.traps_filled = datamodels.TrapsFilledModel(
@@ -182,7 +189,8 @@ class DataSet():
         self.trap_density = no_NaN(self.trap_density, 0., zap_nan=True)
         self.persistencesat = no_NaN(self.persistencesat, 1.e7, zap_nan=True)
 
-        if have_traps_filled:   # was there an actual traps_filled file?
+        # was there an actual traps_filled file, for an earlier exposure?
+        if have_traps_filled and int_offset == 0:
             # Decrease traps_filled by the number of traps that decayed
             # in the time (to_start) from the end of the traps_filled file
             # to the start of the current exposure.
@@ -267,7 +275,8 @@ class DataSet():
         # account for charge capture and decay of traps.
         filled = -1                             # just to ensure that it exists
         for integ in range(nints):
-            self.get_group_info(integ)          # self.tgroup, etc.
+            # self.tgroup, etc.
+            self.get_group_info(int_offset + integ)
             decayed[:, :, :] = 0.               # initialize
             # slope has to be computed early in the loop over integrations,
             # before the data are modified by subtracting persistence.
@@ -280,7 +289,8 @@ class DataSet():
                     # Compute and subtract the decays during the reset.
                     # Decays during the reset at the beginning of the
                     # first integration have already been accounted for.
-                    if integ > 0 and group == 0 and self.nresets > 0:
+                    if (int_offset + integ > 0 and group == 0 and
+                        self.nresets > 0):
                         reset_time = self.tframe * self.nresets
                         decay_during_reset = \
                             self.compute_decay(self.traps_filled.data[k],
@@ -339,6 +349,36 @@ class DataSet():
         return (self.output_obj, self.traps_filled, self.output_pers, skipped)
 
 
+    def continued_integrations(self):
+        """Number of earlier integrations that input traps_filled is for.
+
+        If the input traps_filled was computed for the integrations of the
+        same exposure just before those of the science data, the traps
+        filled are those at the end of the previous integration.
+
+        Returns
+        -------
+        int
+            The number of integrations of the exposure before the science
+            data, or 0 if input traps_filled does not end just before them.
+        """
+
+        if not self.traps_filled:
+            return 0
+
+        sci_exposure = self.output_obj.meta.exposure
+        traps_exposure = self.traps_filled.meta.exposure
+        if (sci_exposure.integration_start is None or
+            sci_exposure.integration_start <= 1 or
+            self.traps_filled.meta.filename !=
+                self.output_obj.meta.filename or
+            traps_exposure.integration_end !=
+                sci_exposure.integration_start - 1):
+            return 0
+
+        return traps_exposure.integration_end
+
+
     def get_slice(self, ref, sci):
         """Find the 2-D slice for a reference file.
 
@@ -10,6 +10,11 @@ __all__ = ["PersistenceStep"]
 class PersistenceStep(Step):
     """
     PersistenceStep: Correct a science image for persistence.
+
+    The traps filled at the end of the input are kept as
+    `output_trapsfilled`.  `input_trapsfilled` may also be set to a
+    TrapsFilledModel, e.g. the `output_trapsfilled` of the preceding
+    integrations of the same exposure.
     """
 
     spec = """
@@ -31,7 +36,8 @@ class PersistenceStep(Step):
 
     def process(self, input):
 
-        if self.input_trapsfilled is not None:
+        self.output_trapsfilled = None
+        if isinstance(self.input_trapsfilled, str):
             if (self.input_trapsfilled == "None" or
                 len(self.input_trapsfilled) == 0):
                 self.input_trapsfilled = None
@@ -69,6 +75,8 @@ class PersistenceStep(Step):
 
         if self.input_trapsfilled is None:
             traps_filled_model = None
+        elif isinstance(self.input_trapsfilled, datamodels.TrapsFilledModel):
+            traps_filled_model = self.input_trapsfilled
         else:
             traps_filled_model = datamodels.TrapsFilledModel(
                                         self.input_trapsfilled)
@@ -88,14 +96,15 @@ class PersistenceStep(Step):
         else:
             output_obj.meta.cal_step.persistence = 'COMPLETE'
 
-        if traps_filled_model is not None:      # input traps_filled
+        if (traps_filled_model is not None and    # input traps_filled
+            traps_filled_model is not self.input_trapsfilled):
             traps_filled_model.close()
         if traps_filled is not None:            # output traps_filled
             # Save the traps_filled image with suffix 'trapsfilled'.
             self.save_model(
                 traps_filled, suffix='trapsfilled', force=self.save_trapsfilled
             )
-            traps_filled.close()
+        self.output_trapsfilled = traps_filled
 
         if output_pers is not None:             # output file of persistence
             self.save_model(output_pers, suffix='output_pers')
@@ -6,6 +6,8 @@ import logging
 import numpy as np
 from .. import datamodels
 from .. datamodels import dqflags
+from .. lib import reffile_utils
+from .. stpipe.reference_cache import open_reference_model
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
@@ -202,11 +204,11 @@ class DataSet():
                             # if necessary
                             microns_100 = 1.e-4    # 100 microns, in meters
                             if waves.max() > 0. and waves.max() < microns_100:
-                                waves *= 1.e+6
+                                waves = waves * 1.e+6
 
                         # Load the pixel area table for the IFU slices
-                        area_model = \
-                            datamodels.NirspecIfuAreaModel(area_fname)
+                        area_model = open_reference_model(
+                            datamodels.NirspecIfuAreaModel, area_fname)
                         area_data = area_model.area_table
 
                         # Compute 2D wavelength and pixel area arrays for the
@@ -405,6 +407,11 @@ class DataSet():
         # MRS detectors
         elif self.detector == 'MIRIFUSHORT' or self.detector == 'MIRIFULONG':
 
+            # The reference arrays are modified below
+            ftab.data = reffile_utils.writeable_array(ftab.data)
+            ftab.pixsiz = reffile_utils.writeable_array(ftab.pixsiz)
+            ftab.dq = reffile_utils.writeable_array(ftab.dq)
+
             # Reset conversion and pixel size values with DQ=NON_SCIENCE to 1,
             # so no conversion is applied
             where_dq = np.bitwise_and(ftab.dq, dqflags.pixel['NON_SCIENCE'])
@@ -543,7 +550,7 @@ class DataSet():
 
         import numpy as np
         from .. assign_wcs import nirspec       # for NIRSpec IFU data
-        import gwcs
+        from .. assign_wcs import util
 
         microns_100 = 1.e-4                     # 100 microns, in meters
 
@@ -563,18 +570,15 @@ class DataSet():
         for (k, ifu_wcs) in enumerate(list_of_wcs):
 
             # Construct array indexes for pixels in this slice
-            x, y = gwcs.wcstools.grid_from_bounding_box(ifu_wcs.bounding_box,
-                                                        step=(1, 1),
-                                                        center=True)
+            evaluation = util.evaluate_slit_wcs(ifu_wcs)
+            x, y = evaluation.x, evaluation.y
 
             log.debug("Slice %d: %g %g %g %g" %
                       (k, x[0][0], x[-1][-1], y[0][0], y[-1][-1]))
 
-            # Get the world coords for all pixels in this slice
-            coords = ifu_wcs(x, y)
-
-            # Pull out the wavelengths only
-            wl = coords[2]
+            # Get the world coords for all pixels in this slice,
+            # and pull out the wavelengths only
+            wl = evaluation.world[2].copy()
             nan_flag = np.isnan(wl)
             good_flag = np.logical_not(nan_flag)
             if wl[good_flag].max() < microns_100:
@@ -646,7 +650,7 @@ class DataSet():
             # Convert wavelengths from meters to microns, if necessary
             microns_100 = 1.e-4         # 100 microns, in meters
             if waves.max() > 0. and waves.max() < microns_100:
-                waves *= 1.e+6
+                waves = waves * 1.e+6
             wl_unit = 'um'
 
             # Set the relative sensitivity table for the correct Model type
@@ -693,14 +697,15 @@ class DataSet():
         """
 
         # Load the pixel area reference file
-        pix_area = datamodels.PixelAreaModel(area_fname)
+        pix_area = open_reference_model(datamodels.PixelAreaModel, area_fname)
 
         # Copy the pixel area data array to the appropriate attribute
         # of the science data model
+        area = reffile_utils.writeable_array(pix_area.data)
         if isinstance(self.input, datamodels.MultiSlitModel):
-            self.input.slits[0].area = pix_area.data
+            self.input.slits[0].area = area
         else:
-            self.input.area = pix_area.data
+            self.input.area = area
         log.info('Pixel area map copied to output.')
 
         # Load the average pixel area values from the photom reference file
@@ -779,29 +784,36 @@ class DataSet():
 
         """
         if self.instrument == 'NIRISS':
-            ftab = datamodels.NirissPhotomModel(photom_fname)
+            ftab = open_reference_model(datamodels.NirissPhotomModel,
+                                        photom_fname)
             self.calc_niriss(ftab)
 
         if self.instrument == 'NIRSPEC':
             if self.exptype in ['NRS_FIXEDSLIT', 'NRS_BRIGHTOBJ']:
-                ftab = datamodels.NirspecFSPhotomModel(photom_fname)
+                ftab = open_reference_model(datamodels.NirspecFSPhotomModel,
+                                            photom_fname)
             else:
-                ftab = datamodels.NirspecPhotomModel(photom_fname)
+                ftab = open_reference_model(datamodels.NirspecPhotomModel,
+                                            photom_fname)
             self.calc_nirspec(ftab, area_fname)
 
         if self.instrument == 'NIRCAM':
-            ftab = datamodels.NircamPhotomModel(photom_fname)
+            ftab = open_reference_model(datamodels.NircamPhotomModel,
+                                        photom_fname)
             self.calc_nircam(ftab)
 
         if self.instrument == 'MIRI':
             if self.detector == 'MIRIMAGE':
-                ftab = datamodels.MiriImgPhotomModel(photom_fname)
+                ftab = open_reference_model(datamodels.MiriImgPhotomModel,
+                                            photom_fname)
             else:
-                ftab = datamodels.MiriMrsPhotomModel(photom_fname)
+                ftab = open_reference_model(datamodels.MiriMrsPhotomModel,
+                                            photom_fname)
             self.calc_miri(ftab)
 
         if self.instrument == 'FGS':
-            ftab = datamodels.FgsPhotomModel(photom_fname)
+            ftab = open_reference_model(datamodels.FgsPhotomModel,
+                                        photom_fname)
             self.calc_fgs(ftab)
 
         if area_fname is not None:   # Load and save the pixel area info
@@ -2,6 +2,7 @@
 import logging
 from ..stpipe import Pipeline
 from .. import datamodels
+from ..lib import ramp_tiles
 
 # step imports
 from ..group_scale import group_scale_step
@@ -38,6 +39,8 @@ class Detector1Pipeline(Pipeline):
 
     spec = """
         save_calibrated_ramp = boolean(default=False)
+        streaming = boolean(default=False) # process the ramp in integration tiles
+        stream_nints = integer(min=1, default=1) # integrations per tile when streaming
     """
 
     # Define aliases to steps
@@ -63,54 +66,18 @@ class Detector1Pipeline(Pipeline):
 
         log.info('Starting calwebb_detector1 ...')
 
-        # open the input as a RampModel
-        input = datamodels.RampModel(input)
-
         # propagate output_dir to steps that might need it
         self.dark_current.output_dir = self.output_dir
         self.ramp_fit.output_dir = self.output_dir
 
-        if input.meta.instrument.name == 'MIRI':
-
-            # process MIRI exposures;
-            # the steps are in a different order than NIR
-            log.debug('Processing a MIRI exposure')
-
-            input = self.group_scale(input)
-            input = self.dq_init(input)
-            input = self.saturation(input)
-            input = self.ipc(input)
-            input = self.firstframe(input)
-            input = self.lastframe(input)
-            input = self.linearity(input)
-            input = self.rscd(input)
-            input = self.dark_current(input)
-            input = self.refpix(input)
-
-            # skip until MIRI team has figured out an algorithm
-            #input = self.persistence(input)
-
+        if self.streaming:
+            input = self.stream_ramp_steps(input)
         else:
+            # open the input as a RampModel
+            input = datamodels.RampModel(input)
 
-            # process Near-IR exposures
-            log.debug('Processing a Near-IR exposure')
-
-            input = self.group_scale(input)
-            input = self.dq_init(input)
-            input = self.saturation(input)
-            input = self.ipc(input)
-            input = self.superbias(input)
-            input = self.refpix(input)
-            input = self.linearity(input)
-
-            # skip persistence for NIRSpec
-            if input.meta.instrument.name != 'NIRSPEC':
-                input = self.persistence(input)
-
-            input = self.dark_current(input)
-
-        # apply the jump step
-        input = self.jump(input)
+            for step in self.ramp_steps(input):
+                input = step(input)
 
         # save the corrected ramp data, if requested
         if self.save_calibrated_ramp:
@@ -151,3 +118,114 @@ class Detector1Pipeline(Pipeline):
             self.suffix = 'rate'
         else:
             self.suffix = 'ramp'
+
+    def ramp_steps(self, input):
+        """Return the ramp-level steps, through jump, in the order run.
+
+        Parameters
+        ----------
+        input : `~jwst.datamodels.RampModel`
+            The exposure (or a tile of it); only its metadata is used.
+
+        Returns
+        -------
+        steps : list of `~jwst.stpipe.Step`
+            The steps to apply to the ramp before ramp fitting.
+        """
+        if input.meta.instrument.name == 'MIRI':
+
+            # process MIRI exposures;
+            # the steps are in a different order than NIR
+            log.debug('Processing a MIRI exposure')
+
+            steps = [self.group_scale, self.dq_init, self.saturation,
+                     self.ipc, self.firstframe, self.lastframe,
+                     self.linearity, self.rscd, self.dark_current,
+                     self.refpix]
+
+            # skip until MIRI team has figured out an algorithm
+            #steps.append(self.persistence)
+
+        else:
+
+            # process Near-IR exposures
+            log.debug('Processing a Near-IR exposure')
+
+            steps = [self.group_scale, self.dq_init, self.saturation,
+                     self.ipc, self.superbias, self.refpix, self.linearity]
+
+            # skip persistence for NIRSpec
+            if input.meta.instrument.name != 'NIRSPEC':
+                steps.append(self.persistence)
+
+            steps.append(self.dark_current)
+
+        # apply the jump step
+        steps.append(self.jump)
+
+        return steps
+
+    def stream_ramp_steps(self, input):
+        """Apply the ramp-level steps to integration tiles of the input.
+
+        The input is memory-mapped and `stream_nints` integrations at a
+        time are pushed through the steps.  The processed tiles are
+        collected into memory-mapped arrays in `output_dir` (or the default
+        temporary directory), so only a few tiles are held in memory.
+
+        Each tile is numbered by its integrations in the exposure, so the
+        MIRI dark current is subtracted with the dark for each integration.
+        The rscd correction of an integration uses the integration before
+        it, so when rscd is not skipped each tile is read along with the
+        preceding integration, which is dropped after the steps.  The
+        persistence correction of each tile starts from the traps filled
+        at the end of the previous tile.
+
+        Parameters
+        ----------
+        input : str or `~jwst.datamodels.RampModel`
+            The uncalibrated exposure.
+
+        Returns
+        -------
+        model : `~jwst.datamodels.RampModel`
+            The calibrated ramp, with memory-mapped data, groupdq and err
+            arrays.
+        """
+        source = ramp_tiles.RampTileSource(input)
+        tiles = ramp_tiles.integration_tiles(source.nints, self.stream_nints)
+        log.info('Streaming %d integrations in %d tiles',
+                 source.nints, len(tiles))
+
+        steps = self.ramp_steps(source.read(*tiles[0]))
+        active = [step for step in steps if not step.skip]
+        overlap = 1 if self.rscd in active else 0
+
+        persistence = self.persistence
+        input_trapsfilled = persistence.input_trapsfilled
+        save_trapsfilled = persistence.save_trapsfilled
+        if persistence in active and persistence.save_persistence:
+            log.warning('Only the persistence of the last tile is saved '
+                        'when streaming')
+
+        writer = ramp_tiles.RampTileWriter(source.nints, self.output_dir)
+        try:
+            for start, stop in tiles:
+                # Save the traps filled at the end of the exposure only
+                persistence.save_trapsfilled = (save_trapsfilled and
+                                                stop == source.nints)
+
+                tile = source.read(max(start - overlap, 0), stop)
+                for step in steps:
+                    tile = step(tile)
+                writer.write(tile, start, stop)
+
+                if persistence in active:
+                    persistence.input_trapsfilled = \
+                        persistence.output_trapsfilled
+        finally:
+            persistence.input_trapsfilled = input_trapsfilled
+            persistence.save_trapsfilled = save_trapsfilled
+            source.close()
+
+        return writer.to_model()
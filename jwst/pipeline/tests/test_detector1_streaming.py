@@ -0,0 +1,259 @@
+"""Test calwebb_detector1 in integration-tile streaming mode"""
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from ... import datamodels
+from ...datamodels import (RSCDModel, TrapDensityModel, PersistenceSatModel,
+                           TrapParsModel)
+from ..calwebb_detector1 import Detector1Pipeline
+
+
+def miri_ramp(nints=4, ngroups=3, ny=5, nx=6):
+    """A small MIRI ramp with random data"""
+    model = datamodels.RampModel((nints, ngroups, ny, nx))
+    model.meta.instrument.name = 'MIRI'
+    model.meta.instrument.detector = 'MIRIMAGE'
+    model.meta.exposure.nints = nints
+    model.meta.exposure.ngroups = ngroups
+    model.meta.exposure.nframes = 1
+    model.meta.exposure.groupgap = 0
+    model.meta.exposure.readpatt = 'FAST'
+    model.meta.subarray.name = 'FULL'
+    model.data[...] = np.random.uniform(0., 1000., model.data.shape)
+    model.data[...] += 100. * np.arange(ngroups)[:, None, None]
+    model.zeroframe = np.random.uniform(0., 10., (nints, ny, nx))
+    return model
+
+
+def nircam_ramp(nints=4, ngroups=5, ny=6, nx=7):
+    """A small NIRCam ramp with random data"""
+    model = datamodels.RampModel((nints, ngroups, ny, nx))
+    model.meta.filename = 'nircam_uncal.fits'
+    model.meta.instrument.name = 'NIRCAM'
+    model.meta.instrument.detector = 'NRCA1'
+    model.meta.exposure.nints = nints
+    model.meta.exposure.ngroups = ngroups
+    model.meta.exposure.nframes = 1
+    model.meta.exposure.groupgap = 0
+    model.meta.exposure.frame_time = 10.
+    model.meta.exposure.group_time = 10.
+    model.meta.exposure.nresets_at_start = 1
+    model.meta.exposure.nresets_between_ints = 1
+    model.meta.subarray.xstart = 1
+    model.meta.subarray.ystart = 1
+    model.data[...] = np.random.uniform(0., 1000., model.data.shape)
+    model.data[...] += 5000. * np.arange(ngroups)[:, None, None]
+    return model
+
+
+def miri_dark(nints, ngroups, ny, nx):
+    """A MIRI dark with a different dark for each integration"""
+    dark = datamodels.DarkMIRIModel((nints, ngroups, ny, nx))
+    dark.meta.exposure.nframes = 1
+    dark.meta.exposure.groupgap = 0
+    for i in range(nints):
+        dark.data[i] = 10. * (i + 1)
+    return dark
+
+
+def rscd_reference():
+    """RSCD parameters for the full-frame FAST readout"""
+    names = ('TAU', 'ASCALE', 'POW', 'ILLUM_ZP', 'ILLUM_SLOPE', 'ILLUM2',
+             'PARAM3', 'CROSSOPT', 'SAT_ZP', 'SAT_SLOPE', 'SAT_2', 'SAT_MZP',
+             'SAT_ROWTERM', 'SAT_SCALE')
+    values = (2., 0.5, 0.5, 1., 0.01, 0., 1000., 10., 1., 0.1, 0., 0., 0., 1.)
+    dtype = ([('SUBARRAY', 'U13'), ('READPATT', 'U4'), ('ROWS', 'U4')] +
+             [(name, np.float32) for name in names])
+    table = np.array([('FULL', 'FAST', rows) + values
+                      for rows in ('EVEN', 'ODD')], dtype=dtype)
+    return RSCDModel(rscd_table=table)
+
+
+def persistence_references(ny, nx):
+    """Trap density, trap parameters and saturation references"""
+    trap_density = TrapDensityModel(
+        data=np.full((ny, nx), 500., dtype=np.float32))
+    persat = PersistenceSatModel(
+        data=np.full((ny, nx), 50000., dtype=np.float32))
+    for model in (trap_density, persat):
+        model.meta.subarray.xstart = 1
+        model.meta.subarray.ystart = 1
+    table = np.array([(0.1, 1e-3, 0., 5e-3), (0.2, 2e-3, 0., 1e-3)],
+                     dtype=[('capture0', np.float64),
+                            ('capture1', np.float64),
+                            ('capture2', np.float64),
+                            ('decay_param', np.float64)])
+    trappars = TrapParsModel(trappars_table=table)
+    return {'TrapDensityModel': trap_density,
+            'PersistenceSatModel': persat,
+            'TrapParsModel': trappars}
+
+
+def only_steps(pipe, *names):
+    """Skip all the steps of a pipeline but the named ones"""
+    for name in pipe.step_defs:
+        getattr(pipe, name).skip = name not in names
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """A pipeline with the MIRI dark, rscd and persistence references"""
+    pipe = Detector1Pipeline()
+    pipe.persistence.save_trapsfilled = False
+
+    for step in (pipe.dark_current, pipe.rscd, pipe.persistence):
+        monkeypatch.setattr(step, 'get_reference_file',
+                            lambda model, reftype: reftype + '.fits')
+    monkeypatch.setattr(pipe.dark_current, 'open_reference_model',
+                        lambda model_class, path: miri_dark(3, 3, 5, 6))
+    monkeypatch.setattr(datamodels, 'RSCDModel',
+                        lambda path: rscd_reference())
+    for name in ('TrapDensityModel', 'PersistenceSatModel', 'TrapParsModel'):
+        monkeypatch.setattr(
+            datamodels, name,
+            lambda path, name=name: persistence_references(6, 7)[name])
+    return pipe
+
+
+def run_whole(pipeline, ramp):
+    """Apply the ramp steps to the whole exposure"""
+    for step in pipeline.ramp_steps(ramp):
+        ramp = step(ramp)
+    return ramp
+
+
+@pytest.mark.parametrize('stream_nints', [1, 3])
+def test_stream_miri_dark(tmpdir, pipeline, stream_nints):
+    """Each integration is corrected with its own dark when streaming"""
+    only_steps(pipeline, 'dark_current')
+    ramp = miri_ramp()
+    expected = run_whole(pipeline, ramp.copy())
+
+    pipeline.output_dir = str(tmpdir)
+    pipeline.stream_nints = stream_nints
+    result = pipeline.stream_ramp_steps(ramp.copy())
+
+    np.testing.assert_array_equal(result.data, expected.data)
+    dark = np.array([10., 20., 30., 30.], dtype=np.float32)
+    np.testing.assert_array_equal(result.data,
+                                  ramp.data - dark[:, None, None, None])
+    np.testing.assert_array_equal(result.zeroframe, ramp.zeroframe)
+    assert result.meta.exposure.integration_start == 1
+    assert result.meta.exposure.integration_end == 4
+
+
+@pytest.mark.parametrize('stream_nints', [1, 2, 4])
+def test_stream_miri_rscd(tmpdir, pipeline, stream_nints):
+    """The rscd correction uses the integration before each tile"""
+    only_steps(pipeline, 'rscd', 'dark_current')
+    ramp = miri_ramp(nints=5, ngroups=6)
+    expected = run_whole(pipeline, ramp.copy())
+    assert expected.meta.cal_step.rscd == 'COMPLETE'
+
+    pipeline.output_dir = str(tmpdir)
+    pipeline.stream_nints = stream_nints
+    result = pipeline.stream_ramp_steps(ramp.copy())
+
+    assert result.meta.cal_step.rscd == 'COMPLETE'
+    assert not np.all(expected.data[1:] == ramp.data[1:] - 30.)
+    np.testing.assert_array_equal(result.data, expected.data)
+    np.testing.assert_array_equal(result.groupdq, expected.groupdq)
+    np.testing.assert_array_equal(result.pixeldq, expected.pixeldq)
+
+
+@pytest.mark.parametrize('stream_nints', [1, 3])
+def test_stream_persistence(tmpdir, monkeypatch, pipeline, stream_nints):
+    """The persistence of each tile starts from the traps of the last one"""
+    only_steps(pipeline, 'persistence')
+    ramp = nircam_ramp()
+    expected = run_whole(pipeline, ramp.copy())
+    expected_traps = pipeline.persistence.output_trapsfilled.data.copy()
+    assert expected.meta.cal_step.persistence == 'COMPLETE'
+    assert np.all(expected_traps > 0.)
+
+    saved = []
+    monkeypatch.setattr(
+        pipeline.persistence, 'save_model',
+        lambda model, suffix, force: saved.append(
+            (model.data.copy(), force)))
+    pipeline.persistence.save_trapsfilled = True
+    input_trapsfilled = pipeline.persistence.input_trapsfilled
+    pipeline.output_dir = str(tmpdir)
+    pipeline.stream_nints = stream_nints
+    result = pipeline.stream_ramp_steps(ramp.copy())
+
+    assert not np.all(expected.data == ramp.data)
+    np.testing.assert_allclose(result.data, expected.data, rtol=1e-6)
+    np.testing.assert_array_equal(result.pixeldq, expected.pixeldq)
+    np.testing.assert_allclose(pipeline.persistence.output_trapsfilled.data,
+                               expected_traps, rtol=1e-6)
+
+    # The traps filled at the end of the exposure are saved
+    assert [force for data, force in saved].count(True) == 1
+    np.testing.assert_allclose(saved[-1][0], expected_traps, rtol=1e-6)
+    assert saved[-1][1]
+
+    # The pipeline's configuration is restored
+    assert pipeline.persistence.input_trapsfilled == input_trapsfilled
+    assert pipeline.persistence.save_trapsfilled
+
+
+@pytest.mark.parametrize('instrument, steps', [
+    ('MIRI', ('rscd', 'dark_current')),
+    ('NIRCAM', ('persistence',)),
+])
+def test_stream_memory(tmpdir, monkeypatch, pipeline, instrument, steps):
+    """No full-size copy of the ramp is made when streaming
+
+    The peak memory used to stream tiles of the same size does not grow
+    with the number of integrations in the exposure.
+    """
+    only_steps(pipeline, *steps)
+    pipeline.output_dir = str(tmpdir)
+    pipeline.stream_nints = 4
+    shape = (4, 120, 126)
+
+    dark = miri_dark(3, shape[0], *shape[1:])
+    monkeypatch.setattr(pipeline.dark_current, 'open_reference_model',
+                        lambda model_class, path: dark.copy())
+    references = persistence_references(*shape[1:])
+    for name, model in references.items():
+        monkeypatch.setattr(datamodels, name,
+                            lambda path, model=model: model.copy())
+
+    def make_ramp(nints):
+        if instrument == 'MIRI':
+            ramp = miri_ramp(nints, 2, 5, 6)
+        else:
+            ramp = nircam_ramp(nints, 2, 6, 7)
+        size = (nints,) + shape
+        ramp.data = np.resize(ramp.data, size)
+        ramp.groupdq = np.zeros(size, dtype=np.uint8)
+        ramp.err = np.zeros(size, dtype=np.float32)
+        ramp.pixeldq = np.zeros(shape[1:], dtype=np.uint32)
+        ramp.zeroframe = np.zeros((nints,) + shape[1:], dtype=np.float32)
+        ramp.meta.exposure.nints = nints
+        ramp.meta.exposure.ngroups = shape[0]
+        return ramp
+
+    def stream_peak(ramp):
+        tracemalloc.start()
+        try:
+            result = pipeline.stream_ramp_steps(ramp)
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert result.data.shape == ramp.data.shape
+        return peak
+
+    small, large = make_ramp(8), make_ramp(24)
+    extra_nbytes = sum(large[name].nbytes - small[name].nbytes
+                       for name in ('data', 'groupdq', 'err'))
+
+    pipeline.stream_ramp_steps(small.copy())
+    small_peak = stream_peak(small)
+    large_peak = stream_peak(large)
+
+    assert large_peak - small_peak < extra_nbytes / 4
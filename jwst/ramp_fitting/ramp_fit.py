@@ -15,6 +15,8 @@
 
 import time
 import logging
+from multiprocessing import Pool
+
 import numpy as np
 
 from .. import datamodels
@@ -32,7 +34,7 @@ BUFSIZE = 1024 * 30000  # 30Mb cache size for data section
 
 
 def ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
-             algorithm, weighting):
+             algorithm, weighting, max_cores='none'):
     """
     Extended Summary
     ----------------
@@ -68,6 +70,11 @@ def ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
         'optimal' specifies that optimal weighting should be used;
          currently the only weighting supported.
 
+    max_cores: string
+        Fraction of the available cores to use for OLS ramp fitting; one of
+        'none', 'quarter', 'half' or 'all'. With 'none' all the work is
+        done in the current process.
+
     Returns
     -------
     new_model: Data Model object
@@ -93,7 +100,7 @@ def ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
     else:
         new_model, int_model, opt_model = \
                ols_ramp_fit(model, buffsize, save_opt, readnoise_model, \
-               gain_model, weighting)
+               gain_model, weighting, max_cores)
         gls_opt_model = None
 
     # Update data units in output models
@@ -107,7 +114,7 @@ def ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
 
 
 def ols_ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
-                 weighting):
+                 weighting, max_cores='none'):
     """
     Extended Summary
     ----------------
@@ -116,6 +123,10 @@ def ols_ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
     slope for all sections (intervals between cosmic rays) of the pixel's ramp
     divided by the effective integration time.
 
+    If more than one core is requested, the data is split into slices of
+    contiguous rows, the slices are fit in separate processes, and the
+    results are reassembled into the output models.
+
     Parameters
     ----------
     model: data model
@@ -137,6 +148,10 @@ def ols_ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
         'optimal' specifies that optimal weighting should be used; currently
         the only weighting supported.
 
+    max_cores: string
+        Fraction of the available cores to use; one of 'none', 'quarter',
+        'half' or 'all'.
+
     Returns
     -------
     new_model: Data Model object
@@ -151,16 +166,10 @@ def ols_ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
         DM object containing optional OLS-specific ramp fitting data for the
         exposure; this will be None if save_opt is False
     """
-    tstart = time.time()
-
     # Get needed sizes and shapes
     nreads, npix, imshape, cubeshape, n_int, instrume, frame_time, ngroups, \
         group_time = utils.get_dataset_info(model)
 
-    # Save original shapes for writing to log file, as these may change for MIRI
-    orig_nreads = nreads
-    orig_cubeshape = cubeshape
-
     # For MIRI datasets having >1 groups, if all final groups are flagged
     # as DO_NOT_USE, resize the input model arrays to exclude the final group.
     if (instrume == 'MIRI' and nreads > 1):
@@ -172,7 +181,6 @@ def ols_ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
             model.groupdq = model.groupdq[:,:-1,:,:]
             nreads -= 1
             ngroups -= 1
-            cubeshape = (nreads,)+imshape
             log.info('MIRI dataset has all final groups flagged as DO_NOT_USE.')
 
         # Next block is to satisfy github issue 1681:
@@ -187,6 +195,257 @@ def ols_ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
         log.warning('will be calculated as the value of that 1 group divided by')
         log.warning('the group exposure time.')
 
+    # Get readnoise array for calculation of variance of noiseless ramps, and
+    #   gain array in case optimal weighting is to be done
+    nframes = model.meta.exposure.nframes
+    readnoise_2d, gain_2d = utils.get_ref_subs(model, readnoise_model,
+                                               gain_model, nframes)
+
+    # Get max number of segments fit in all integrations. This is computed
+    #   over the whole dataset so that every slice sizes its segment arrays
+    #   identically.
+    max_seg = calc_num_seg(model.groupdq, n_int)
+
+    # Never use more slices than there are rows
+    number_slices = min(pipe_utils.get_num_processes(max_cores), imshape[0])
+    if number_slices == 1:
+        new_model, int_model, opt_model, f_max_seg = ols_ramp_fit_single(
+            model, buffsize, save_opt, readnoise_2d, gain_2d, weighting,
+            max_seg)
+        return new_model, int_model, opt_model
+
+    log.info('Fitting ramps using %d processes', number_slices)
+
+    # Information needed to rebuild a RampModel for each slice
+    exposure = {}
+    for key in ('frame_time', 'ngroups', 'group_time', 'groupgap', 'nframes',
+                'drop_frames1'):
+        exposure[key] = getattr(model.meta.exposure, key)
+    exposure['ngroups'] = ngroups
+
+    # Split the rows as evenly as possible between the slices
+    row_bounds = np.linspace(0, imshape[0], number_slices + 1).astype(int)
+    slices = []
+    for rlo, rhi in zip(row_bounds[:-1], row_bounds[1:]):
+        slices.append((model.data[:, :, rlo:rhi, :],
+                       model.err[:, :, rlo:rhi, :],
+                       model.groupdq[:, :, rlo:rhi, :],
+                       model.pixeldq[rlo:rhi, :],
+                       buffsize, save_opt,
+                       readnoise_2d[rlo:rhi, :], gain_2d[rlo:rhi, :],
+                       weighting, max_seg, instrume, exposure))
+
+    with Pool(processes=number_slices) as pool:
+        slice_results = pool.starmap(ols_ramp_fit_sliced, slices)
+
+    # Reassemble the slices. The segment-specific optional results of every
+    #   slice hold all max_seg segments, and are truncated below at the
+    #   largest number of segments fit in any slice, as a single process
+    #   does. The cosmic ray magnitudes may have a different number of
+    #   cosmic rays for each slice, so they are padded with zeros to the
+    #   largest depth, which matches what a single process writes for
+    #   non-existent cosmic rays.
+    f_max_seg = max([res.pop('f_max_seg') for res in slice_results])
+    results = {}
+    for name in slice_results[0]:
+        if slice_results[0][name] is None:
+            results[name] = None
+            continue
+        arrays = [res[name] for res in slice_results]
+        row_axis = arrays[0].ndim - 2
+        if arrays[0].ndim == 4:
+            depth = max([arr.shape[1] for arr in arrays])
+            arrays = [np.pad(arr, ((0, 0), (0, depth - arr.shape[1]),
+                                   (0, 0), (0, 0)), 'constant')
+                      for arr in arrays]
+        results[name] = np.concatenate(arrays, axis=row_axis)
+        if arrays[0].ndim == 4 and name != 'opt_crmag':
+            results[name] = results[name][:, :f_max_seg, :, :]
+    del slice_results
+
+    log_stats(results['data'])
+
+    new_model = datamodels.ImageModel(data=results['data'],
+            dq=results['dq'], var_poisson=results['var_poisson'],
+            var_rnoise=results['var_rnoise'], err=results['err'])
+    new_model.update(model)
+
+    int_model = None
+    if results['int_data'] is not None:
+        int_times = None
+        if n_int > 1 and pipe_utils.is_tso(model) and \
+                hasattr(model, 'int_times'):
+            int_times = model.int_times
+
+        int_model = datamodels.CubeModel()
+        int_model.data = results['int_data']
+        int_model.err = results['int_err']
+        int_model.dq = results['int_dq']
+        int_model.var_poisson = results['int_var_poisson']
+        int_model.var_rnoise = results['int_var_rnoise']
+        int_model.int_times = int_times
+        int_model.update(model)
+
+    opt_model = None
+    if save_opt:
+        opt_model = datamodels.RampFitOutputModel(
+            slope=results['opt_slope'],
+            sigslope=results['opt_sigslope'],
+            var_poisson=results['opt_var_poisson'],
+            var_rnoise=results['opt_var_rnoise'],
+            yint=results['opt_yint'],
+            sigyint=results['opt_sigyint'],
+            pedestal=results['opt_pedestal'],
+            weights=results['opt_weights'],
+            crmag=results['opt_crmag'])
+        opt_model.meta.filename = model.meta.filename
+
+    return new_model, int_model, opt_model
+
+
+def ols_ramp_fit_sliced(data, err, groupdq, pixeldq, buffsize, save_opt,
+                        readnoise_2d, gain_2d, weighting, max_seg, instrume,
+                        exposure):
+    """
+    Extended Summary
+    ----------------
+    Fit the ramps of a slice of rows of the input dataset. This is run in a
+    worker process: a RampModel is created for the slice and passed to
+    ols_ramp_fit_single, and the output arrays are returned instead of
+    data models so that they can be sent back to the parent process.
+
+    Parameters
+    ----------
+    data: float, 4D array
+        science data for the slice
+
+    err: float, 4D array
+        error array for the slice
+
+    groupdq: int, 4D array
+        group DQ array for the slice
+
+    pixeldq: int, 2D array
+        pixel DQ array for the slice
+
+    buffsize: int
+        size of data section (buffer) in bytes
+
+    save_opt: boolean
+        calculate optional fitting results
+
+    readnoise_2d: float, 2D array
+        readnoise for the slice, already scaled by get_ref_subs
+
+    gain_2d: float, 2D array
+        gain for the slice
+
+    weighting: string
+        'optimal' specifies that optimal weighting should be used
+
+    max_seg: int
+        maximum number of segments fit, over the whole dataset
+
+    instrume: string
+        instrument name
+
+    exposure: dict
+        values of the meta.exposure keywords needed for fitting
+
+    Returns
+    -------
+    results: dict
+        output arrays of the rate, integration-specific rate, and optional
+        models, keyed by name
+    """
+    model = datamodels.RampModel(data=data, err=err, groupdq=groupdq,
+                                 pixeldq=pixeldq)
+    model.meta.instrument.name = instrume
+    for key, value in exposure.items():
+        setattr(model.meta.exposure, key, value)
+
+    new_model, int_model, opt_model, f_max_seg = ols_ramp_fit_single(
+        model, buffsize, save_opt, readnoise_2d, gain_2d, weighting, max_seg,
+        opt_max_seg=max_seg)
+
+    results = {}
+    for name in ('data', 'dq', 'var_poisson', 'var_rnoise', 'err'):
+        results[name] = getattr(new_model, name)
+        if int_model is None:
+            results['int_' + name] = None
+        else:
+            results['int_' + name] = getattr(int_model, name)
+
+    if opt_model is not None:
+        for name in ('slope', 'sigslope', 'var_poisson', 'var_rnoise',
+                     'yint', 'sigyint', 'pedestal', 'weights', 'crmag'):
+            results['opt_' + name] = getattr(opt_model, name)
+    results['f_max_seg'] = f_max_seg
+
+    model.close()
+
+    return results
+
+
+def ols_ramp_fit_single(model, buffsize, save_opt, readnoise_2d, gain_2d,
+                        weighting, max_seg, opt_max_seg=None):
+    """
+    Extended Summary
+    ----------------
+    Fit a ramp using ordinary least squares, in the current process. The
+    input model is assumed to already have had any unusable final MIRI
+    group removed.
+
+    Parameters
+    ----------
+    model: data model
+        input data model, assumed to be of type RampModel
+
+    buffsize: int
+        size of data section (buffer) in bytes
+
+    save_opt: boolean
+        calculate optional fitting results
+
+    readnoise_2d: float, 2D array
+        readnoise for all pixels, as returned by utils.get_ref_subs
+
+    gain_2d: float, 2D array
+        gain for all pixels
+
+    weighting: string
+        'optimal' specifies that optimal weighting should be used; currently
+        the only weighting supported.
+
+    max_seg: int
+        maximum number of segments fit in all integrations
+
+    opt_max_seg: int or None
+        number of segments kept in the segment-specific optional results; if
+        None, the largest number of segments fit
+
+    Returns
+    -------
+    new_model: Data Model object
+        DM object containing a rate image averaged over all integrations in
+        the exposure
+
+    int_model: Data Model object or None
+        DM object containing rate images for each integration in the exposure
+
+    opt_model: Data Model object or None
+        DM object containing optional OLS-specific ramp fitting data for the
+        exposure; this will be None if save_opt is False
+
+    f_max_seg: int
+        largest number of segments fit
+    """
+    tstart = time.time()
+
+    # Get needed sizes and shapes
+    nreads, npix, imshape, cubeshape, n_int, instrume, frame_time, ngroups, \
+        group_time = utils.get_dataset_info(model)
+
     # Calculate effective integration time (once EFFINTIM has been populated
     #   and accessible, will use that instead), and other keywords that will
     #   needed if the pedestal calculation is requested. Note 'nframes'
@@ -196,12 +455,7 @@ def ols_ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
     effintim, nframes, groupgap, dropframes1= utils.get_efftim_ped(model)
 
     # Get GROUP DQ and ERR arrays from input file
-    gdq_cube = model.groupdq
-    gdq_cube_shape = gdq_cube.shape
-
-    # Get max number of segments fit in all integrations
-    max_seg = calc_num_seg(gdq_cube, n_int)
-    del gdq_cube
+    gdq_cube_shape = model.groupdq.shape
 
     f_max_seg = 0  # final number to use, usually overwritten by actual value
 
@@ -221,11 +475,6 @@ def ols_ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
     # calculate number of (contiguous) rows per data section
     nrows = calc_nrows(model, buffsize, cubeshape, nreads)
 
-    # Get readnoise array for calculation of variance of noiseless ramps, and
-    #   gain array in case optimal weighting is to be done
-    readnoise_2d, gain_2d = utils.get_ref_subs(model, readnoise_model,
-                                               gain_model, nframes)
-
     # Flag any bad pixels in the gain
     pixeldq = utils.reset_bad_gain( pixeldq, gain_2d )
 
@@ -550,13 +799,15 @@ def ols_ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
         del gdq_cube 
 
         # Truncate results at the maximum number of segments found
-        opt_res.slope_seg = opt_res.slope_seg[:,:f_max_seg,:,:]
-        opt_res.sigslope_seg = opt_res.sigslope_seg[:,:f_max_seg,:,:]
-        opt_res.yint_seg = opt_res.yint_seg[:,:f_max_seg,:,:]
-        opt_res.sigyint_seg = opt_res.sigyint_seg[:,:f_max_seg,:,:]
-        opt_res.weights = (inv_var_both4[:,:f_max_seg,:,:])**2.
-        opt_res.var_p_seg = var_p4[:,:f_max_seg,:,:]
-        opt_res.var_r_seg = var_r4[:,:f_max_seg,:,:]
+        if opt_max_seg is None:
+            opt_max_seg = f_max_seg
+        opt_res.slope_seg = opt_res.slope_seg[:,:opt_max_seg,:,:]
+        opt_res.sigslope_seg = opt_res.sigslope_seg[:,:opt_max_seg,:,:]
+        opt_res.yint_seg = opt_res.yint_seg[:,:opt_max_seg,:,:]
+        opt_res.sigyint_seg = opt_res.sigyint_seg[:,:opt_max_seg,:,:]
+        opt_res.weights = (inv_var_both4[:,:opt_max_seg,:,:])**2.
+        opt_res.var_p_seg = var_p4[:,:opt_max_seg,:,:]
+        opt_res.var_r_seg = var_r4[:,:opt_max_seg,:,:]
 
         opt_model = opt_res.output_optional(model, effintim)
     else:
@@ -621,10 +872,10 @@ def ols_ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
     log.debug('Instrument: %s', instrume)
     log.debug('Number of pixels in 2D array: %d', npix)
     log.debug('Shape of 2D image: (%d, %d)' %(imshape))
-    log.debug('Shape of data cube: (%d, %d, %d)' %(orig_cubeshape))
+    log.debug('Shape of data cube: (%d, %d, %d)' %(cubeshape))
     log.debug('Buffer size (bytes): %d', buffsize)
     log.debug('Number of rows per buffer: %d', nrows)
-    log.info('Number of groups per integration: %d', orig_nreads)
+    log.info('Number of groups per integration: %d', nreads)
     log.info('Number of integrations: %d', n_int)
     log.debug('The execution time in seconds: %f', tstop - tstart)
 
@@ -644,7 +895,7 @@ def ols_ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
 
     new_model.update(model)  # ... and add all keys from input
 
-    return new_model, int_model, opt_model
+    return new_model, int_model, opt_model, f_max_seg
 
 
 def gls_ramp_fit(model,
@@ -1154,13 +1405,6 @@ def calc_slope(data_sect, gdq_sect, frame_time, opt_res, save_opt, rn_sect,
     end_st = np.zeros((nreads + 1, npix), dtype=np.int32)
     end_st[0, :] = nreads - 1
 
-    # end_heads is initially a tuple populated with every pixel that is
-    # either saturated or contains a cosmic ray based on the input DQ
-    # array, so is sized to accomodate the maximum possible number of
-    # pixels flagged. It is later compressed to be an array denoting
-    # the number of endpoints per pixel.
-    end_heads = np.ones(npix * nreads, dtype=np.int32)
-
     # Create nominal 2D ERR array, which is 1st slice of
     #    avged_data_cube * readtime
     err_2d_array = data_sect[0, :, :] * frame_time
@@ -1179,26 +1423,17 @@ def calc_slope(data_sect, gdq_sect, frame_time, opt_res, save_opt, rn_sect,
     mask_2d[gdq_sect_r != 0] = False  # saturated or CR-affected
     mask_2d_init = mask_2d.copy() # initial flags for entire ramp
 
-    wh_f = np.where(np.logical_not(mask_2d))
-
-    these_p = wh_f[1] # coordinates of pixels flagged as False
-    these_r = wh_f[0] # reads of pixels flagged as False
-
-    del wh_f
-
-    # Populate end_st to contain the set of end points for each pixel.
-    # Populate end_heads to initially include every pixel that is either
-    # saturated or contains a cosmic ray. Skips the duplicated final group
-    # for saturated pixels. Saturated pixels resulting in a contiguous set
-    # of intervals of length 1 will later be flagged as too short
-    # to fit well.
-    for ii, val in enumerate(these_p):
-        if (these_r[ii] != (nreads - 1)):
-            end_st[end_heads[these_p[ii]], these_p[ii]] = these_r[ii]
-            end_heads[these_p[ii]] += 1
-
-    # Sort and reverse array to handle the order that saturated pixels
-    # were added
+    # Populate end_st to contain the set of end points for each pixel: every
+    # group that is either saturated or contains a cosmic ray is an end point.
+    # Skips the duplicated final group for saturated pixels. Saturated pixels
+    # resulting in a contiguous set of intervals of length 1 will later be
+    # flagged as too short to fit well. Each flagged group is stored in the
+    # row following its own group number; the end points are sorted below,
+    # so only the set of values in each column matters.
+    end_st[1:nreads, :] = np.where(np.logical_not(mask_2d[:-1, :]),
+                                   arange_nreads_col[:-1], 0)
+
+    # Sort and reverse array to order the end points for each pixel
     end_st.sort(axis=0)
     end_st = end_st[::-1]
 
@@ -1209,18 +1444,21 @@ def calc_slope(data_sect, gdq_sect, frame_time, opt_res, save_opt, rn_sect,
     # Create object to hold optional results
     opt_res.init_2d(npix, i_max_seg, save_opt)
 
+    # Groups having good dq values, used to mask each segment
+    good_groups = (gdq_sect_r == 0)
+
     # LS fit until 'nreads' iterations or all pixels in
     #    section have been processed
     for iter_num in range(nreads):
         if pixel_done.all():
             break
 
-       # frames >= start and <= end_st will be included in fit
+       # frames >= start and <= end_st will be included in fit, RE-excluding
+       #    bad group dq values
         mask_2d = ((arange_nreads_col >= start) &
                    (arange_nreads_col <
-                    (end_st[end_heads[all_pix] - 1, all_pix] + 1)))
-
-        mask_2d[gdq_sect_r != 0] = False # RE-exclude bad group dq values
+                    (end_st[end_heads[all_pix] - 1, all_pix] + 1)) &
+                   good_groups)
 
         # for all pixels, update arrays, summing slope and variance
         f_max_seg, num_seg = \
@@ -1317,13 +1555,35 @@ def fit_next_segment(start, end_st, end_heads, pixel_done, data_sect, mask_2d,
         numbers of segments for good pixels
     """
     nreads, asize2, asize1 = data_sect.shape # Note: nreads is a scalar here
-    all_pix = np.arange(asize2 * asize1)
+    npix = asize2 * asize1
+    all_pix = np.arange(npix)
 
     ramp_mask_sum = mask_2d_init.sum(axis=0)
 
-    # Each returned array below is 1D, for all npix pixels for current segment
-    slope, intercept, variance, sig_intercept, sig_slope = fit_lines(data_sect,
-              mask_2d, rn_sect, gain_sect, ngroups, weighting)
+    # Each array below is 1D, for all npix pixels for current segment. Only
+    #   the pixels still being processed are fit, as the fit results for the
+    #   pixels that are done are never used.
+    slope = np.zeros(npix, dtype=np.float32)
+    intercept = np.zeros(npix, dtype=np.float32)
+    variance = np.zeros(npix, dtype=np.float32)
+    sig_intercept = np.zeros(npix, dtype=np.float32)
+    sig_slope = np.zeros(npix, dtype=np.float32)
+
+    act_pix = all_pix[~pixel_done]
+    if len(act_pix) > 0:
+        act_shape = (1, len(act_pix))
+        act_data = data_sect.reshape(nreads, npix)[:, act_pix]
+        act_fit = fit_lines(act_data.reshape((nreads,) + act_shape),
+                            mask_2d[:, act_pix],
+                            rn_sect.reshape(npix)[act_pix].reshape(act_shape),
+                            gain_sect.reshape(npix)[act_pix].reshape(act_shape),
+                            ngroups, weighting)
+
+        for all_res, act_res in zip((slope, intercept, variance,
+                                     sig_intercept, sig_slope), act_fit):
+            all_res[act_pix] = act_res
+
+        del act_data, act_fit
 
     end_locs = end_st[end_heads[all_pix] - 1, all_pix]
     l_interval = end_locs - start # fitting interval length
@@ -1390,20 +1650,16 @@ def fit_next_segment(start, end_st, end_heads, pixel_done, data_sect, mask_2d,
             f_max_seg = max(f_max_seg, num_seg.max())
 
             # If there are pixels with no later good groups, update stack
-            #   arrays accordingly
-            c_mask_2d_init = mask_2d_init.copy()
-
-            # create array: 0...nreads-1 in a column for each pixel
-            arr_ind_all = np.array( [np.arange(nreads),] *
-                                    c_mask_2d_init.shape[1]).transpose()
-            wh_c_start_all = np.zeros( c_mask_2d_init.shape[1], dtype=np.uint8)
-            wh_c_start_all[ g_pix ]= start[ g_pix]
-
-            # set to False all groups before start group
-            c_mask_2d_init[ arr_ind_all < wh_c_start_all ] = False
+            #   arrays accordingly. For the pixels just fit, only the groups
+            #   from the new start group onward are counted; the start group
+            #   is stored as uint8, as the count has always been done.
+            tot_good_groups = ramp_mask_sum.copy()
+            g_start = start[g_pix].astype(np.uint8)
+            tot_good_groups[g_pix] = (mask_2d_init[:, g_pix] &
+                (np.arange(nreads)[:, np.newaxis] >= g_start)).sum(axis=0)
 
             # select pixels having all groups False from start to ramp end
-            wh_rest_false = np.where( c_mask_2d_init.sum(axis=0) == 0)
+            wh_rest_false = np.where(tot_good_groups == 0)
             if(len(wh_rest_false[0]) > 0):
                 pix_rest_false = wh_rest_false[0]
                 start[ pix_rest_false ] = -1
@@ -1508,9 +1764,6 @@ def fit_next_segment(start, end_st, end_heads, pixel_done, data_sect, mask_2d,
     #    - add slopes and variances to running sums
     #    - set pixel_done to True to designate all fitting done
 
-    # Copy mask, as will modify when calculating the number of later good groups
-    c_mask_2d_init = mask_2d_init.copy()
-
     wh_check = np.where((l_interval == 2) & ( ngroups >2 ) &
                         (end_locs != nreads - 1) & ~pixel_done)
     if(len(wh_check[0]) > 0):
@@ -1518,20 +1771,15 @@ def fit_next_segment(start, end_st, end_heads, pixel_done, data_sect, mask_2d,
         got_case[ these_pix ] = True
         inv_var[these_pix] += 1.0 / variance[these_pix]
 
-        # create array: 0...nreads-1 in a column for each pixel
-        arr_ind_all = np.array([np.arange(nreads),] *
-                               c_mask_2d_init.shape[1]).transpose()
-        wh_c_start_all = np.zeros( mask_2d_init.shape[1], dtype=np.uint8)
-        wh_c_start_all[ these_pix ]= start[ these_pix]
-
-        # set to False all groups before start group
-        c_mask_2d_init[ arr_ind_all < wh_c_start_all ] = 0
-
-        tot_good_groups = c_mask_2d_init.sum(axis=0 )
+        # Count the good groups from the start group onward (the start group
+        #   being stored as uint8, as the count has always been done)
+        these_start = start[these_pix].astype(np.uint8)
+        tot_good_groups = (mask_2d_init[:, these_pix] &
+            (np.arange(nreads)[:, np.newaxis] >= these_start)).sum(axis=0)
 
         # Select pixels having at least 2 later good groups (these later good
         #   groups are a segment whose slope will be calculated)
-        wh_more = np.where( tot_good_groups[these_pix] > 1 )
+        wh_more = np.where( tot_good_groups > 1 )
         pix_more = these_pix[ wh_more ]
         start[ pix_more ] = end_locs[ pix_more ]
         end_st[ end_heads[ pix_more ] - 1, pix_more ] = 0
@@ -1539,7 +1787,7 @@ def fit_next_segment(start, end_st, end_heads, pixel_done, data_sect, mask_2d,
 
         # Select pixels having less than 2 later good groups (these later good
         #   groups will not be used)
-        wh_only = np.where( tot_good_groups[these_pix] <= 1 )
+        wh_only = np.where( tot_good_groups <= 1 )
         pix_only = these_pix[ wh_only ]
         start[ pix_only ] = -1
         end_st[ end_heads[ pix_only ] - 1, pix_only ] = 0
@@ -1871,8 +2119,7 @@ def fit_double_read(mask_2d, wh_pix_2r, data_masked, slope_s, intercept_s,
     """
     Short Summary
     -------------
-    Process all semi-ramps having exactly 2 good groups. May need to optimize
-    later to remove loop over pixels.
+    Process all semi-ramps having exactly 2 good groups.
 
     Parameters
     ----------
@@ -1920,22 +2167,26 @@ def fit_double_read(mask_2d, wh_pix_2r, data_masked, slope_s, intercept_s,
     sig_intercept_s: float, 1D array
         sigma of y-intercepts from fit for data section
     """
-    for ff in range(len(wh_pix_2r[0])): # loop over the pixels
-        pixel_ff = wh_pix_2r[0][ff] # pixel index (1d)
-        rn = rn_sect.flatten()[pixel_ff] # read noise for this pixel
-
-        read_nums = np.where( mask_2d[:,pixel_ff])
-        second_read = read_nums[0][1]
-        data_ramp = data_masked[:, pixel_ff] * mask_2d[:, pixel_ff]
-        data_semi = data_ramp[ mask_2d[:, pixel_ff]] # picks only the 2
-        diff_data =  data_semi[1] - data_semi[0]
-
-        slope_s[ pixel_ff ] = diff_data
-        intercept_s[ pixel_ff ] = data_semi[1]*(1.- second_read) + \
-            data_semi[0]*second_read # by geometry
-        variance_s[ pixel_ff ] = 2.0 * rn * rn
-        sig_slope_s[pixel_ff] = np.sqrt(2) * rn
-        sig_intercept_s[ pixel_ff ] = np.sqrt(2) * rn
+    pix_2r = wh_pix_2r[0] # pixel indices (1d)
+    if len(pix_2r) == 0:
+        return slope_s, intercept_s, variance_s, sig_slope_s, sig_intercept_s
+
+    # read noise for these pixels; the products below are done in double
+    #   precision before being stored
+    rn = rn_sect.flatten()[pix_2r].astype(np.float64)
+
+    # The 2 good groups of each pixel, as [pixel, (first, second)]
+    read_nums = np.nonzero(mask_2d[:, pix_2r].transpose())[1].reshape(-1, 2)
+    second_read = read_nums[:, 1]
+    data_first = data_masked[read_nums[:, 0], pix_2r]
+    data_second = data_masked[second_read, pix_2r]
+
+    slope_s[pix_2r] = data_second - data_first
+    intercept_s[pix_2r] = data_second * (1. - second_read) + \
+        data_first * second_read # by geometry
+    variance_s[pix_2r] = 2.0 * rn * rn
+    sig_slope_s[pix_2r] = np.sqrt(2) * rn
+    sig_intercept_s[pix_2r] = np.sqrt(2) * rn
 
     return slope_s, intercept_s, variance_s, sig_slope_s, sig_intercept_s
 
@@ -2440,28 +2691,57 @@ def calc_opt_sums(rn_sect, gain_sect, data_masked, mask_2d, xvalues, good_pix):
     power_wt_r = 0
 
     # For all pixels, 'roll' up the leading zeros such that the 0th group of
-    #  each pixel is the lowest nonzero group for that pixel
-    wh_m2d_f = np.logical_not(c_mask_2d[0, :]) # ramps with initial group False
-    while (wh_m2d_f.sum() > 0):
-        data_masked[:, wh_m2d_f] = np.roll(data_masked[:, wh_m2d_f], -1, axis=0)
-        c_mask_2d[:, wh_m2d_f] = np.roll(c_mask_2d[:, wh_m2d_f], -1, axis=0)
-        xvalues[:, wh_m2d_f] = np.roll(xvalues[:, wh_m2d_f], -1, axis=0)
-        wh_m2d_f = np.logical_not(c_mask_2d[0, :])
+    #  each pixel is the lowest nonzero group for that pixel. Every pixel is
+    #  rolled at once by its own number of leading zeros.
+    nreads_sect, npix_good = c_mask_2d.shape
+    roll_ind = (np.arange(nreads_sect)[:, np.newaxis] +
+                np.argmax(c_mask_2d, axis=0)) % nreads_sect
+    pix_ind = np.arange(npix_good)
+    data_masked = data_masked[roll_ind, pix_ind]
+    c_mask_2d = c_mask_2d[roll_ind, pix_ind]
+    xvalues = xvalues[roll_ind, pix_ind]
+
+    del roll_ind, pix_ind
 
     # Create weighted sums for Poisson noise and read noise
-    nreads_wtd = (wt_h * c_mask_2d).sum(axis=0)  # using optimal weights
+    nreads_wtd = sum_groups(wt_h * c_mask_2d)  # using optimal weights
 
-    sumx = (xvalues * wt_h).sum(axis=0)
-    sumxx = (xvalues**2 * wt_h).sum(axis=0)
+    sumx = sum_groups(xvalues * wt_h)
+    sumxx = sum_groups(xvalues**2 * wt_h)
 
     c_data_masked = data_masked.copy()
     c_data_masked[np.isnan(c_data_masked)] = 0.
-    sumy = (np.reshape((c_data_masked * wt_h).sum(axis=0), sumx.shape))
-    sumxy = (xvalues * wt_h * np.reshape(c_data_masked, xvalues.shape)).sum(axis=0)
+    sumy = (np.reshape(sum_groups(c_data_masked * wt_h), sumx.shape))
+    sumxy = sum_groups(xvalues * wt_h * np.reshape(c_data_masked, xvalues.shape))
 
     return sumx, sumxx, sumxy, sumy, nreads_wtd, xvalues
 
 
+def sum_groups(values):
+    """
+    Short Summary
+    -------------
+    Sum a [group, pixel] array over the groups, adding the groups in order for
+    every pixel. numpy sums the groups of a single pixel pairwise instead,
+    which would make the fit of a pixel depend on how many other pixels are
+    fit along with it (e.g. on the number of rows in a data section or slice).
+
+    Parameters
+    ----------
+    values: float, 2D array
+        values for the groups of each pixel
+
+    Returns
+    -------
+    sums: float, 1D array
+        sum of the values of each pixel
+    """
+    if values.shape[1] == 1:
+        return np.concatenate((values, values), axis=1).sum(axis=0)[:1]
+
+    return values.sum(axis=0)
+
+
 def log_stats(c_rates):
     """
     Short Summary
@@ -24,6 +24,7 @@ class RampFitStep (Step):
         int_name = string(default='')
         save_opt = boolean(default=False) # Save optional output
         opt_name = string(default='')
+        maximum_cores = option('none', 'quarter', 'half', 'all', default='none') # max number of processes to create
     """
 
     # Prior to 04/26/17, the following were also in the spec above:
@@ -68,7 +69,7 @@ class RampFitStep (Step):
             out_model, int_model, opt_model, gls_opt_model = ramp_fit.ramp_fit(
                 input_model, buffsize,
                 self.save_opt, readnoise_model, gain_model, self.algorithm,
-                self.weighting
+                self.weighting, self.maximum_cores
             )
 
             readnoise_model.close()
@@ -0,0 +1,128 @@
+"""Test OLS ramp fitting"""
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from ... import datamodels
+from ...datamodels import dqflags
+from ...lib import pipe_utils
+from .. import ramp_fit
+
+
+def make_ramp(nints=2, ngroups=10, ny=4, nx=5, seed=3):
+    """A NIRCam ramp with many jumps, and saturated pixels"""
+    rng = np.random.RandomState(seed)
+    rate = rng.uniform(1., 50., (ny, nx))
+    time = 10.7 * np.arange(ngroups)[:, np.newaxis, np.newaxis]
+    data = rate * time + rng.normal(0., 5., (nints, ngroups, ny, nx))
+    groupdq = np.zeros((nints, ngroups, ny, nx), dtype=np.uint8)
+    for i in range(nints):
+        for y in range(ny):
+            for x in range(nx):
+                for group in rng.randint(1, ngroups, rng.randint(0, 5)):
+                    groupdq[i, group, y, x] = dqflags.group['JUMP_DET']
+                    data[i, group:, y, x] += 500.
+    groupdq[:, -3:, 0, :2] = dqflags.group['SATURATED']
+
+    model = datamodels.RampModel(data=data.astype(np.float32), groupdq=groupdq)
+    model.meta.instrument.name = 'NIRCAM'
+    model.meta.instrument.detector = 'NRCA1'
+    model.meta.exposure.frame_time = 10.7
+    model.meta.exposure.group_time = 10.7
+    model.meta.exposure.ngroups = ngroups
+    model.meta.exposure.nframes = 1
+    model.meta.exposure.groupgap = 0
+    model.meta.exposure.drop_frames1 = 0
+
+    readnoise = datamodels.ReadnoiseModel(
+        data=np.full((ny, nx), 5., dtype=np.float32))
+    gain = datamodels.GainModel(data=np.full((ny, nx), 2., dtype=np.float32))
+    for ref in (model, readnoise, gain):
+        ref.meta.subarray.xstart = 1
+        ref.meta.subarray.ystart = 1
+        ref.meta.subarray.xsize = nx
+        ref.meta.subarray.ysize = ny
+    return model, readnoise, gain
+
+
+@pytest.mark.parametrize('num_processes, ny', [(2, 9), (3, 9), (5, 9), (4, 3)])
+def test_ols_ramp_fit_parallel(monkeypatch, num_processes, ny):
+    """Fitting slices of rows in worker processes gives the serial fit
+
+    With more than 8 groups, numpy would sum the groups of a lone pixel in
+    a different order than those of several pixels.
+    """
+    pools = []
+
+    def counting_pool(processes):
+        pools.append(processes)
+        return multiprocessing.Pool(processes)
+
+    monkeypatch.setattr(ramp_fit, 'Pool', counting_pool)
+    monkeypatch.setattr(pipe_utils, 'get_num_processes',
+                        lambda max_cores: 1 if max_cores == 'none' else num_processes)
+
+    model, readnoise, gain = make_ramp(ngroups=12, ny=ny, nx=6, seed=11)
+    serial = ramp_fit.ols_ramp_fit(model, ramp_fit.BUFSIZE, True, readnoise,
+                                   gain, 'optimal', 'none')
+    assert pools == []
+    model, readnoise, gain = make_ramp(ngroups=12, ny=ny, nx=6, seed=11)
+    parallel = ramp_fit.ols_ramp_fit(model, ramp_fit.BUFSIZE, True, readnoise,
+                                     gain, 'optimal', 'all')
+    assert pools == [min(num_processes, ny)]
+
+    for name in ('data', 'dq', 'var_poisson', 'var_rnoise', 'err'):
+        np.testing.assert_array_equal(parallel[0][name], serial[0][name])
+        np.testing.assert_array_equal(parallel[1][name], serial[1][name])
+    for name in ('slope', 'sigslope', 'var_poisson', 'var_rnoise', 'yint',
+                 'sigyint', 'pedestal', 'weights', 'crmag'):
+        np.testing.assert_array_equal(parallel[2][name], serial[2][name])
+
+
+def test_ols_ramp_fit_many_jumps():
+    """The fit of ramps with many jumps is that of the per-pixel algorithm
+
+    The expected values were computed with the OLS fit that looped over the
+    flagged groups and pixels in Python, before it was vectorized.
+    """
+    model, readnoise, gain = make_ramp()
+    # 62 jumps in 40 ramps of 10 groups
+    assert np.count_nonzero(model.groupdq == dqflags.group['JUMP_DET']) == 62
+
+    rate, integ, opt = ramp_fit.ols_ramp_fit(model, ramp_fit.BUFSIZE, False,
+                                             readnoise, gain, 'optimal')
+
+    np.testing.assert_array_equal(rate.data, np.array(
+        [[28.036188, 35.97872, 11.70136, 25.976562, 44.70742],
+         [39.462753, 7.231064, 11.148669, 3.5963461, 19.651957],
+         [2.2900636, 18.631855, 30.654272, 9.7338505, 34.11937],
+         [29.938648, 1.6468182, 28.521578, 13.72401, 20.534096]],
+        dtype=np.float32))
+    np.testing.assert_array_equal(rate.dq, [[6, 6, 4, 4, 4],
+                                            [4, 4, 0, 4, 4],
+                                            [4, 4, 4, 4, 4],
+                                            [4, 4, 4, 4, 4]])
+    np.testing.assert_array_equal(rate.var_poisson, np.array(
+        [[0.20566028, 0.18885526, 0.05217542, 0.08077078, 0.14839278],
+         [0.14082569, 0.02086018, 0.029138958, 0.010417574, 0.07632299],
+         [0.045354962, 0.07933265, 0.2020452, 0.09388804, 0.09434685],
+         [0.13929893, 0.008062671, 0.08366779, 0.1222304, 0.067143835]],
+        dtype=np.float32))
+    np.testing.assert_array_equal(rate.var_rnoise, np.array(
+        [[0.032349583, 0.027294962, 0.011645851, 0.006023716, 0.004879547],
+         [0.01343752, 0.0046959077, 0.0026467843, 0.004159232, 0.015880704],
+         [0.00490696, 0.010039526, 0.015323486, 0.01940975, 0.0034937551],
+         [0.00671876, 0.0080132, 0.0045970464, 0.0050781327, 0.004345467]],
+        dtype=np.float32))
+    np.testing.assert_array_equal(integ.data, np.array(
+        [[[27.799227, 35.7742, 12.374022, 26.033918, 44.684788],
+          [45.066837, 7.4393606, 11.22907, 3.5341933, 16.470552],
+          [2.0194738, 13.699354, 26.792059, 5.9920297, 34.16224],
+          [29.987257, 2.1932333, 28.65316, 13.802322, 21.411177]],
+         [[28.198936, 36.24774, 10.5724945, 25.934885, 44.753555],
+          [32.628918, 7.1348553, 11.06827, 3.7027364, 22.645721],
+          [2.4019988, 23.39452, 32.831604, 14.669039, 34.068344],
+          [29.857435, 0.4413187, 28.436014, 13.532447, 19.021936]]],
+        dtype=np.float32))
+    assert opt is None
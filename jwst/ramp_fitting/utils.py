@@ -240,6 +240,7 @@ class OptRes:
 
         # Loop over integrations and groups: for those pix having a cr, add
         #    the magnitude to the compressed array
+        max_num_crs = 0
         for ii_int in range(0, n_int):
             cr_mag_int = self.cr_mag_seg[ii_int, :, :, :]
             cr_int_has_cr = np.where(cr_mag_int.sum(axis=0) != 0)
@@ -256,7 +257,8 @@ class OptRes:
                         cr_com[ii_int,end_cr[y,x],y,x] = cr_mag_int[k_rd,y,x]
                         end_cr[y, x] += 1
 
-        max_num_crs = end_cr.max()
+            max_num_crs = max(max_num_crs, end_cr.max())
+
         self.cr_mag_seg = cr_com [:,:max_num_crs,:,:]
 
 
@@ -38,7 +38,8 @@ class GWCSBlot:
         self.source_wcs = product.meta.wcs
         self.source = product.data
 
-    def extract_image(self, blot_img, interp='poly5', sinscl=1.0):
+    def extract_image(self, blot_img, interp='poly5', sinscl=1.0,
+                      pixmap_error=None):
         """
         Resample the output/resampled image to recreate an input image based on
         the input image's world coordinate system
@@ -59,18 +60,48 @@ class GWCSBlot:
 
         sincscl : float, optional
             The scaling factor for sinc interpolation.
+
+        pixmap_error : float, optional
+            The maximum error, in pixels, of the interpolated pixel map.
+            If None, the WCS transforms are evaluated at every pixel.
+        """
+        return self.extract(blot_img.meta.wcs, blot_img.shape,
+                            blot_img.meta.wcsinfo.cdelt1,
+                            interp=interp, sinscl=sinscl,
+                            pixmap_error=pixmap_error)
+
+    def extract(self, blot_wcs, blot_shape, blot_pscale, interp='poly5',
+                sinscl=1.0, pixmap_error=None):
+        """
+        Resample the output/resampled image onto the pixel grid of an input
+        image, given the WCS, shape and pixel scale of that image
+
+        This lets the blotting be done without the input image datamodel,
+        e.g. in a worker process.
+
+        Parameters
+        ----------
+
+        blot_wcs : gwcs.WCS
+            The WCS of the 'blotted' image
+
+        blot_shape : tuple
+            The shape of the 'blotted' image
+
+        blot_pscale : float
+            The pixel scale (CDELT1) of the 'blotted' image
+
+        interp, sinscl, pixmap_error : see `extract_image`
         """
-        blot_wcs = blot_img.meta.wcs
-        outsci = np.zeros(blot_img.shape, dtype=np.float32)
+        outsci = np.zeros(blot_shape, dtype=np.float32)
 
         # Compute the mapping between the input and output pixel coordinates
         pixmap = resample_utils.calc_gwcs_pixmap(blot_wcs, self.source_wcs,
-            outsci.shape)
+            outsci.shape, max_error=pixmap_error)
         log.debug("Pixmap shape: {}".format(pixmap[:, :, 0].shape))
         log.debug("Sci shape: {}".format(outsci.shape))
 
         source_pscale = self.source_model.meta.wcsinfo.cdelt1
-        blot_pscale = blot_img.meta.wcsinfo.cdelt1
 
         pix_ratio = source_pscale / blot_pscale
         log.info('Blotting {} <-- {}'.format(outsci.shape, self.source.shape))
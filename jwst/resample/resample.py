@@ -1,11 +1,16 @@
 import logging
 from collections import OrderedDict
+import tempfile
+
 import numpy as np
+from astropy.modeling.models import Shift
+from gwcs import WCS
 
 from .. import datamodels
 
 from . import gwcs_drizzle
 from . import resample_utils
+from ..lib.pipe_utils import get_num_processes, run_tasks
 from ..model_blender import blendmeta
 
 log = logging.getLogger(__name__)
@@ -13,6 +18,18 @@ log.setLevel(logging.DEBUG)
 
 __all__ = ["ResampleData"]
 
+# Maximum number of pixels in a tile of an output drizzled by a worker
+MAX_TILE_PIXELS = 4096 * 4096
+
+# Rows drizzled on each side of a tile, but not kept.  Drizzle drops the
+# input lines whose end pixels both fall outside of the output frame (by
+# more than the kernel size), even if the line curves into the frame.
+TILE_OVERLAP = 16
+
+# Distance, in output pixels, beyond the input pixel centers that the
+# drizzle kernels reach, in addition to the size of an input pixel
+KERNEL_MARGIN = 4
+
 
 class ResampleData:
     """
@@ -44,9 +61,14 @@ class ResampleData:
 
         output : str
             filename for output
+
+        pars : dict
+            The drizzle parameters.  If ``in_memory`` is False, the output
+            arrays are memory-mapped to scratch files, see `new_output_model`.
         """
         self.input_models = input_models
         self.drizpars = pars
+        self.in_memory = pars.get('in_memory', True)
         if output is None:
             output = input_models.meta.resample.output
         self.output_filename = output
@@ -54,7 +76,12 @@ class ResampleData:
         # Define output WCS based on all inputs, including a reference WCS
         self.output_wcs = resample_utils.make_output_wcs(self.input_models)
         log.debug('Output mosaic size: {}'.format(self.output_wcs.data_size))
-        self.blank_output = datamodels.DrizProductModel(self.output_wcs.data_size)
+        if self.in_memory:
+            self.blank_output = datamodels.DrizProductModel(
+                self.output_wcs.data_size)
+        else:
+            # Only the metadata is used; see new_output_model
+            self.blank_output = datamodels.DrizProductModel()
 
         # update meta data and wcs
         self.blank_output.update(input_models[0])
@@ -62,16 +89,28 @@ class ResampleData:
 
         self.output_models = datamodels.ModelContainer()
 
-    def update_driz_outputs(self):
-        """ Define output arrays for use with drizzle operations.
+    def new_output_model(self, num_inputs):
+        """ Make a blank output model for drizzling a number of images.
+
+        If the ``in_memory`` parameter is False, the SCI, WHT and CON arrays
+        are memory-mapped to scratch files in the default temporary
+        directory (set by the TMPDIR environment variable), so that the
+        output mosaic is not held in memory.  The scratch files are removed
+        when the arrays are released.  The CON array then has a plane for
+        every 32 input images.
         """
-        numchips = len(self.input_models)
-        numplanes = (numchips // 32) + 1
+        if self.in_memory:
+            return self.blank_output.copy()
 
-        # Replace CONTEXT array with full set of planes needed for all inputs
-        outcon = np.zeros((numplanes, self.output_wcs.data_size[0],
-                           self.output_wcs.data_size[1]), dtype=np.int32)
-        self.blank_output.con = outcon
+        shape = tuple(self.output_wcs.data_size)
+        numplanes = (num_inputs - 1) // 32 + 1
+        output_model = datamodels.DrizProductModel(
+            data=_scratch_array(shape, np.float32),
+            wht=_scratch_array(shape, np.float32),
+            con=_scratch_array((numplanes,) + shape, np.int32))
+        output_model.update(self.blank_output)
+        output_model.meta.wcs = self.output_wcs
+        return output_model
 
     def blend_output_metadata(self, output_model):
         """Create new output metadata based on blending all input metadata."""
@@ -84,6 +123,13 @@ class ResampleData:
 
     def do_drizzle(self):
         """ Perform drizzling operation on input images's to create a new output
+
+        If the ``maximum_cores`` parameter is set, the images are drizzled
+        by worker processes.  Each output is split into tiles of rows, at
+        least one per process for the final output, and each worker drizzles
+        the images that overlap a tile onto the rows of the tile only.  The
+        tiles are then copied into the output arrays, which may be
+        memory-mapped, so no worker holds a whole large output.
         """
         # Set up information about what outputs we need to create: single or final
         # Key: value from metadata for output/observation name
@@ -108,9 +154,13 @@ class ResampleData:
             group_exptime = [total_exposure_time]
         pointings = len(self.input_models.group_names)
 
+        num_processes = get_num_processes(
+            self.drizpars.get('maximum_cores', 'none'))
+        tasks = []
+
         for obs_product, exposure, texptime in zip(driz_outputs, exposures,
                                                    group_exptime):
-            output_model = self.blank_output.copy()
+            output_model = self.new_output_model(len(exposure))
             output_model.meta.filename = obs_product
             saved_model_type = output_model.meta.model_type
 
@@ -118,15 +168,25 @@ class ResampleData:
                 self.blend_output_metadata(output_model)
                 output_model.meta.model_type = saved_model_type
 
+            # Share the output WCS between the outputs, rather than a copy
+            # per output, so that cached pixel maps are reused when blotting
+            output_model.meta.wcs = self.output_wcs
+
             exposure_times = {'start': [], 'end': []}
 
             # Initialize the output with the wcs
-            driz = gwcs_drizzle.GWCSDrizzle(output_model,
-                                            single=self.drizpars['single'],
-                                            pixfrac=self.drizpars['pixfrac'],
-                                            kernel=self.drizpars['kernel'],
-                                            fillval=self.drizpars['fillval'])
+            if num_processes > 1:
+                driz = None
+            else:
+                driz = gwcs_drizzle.GWCSDrizzle(output_model,
+                                                single=self.drizpars['single'],
+                                                pixfrac=self.drizpars['pixfrac'],
+                                                kernel=self.drizpars['kernel'],
+                                                fillval=self.drizpars['fillval'],
+                                                pixmap_error=self.drizpars.get(
+                                                    'pixmap_error'))
 
+            images = []
             for n, img in enumerate(exposure):
                 exposure_times['start'].append(img.meta.exposure.start_time)
                 exposure_times['end'].append(img.meta.exposure.end_time)
@@ -139,6 +199,11 @@ class ResampleData:
                 outwcs_pscale = output_model.meta.wcsinfo.cdelt1
                 wcslin_pscale = img.meta.wcsinfo.cdelt1
 
+                if driz is None:
+                    # The image is drizzled by a worker process
+                    images.append((n + 1, img, outwcs_pscale / wcslin_pscale))
+                    continue
+
                 inwht = resample_utils.build_driz_weight(img,
                     weight_type=self.drizpars['weight_type'],
                     good_bits=self.drizpars['good_bits'])
@@ -146,6 +211,20 @@ class ResampleData:
                         expin=img.meta.exposure.exposure_time,
                         pscale_ratio=outwcs_pscale / wcslin_pscale)
 
+            if driz is None:
+                # Make room for the context planes of all the images
+                numplanes = (len(images) - 1) // 32 + 1
+                con_shape = (numplanes,) + output_model.data.shape
+                if output_model.con.shape != con_shape:
+                    output_model.con = np.zeros(con_shape, dtype=np.int32)
+
+                ntiles = 1 if self.drizpars['single'] else num_processes
+                tasks.extend(self.drizzle_tasks(len(self.output_models),
+                                                images, ntiles))
+            else:
+                # Keep the context planes added for more than 32 images
+                output_model.con = driz.outcon
+
             # Update some basic exposure time values based on all the inputs
             output_model.meta.exposure.exposure_time = texptime
             output_model.meta.exposure.start_time = min(exposure_times['start'])
@@ -158,6 +237,109 @@ class ResampleData:
 
             self.output_models.append(output_model)
 
+        if tasks:
+            num_processes = min(num_processes, len(tasks))
+            log.info("Drizzling {} tiles using {} processes".format(
+                len(tasks), num_processes))
+            for (func, args), tile in zip(tasks, run_tasks(tasks,
+                                                           num_processes)):
+                index, rows = args[:2]
+                self.write_tile(self.output_models[index], rows, *tile,
+                                fillval=self.drizpars['fillval'])
+
+    def drizzle_tasks(self, index, images, ntiles=1):
+        """ Make the tasks drizzling a group of images onto an output.
+
+        The output is split into tiles of consecutive rows, and each task
+        drizzles the images that overlap a tile onto the rows of the tile.
+
+        Parameters
+        ----------
+        index : int
+            The index of the output in ``self.output_models``.
+
+        images : list of tuple
+            The (uniqid, model, pscale_ratio) of each image, where uniqid is
+            the bit of the image in the context array, starting at 1.
+
+        ntiles : int
+            The minimum number of tiles.  More tiles are made if needed to
+            keep them under `MAX_TILE_PIXELS` pixels.
+
+        Returns
+        -------
+        tasks : list of tuple
+            The (function, arguments) of each task, for
+            `~jwst.lib.pipe_utils.run_tasks`.  The first two arguments are
+            the index of the output and the (start, stop) rows of the tile.
+            The tiles are not filled; see `write_tile`.
+        """
+        numplanes = (len(images) - 1) // 32 + 1
+        drizpars = dict(pixfrac=self.drizpars['pixfrac'],
+                        kernel=self.drizpars['kernel'],
+                        fillval='INDEF',
+                        pixmap_error=self.drizpars.get('pixmap_error'),
+                        weight_type=self.drizpars['weight_type'],
+                        good_bits=self.drizpars['good_bits'])
+
+        ny, nx = self.output_wcs.data_size
+        ntiles = max(ntiles, -(-ny * nx // MAX_TILE_PIXELS))
+        ntiles = max(1, min(ntiles, ny))
+        bounds = np.linspace(0, ny, ntiles + 1).astype(int).tolist()
+
+        # The output rows that each image reaches
+        extents = []
+        for uniqid, img, pscale_ratio in images:
+            bbox = resample_utils.calc_output_bounding_box(
+                img.meta.wcs, self.output_wcs, img.data.shape)
+            if bbox is None:
+                extents.append((-np.inf, np.inf))
+                continue
+            margin = KERNEL_MARGIN + 1. / pscale_ratio
+            extents.append((bbox[1][0] - margin, bbox[1][1] + margin))
+
+        tasks = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            tile_images = [image for image, (ymin, ymax)
+                           in zip(images, extents)
+                           if ymax >= start and ymin < stop]
+            tasks.append((_drizzle_tile, (index, (start, stop), tile_images,
+                                          self.output_wcs, numplanes,
+                                          drizpars)))
+        return tasks
+
+    @staticmethod
+    def write_tile(output_model, rows, sci, wht, con, fillval='INDEF'):
+        """ Copy a tile drizzled by `drizzle_tasks` into an output model.
+
+        The pixels of the tile with no weight are set to ``fillval``, as
+        drizzle does with each image when ``fillval`` is not INDEF (or
+        blank).  The CON array of the output model must have a plane for
+        every 32 images.
+
+        Parameters
+        ----------
+        output_model : `~jwst.datamodels.DrizProductModel`
+            The output; its arrays are updated in place.
+
+        rows : tuple
+            The (start, stop) rows of the tile in the output.
+
+        sci, wht, con : numpy.ndarray
+            The arrays of the tile.
+
+        fillval : str
+            The value of pixels with no weight.
+        """
+        if fillval is not None and str(fillval).strip().upper() not in (
+                '', 'INDEF'):
+            sci[wht == 0] = float(fillval)
+
+        start, stop = rows
+        output_model.data[start:stop] = sci
+        output_model.wht[start:stop] = wht
+        output_model.con[:, start:stop] = con
+
     def update_fits_wcs(self, model):
         """
         Update FITS WCS keywords of the resampled image.
@@ -175,3 +357,53 @@ class ResampleData:
         model.meta.wcsinfo.pc1_2 = transform[2].matrix.value[0][1]
         model.meta.wcsinfo.pc2_1 = transform[2].matrix.value[1][0]
         model.meta.wcsinfo.pc2_2 = transform[2].matrix.value[1][1]
+
+
+def _drizzle_tile(index, rows, images, output_wcs, numplanes, drizpars):
+    """ Drizzle images onto a tile of rows of an output frame.
+
+    The parameters are those of the tasks made by
+    `ResampleData.drizzle_tasks`.  The images are drizzled onto the rows of
+    the tile and `TILE_OVERLAP` rows on each side, and the SCI, WHT and CON
+    arrays of the rows of the tile are returned.
+    """
+    start = max(rows[0] - TILE_OVERLAP, 0)
+    stop = min(rows[1] + TILE_OVERLAP, output_wcs.data_size[0])
+    shape = (stop - start, output_wcs.data_size[1])
+    product = datamodels.DrizProductModel(shape)
+    product.con = np.zeros((numplanes,) + shape, dtype=np.int32)
+    product.meta.wcs = _tile_wcs(output_wcs, start)
+
+    driz = gwcs_drizzle.GWCSDrizzle(product, pixfrac=drizpars['pixfrac'],
+                                    kernel=drizpars['kernel'],
+                                    fillval=drizpars['fillval'],
+                                    pixmap_error=drizpars['pixmap_error'])
+    for uniqid, img, pscale_ratio in images:
+        inwht = resample_utils.build_driz_weight(img,
+            weight_type=drizpars['weight_type'],
+            good_bits=drizpars['good_bits'])
+        # Use the bit of the image in the whole output
+        driz.uniqid = uniqid - 1
+        driz.add_image(img.data, img.meta.wcs, inwht=inwht,
+                       expin=img.meta.exposure.exposure_time,
+                       pscale_ratio=pscale_ratio)
+
+    tile = slice(rows[0] - start, rows[1] - start)
+    return product.data[tile], product.wht[tile], driz.outcon[:, tile]
+
+
+def _tile_wcs(output_wcs, row):
+    """ The WCS of the rows of an output frame starting at a row.
+    """
+    offset = Shift(0.) & Shift(row)
+    transform = offset | output_wcs.forward_transform
+    transform.inverse = output_wcs.backward_transform | offset.inverse
+    return WCS(transform, input_frame=output_wcs.input_frame,
+               output_frame=output_wcs.output_frame)
+
+
+def _scratch_array(shape, dtype):
+    """ Create a zeroed array memory-mapped to an anonymous temporary file.
+    """
+    return np.memmap(tempfile.TemporaryFile(), dtype=dtype, mode='w+',
+                     shape=shape)
@@ -7,10 +7,11 @@ from astropy import coordinates as coord
 from astropy import units as u
 from astropy.modeling.models import Mapping, Tabular1D, Linear1D
 from astropy.modeling.fitting import LinearLSQFitter
-from gwcs import wcstools, WCS
+from gwcs import WCS
 from gwcs import coordinate_frames as cf
 
 from .. import datamodels
+from ..assign_wcs.util import evaluate_slit_wcs
 from . import gwcs_drizzle
 from . import resample_utils
 
@@ -95,8 +96,7 @@ class ResampleSpecData:
         refwcs = refmodel.meta.wcs
         bb = refwcs.bounding_box
 
-        grid = wcstools.grid_from_bounding_box(bb)
-        ra, dec, lam = np.array(refwcs(*grid))
+        ra, dec, lam = np.array(evaluate_slit_wcs(refwcs).world)
 
         spectral_axis = find_dispersion_axis(lam)
         spatial_axis = spectral_axis ^ 1
@@ -229,7 +229,8 @@ class ResampleSpecData:
                                 single=self.drizpars['single'],
                                 pixfrac=self.drizpars['pixfrac'],
                                 kernel=self.drizpars['kernel'],
-                                fillval=self.drizpars['fillval'])
+                                fillval=self.drizpars['fillval'],
+                                pixmap_error=self.drizpars.get('pixmap_error'))
 
             for n, img in enumerate(group):
                 exposure_times['start'].append(img.meta.exposure.start_time)
@@ -33,6 +33,9 @@ class ResampleStep(Step):
         good_bits = integer(min=0, default=4)
         single = boolean(default=False)
         blendheaders = boolean(default=True)
+        pixmap_error = float(default=None) # Maximum error in output pixels of interpolated pixel maps
+        maximum_cores = option('none','quarter','half','all',default='none') # Number of processes used to drizzle
+        in_memory = boolean(default=True) # Keep the output arrays in memory, else in scratch files
     """
 
     reference_file_types = ['drizpars']
@@ -162,7 +165,10 @@ class ResampleStep(Step):
         kwargs = dict(
             good_bits=self.good_bits,
             single=self.single,
-            blendheaders=self.blendheaders
+            blendheaders=self.blendheaders,
+            pixmap_error=self.pixmap_error,
+            maximum_cores=self.maximum_cores,
+            in_memory=self.in_memory
             )
 
         kwargs.update(all_drizpars)
@@ -1,4 +1,9 @@
+from collections import OrderedDict
+import os
+import weakref
+
 import numpy as np
+from scipy.interpolate import RectBivariateSpline
 
 from astropy import wcs as fitswcs
 from astropy.coordinates import SkyCoord
@@ -14,6 +19,14 @@ import logging
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
+# Environment variable setting the size, in MB, of the pixel map cache
+PIXMAP_CACHE_SIZE_ENVAR = 'JWST_PIXMAP_CACHE_SIZE'
+
+# Initial spacing, in pixels, of the grid of an interpolated pixel map
+PIXMAP_GRID_STEP = 64
+
+_pixmap_cache = None
+
 
 def make_output_wcs(input_models):
     """ Generate output WCS here based on footprints of all input WCS objects
@@ -95,8 +108,30 @@ def shape_from_bounding_box(bounding_box):
     return tuple(reversed(size))
 
 
-def calc_gwcs_pixmap(in_wcs, out_wcs, shape=None):
+def calc_gwcs_pixmap(in_wcs, out_wcs, shape=None, max_error=None):
     """ Return a pixel grid map from input frame to output frame.
+
+    Parameters
+    ----------
+    in_wcs, out_wcs : `~gwcs.wcs.WCS`
+        The WCS of the input and output frames.
+
+    shape : tuple, optional
+        The shape of the input frame.  If not given, the bounding box of
+        ``in_wcs`` is used.
+
+    max_error : float, optional
+        If given, the transform is evaluated on a coarse grid of pixels and
+        interpolated with bicubic splines to the other pixels.  The grid is
+        refined until the interpolation error, checked at the centers of the
+        grid cells, is at most ``max_error`` output pixels.  If None, the
+        transform is evaluated at every pixel.
+
+    Notes
+    -----
+    Pixel maps are kept in the cache returned by `get_pixmap_cache`, if it
+    is enabled, so that e.g. drizzling and later blotting an image onto the
+    same output frame computes the pixel map only once.
     """
     if shape:
         bb = bounding_box_from_shape(shape)
@@ -106,10 +141,226 @@ def calc_gwcs_pixmap(in_wcs, out_wcs, shape=None):
         log.debug("Bounding box from WCS: {}".format(in_wcs.bounding_box))
 
     grid = wcstools.grid_from_bounding_box(bb, step=(1, 1))
-    pixmap = np.dstack(reproject(in_wcs, out_wcs)(grid[0], grid[1]))
+    transform = reproject(in_wcs, out_wcs)
+
+    cache = get_pixmap_cache()
+    if cache.max_bytes > 0:
+        # The mapped corners of the frame identify the transforms
+        rows, cols = [0, 0, -1, -1], [0, -1, 0, -1]
+        corners = np.dstack(transform(grid[0][rows, cols],
+                                      grid[1][rows, cols]))
+        key = (bb, max_error)
+        pixmap = cache.get(in_wcs, out_wcs, key, corners)
+        if pixmap is not None:
+            return pixmap
+
+    if max_error is None:
+        pixmap = np.dstack(transform(grid[0], grid[1]))
+    else:
+        pixmap = interpolated_pixmap(transform, grid[0][0], grid[1][:, 0],
+                                     max_error)
+
+    if cache.max_bytes > 0:
+        cache.put(in_wcs, out_wcs, key, corners, pixmap)
     return pixmap
 
 
+def calc_output_bounding_box(in_wcs, out_wcs, shape):
+    """ Return the extent of an input frame in the pixels of an output frame.
+
+    Only the pixels on the edges of the input frame are mapped; unless the
+    transform folds the frame, the other pixels map inside their outline.
+
+    Parameters
+    ----------
+    in_wcs, out_wcs : `~gwcs.wcs.WCS`
+        The WCS of the input and output frames.
+
+    shape : tuple
+        The shape of the input frame.
+
+    Returns
+    -------
+    bounding_box : tuple or None
+        The ((xmin, xmax), (ymin, ymax)) output pixel coordinates of the
+        centers of the input pixels, or None if none of the edge pixels
+        could be mapped.
+    """
+    ny, nx = shape
+    x = np.concatenate([np.arange(nx), np.full(ny, nx - 1),
+                        np.arange(nx), np.zeros(ny)]).astype(np.float64)
+    y = np.concatenate([np.zeros(nx), np.arange(ny),
+                        np.full(nx, ny - 1), np.arange(ny)]).astype(np.float64)
+    xout, yout = reproject(in_wcs, out_wcs)(x, y)
+
+    valid = np.isfinite(xout) & np.isfinite(yout)
+    if not valid.any():
+        return None
+    xout, yout = xout[valid], yout[valid]
+    return ((xout.min(), xout.max()), (yout.min(), yout.max()))
+
+
+def interpolated_pixmap(transform, x, y, max_error, step=PIXMAP_GRID_STEP):
+    """ Interpolate a pixel map from a coarse grid of pixels.
+
+    Parameters
+    ----------
+    transform : func
+        Function taking x, y input pixel coordinates and returning the
+        x, y output pixel coordinates, e.g. the result of `reproject`.
+
+    x, y : 1D arrays
+        The coordinates of the columns and rows of the input frame.
+
+    max_error : float
+        The maximum interpolation error, in output pixels.
+
+    step : int
+        The initial spacing of the grid.  It is halved until the error at
+        the centers of the grid cells is below ``max_error``.
+
+    Returns
+    -------
+    pixmap : 3D array
+        The output x, y coordinates of all the input pixels, stacked along
+        the last axis.  If the transform is not finite over the whole grid,
+        or if the error cannot be met, the transform is evaluated at every
+        pixel.
+    """
+    while step > 1:
+        xnodes = _grid_nodes(x, step)
+        ynodes = _grid_nodes(y, step)
+        # bicubic splines need 4 nodes on each axis
+        if len(xnodes) < 4 or len(ynodes) < 4:
+            break
+
+        coarse = transform(*np.meshgrid(xnodes, ynodes))
+        if not all(np.isfinite(c).all() for c in coarse):
+            log.debug("Transform is not finite over the pixel map grid")
+            break
+        splines = [RectBivariateSpline(ynodes, xnodes, c) for c in coarse]
+
+        xcheck, ycheck = np.meshgrid(0.5 * (xnodes[1:] + xnodes[:-1]),
+                                     0.5 * (ynodes[1:] + ynodes[:-1]))
+        exact = transform(xcheck, ycheck)
+        error = max(np.abs(spline.ev(ycheck, xcheck) - c).max()
+                    for spline, c in zip(splines, exact))
+        if error <= max_error:
+            log.debug("Pixel map interpolated from a grid of step {} with "
+                      "maximum error {:.3g}".format(step, error))
+            return np.dstack([spline(y, x) for spline in splines])
+        step //= 2
+
+    log.debug("Evaluating the transform at every pixel")
+    return np.dstack(transform(*np.meshgrid(x, y)))
+
+
+def _grid_nodes(coords, step):
+    """ Every ``step`` coordinate, including the last one."""
+    nodes = coords[::step]
+    if nodes[-1] != coords[-1]:
+        nodes = np.append(nodes, coords[-1])
+    return nodes
+
+
+class PixmapCache:
+    """ Least-recently-used cache of pixel maps.
+
+    Pixel maps are keyed by the input and output WCS objects and by the
+    bounding box and maximum error used to compute them.  The WCS objects
+    are held by weak references, and a cached pixel map is only returned if
+    the transform still maps the corners of the frame to the same output
+    pixels, so that WCS objects modified in place are not matched.  Cached
+    pixel maps are read-only.
+    """
+
+    def __init__(self, max_bytes=0):
+        """
+        Parameters
+        ----------
+        max_bytes : int
+            The total size of the pixel maps that may be held in the cache.
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._pixmaps = OrderedDict()
+
+    def __len__(self):
+        return len(self._pixmaps)
+
+    def get(self, in_wcs, out_wcs, key, corners):
+        """ Return a cached pixel map, or None if there is none.
+
+        Parameters
+        ----------
+        in_wcs, out_wcs : `~gwcs.wcs.WCS`
+            The WCS of the input and output frames.
+
+        key : tuple
+            Other parameters the pixel map depends on.
+
+        corners : array
+            The output coordinates of the corners of the input frame.
+        """
+        key = (id(in_wcs), id(out_wcs)) + key
+        entry = self._pixmaps.get(key)
+        if (entry is None or entry[0]() is not in_wcs or
+                entry[1]() is not out_wcs or
+                not np.array_equal(entry[2], corners)):
+            self.misses += 1
+            return None
+
+        self._pixmaps.move_to_end(key)
+        self.hits += 1
+        return entry[3]
+
+    def put(self, in_wcs, out_wcs, key, corners, pixmap):
+        """ Add a pixel map to the cache, if it fits in the cache.
+
+        The parameters are those of `get`, and the pixel map.
+        """
+        if pixmap.nbytes > self.max_bytes:
+            return
+        try:
+            refs = (weakref.ref(in_wcs), weakref.ref(out_wcs))
+        except TypeError:
+            return
+
+        key = (id(in_wcs), id(out_wcs)) + key
+        if key in self._pixmaps:
+            self._remove(key)
+        while self._pixmaps and self.nbytes + pixmap.nbytes > self.max_bytes:
+            self._remove(next(iter(self._pixmaps)))
+
+        pixmap.flags.writeable = False
+        self._pixmaps[key] = refs + (corners, pixmap)
+        self.nbytes += pixmap.nbytes
+
+    def _remove(self, key):
+        self.nbytes -= self._pixmaps.pop(key)[3].nbytes
+
+    def clear(self):
+        """ Remove all the pixel maps from the cache."""
+        self._pixmaps.clear()
+        self.nbytes = 0
+
+
+def get_pixmap_cache():
+    """ Return the process-wide pixel map cache.
+
+    The cache is created on first use, with a size taken from the
+    ``JWST_PIXMAP_CACHE_SIZE`` environment variable (in megabytes).  The
+    default of 0 disables the cache.
+    """
+    global _pixmap_cache
+    if _pixmap_cache is None:
+        size = float(os.environ.get(PIXMAP_CACHE_SIZE_ENVAR, 0))
+        _pixmap_cache = PixmapCache(int(size * 1024 * 1024))
+    return _pixmap_cache
+
+
 def reproject(wcs1, wcs2):
     """
     Given two WCSs or transforms return a function which takes pixel
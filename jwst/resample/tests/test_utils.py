@@ -1,6 +1,7 @@
 import numpy as np
 import pytest
 
+from jwst.resample import resample_utils
 from jwst.resample.resample_spec import find_dispersion_axis
 
 
@@ -32,3 +33,194 @@ def test_find_dispersion_axis():
     wavelengths_zeros = np.zeros((15, 100))
     with pytest.raises(RuntimeError):
         find_dispersion_axis(wavelengths_zeros)
+
+
+def make_wcs(shift, distortion=0.):
+    """An imaging WCS with an optional quadratic distortion"""
+    from astropy import coordinates as coord
+    from astropy import units as u
+    from astropy.modeling import models
+    from gwcs import wcs, coordinate_frames as cf
+
+    scale = 0.1 / 3600
+    transform = (models.Shift(-shift) & models.Shift(-shift))
+    if distortion:
+        xdist = models.Polynomial2D(2, c1_0=1., c2_0=distortion)
+        ydist = models.Polynomial2D(2, c0_1=1., c0_2=distortion)
+        transform |= models.Mapping((0, 1, 0, 1)) | xdist & ydist
+    transform |= (models.Scale(scale) & models.Scale(scale)) | \
+        models.Pix2Sky_TAN() | models.RotateNative2Celestial(10., 20., 180.)
+    detector = cf.Frame2D(name='detector', axes_order=(0, 1))
+    sky = cf.CelestialFrame(reference_frame=coord.ICRS(), name='world',
+                            unit=(u.deg, u.deg))
+    return wcs.WCS(transform, input_frame=detector, output_frame=sky)
+
+
+@pytest.mark.parametrize('max_error', [0.1, 1e-4])
+def test_interpolated_pixmap(max_error):
+    """Interpolated pixel maps are within the maximum error"""
+    in_wcs = make_wcs(150., distortion=1e-4)
+    out_wcs = make_wcs(160.)
+
+    exact = resample_utils.calc_gwcs_pixmap(in_wcs, out_wcs, (300, 250))
+    pixmap = resample_utils.calc_gwcs_pixmap(in_wcs, out_wcs, (300, 250),
+                                             max_error=max_error)
+    assert pixmap.shape == exact.shape == (300, 250, 2)
+    assert np.abs(pixmap - exact).max() <= 2 * max_error
+
+
+def test_interpolated_pixmap_not_finite():
+    """The transform is evaluated at every pixel when it is not finite"""
+    def transform(x, y):
+        x = np.where(x > 40, np.nan, x)
+        return x + 0.5, y ** 2
+
+    x, y = np.arange(100.), np.arange(80.)
+    pixmap = resample_utils.interpolated_pixmap(transform, x, y, 0.1, step=8)
+    expected = np.dstack(transform(*np.meshgrid(x, y)))
+    np.testing.assert_array_equal(pixmap, expected)
+
+
+def test_pixmap_cache(monkeypatch):
+    """Pixel maps of the same WCS pair are computed once"""
+    cache = resample_utils.PixmapCache(10 * 1024 * 1024)
+    monkeypatch.setattr(resample_utils, '_pixmap_cache', cache)
+    in_wcs = make_wcs(50.)
+    out_wcs = make_wcs(60.)
+
+    first = resample_utils.calc_gwcs_pixmap(in_wcs, out_wcs, (100, 80))
+    second = resample_utils.calc_gwcs_pixmap(in_wcs, out_wcs, (100, 80))
+    assert second is first
+    assert not second.flags.writeable
+    assert cache.hits == 1
+
+    # other shapes, errors and WCS objects are not matched
+    resample_utils.calc_gwcs_pixmap(in_wcs, out_wcs, (100, 81))
+    resample_utils.calc_gwcs_pixmap(in_wcs, out_wcs, (100, 80), max_error=1.)
+    resample_utils.calc_gwcs_pixmap(make_wcs(50.), out_wcs, (100, 80))
+    assert cache.misses == 4
+    assert len(cache) == 4
+
+    # nor are WCS objects modified in place
+    in_wcs.forward_transform.offset_0 = -51.
+    third = resample_utils.calc_gwcs_pixmap(in_wcs, out_wcs, (100, 80))
+    np.testing.assert_allclose(third[..., 0], first[..., 0] - 1.)
+
+
+def test_pixmap_cache_budget():
+    """Least recently used pixel maps are dropped to stay within the budget"""
+    pixmaps = [np.zeros((10, 10, 2)) for i in range(3)]
+    wcs_objects = [make_wcs(i) for i in range(3)]
+    corners = np.zeros((1, 4, 2))
+    cache = resample_utils.PixmapCache(2 * pixmaps[0].nbytes)
+
+    for w, pixmap in zip(wcs_objects, pixmaps):
+        cache.put(w, w, (), corners, pixmap)
+    assert len(cache) == 2
+    assert cache.nbytes == 2 * pixmaps[0].nbytes
+    assert cache.get(wcs_objects[0], wcs_objects[0], (), corners) is None
+    assert cache.get(wcs_objects[2], wcs_objects[2], (), corners) is pixmaps[2]
+
+
+def shifted_pixmap(in_wcs, out_wcs, shape, max_error=None):
+    """The pixel map of a `make_wcs` WCS onto a shifted one, e.g. a tile"""
+    in_transform = in_wcs.forward_transform
+    out_transform = out_wcs.forward_transform
+    y, x = np.indices(shape, dtype=np.float64)
+    return np.dstack([
+        x + in_transform[0].offset.value - out_transform[0].offset.value,
+        y + in_transform[1].offset.value - out_transform[1].offset.value])
+
+
+def test_calc_output_bounding_box():
+    """The extent of an input frame is that of its edges"""
+    bbox = resample_utils.calc_output_bounding_box(
+        make_wcs(3., distortion=1e-3), make_wcs(0.), (20, 10))
+    pixmap = resample_utils.calc_gwcs_pixmap(
+        make_wcs(3., distortion=1e-3), make_wcs(0.), (20, 10))
+    np.testing.assert_allclose(bbox[0], (pixmap[..., 0].min(),
+                                         pixmap[..., 0].max()))
+    np.testing.assert_allclose(bbox[1], (pixmap[..., 1].min(),
+                                         pixmap[..., 1].max()))
+
+
+def test_drizzle_tiles():
+    """Images are only drizzled onto the tiles they overlap"""
+    from jwst import datamodels
+    from jwst.resample import resample
+
+    output_wcs = make_wcs(0.)
+    output_wcs.data_size = (60, 14)
+    images = []
+    for uniqid, shift in ((1, 0.), (2, -40.)):
+        img = datamodels.ImageModel((6, 5))
+        img.meta.wcs = make_wcs(shift)
+        images.append((uniqid, img, 1.))
+
+    driz = resample.ResampleData.__new__(resample.ResampleData)
+    driz.output_wcs = output_wcs
+    driz.drizpars = dict(pixfrac=1., kernel='square', fillval='INDEF',
+                         weight_type='exptime', good_bits=0)
+    tasks = driz.drizzle_tasks(0, images, ntiles=3)
+
+    assert [args[1] for func, args in tasks] == [(0, 20), (20, 40), (40, 60)]
+    assert [[image[0] for image in args[2]] for func, args in tasks] == [
+        [1], [2], [2]]
+
+
+@pytest.mark.parametrize('in_memory', [True, False])
+@pytest.mark.parametrize('fillval', ['INDEF', 'NaN', '-1'])
+def test_parallel_drizzle(monkeypatch, fillval, in_memory):
+    """Drizzling tiles with worker processes gives the serial result"""
+    from jwst import datamodels
+    from jwst.resample import resample
+
+    monkeypatch.setattr(resample_utils, 'calc_gwcs_pixmap', shifted_pixmap)
+    monkeypatch.setattr(resample, 'get_num_processes',
+                        lambda max_cores: 1 if max_cores == 'none' else 3)
+    # Tiles of 2 rows, drizzled with one row on either side
+    monkeypatch.setattr(resample, 'MAX_TILE_PIXELS', 2 * 14)
+    monkeypatch.setattr(resample, 'TILE_OVERLAP', 1)
+
+    output_wcs = make_wcs(0.)
+    output_wcs.data_size = (12, 14)
+    # The shifts are not whole pixels, since drizzle skips images whose
+    # first line falls exactly on the margin it clips the output frame with
+    images = datamodels.ModelContainer()
+    for shift in (-3.25, 0.5, 2.25, 4.5, 7.25):
+        img = datamodels.ImageModel((6, 5))
+        img.data[...] = np.random.uniform(1., 2., img.data.shape)
+        img.dq[0, 0] = 1
+        img.meta.wcs = make_wcs(shift)
+        img.meta.wcsinfo.cdelt1 = 1.
+        img.meta.observation.exposure_number = str(int(shift) + 10)
+        img.meta.exposure.exposure_time = 10.
+        img.meta.exposure.start_time = shift
+        img.meta.exposure.end_time = shift + 1.
+        images.append(img)
+
+    outputs = []
+    for maximum_cores in ('none', 'all'):
+        driz = resample.ResampleData.__new__(resample.ResampleData)
+        driz.input_models = images
+        driz.output_filename = 'test_i2d.fits'
+        driz.in_memory = in_memory
+        driz.output_wcs = output_wcs
+        driz.blank_output = datamodels.DrizProductModel(output_wcs.data_size)
+        driz.blank_output.meta.wcs = output_wcs
+        driz.blank_output.meta.wcsinfo.cdelt1 = 1.
+        driz.output_models = datamodels.ModelContainer()
+        driz.drizpars = dict(single=False, blendheaders=False, pixfrac=1.,
+                             kernel='square', fillval=fillval,
+                             weight_type='exptime', good_bits=0,
+                             maximum_cores=maximum_cores)
+        monkeypatch.setattr(driz, 'update_fits_wcs', lambda model: None)
+        driz.do_drizzle()
+        outputs.append(driz.output_models[0])
+
+    serial, parallel = outputs
+    assert isinstance(parallel.data, np.memmap) == (not in_memory)
+    assert (serial.wht == 0).any()
+    np.testing.assert_allclose(parallel.data, serial.data, rtol=1e-6)
+    np.testing.assert_array_equal(parallel.wht, serial.wht)
+    np.testing.assert_array_equal(parallel.con, serial.con)
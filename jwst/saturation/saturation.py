@@ -47,8 +47,8 @@ def do_correction(input_model, ref_model):
 
     # Extract subarray from reference file, if necessary
     if reffile_utils.ref_matches_sci(input_model, ref_model):
-        satmask = ref_model.data
-        dqmask = ref_model.dq
+        satmask = reffile_utils.writeable_array(ref_model.data)
+        dqmask = reffile_utils.writeable_array(ref_model.dq)
     else:
         log.info('Extracting reference file subarray to match science data')
         ref_sub_model = reffile_utils.get_subarray_model(input_model, ref_model)
@@ -23,7 +23,7 @@ Polygon filling algorithm.
 from collections import OrderedDict
 import numpy as np
 
-__all__ = ['Region', 'Edge', 'Polygon']
+__all__ = ['Region', 'Edge', 'Polygon', 'fill_spans']
 __taskname__ = 'region'
 __version__ = '0.9.3'
 __vdate__ = '07-April-2017'
@@ -130,8 +130,15 @@ class Polygon(Region):
         self._bbox = self._get_bounding_box()
         self._scan_line_range = \
                 list(range(self._bbox[1], self._bbox[3] + self._bbox[1] + 1))
-        #constructs a Global Edge Table (GET) in bbox coordinates
-        self._GET = self._construct_ordered_GET()
+        # the Global Edge Table (GET) in bbox coordinates is constructed
+        # on first use by update_AET():
+        self._get_table = None
+
+    @property
+    def _GET(self):
+        if self._get_table is None:
+            self._get_table = self._construct_ordered_GET()
+        return self._get_table
 
     def _get_bounding_box(self):
         x = self._vertices[:, 0].min()
@@ -192,57 +199,74 @@ class Polygon(Region):
             the region's ID
 
         Algorithm:
-        - Set the Global Edge Table (GET)
-        - Set y to be the smallest y coordinate that has an entry in GET
-        - Initialize the Active Edge Table (AET) to be empty
-        - For each scan line:
-          1. Add edges from GET to AET for which ymin==y
-          2. Remove edges from AET fro which ymax==y
-          3. Compute the intersection of the current scan line with all edges in the AET
-          4. Sort on X of intersection point
-          5. Set elements between pairs of X in the AET to the Edge's ID
+        - Compute the spans of pixels inside the polygon (see `spans`)
+        - Set elements of the spans to the polygon's ID
 
         """
-        ##TODO: 1.This algorithm does not mark pixels in the top row and left most column.
-        ## Pad the initial pixel description on top and left with 1 px to prevent this.
-        ## 2. Currently it uses intersection of the scan line with edges. If this is
-        ## too slow it should use the 1/m increment (replace 3 above) (or the increment
-        ## should be removed from the GET entry).
-
-        # see comments in the __init__ function for the reason of introducing
-        # polygon shifts (self._shiftx & self._shifty). Here we need to shift
-        # it back.
-
-        (ny, nx) = data.shape
-
-        y = np.min(list(self._GET.keys()))
-
-        AET = []
-        scline = self._scan_line_range[-1]
-
-        while y <= scline:
-
-            if y < scline:
-                AET = self.update_AET(y, AET)
+        y, xstart, xend = self.spans(data.shape)
+        return fill_spans(data, y, xstart, xend, self._rid)
 
-            scan_line = Edge('scan_line', start=[self._bbox[0], y],
-                             stop=[self._bbox[0] + self._bbox[2], y])
-            x = [np.ceil(e.compute_AET_entry(scan_line)[1]) for e in AET if e is not None]
-            xnew = np.sort(x)
-            ysh = y + self._shifty
+    def spans(self, shape):
+        """
+        Compute the spans of pixels inside the polygon.
 
-            if ysh < 0 or ysh >= ny:
-                y += 1
-                continue
+        This is a vectorized version of the Active Edge Table scan line
+        algorithm: intersections of all the edges with all the scan lines
+        that cross them are computed at once and, on each scan line, pixels
+        between pairs of (sorted) intersections are inside the polygon.
 
-            for i, j in zip(xnew[::2], xnew[1::2]):
-                xstart = max(0, int(i) + self._shiftx)
-                xend = min(int(j) + self._shiftx, nx - 1)
-                data[ysh][xstart:xend + 1] = self._rid
+        Parameters
+        ----------
+        shape : tuple of int
+            The ``(ny, nx)`` shape of the mask array. Spans are clipped to
+            the array.
 
-            y += 1
+        Returns
+        -------
+        y, xstart, xend : numpy.ndarray
+            Row, first and last (inclusive) column of each span of pixels
+            inside the polygon.
 
-        return data
+        """
+        (ny, nx) = shape
+        start = self._vertices[:-1]
+        stop = self._vertices[1:]
+
+        # An edge is active on scan lines ymin <= y < ymax. Edges that end on
+        # the top scan line are active on that line as well.
+        ymin = np.minimum(start[:, 1], stop[:, 1])
+        ymax = np.maximum(start[:, 1], stop[:, 1])
+        ytop = self._bbox[1] + self._bbox[3]
+        nlines = np.where(ymax == ytop, ymax + 1, ymax) - ymin
+        nlines[start[:, 1] == stop[:, 1]] = 0
+
+        e = np.repeat(np.arange(nlines.size), nlines)
+        first = np.repeat(np.cumsum(nlines) - nlines, nlines)
+        y = ymin[e] + np.arange(e.size) - first
+
+        # intersections of the edges with the scan lines:
+        u = stop[e] - start[e]
+        x = np.ceil((y - start[e, 1]) / u[:, 1] * u[:, 0] + start[e, 0])
+
+        # pair sorted intersections on each scan line:
+        order = np.lexsort((x, y))
+        x = x[order].astype(np.int_)
+        y = y[order]
+        newline = np.ones(y.size, dtype=np.bool_)
+        newline[1:] = y[1:] != y[:-1]
+        linestart = np.maximum.accumulate(
+            np.where(newline, np.arange(y.size), 0)
+        )
+        rank = np.arange(y.size) - linestart
+        pair = np.flatnonzero((rank % 2 == 0)[:-1] & ~newline[1:])
+
+        y = y[pair] + self._shifty
+        xstart = np.maximum(0, x[pair] + self._shiftx)
+        xend = np.minimum(x[pair + 1] + self._shiftx, nx - 1)
+
+        keep = (y >= 0) & (y < ny) & (xstart <= xend)
+
+        return y[keep], xstart[keep], xend[keep]
 
     def update_AET(self, y, AET):
         """
@@ -395,6 +419,48 @@ class Edge():
         else:
             return True
 
+def fill_spans(data, y, xstart, xend, value):
+    """
+    Set elements of spans of pixels in a 2D array to a value.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        A 2D array.
+
+    y, xstart, xend : numpy.ndarray
+        Row, first and last (inclusive) column of each span, e.g., as
+        returned by :py:meth:`Polygon.spans`. Spans must be within ``data``.
+
+    value
+        The value to set.
+
+    Returns
+    -------
+    data : numpy.ndarray
+        The input array.
+
+    """
+    if len(y) == 0:
+        return data
+
+    rows, irow = np.unique(y, return_inverse=True)
+    x0 = np.min(xstart)
+    x1 = np.max(xend) + 1
+
+    # mark the start and the end of each span and fill between them:
+    edges = np.zeros((rows.size, x1 - x0 + 1), dtype=np.int32)
+    np.add.at(edges, (irow, xstart - x0), 1)
+    np.add.at(edges, (irow, xend + 1 - x0), -1)
+    inside = np.cumsum(edges, axis=1)[:, :-1] > 0
+
+    sub = data[rows, x0:x1]
+    sub[inside] = value
+    data[rows, x0:x1] = sub
+
+    return data
+
+
 def _round_vertex(v):
     x, y = v
     return (int(round(x)), int(round(y)))
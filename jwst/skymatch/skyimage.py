@@ -283,6 +283,58 @@ class SkyImage:
         self._polygon = SphericalPolygon.from_radec(ra, dec)
         self._poly_area = np.fabs(self._polygon.area())
 
+    def overlap_spans(self, polygon):
+        """
+        Compute the area of the intersection of this image with a polygon
+        and the spans of pixels of this image that are inside the
+        intersection.
+
+        Parameters
+        ----------
+        polygon : SphericalPolygon
+            A :py:class:`~spherical_geometry.polygon.SphericalPolygon`,
+            e.g., the bounding polygon of another `SkyImage`.
+
+        Returns
+        -------
+        polyarea : float
+            Area (in srad) of the intersection polygon.
+
+        spans : tuple of numpy.ndarray
+            Row, first and last (inclusive) column of each span of pixels
+            inside the intersection (see :py:meth:`region.Polygon.spans`).
+
+        """
+        intersection = self._polygon.intersection(polygon)
+        polyarea = np.fabs(intersection.area())
+        if polyarea == 0.0:
+            spans = self._polygon_spans([])
+        else:
+            spans = self._polygon_spans(intersection.to_radec())
+
+        return polyarea, spans
+
+    def _polygon_spans(self, radec):
+        """ Rasterize spherical polygons given by their vertices onto
+        the pixels of this image.
+        """
+        spans = [np.array([], dtype=np.int32)] * 3
+
+        for ra, dec in radec:
+            if len(ra) < 4:
+                continue
+
+            x, y = self.wcs_inv(ra, dec)
+            poly_vert = list(zip(*[x, y]))
+
+            polygon = region.Polygon(True, poly_vert)
+            spans = [
+                np.concatenate([s, p.astype(np.int32)])
+                for s, p in zip(spans, polygon.spans(self.image.shape))
+            ]
+
+        return tuple(spans)
+
     @property
     def skystat(self):
         """ Stores/retrieves a callable object that takes a either a 2D image
@@ -380,23 +432,21 @@ None, optional
             fill_mask = np.zeros(self.image.shape, dtype=bool)
 
             if isinstance(overlap, SkyImage):
-                intersection = self.intersection(overlap)
-                polyarea = np.fabs(intersection.area())
-                radec = list(intersection.to_radec())
+                polyarea, spans = self.overlap_spans(overlap.polygon)
+                spans = [spans]
 
             elif isinstance(overlap, SkyGroup):
-                radec = []
+                spans = []
                 polyarea = 0.0
                 for im in overlap:
-                    intersection = self.intersection(im)
-                    polyarea1 = np.fabs(intersection.area())
+                    polyarea1, spans1 = self.overlap_spans(im.polygon)
                     if polyarea1 == 0.0:
                         continue
                     polyarea += polyarea1
-                    radec += list(intersection.to_radec())
+                    spans.append(spans1)
 
             elif isinstance(overlap, SphericalPolygon):
-                radec = []
+                spans = []
                 polyarea = 0.0
                 for p in overlap._polygons:
                     intersection = self.intersection(SphericalPolygon([p]))
@@ -404,10 +454,10 @@ None, optional
                     if polyarea1 == 0.0:
                         continue
                     polyarea += polyarea1
-                    radec += list(intersection.to_radec())
+                    spans.append(self._polygon_spans(intersection.to_radec()))
 
             else: # assume a list of (ra, dec) tuples:
-                radec = []
+                spans = []
                 polyarea = 0.0
                 for r, d in overlap:
                     poly = SphericalPolygon.from_radec(r, d)
@@ -415,21 +465,16 @@ None, optional
                     if polyarea1 == 0.0 or len(r) < 4:
                         continue
                     polyarea += polyarea1
-                    radec.append(self.intersection(poly).to_radec())
+                    spans.append(
+                        self._polygon_spans(self.intersection(poly).to_radec())
+                    )
 
             if polyarea == 0.0:
                 return (None, 0, 0.0)
 
-            for ra, dec in radec:
-                if len(ra) < 4:
-                    continue
-
-                # set pixels in 'fill_mask' that are inside a polygon to True:
-                x, y = self.wcs_inv(ra, dec)
-                poly_vert = list(zip(*[x, y]))
-
-                polygon = region.Polygon(True, poly_vert)
-                fill_mask = polygon.scan(fill_mask)
+            # set pixels in 'fill_mask' that are inside a polygon to True:
+            for y, xstart, xend in spans:
+                region.fill_spans(fill_mask, y, xstart, xend, True)
 
             if self.mask is not None:
                 fill_mask &= self.mask
@@ -10,6 +10,7 @@ import numpy as np
 
 # LOCAL
 from . skyimage import SkyImage, SkyGroup
+from ..lib.pipe_utils import run_tasks
 
 
 __all__ = ['match']
@@ -25,7 +26,8 @@ log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
 
-def match(images, skymethod='global+match', match_down=True, subtract=False):
+def match(images, skymethod='global+match', match_down=True, subtract=False,
+          num_processes=1):
     """
     A function to compute and/or "equalize" sky background in input images.
 
@@ -93,6 +95,11 @@ stsci_python_sphinxdocs_2.13/drizzlepac/astrodrizzle.html>`_ because it
     subtract : bool (Default = False)
         Subtract computed sky value from image data.
 
+    num_processes : int (Default = 1)
+        Number of worker processes used to compute sky statistics in the
+        overlaps of pairs of images when `skymethod` is either `'match'` or
+        `'global+match'`. The workers are forked and share the image data.
+
 
     Raises
     ------
@@ -309,7 +316,8 @@ stsci_python_sphinxdocs_2.13/drizzlepac/astrodrizzle.html>`_\ .
                  "overlapping regions.")
 
         # find "optimum" sky changes:
-        sky_deltas = _find_optimum_sky_deltas(images, apply_sky=not subtract)
+        sky_deltas = _find_optimum_sky_deltas(images, apply_sky=not subtract,
+                                              num_processes=num_processes)
         sky_good = np.isfinite(sky_deltas)
 
         # match sky "Up" or "Down":
@@ -464,22 +472,25 @@ def _apply_sky(images, sky_deltas, do_global, do_skysub, show_old):
     #return A, W
 
 # bug workaround version:
-def _overlap_matrix(images, apply_sky=True):
-    #TODO: to improve performance, the nested loops could be parallelized
-    # since _calc_sky() here can be called independently from previous steps.
+def _overlap_matrix(images, apply_sky=True, num_processes=1):
+    # Sky statistics in the overlaps of different pairs of images are
+    # independent: split the pairs between the worker processes.
     ns = len(images)
     A = np.zeros((ns, ns), dtype=float)
     W = np.zeros((ns, ns), dtype=float)
 
-    for i in range(ns):
-        for j in range(i + 1, ns):
-            s1, w1, area1 = images[i].calc_sky(
-                overlap=images[j], delta=apply_sky
-            )
+    pairs = [(i, j) for i in range(ns) for j in range(i + 1, ns)]
+    if num_processes > 1:
+        nchunks = min(len(pairs), 4 * num_processes)
+    else:
+        nchunks = min(len(pairs), 1)
 
-            s2, w2, area2 = images[j].calc_sky(
-                overlap=images[i], delta=apply_sky
-            )
+    tasks = [(_pair_skies, (images, pairs[k::nchunks], apply_sky))
+             for k in range(nchunks)]
+
+    for k, skies in enumerate(run_tasks(tasks, num_processes)):
+        for (i, j), (s1, w1, area1, s2, w2, area2) in \
+                zip(pairs[k::nchunks], skies):
 
             if area1 == 0.0 or area2 == 0.0 or s1 is None or s2 is None:
                 continue
@@ -492,9 +503,27 @@ def _overlap_matrix(images, apply_sky=True):
     return A, W
 
 
-def _find_optimum_sky_deltas(images, apply_sky=True):
+def _pair_skies(images, pairs, apply_sky):
+    """ Compute sky values of both images of each pair in their overlap. """
+    skies = []
+    for i, j in pairs:
+        s1, w1, area1 = images[i].calc_sky(
+            overlap=images[j], delta=apply_sky
+        )
+
+        s2, w2, area2 = images[j].calc_sky(
+            overlap=images[i], delta=apply_sky
+        )
+
+        skies.append((s1, w1, area1, s2, w2, area2))
+
+    return skies
+
+
+def _find_optimum_sky_deltas(images, apply_sky=True, num_processes=1):
     ns = len(images)
-    A, W = _overlap_matrix(images, apply_sky=apply_sky)
+    A, W = _overlap_matrix(images, apply_sky=apply_sky,
+                           num_processes=num_processes)
 
     def is_valid(i, j):
         return (W[i, j] > 0 and W[j, i] > 0)
@@ -13,6 +13,7 @@ import logging
 
 from ..stpipe import Step
 from .. import datamodels
+from ..lib.pipe_utils import get_num_processes
 
 try:
     from stsci.tools.bitmask import bitfield_to_boolean_mask
@@ -39,6 +40,7 @@ class SkyMatchStep(Step):
         skymethod = option('local', 'global', 'match', 'global+match', default='global+match') # sky computation method
         match_down = boolean(default=True) # adjust sky to lowest measured value?
         subtract = boolean(default=False) # subtract computed sky from image data?
+        maximum_cores = option('none','quarter','half','all',default='none') # Number of processes used to match sky in image overlaps
 
         # Image's bounding polygon parameters:
         stepsize = integer(default=None) # Max vertex separation
@@ -96,7 +98,8 @@ class SkyMatchStep(Step):
 
         # match/compute sky values:
         match(images, skymethod=self.skymethod, match_down=self.match_down,
-              subtract=self.subtract)
+              subtract=self.subtract,
+              num_processes=get_num_processes(self.maximum_cores))
 
         # set sky background value in each image's meta:
         for im in images:
@@ -0,0 +1,112 @@
+"""Test the polygon rasterizer"""
+import numpy as np
+import pytest
+
+from ..region import Edge, Polygon, fill_spans
+
+
+def aet_scan(polygon, data):
+    """Fill a polygon with the Active Edge Table scan line algorithm
+
+    This is the scan of `Polygon` before it was vectorized, except that spans
+    entirely left of the array are skipped instead of filling the row up to a
+    negative column.
+    """
+    (ny, nx) = data.shape
+    bbox = polygon._bbox
+    y = np.min(list(polygon._GET.keys()))
+    AET = []
+    scline = polygon._scan_line_range[-1]
+    while y <= scline:
+        if y < scline:
+            AET = polygon.update_AET(y, AET)
+        scan_line = Edge('scan_line', start=[bbox[0], y],
+                         stop=[bbox[0] + bbox[2], y])
+        x = [np.ceil(e.compute_AET_entry(scan_line)[1])
+             for e in AET if e is not None]
+        xnew = np.sort(x)
+        ysh = y + polygon._shifty
+        if 0 <= ysh < ny:
+            for i, j in zip(xnew[::2], xnew[1::2]):
+                xstart = max(0, int(i) + polygon._shiftx)
+                xend = min(int(j) + polygon._shiftx, nx - 1)
+                if xend >= xstart:
+                    data[ysh][xstart:xend + 1] = polygon._rid
+        y += 1
+    return data
+
+
+def test_rectangle():
+    """The right-most column and top row of the polygon are filled"""
+    polygon = Polygon(1, [(1, 1), (4, 1), (4, 3), (1, 3), (1, 1)])
+    mask = polygon.scan(np.zeros((6, 7), dtype=np.int32))
+
+    expected = np.zeros((6, 7), dtype=np.int32)
+    expected[1:4, 1:5] = 1
+    np.testing.assert_array_equal(mask, expected)
+
+
+def test_triangle():
+    polygon = Polygon(2, [(0, 0), (4, 0), (0, 4), (0, 0)])
+    mask = polygon.scan(np.zeros((5, 5), dtype=np.int32))
+
+    expected = np.array([[2, 2, 2, 2, 2],
+                         [2, 2, 2, 2, 0],
+                         [2, 2, 2, 0, 0],
+                         [2, 2, 0, 0, 0],
+                         [2, 0, 0, 0, 0]])
+    np.testing.assert_array_equal(mask, expected)
+
+
+@pytest.mark.parametrize('vertices', [
+    # inside the array
+    [(2.2, 1.7), (12.6, 3.1), (9.4, 11.8), (3.1, 9.2), (2.2, 1.7)],
+    # concave
+    [(1, 1), (14, 1), (14, 12), (8, 4), (1, 12), (1, 1)],
+    # partly off each side of the array
+    [(-5.3, 2.1), (8.2, -4.7), (22.6, 6.3), (9.9, 19.4), (-5.3, 2.1)],
+    # partly off the array, with rows entirely left of it
+    [(-9, -3), (4, 2), (-2, 8), (-12, 14), (-9, -3)],
+    # entirely off the array
+    [(-9, 2), (-3, 2), (-3, 6), (-9, 2)],
+    [(20, 20), (25, 22), (21, 27), (20, 20)],
+])
+def test_spans(vertices):
+    """The spans fill the same pixels as the scan line algorithm"""
+    polygon = Polygon(3, vertices)
+    mask = polygon.scan(np.zeros((15, 16), dtype=np.int32))
+    expected = aet_scan(polygon, np.zeros((15, 16), dtype=np.int32))
+    np.testing.assert_array_equal(mask, expected)
+
+    y, xstart, xend = polygon.spans((15, 16))
+    assert ((y >= 0) & (y < 15)).all()
+    assert ((xstart >= 0) & (xstart <= xend) & (xend < 16)).all()
+
+
+def test_spans_left_of_array():
+    """Rows of the polygon entirely left of the array are not filled"""
+    polygon = Polygon(1, [(-8, 0), (-2, 0), (-2, 3), (3, 3), (3, 5),
+                          (-8, 5), (-8, 0)])
+    mask = polygon.scan(np.zeros((7, 6), dtype=np.int32))
+
+    expected = np.zeros((7, 6), dtype=np.int32)
+    expected[3:6, 0:4] = 1
+    np.testing.assert_array_equal(mask, expected)
+
+
+def test_fill_spans():
+    data = np.zeros((4, 8), dtype=np.int32)
+    y = np.array([0, 2, 2, 3])
+    xstart = np.array([1, 0, 5, 7])
+    xend = np.array([3, 1, 6, 7])
+    fill_spans(data, y, xstart, xend, 5)
+
+    expected = np.array([[0, 5, 5, 5, 0, 0, 0, 0],
+                         [0, 0, 0, 0, 0, 0, 0, 0],
+                         [5, 5, 0, 0, 0, 5, 5, 0],
+                         [0, 0, 0, 0, 0, 0, 0, 5]])
+    np.testing.assert_array_equal(data, expected)
+
+    # no spans
+    empty = np.array([], dtype=int)
+    assert not fill_spans(np.zeros((2, 2)), empty, empty, empty, 1).any()
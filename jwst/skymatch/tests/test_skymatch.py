@@ -0,0 +1,35 @@
+"""Test the sky matching of image pairs in worker processes"""
+import numpy as np
+import pytest
+
+from .. import skymatch
+
+
+class FakeImage:
+    """An image whose sky in an overlap depends on both images"""
+
+    def __init__(self, id):
+        self.id = id
+
+    def calc_sky(self, overlap=None, delta=True):
+        if (self.id + overlap.id) % 5 == 0:
+            # no overlap
+            return (None, 0., 0.)
+        sky = 10. * self.id + overlap.id + (0.5 if delta else 0.)
+        return (sky, 1. + self.id * overlap.id, 2. * sky)
+
+
+@pytest.mark.parametrize('num_processes', [2, 3])
+@pytest.mark.parametrize('apply_sky', [True, False])
+def test_overlap_matrix(num_processes, apply_sky):
+    """The matrices computed by worker processes are the serial ones"""
+    images = [FakeImage(id) for id in range(7)]
+
+    A, W = skymatch._overlap_matrix(images, apply_sky=apply_sky)
+    A_par, W_par = skymatch._overlap_matrix(images, apply_sky=apply_sky,
+                                            num_processes=num_processes)
+
+    assert A[1, 2] == 21. + (0.5 if apply_sky else 0.)
+    assert A[2, 3] == W[2, 3] == 0.
+    np.testing.assert_array_equal(A_par, A)
+    np.testing.assert_array_equal(W_par, W)
@@ -32,7 +32,10 @@ JWST CAL code and STPIPE, tailoring it to work with DATAMODELS as inputs
 and provide results in the forms required by STPIPE.
 """
 
+import json
+import os
 import re
+import sqlite3
 
 # ----------------------------------------------------------------------
 
@@ -67,8 +70,20 @@ def get_multiple_reference_paths(dataset_model, reference_file_types):
 
     Returns best references dict { filetype : filepath or "N/A", ... }
     """
-    data_dict = _get_data_dict(dataset_model)
-    refpaths = _get_refpaths(data_dict, tuple(reference_file_types))
+    reference_file_types = tuple(reference_file_types)
+    if not reference_file_types:   # [] interpreted as *all types*.
+        return {}
+    cache = get_bestrefs_cache()
+    key = _get_bestrefs_key(dataset_model)
+    refpaths = cache.get(key, reference_file_types) if key else {}
+    missing = tuple(filetype for filetype in reference_file_types
+                    if filetype not in refpaths)
+    if missing:
+        data_dict = _get_data_dict(dataset_model)
+        found = _get_refpaths(data_dict, missing)
+        if key:
+            cache.put(key, found)
+        refpaths.update(found)
     return refpaths
 
 # ......................
@@ -109,6 +124,102 @@ def _get_refpaths(data_dict, reference_file_types):
                 for (filetype, filepath) in bestrefs.items()}
     return refpaths
 
+# ......................
+
+def _get_bestrefs_key(dataset_model):
+    """Return the (context, matching parameters) key of `dataset_model` for the
+    bestrefs cache,  or None if the CRDS rules for the dataset are not
+    available locally yet.
+
+    The matching parameters are the parkeys of all the rmaps of the dataset's
+    instrument,  read directly from the model without flattening its header.
+    """
+    try:
+        context = get_context_used()
+        imap = crds.get_cached_mapping(context).get_imap(
+            dataset_model.meta.instrument.name)
+        parkeys = sorted(set(imap.get_required_parkeys()) | {"META.INSTRUMENT.NAME"})
+    except Exception:
+        return None
+    values = []
+    for parkey in parkeys:
+        try:
+            value = dataset_model[parkey.lower()]
+        except KeyError:
+            value = None
+        values.append((parkey, value))
+    return context, json.dumps(values, default=str)
+
+
+class BestrefsCache:
+    """Memoized best references,  keyed on the CRDS context,  the matching
+    parameters of the dataset and the reference type.
+
+    If `path` is given,  the cache is also kept in that sqlite file,  so
+    that it is shared between runs and processes.  Cached reference paths
+    which are no longer in the CRDS file cache are ignored.
+    """
+    def __init__(self, path=None):
+        self._refpaths = {}
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=60)
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS bestrefs "
+                    "(context TEXT, parkeys TEXT, filetype TEXT, refpath TEXT, "
+                    "PRIMARY KEY (context, parkeys, filetype))")
+
+    def get(self, key, reference_file_types):
+        """Return the cached best references { filetype : filepath or "N/A", ... }
+        of `key` for as many of `reference_file_types` as are known.
+        """
+        refpaths = {}
+        for filetype in reference_file_types:
+            refpath = self._refpaths.get(key + (filetype,))
+            if refpath is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT refpath FROM bestrefs "
+                    "WHERE context=? AND parkeys=? AND filetype=?",
+                    key + (filetype,)).fetchone()
+                if row is not None:
+                    refpath = row[0]
+            if refpath is not None and (refpath == "N/A" or os.path.exists(refpath)):
+                self._refpaths[key + (filetype,)] = refpath
+                refpaths[filetype] = refpath
+        return refpaths
+
+    def put(self, key, refpaths):
+        """Cache best references { filetype : filepath or "N/A", ... } of `key`."""
+        for filetype, refpath in refpaths.items():
+            self._refpaths[key + (filetype,)] = refpath
+        if self._db is not None:
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO bestrefs VALUES (?, ?, ?, ?)",
+                    [key + (filetype, refpath)
+                     for filetype, refpath in refpaths.items()])
+
+    def clear(self):
+        """Forget all cached best references."""
+        self._refpaths.clear()
+        if self._db is not None:
+            with self._db:
+                self._db.execute("DELETE FROM bestrefs")
+
+
+_BESTREFS_CACHE = None
+
+def get_bestrefs_cache():
+    """Return the process-wide BestrefsCache.   If the JWST_BESTREFS_CACHE
+    environment variable is set,  it names the sqlite file the cache is
+    persisted to.
+    """
+    global _BESTREFS_CACHE
+    if _BESTREFS_CACHE is None:
+        _BESTREFS_CACHE = BestrefsCache(os.environ.get("JWST_BESTREFS_CACHE"))
+    return _BESTREFS_CACHE
+
 # ----------------------------------------------------------------------
 
 def check_reference_open(refpath):
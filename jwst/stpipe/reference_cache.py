@@ -0,0 +1,176 @@
+"""In-process cache of opened reference file models.
+
+Batch runs over many exposures typically use the same reference files
+(flats, darks, linearity, ...) over and over.  This module keeps the
+opened reference models in a least-recently-used cache so that a reference
+file is read and parsed only once per process.
+
+The cache is shared by all the steps in the process and is bounded by a
+byte budget, set in megabytes with the ``JWST_REFERENCE_CACHE_SIZE``
+environment variable.  The default of 0 disables the cache.
+
+The arrays of cached models are made read-only and are shared by every
+step that opens the same reference file.  Each call returns a separate
+model, so steps may set attributes on it, and closing it does not affect
+the cache.
+"""
+from collections import OrderedDict
+import logging
+import os
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+CACHE_SIZE_ENVAR = 'JWST_REFERENCE_CACHE_SIZE'
+
+_cache = None
+
+
+class ReferenceModelCache:
+    """Least-recently-used cache of opened reference models.
+
+    Models are keyed by the absolute path and modification time of the
+    reference file, and by the model class used to open it.  The size of
+    each entry is taken to be the size of the file.
+    """
+
+    def __init__(self, max_bytes=0):
+        """
+        Parameters
+        ----------
+        max_bytes : int
+            The total size of the files that may be held in the cache.
+            Files larger than this are opened without being cached.
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._models = OrderedDict()
+
+    def __len__(self):
+        return len(self._models)
+
+    def open(self, model_class, filename):
+        """Open a reference file, reusing an already opened model.
+
+        Parameters
+        ----------
+        model_class : class
+            The `~jwst.datamodels.DataModel` subclass of the reference file.
+
+        filename : str
+            The path of the reference file.
+
+        Returns
+        -------
+        model : `~jwst.datamodels.DataModel`
+            A model sharing the read-only arrays of the cached model.
+        """
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        if stat.st_size > self.max_bytes:
+            return model_class(filename)
+
+        key = (path, stat.st_mtime, model_class)
+        if key in self._models:
+            self._models.move_to_end(key)
+            self.hits += 1
+            model = self._models[key][0]
+        else:
+            self.misses += 1
+            model = model_class(filename)
+            _set_readonly(model._instance)
+            self._add(key, model, stat.st_size)
+
+        return _share(model)
+
+    def _add(self, key, model, nbytes):
+        # Drop models of older versions of the same file
+        path, mtime, model_class = key
+        for old_key in list(self._models):
+            if old_key[0] == path and old_key[2] is model_class:
+                self._remove(old_key)
+
+        while self._models and self.nbytes + nbytes > self.max_bytes:
+            self._remove(next(iter(self._models)))
+
+        self._models[key] = (model, nbytes)
+        self.nbytes += nbytes
+
+    def _remove(self, key):
+        model, nbytes = self._models.pop(key)
+        self.nbytes -= nbytes
+        log.debug('Dropping reference model %s from the cache', key[0])
+
+    def clear(self):
+        """Remove all the models from the cache."""
+        self._models.clear()
+        self.nbytes = 0
+
+
+def get_cache():
+    """Return the process-wide reference model cache.
+
+    The cache is created on first use, with a size taken from the
+    ``JWST_REFERENCE_CACHE_SIZE`` environment variable (in megabytes).
+    """
+    global _cache
+    if _cache is None:
+        size = float(os.environ.get(CACHE_SIZE_ENVAR, 0))
+        _cache = ReferenceModelCache(int(size * 1024 * 1024))
+    return _cache
+
+
+def open_reference_model(model_class, filename):
+    """Open a reference file through the process-wide cache.
+
+    Parameters
+    ----------
+    model_class : class
+        The `~jwst.datamodels.DataModel` subclass of the reference file.
+
+    filename : str
+        The path of the reference file.
+
+    Returns
+    -------
+    model : `~jwst.datamodels.DataModel`
+        The opened reference model.  If caching is enabled its arrays are
+        read-only.
+    """
+    cache = get_cache()
+    if cache.max_bytes <= 0:
+        return model_class(filename)
+    return cache.open(model_class, filename)
+
+
+def _set_readonly(tree):
+    """Make all the arrays in a model tree read-only."""
+    if isinstance(tree, dict):
+        for val in tree.values():
+            _set_readonly(val)
+    elif isinstance(tree, list):
+        for val in tree:
+            _set_readonly(val)
+    elif isinstance(tree, np.ndarray):
+        tree.flags.writeable = False
+
+
+def _copy_tree(tree):
+    """Copy the dicts and lists of a model tree, sharing the leaves."""
+    if isinstance(tree, dict):
+        return tree.__class__(
+            (key, _copy_tree(val)) for key, val in tree.items())
+    elif isinstance(tree, list):
+        return [_copy_tree(val) for val in tree]
+    return tree
+
+
+def _share(model):
+    """Make a model that shares the arrays, but not the tree, of `model`."""
+    shared = model.__class__(model)
+    shared._instance = _copy_tree(model._instance)
+    return shared
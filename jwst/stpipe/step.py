@@ -25,6 +25,7 @@ except ImportError:
 from . import config_parser
 from . import crds_client
 from . import log
+from . import reference_cache
 from . import utilities
 from .. import __version_commit__, __version__
 from ..associations.load_as_asn import (LoadAsAssociation, LoadAsLevel2Asn)
@@ -657,6 +658,34 @@ class Step():
                 (reference_file_type, hdr_name))
         return crds_client.check_reference_open(reference_name)
 
+    def open_reference_model(self, model_class, reference_file):
+        """
+        Open a reference file as a data model.
+
+        The model is opened through the process-wide reference model
+        cache, so that a reference file shared by many exposures is read
+        only once.  When the cache is enabled (see
+        `jwst.stpipe.reference_cache`) the arrays of the returned model are
+        read-only.
+
+        Parameters
+        ----------
+        model_class : class
+            The `~jwst.datamodels.DataModel` subclass to open the
+            reference file with, e.g. `~jwst.datamodels.DarkModel`.
+
+        reference_file : str
+            Path of the reference file, as returned by
+            `get_reference_file`.
+
+        Returns
+        -------
+        reference_model : `~jwst.datamodels.DataModel`
+            The opened reference file.
+        """
+        return reference_cache.open_reference_model(model_class,
+                                                    reference_file)
+
     def reference_uri_to_cache_path(self, reference_uri):
         """Convert an abstract CRDS reference URI to an absolute file path in the CRDS
         cache.  Reference URI's are typically output to dataset headers to record the
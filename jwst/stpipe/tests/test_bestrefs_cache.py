@@ -0,0 +1,125 @@
+"""Test memoization of CRDS best references"""
+import pytest
+
+from .. import crds_client
+from ... import datamodels
+
+KEY = ('jwst_0500.pmap', '[["META.INSTRUMENT.NAME", "NIRCAM"]]')
+
+
+@pytest.fixture
+def reffiles(tmpdir):
+    """Two reference files in a fake CRDS cache"""
+    paths = {}
+    for filetype in ('flat', 'dark'):
+        path = tmpdir.join('jwst_nircam_{}_0001.fits'.format(filetype))
+        path.write('')
+        paths[filetype] = str(path)
+    return paths
+
+
+def test_cache_get_put(reffiles):
+    """Cached references are returned per reference type"""
+    cache = crds_client.BestrefsCache()
+    assert cache.get(KEY, ('flat',)) == {}
+
+    cache.put(KEY, {'flat': reffiles['flat'], 'area': 'N/A'})
+    assert cache.get(KEY, ('flat', 'area', 'dark')) == {
+        'flat': reffiles['flat'], 'area': 'N/A'}
+    assert cache.get(('jwst_0501.pmap', KEY[1]), ('flat',)) == {}
+
+
+def test_cache_missing_file(tmpdir):
+    """References no longer on disk are looked up again"""
+    cache = crds_client.BestrefsCache()
+    cache.put(KEY, {'flat': str(tmpdir.join('gone.fits'))})
+    assert cache.get(KEY, ('flat',)) == {}
+
+
+def test_cache_sqlite(tmpdir, reffiles):
+    """The cache persists in an sqlite file"""
+    path = str(tmpdir.join('bestrefs.db'))
+    crds_client.BestrefsCache(path).put(KEY, reffiles)
+
+    cache = crds_client.BestrefsCache(path)
+    assert cache.get(KEY, ('flat', 'dark')) == reffiles
+
+    cache.clear()
+    assert crds_client.BestrefsCache(path).get(KEY, ('flat',)) == {}
+
+
+def test_get_multiple_reference_paths(monkeypatch, reffiles):
+    """Only references missing from the cache are looked up in CRDS"""
+    lookups = []
+
+    def get_refpaths(data_dict, reference_file_types):
+        lookups.append(reference_file_types)
+        return {filetype: reffiles[filetype]
+                for filetype in reference_file_types}
+
+    monkeypatch.setattr(crds_client, '_BESTREFS_CACHE',
+                        crds_client.BestrefsCache())
+    monkeypatch.setattr(crds_client, '_get_bestrefs_key', lambda model: KEY)
+    monkeypatch.setattr(crds_client, '_get_refpaths', get_refpaths)
+
+    model = datamodels.ImageModel()
+    refpaths = crds_client.get_multiple_reference_paths(model, ['flat'])
+    assert refpaths == {'flat': reffiles['flat']}
+
+    refpaths = crds_client.get_multiple_reference_paths(model, ['flat', 'dark'])
+    assert refpaths == reffiles
+    assert lookups == [('flat',), ('dark',)]
+
+    assert crds_client.get_multiple_reference_paths(model, []) == {}
+
+
+def test_get_multiple_reference_paths_no_rules(monkeypatch, reffiles):
+    """Without local CRDS rules, every lookup goes to CRDS"""
+    lookups = []
+
+    def get_refpaths(data_dict, reference_file_types):
+        lookups.append(reference_file_types)
+        return {'flat': reffiles['flat']}
+
+    monkeypatch.setattr(crds_client, '_BESTREFS_CACHE',
+                        crds_client.BestrefsCache())
+    monkeypatch.setattr(crds_client, '_get_bestrefs_key', lambda model: None)
+    monkeypatch.setattr(crds_client, '_get_refpaths', get_refpaths)
+
+    model = datamodels.ImageModel()
+    for i in range(2):
+        crds_client.get_multiple_reference_paths(model, ['flat'])
+    assert lookups == [('flat',), ('flat',)]
+
+
+def test_bestrefs_key(monkeypatch):
+    """The key holds the context and the instrument's matching parameters"""
+    class Mapping:
+        def get_imap(self, instrument):
+            assert instrument == 'NIRCAM'
+            return self
+
+        def get_required_parkeys(self):
+            return ['META.INSTRUMENT.FILTER', 'META.EXPOSURE.TYPE']
+
+    monkeypatch.setattr(crds_client, 'get_context_used',
+                        lambda: 'jwst_0500.pmap')
+    monkeypatch.setattr(crds_client.crds, 'get_cached_mapping',
+                        lambda context: Mapping())
+
+    model = datamodels.ImageModel()
+    model.meta.instrument.name = 'NIRCAM'
+    model.meta.instrument.filter = 'F200W'
+    model.meta.observation.date = '2018-10-18'
+    key = crds_client._get_bestrefs_key(model)
+    assert key == (
+        'jwst_0500.pmap',
+        '[["META.EXPOSURE.TYPE", null], '
+        '["META.INSTRUMENT.FILTER", "F200W"], '
+        '["META.INSTRUMENT.NAME", "NIRCAM"]]'
+    )
+
+    model.meta.observation.date = '2018-10-19'
+    assert crds_client._get_bestrefs_key(model) == key
+    model.meta.instrument.filter = 'F150W'
+    assert crds_client._get_bestrefs_key(model) != key
@@ -0,0 +1,139 @@
+"""Test the reference model cache"""
+import os
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from .. import reference_cache
+from ... import datamodels
+from ...lib import reffile_utils
+
+
+def make_flat(path, value=1.0):
+    """Write a small flat reference file"""
+    hdulist = fits.HDUList([
+        fits.PrimaryHDU(),
+        fits.ImageHDU(np.full((10, 10), value, dtype=np.float32),
+                      name='SCI'),
+        fits.ImageHDU(np.zeros((10, 10), dtype=np.uint32), name='DQ'),
+    ])
+    hdulist.writeto(path, overwrite=True)
+    return path
+
+
+@pytest.fixture
+def flat_file(tmpdir):
+    return make_flat(str(tmpdir.join('flat.fits')))
+
+
+def test_cache_hit(flat_file):
+    """A second open reuses the read-only arrays of the first"""
+    cache = reference_cache.ReferenceModelCache(10 * 1024 * 1024)
+    first = cache.open(datamodels.FlatModel, flat_file)
+    second = cache.open(datamodels.FlatModel, flat_file)
+
+    assert cache.misses == 1
+    assert cache.hits == 1
+    assert len(cache) == 1
+    assert second.data is first.data
+    assert not second.data.flags.writeable
+    with pytest.raises(ValueError):
+        second.data[0, 0] = 2.0
+
+
+def test_cache_isolation(flat_file):
+    """Setting attributes on, or closing, an opened model is harmless"""
+    cache = reference_cache.ReferenceModelCache(10 * 1024 * 1024)
+    first = cache.open(datamodels.FlatModel, flat_file)
+    first.data = np.zeros((10, 10), dtype=np.float32)
+    first.meta.instrument.name = 'MIRI'
+    first.close()
+
+    second = cache.open(datamodels.FlatModel, flat_file)
+    assert np.all(second.data == 1.0)
+    assert second.meta.instrument.name is None
+
+
+def test_cache_modified_file(flat_file):
+    """A rewritten reference file is read again"""
+    cache = reference_cache.ReferenceModelCache(10 * 1024 * 1024)
+    first = cache.open(datamodels.FlatModel, flat_file)
+
+    make_flat(flat_file, value=2.0)
+    stat = os.stat(flat_file)
+    os.utime(flat_file, (stat.st_atime, stat.st_mtime + 10))
+
+    second = cache.open(datamodels.FlatModel, flat_file)
+    assert cache.misses == 2
+    assert len(cache) == 1
+    assert np.all(first.data == 1.0)
+    assert np.all(second.data == 2.0)
+
+
+def test_cache_budget(tmpdir):
+    """Least recently used models are dropped to stay within the budget"""
+    paths = [make_flat(str(tmpdir.join('flat{}.fits'.format(i))))
+             for i in range(3)]
+    size = os.path.getsize(paths[0])
+    cache = reference_cache.ReferenceModelCache(2 * size)
+
+    cache.open(datamodels.FlatModel, paths[0])
+    cache.open(datamodels.FlatModel, paths[1])
+    cache.open(datamodels.FlatModel, paths[0])
+    cache.open(datamodels.FlatModel, paths[2])
+
+    assert len(cache) == 2
+    assert cache.nbytes == 2 * size
+
+    cache.open(datamodels.FlatModel, paths[0])
+    assert cache.hits == 2
+    cache.open(datamodels.FlatModel, paths[1])
+    assert cache.misses == 4
+
+
+def test_cache_too_large(flat_file):
+    """Files larger than the budget are not cached"""
+    cache = reference_cache.ReferenceModelCache(100)
+    model = cache.open(datamodels.FlatModel, flat_file)
+
+    assert len(cache) == 0
+    assert model.data.flags.writeable
+
+
+def test_cache_disabled(flat_file, monkeypatch):
+    """By default, reference files are opened directly"""
+    monkeypatch.delenv(reference_cache.CACHE_SIZE_ENVAR, raising=False)
+    monkeypatch.setattr(reference_cache, '_cache', None)
+
+    model = reference_cache.open_reference_model(datamodels.FlatModel,
+                                                 flat_file)
+    assert model.data.flags.writeable
+    assert len(reference_cache.get_cache()) == 0
+
+
+def test_cache_enabled(flat_file, monkeypatch):
+    """The cache size is set from the environment"""
+    monkeypatch.setenv(reference_cache.CACHE_SIZE_ENVAR, '1')
+    monkeypatch.setattr(reference_cache, '_cache', None)
+
+    reference_cache.open_reference_model(datamodels.FlatModel, flat_file)
+    model = reference_cache.open_reference_model(datamodels.FlatModel,
+                                                 flat_file)
+    cache = reference_cache.get_cache()
+    assert cache.max_bytes == 1024 * 1024
+    assert cache.hits == 1
+    assert not model.data.flags.writeable
+
+
+def test_writeable_array(flat_file):
+    """Only the read-only arrays of cached models are copied"""
+    cache = reference_cache.ReferenceModelCache(10 * 1024 * 1024)
+    cached = cache.open(datamodels.FlatModel, flat_file)
+    array = reffile_utils.writeable_array(cached.data)
+    assert array is not cached.data
+    assert array.flags.writeable
+    np.testing.assert_array_equal(array, cached.data)
+
+    model = datamodels.FlatModel(flat_file)
+    assert reffile_utils.writeable_array(model.data) is model.data
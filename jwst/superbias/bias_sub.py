@@ -36,8 +36,11 @@ def do_correction(input_model, bias_model):
     if not reffile_utils.ref_matches_sci(input_model, bias_model):
         bias_model = reffile_utils.get_subarray_model(input_model, bias_model)
 
-    # Replace NaN's in the superbias with zeros
-    bias_model.data[np.isnan(bias_model.data)] = 0.0
+    # Replace NaN's in the superbias with zeros, without modifying the
+    # (possibly read-only) reference arrays
+    bias_nan = np.isnan(bias_model.data)
+    if bias_nan.any():
+        bias_model.data = np.where(bias_nan, 0.0, bias_model.data)
 
     # Subtract the bias ref image from the science data
     output_model = subtract_bias(input_model, bias_model)
@@ -35,7 +35,8 @@ class SuperBiasStep(Step):
                 return result
 
             # Open the superbias ref file data model
-            bias_model = datamodels.SuperBiasModel(self.bias_name)
+            bias_model = self.open_reference_model(datamodels.SuperBiasModel,
+                                                   self.bias_name)
 
             # Do the bias subtraction
             result = bias_sub.do_correction(input_model, bias_model)
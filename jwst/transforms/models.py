@@ -1065,6 +1065,27 @@ def _toindex(value):
     return indx
 
 
+def _single_value(value, name):
+    """
+    Return the one value of an input which is the same for all points.
+
+    The spectral order and the source position in the direct image are
+    constants of a grism WCS, but they are passed as arrays when the WCS
+    is evaluated on arrays of pixels.
+
+    Examples
+    --------
+    >>> _single_value(np.array([1., 1., 1.]), "order")
+    1.0
+    >>> _single_value(2, "order")
+    2
+    """
+    values = np.unique(np.asanyarray(value))
+    if values.size != 1:
+        raise ValueError("Expected a single {} for all points".format(name))
+    return values[0]
+
+
 class NIRCAMForwardRowGrismDispersion(Model):
     """Return the transform from grism to image for the given spectral order.
 
@@ -1131,7 +1152,7 @@ class NIRCAMForwardRowGrismDispersion(Model):
             the spectral order to use
         """
         try:
-            iorder = self._order_mapping[int(order)]
+            iorder = self._order_mapping[int(_single_value(order, "order"))]
         except KeyError:
             raise ValueError("Specified order is not available")
 
@@ -1209,7 +1230,7 @@ class NIRCAMForwardColumnGrismDispersion(Model):
             the spectral order to use
         """
         try:
-            iorder = self._order_mapping[int(order)]
+            iorder = self._order_mapping[int(_single_value(order, "order"))]
         except KeyError:
             raise ValueError("Specified order is not available")
 
@@ -1482,15 +1503,18 @@ class NIRISSForwardRowGrismDispersion(Model):
 
         """
         try:
-            iorder = self._order_mapping[int(order)]
+            iorder = self._order_mapping[int(_single_value(order, "order"))]
         except KeyError:
             raise ValueError("Specified order is not available")
 
         dxr = x - x0  # delta x in rotated trace coordinates
 
+        # The trace is sampled for the one source position.
+        xc = _single_value(x0, "x0")
+        yc = _single_value(y0, "y0")
         t = np.linspace(0, 1, 10)  #sample t
-        dx = self.xmodels[iorder][0](x0, y0) + t * self.xmodels[iorder][1](x0, y0)
-        dy = self.ymodels[iorder][0](x0, y0) + t * self.ymodels[iorder][1](x0, y0)
+        dx = self.xmodels[iorder][0](xc, yc) + t * self.xmodels[iorder][1](xc, yc)
+        dy = self.ymodels[iorder][0](xc, yc) + t * self.ymodels[iorder][1](xc, yc)
         if self.theta != 0.0:
             rotate = Rotation2D(self.theta)
             dx, dy = rotate(dx, dy)
@@ -1579,14 +1603,17 @@ class NIRISSForwardColumnGrismDispersion(Model):
 
         """
         try:
-            iorder = self._order_mapping[int(order)]
+            iorder = self._order_mapping[int(_single_value(order, "order"))]
         except KeyError:
             raise ValueError("Specified order is not available")
 
         dyr = y - y0  # delta x in rotated trace coordinate
+        # The trace is sampled for the one source position.
+        xc = _single_value(x0, "x0")
+        yc = _single_value(y0, "y0")
         t = np.linspace(0, 1, 10)
-        dx = self.xmodels[iorder][0](x0, y0) + t * self.xmodels[iorder][1](x0, y0)
-        dy = self.ymodels[iorder][0](x0, y0) + t * self.ymodels[iorder][1](x0, y0)
+        dx = self.xmodels[iorder][0](xc, yc) + t * self.xmodels[iorder][1](xc, yc)
+        dy = self.ymodels[iorder][0](xc, yc) + t * self.ymodels[iorder][1](xc, yc)
         if self.theta != 0.0:
             rotate = Rotation2D(self.theta)
             dx, dy = rotate(dx, dy)
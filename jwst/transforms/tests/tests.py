@@ -2,7 +2,10 @@
 """
 Test jwst.transforms
 """
+import numpy as np
 import pytest
+from astropy.modeling.models import (Const1D, Identity, Mapping,
+                                     Polynomial1D, Polynomial2D)
 from numpy.testing.utils import assert_allclose
 from ..import models
 
@@ -62,3 +65,30 @@ def test_refraction_index(wavelength, n):
                                                        tref, pref, pressure_sys,
                                                        kcoef, lcoef, tcoef)
     assert_allclose(n_pipeline, n)
+
+
+@pytest.mark.parametrize('niriss', [False, True])
+def test_grism_dispersion_arrays(niriss):
+    """
+    Test that a grism WCS can be evaluated on arrays of pixels.
+    The spectral order and source position are constants of the WCS.
+    """
+    if niriss:
+        disp = models.NIRISSForwardRowGrismDispersion(
+            [1], lmodels=[Polynomial1D(1, c0=0.8, c1=0.5)],
+            xmodels=[(Polynomial2D(1, c0_0=-100., c1_0=0.01),
+                      Polynomial2D(1, c0_0=200., c0_1=0.02))],
+            ymodels=[(Polynomial2D(1, c0_0=1.), Polynomial2D(1, c0_0=2.))])
+    else:
+        disp = models.NIRCAMForwardRowGrismDispersion(
+            [1], lmodels=[Polynomial1D(1, c0=2.4, c1=1.5)],
+            xmodels=[Polynomial1D(1, c1=1. / 1500)],
+            ymodels=[Polynomial1D(1, c0=3., c1=0.5)])
+    tr = (Identity(2) | Mapping((0, 1, 0, 1, 0)) |
+          (Identity(2) & Const1D(900.) & Const1D(300.) & Const1D(1)) | disp)
+
+    x = np.arange(850., 1000., 10.)
+    y = np.full(x.shape, 290.)
+    wavelength = tr(x, y)[2]
+    expected = [tr(xi, yi)[2] for xi, yi in zip(x, y)]
+    assert_allclose(wavelength, expected, rtol=1.e-12)
@@ -19,7 +19,8 @@ import numpy as np
 from . wcsimage import (WCSGroupCatalog, WCSImageCatalog, RefCatalog)
 
 
-__all__ = ['align', 'overlap_matrix', 'max_overlap_pair', 'max_overlap_image']
+__all__ = ['align', 'overlap_matrix', 'max_overlap_pair', 'max_overlap_image',
+           'bounding_cap', 'RefOverlaps']
 
 __author__ = 'Mihai Cara'
 
@@ -27,11 +28,15 @@ __author__ = 'Mihai Cara'
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
+# Angular margin (in radians) added to the bounding caps of footprints
+# when testing whether two footprints may overlap:
+CAP_MARGIN = 1.0e-8
+
 
 def align(imcat, refcat=None, enforce_user_order=True,
           expand_refcat=False, minobj=None, searchrad=1.0,
           use2dhist=True, separation=0.5, tolerance=1.0,
-          xoffset=0.0, yoffset=0.0,
+          xoffset=0.0, yoffset=0.0, matcher='xyxymatch',
           fitgeom='general', nclip=3, sigma=3.0):
     """
     Align (groups of) images by adjusting the parameters of their WCS based on
@@ -112,6 +117,13 @@ def align(imcat, refcat=None, enforce_user_order=True,
         reference frame. This offset will be used for all input images
         provided. This parameter is ignored when `use2dhist` is `True`.
 
+    matcher : {'xyxymatch', 'kdtree'}, optional
+        The algorithm used to match sources. ``'xyxymatch'`` uses
+        :py:func:`~stsci.stimage.xyxymatch` and, with `use2dhist`, a
+        histogram of all offsets between input and reference sources.
+        ``'kdtree'`` uses KD-trees to find only the sources within the
+        search radius, which is much faster for catalogs with many sources.
+
     fitgeom : {'shift', 'rscale', 'general'}, optional
         The fitting geometry to be used in fitting the matched object lists.
         This parameter is used in fitting the offsets, rotations and/or scale
@@ -142,6 +154,12 @@ def align(imcat, refcat=None, enforce_user_order=True,
         raise ValueError("Unsupported 'fitgeom'. Valid values are: "
                          "'shift', 'rscale', or 'general'")
 
+    # check matcher:
+    matcher = matcher.lower()
+    if matcher not in ['xyxymatch', 'kdtree']:
+        raise ValueError("Unsupported 'matcher'. Valid values are: "
+                         "'xyxymatch' or 'kdtree'")
+
     if minobj is None:
         if fitgeom == 'general':
             minobj = 3
@@ -172,6 +190,9 @@ def align(imcat, refcat=None, enforce_user_order=True,
             raise TypeError("Each input element of 'images' must be a "
                             "'WCSGroupCatalog'")
 
+    # overlaps of the images with the (growing) reference catalog:
+    overlaps = RefOverlaps()
+
     # get the first image to be aligned and
     # create reference catalog if needed:
     if refcat is None or refcat.catalog is None:
@@ -189,7 +210,8 @@ def align(imcat, refcat=None, enforce_user_order=True,
         current_imcat = max_overlap_image(
             refimage=refcat,
             images=imcat,
-            enforce_user_order=enforce_user_order or not expand_refcat
+            enforce_user_order=enforce_user_order or not expand_refcat,
+            overlaps=overlaps
         )
 
     aligned_imcat = []
@@ -207,6 +229,7 @@ def align(imcat, refcat=None, enforce_user_order=True,
             xoffset=xoffset,
             yoffset=yoffset,
             tolerance=tolerance,
+            matcher=matcher,
             fitgeom=fitgeom,
             nclip=nclip,
             sigma=sigma
@@ -223,7 +246,8 @@ def align(imcat, refcat=None, enforce_user_order=True,
         current_imcat = max_overlap_image(
             refimage=refcat,
             images=imcat,
-            enforce_user_order=enforce_user_order or not expand_refcat
+            enforce_user_order=enforce_user_order or not expand_refcat,
+            overlaps=overlaps
         )
 
     # log running time:
@@ -244,6 +268,11 @@ def overlap_matrix(images):
     absolute value of the area of overlap on the sky between i-th input image
     and j-th input image.
 
+    Overlaps of image groups are the sums of the overlaps of their member
+    images. The exact (spherical polygon) intersection is computed only for
+    pairs of member images whose bounding caps (see `bounding_cap`)
+    intersect; the overlap of all other pairs is ``0.0``.
+
     .. note::
         The diagonal of the returned overlap matrix is set to ``0.0``, i.e.,
         this function does not compute the area of the footprint of a single
@@ -266,11 +295,33 @@ def overlap_matrix(images):
     """
     nimg = len(images)
     m = np.zeros((nimg, nimg), dtype=np.float)
-    for i in range(nimg):
-        for j in range(i + 1, nimg):
-            area = images[i].intersection_area(images[j])
-            m[j, i] = area
-            m[i, j] = area
+
+    footprints = []
+    owners = []
+    for k, image in enumerate(images):
+        for fp in _footprints(image):
+            footprints.append(fp)
+            owners.append(k)
+
+    if len(footprints) < 2:
+        return m
+
+    owners = np.array(owners)
+    centers, radii = _bounding_caps(footprints)
+    candidates = _caps_intersect(centers, radii, centers, radii)
+    candidates &= owners[:, np.newaxis] != owners[np.newaxis, :]
+
+    pairs = np.transpose(np.nonzero(np.triu(candidates, 1)))
+    log.debug("Computing {:d} of {:d} footprint intersections."
+              .format(len(pairs), len(footprints) * (len(footprints) - 1) // 2))
+
+    for a, b in pairs:
+        area = footprints[a].intersection_area(footprints[b])
+        i = owners[a]
+        j = owners[b]
+        m[i, j] += area
+        m[j, i] += area
+
     return m
 
 
@@ -324,7 +375,7 @@ def max_overlap_pair(images, enforce_user_order):
     m = overlap_matrix(images)
     n = m.shape[0]
     index = m.argmax()
-    i = index / n
+    i = index // n
     j = index % n
     si = np.sum(m[i])
     sj = np.sum(m[:, j])
@@ -355,7 +406,7 @@ def max_overlap_pair(images, enforce_user_order):
     return (im1, im2)
 
 
-def max_overlap_image(refimage, images, enforce_user_order):
+def max_overlap_image(refimage, images, enforce_user_order, overlaps=None):
     """
     Return the image from the input ``images`` list that has the largest
     overlap with the ``refimage`` image.
@@ -368,6 +419,9 @@ def max_overlap_image(refimage, images, enforce_user_order):
     Parameters
     ----------
 
+    refimage : RefCatalog, WCSImageCatalog, or WCSGroupCatalog
+        A catalog that implements :py:meth:`intersection_area` method.
+
     images : list of WCSImageCatalog, or WCSGroupCatalog
         A list of catalogs that implement :py:meth:`intersection_area` method.
 
@@ -375,6 +429,13 @@ def max_overlap_image(refimage, images, enforce_user_order):
         When ``enforce_user_order`` is `True`, returned image is the first
         image from the ``images`` input list regardless ofimage overlaps.
 
+    overlaps : RefOverlaps, None, optional
+        A `RefOverlaps` object used to compute the overlaps of the images
+        with ``refimage``. It should be reused as long as ``refimage``
+        only grows (for example, when it is a `RefCatalog` that is being
+        expanded with sources of the aligned images). When `None`,
+        overlaps are computed from scratch.
+
     Returns
     -------
     image: WCSImageCatalog, WCSGroupCatalog, or None
@@ -389,6 +450,172 @@ def max_overlap_image(refimage, images, enforce_user_order):
         # revert to old tweakreg behavior
         return images.pop(0)
 
-    area = [refimage.intersection_area(im) for im in images]
+    if overlaps is None:
+        overlaps = RefOverlaps()
+
+    area = overlaps.areas(refimage, images)
     idx = np.argmax(area)
     return images.pop(idx)
+
+
+def bounding_cap(polygon):
+    """
+    Compute a spherical cap that contains a spherical polygon.
+
+    The cap is centered on the (normalized) mean of the polygon's vertices
+    and its radius is the largest angular distance from the center to a
+    vertex. Caps of polygons that do not fit in a hemisphere are not
+    useful for pre-filtering overlaps and cover the whole sphere.
+
+    Parameters
+    ----------
+    polygon : SphericalPolygon, None
+        A spherical polygon. An empty polygon (or `None`) has an empty cap.
+
+    Returns
+    -------
+    center : numpy.ndarray
+        Unit vector ``(x, y, z)`` of the center of the cap.
+
+    radius : float
+        Angular radius of the cap in radians. It is negative for empty
+        polygons.
+
+    """
+    if polygon is None:
+        return np.zeros(3), -1.0
+
+    points = [np.atleast_2d(p) for p in polygon.points]
+    if len(points) == 0 or sum(len(p) for p in points) == 0:
+        return np.zeros(3), -1.0
+
+    xyz = np.vstack(points)
+    center = np.sum(xyz, axis=0)
+    norm = np.sqrt(np.dot(center, center))
+    if norm == 0.0:
+        return np.array([0.0, 0.0, 1.0]), np.pi
+
+    center /= norm
+    radius = np.arccos(np.clip(np.dot(xyz, center), -1.0, 1.0)).max()
+    if radius >= 0.5 * np.pi:
+        radius = np.pi
+
+    return center, radius
+
+
+class RefOverlaps():
+    """
+    Overlap areas of images with a reference catalog.
+
+    Overlaps are computed per footprint (a member image of a
+    `WCSGroupCatalog`, or the image itself): footprints whose bounding caps
+    (see `bounding_cap`) do not intersect the bounding cap of the reference
+    have no overlap with it and the exact intersection is computed only
+    for the remaining footprints.
+
+    The reference catalog used during alignment only grows: expanding a
+    `RefCatalog` with new sources can only enlarge its convex hull. The
+    overlap of a footprint that is entirely inside the reference
+    footprint therefore cannot change anymore and it is not recomputed
+    when the reference catalog is expanded.
+
+    """
+    def __init__(self, rtol=1.0e-7):
+        """
+        Parameters
+        ----------
+        rtol : float, optional
+            Relative tolerance used to decide that a footprint is entirely
+            inside the reference footprint.
+
+        """
+        self.rtol = rtol
+        self._covered = {}
+        self._areas = {}
+
+    def areas(self, refimage, images):
+        """
+        Compute overlap areas of images with a reference catalog.
+
+        Parameters
+        ----------
+        refimage : RefCatalog, WCSImageCatalog, or WCSGroupCatalog
+            A catalog that implements :py:meth:`intersection_area` method.
+            Between calls, ``refimage`` may only grow (see `RefOverlaps`).
+
+        images : list of WCSImageCatalog, or WCSGroupCatalog
+            A list of catalogs that implement :py:meth:`intersection_area`
+            method.
+
+        Returns
+        -------
+        areas : numpy.ndarray
+            Absolute value of the area of overlap on the sky of each input
+            image with ``refimage``.
+
+        """
+        footprints = []
+        owners = []
+        for k, image in enumerate(images):
+            for fp in _footprints(image):
+                footprints.append(fp)
+                owners.append(k)
+
+        areas = np.zeros(len(images), dtype=np.float)
+        if len(footprints) == 0:
+            return areas
+
+        centers, radii = _bounding_caps(footprints)
+        refcenter, refradius = bounding_cap(refimage.polygon)
+        candidates = _caps_intersect(
+            centers, radii, refcenter[np.newaxis, :], np.array([refradius])
+        )[:, 0]
+
+        ncomputed = 0
+        for fp, k, candidate in zip(footprints, owners, candidates):
+            key = id(fp)
+            if key in self._covered:
+                areas[k] += self._covered[key]
+                continue
+
+            if not candidate:
+                continue
+
+            area = refimage.intersection_area(fp)
+            ncomputed += 1
+            if key not in self._areas:
+                self._areas[key] = np.fabs(fp.polygon.area())
+            if np.isclose(area, self._areas[key], rtol=self.rtol, atol=0.0):
+                self._covered[key] = area
+
+            areas[k] += area
+
+        log.debug("Computed {:d} of {:d} footprint intersections with the "
+                  "reference catalog.".format(ncomputed, len(footprints)))
+
+        return areas
+
+
+def _footprints(image):
+    """ Return the member images of a group, or the image itself. """
+    if isinstance(image, WCSGroupCatalog):
+        return list(image)
+    return [image]
+
+
+def _bounding_caps(images):
+    """ Return centers and radii of the bounding caps of image footprints. """
+    caps = [bounding_cap(im.polygon) for im in images]
+    centers = np.array([c for c, r in caps]).reshape((len(caps), 3))
+    radii = np.array([r for c, r in caps])
+    return centers, radii
+
+
+def _caps_intersect(centers1, radii1, centers2, radii2):
+    """
+    Return a boolean matrix indicating which caps from the first set
+    intersect caps from the second set.
+
+    """
+    dist = np.arccos(np.clip(np.dot(centers1, centers2.T), -1.0, 1.0))
+    return dist <= radii1[:, np.newaxis] + radii2[np.newaxis, :] + CAP_MARGIN
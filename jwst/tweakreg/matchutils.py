@@ -1,11 +1,12 @@
 """
 A module that provides algorithms for initial estimation of shifts
-based on 2D histograms.
+based on 2D histograms and for KD-tree based matching of source lists.
 
 """
 
 import logging
 import numpy as np
+from scipy.spatial import cKDTree
 import stsci.imagestats as imagestats
 
 # LOCAL
@@ -61,18 +62,25 @@ def center_of_mass(img, labels=None, index=None):
     return [tuple(v) for v in np.array(results).T]
 
 
-def build_xy_zeropoint(imgxy, refxy, searchrad=3.0):
+def build_xy_zeropoint(imgxy, refxy, searchrad=3.0, use_kdtree=False):
     """ Create a matrix which contains the delta between each XY position and
         each UV position.
+
+        When ``use_kdtree`` is `True`, the matrix is computed with
+        `xy_offset_histogram` instead of the ``chelp`` C extension.
     """
     log.info("Computing initial guess for X and Y shifts...")
 
-    if chelp is None:
+    if use_kdtree:
+        zpmat = xy_offset_histogram(imgxy, refxy, searchrad)
+
+    elif chelp is None:
         raise ImportError('cannot import chelp')
 
-    # run C function to create ZP matrix
-    zpmat = chelp.arrxyzero(imgxy.astype(np.float32),
-                            refxy.astype(np.float32), searchrad)
+    else:
+        # run C function to create ZP matrix
+        zpmat = chelp.arrxyzero(imgxy.astype(np.float32),
+                                refxy.astype(np.float32), searchrad)
 
     xp, yp, flux, zpqual = find_xy_peak(zpmat, center=(searchrad, searchrad))
     if zpqual is None:
@@ -153,3 +161,140 @@ def find_xy_peak(img, center=None, sigma=3.0):
         flux = imgc[xp_slice].max()
 
     return xp, yp, flux, zpqual
+
+
+def xy_offset_histogram(imgxy, refxy, searchrad=3.0):
+    """
+    Compute the 2D histogram of the offsets between input and reference
+    sources (the cross-correlation of the two source lists).
+
+    This is equivalent to ``chelp.arrxyzero``, but only the pairs of
+    sources closer than ``searchrad`` in both X and Y are found (with a
+    KD-tree) and histogrammed, instead of all pairs.
+
+    Parameters
+    ----------
+    imgxy : numpy.ndarray
+        A ``Nx2`` array of input source positions.
+
+    refxy : numpy.ndarray
+        A ``Mx2`` array of reference source positions.
+
+    searchrad : float, optional
+        The search radius (half-size of the histogram) in pixels.
+
+    Returns
+    -------
+    zpmat : numpy.ndarray
+        A ``(K, K)`` array, where ``K = int(2 * searchrad) + 1``, whose
+        element ``[j, i]`` is the number of pairs of sources with offsets
+        ``(img - ref)`` in the 1-pixel bin ``(i - searchrad, j - searchrad)``.
+
+    """
+    size = int(searchrad * 2) + 1
+    zpmat = np.zeros((size, size), dtype=np.float64)
+
+    imgxy = np.asarray(imgxy, dtype=np.float32).astype(np.float64)
+    refxy = np.asarray(refxy, dtype=np.float32).astype(np.float64)
+    if len(imgxy) == 0 or len(refxy) == 0:
+        return zpmat
+
+    pairs = cKDTree(imgxy).sparse_distance_matrix(
+        cKDTree(refxy), max_distance=searchrad, p=np.inf,
+        output_type='ndarray'
+    )
+    dxy = imgxy[pairs['i']] - refxy[pairs['j']]
+    inside = np.all(np.abs(dxy) < searchrad, axis=1)
+    ind = (dxy[inside] + searchrad).astype(np.int_)
+
+    np.add.at(zpmat, (ind[:, 1], ind[:, 0]), 1)
+
+    return zpmat
+
+
+def kdtree_match(imgxy, refxy, origin=(0.0, 0.0), tolerance=1.0,
+                 separation=0.0):
+    """
+    Match input sources to reference sources within a tolerance, using a
+    KD-tree of the reference sources.
+
+    Input positions are shifted by ``-origin`` and each input source is
+    matched to the nearest reference source within ``tolerance``. When
+    several input sources have the same nearest reference source, only
+    the closest one is kept.
+
+    Parameters
+    ----------
+    imgxy : numpy.ndarray
+        A ``Nx2`` array of input source positions.
+
+    refxy : numpy.ndarray
+        A ``Mx2`` array of reference source positions.
+
+    origin : tuple of float, optional
+        The offset ``(img - ref)`` of the input sources relative to the
+        reference sources.
+
+    tolerance : float, optional
+        The matching tolerance in pixels.
+
+    separation : float, optional
+        Sources closer than ``separation`` pixels to another source of the
+        same list are removed from the lists prior to matching.
+
+    Returns
+    -------
+    matches : numpy.ndarray
+        A structured array with the same fields as the output of
+        :py:func:`~stsci.stimage.xyxymatch`: ``input_x``, ``input_y``,
+        ``input_idx``, ``ref_x``, ``ref_y``, and ``ref_idx``.
+
+    """
+    imgxy = np.asarray(imgxy, dtype=np.float64).reshape((-1, 2))
+    refxy = np.asarray(refxy, dtype=np.float64).reshape((-1, 2))
+
+    input_idx = _isolated_sources(imgxy, separation)
+    ref_idx = _isolated_sources(refxy, separation)
+
+    dtype = [('input_x', np.float64), ('input_y', np.float64),
+             ('input_idx', np.int_), ('ref_x', np.float64),
+             ('ref_y', np.float64), ('ref_idx', np.int_)]
+
+    if len(input_idx) == 0 or len(ref_idx) == 0:
+        return np.zeros(0, dtype=dtype)
+
+    dist, nearest = cKDTree(refxy[ref_idx]).query(
+        imgxy[input_idx] - np.asarray(origin, dtype=np.float64),
+        distance_upper_bound=tolerance
+    )
+    found = np.isfinite(dist)
+    input_idx = input_idx[found]
+    ref_idx = ref_idx[nearest[found]]
+    dist = dist[found]
+
+    # keep only the closest input source for each reference source:
+    order = np.lexsort((dist, ref_idx))
+    first = np.ones(len(order), dtype=np.bool_)
+    first[1:] = ref_idx[order][1:] != ref_idx[order][:-1]
+    keep = np.sort(order[first])
+
+    matches = np.zeros(len(keep), dtype=dtype)
+    matches['input_idx'] = input_idx[keep]
+    matches['input_x'], matches['input_y'] = imgxy[input_idx[keep]].T
+    matches['ref_idx'] = ref_idx[keep]
+    matches['ref_x'], matches['ref_y'] = refxy[ref_idx[keep]].T
+
+    return matches
+
+
+def _isolated_sources(xy, separation):
+    """ Return indices of sources with no neighbor closer than separation. """
+    idx = np.arange(len(xy))
+    if separation <= 0.0 or len(xy) < 2:
+        return idx
+
+    pairs = cKDTree(xy).query_pairs(separation, output_type='ndarray')
+    crowded = np.zeros(len(xy), dtype=np.bool_)
+    crowded[pairs.ravel()] = True
+
+    return idx[~crowded]
@@ -0,0 +1,122 @@
+"""Test the pre-filtering of image overlaps with bounding caps"""
+import numpy as np
+import pytest
+from spherical_geometry.polygon import SphericalPolygon
+
+from .. import imalign
+from ..wcsimage import RefCatalog, WCSGroupCatalog, WCSImageCatalog
+
+
+def square(ra, dec, size=0.1):
+    """A square spherical polygon"""
+    return SphericalPolygon.from_radec(
+        [ra, ra + size, ra + size, ra, ra],
+        [dec, dec, dec + size, dec + size, dec]
+    )
+
+
+def image_catalog(ra, dec, size=0.1):
+    """An image catalog with a square footprint and no sources"""
+    image = WCSImageCatalog.__new__(WCSImageCatalog)
+    image._polygon = square(ra, dec, size)
+    return image
+
+
+def group_catalog(images):
+    """A group of image catalogs"""
+    group = WCSGroupCatalog.__new__(WCSGroupCatalog)
+    group._images = images
+    group.update_bounding_polygon()
+    return group
+
+
+class Reference(RefCatalog):
+    """A reference catalog counting the intersections with its footprint"""
+
+    def __init__(self, polygon):
+        self._polygon = polygon
+        self.calls = 0
+
+    def intersection_area(self, wcsim):
+        self.calls += 1
+        return super(Reference, self).intersection_area(wcsim)
+
+
+@pytest.fixture
+def images():
+    """Images overlapping in pairs, images far apart and a group"""
+    return [
+        image_catalog(10., 20.),
+        image_catalog(10.05, 20.02),
+        image_catalog(10.3, 20.),
+        image_catalog(120., -45.),
+        image_catalog(120.08, -45.05),
+        group_catalog([image_catalog(10.02, 20.06),
+                       image_catalog(10.32, 20.05)]),
+        image_catalog(250., 80.),
+    ]
+
+
+def footprint_overlap(image1, image2):
+    """The overlap of two images computed from all their member footprints"""
+    area = 0.0
+    for fp1 in imalign._footprints(image1):
+        for fp2 in imalign._footprints(image2):
+            area += fp1.intersection_area(fp2)
+    return area
+
+
+def test_bounding_cap():
+    polygon = square(30., -60., size=0.5)
+    center, radius = imalign.bounding_cap(polygon)
+
+    assert np.isclose(np.dot(center, center), 1.)
+    points = np.vstack(list(polygon.points))
+    assert np.all(np.dot(points, center) >= np.cos(radius) - 1e-12)
+    assert radius < np.deg2rad(0.5)
+
+    assert imalign.bounding_cap(None)[1] < 0.
+
+
+def test_overlap_matrix(images):
+    """Pre-filtered overlaps are those of all the pairs of images"""
+    m = imalign.overlap_matrix(images)
+
+    n = len(images)
+    expected = np.zeros((n, n))
+    for i in range(n):
+        for j in range(i + 1, n):
+            expected[i, j] = expected[j, i] = footprint_overlap(images[i],
+                                                                images[j])
+
+    assert np.count_nonzero(expected) > 0
+    np.testing.assert_allclose(m, expected, rtol=1e-8, atol=0.)
+
+
+def test_ref_overlaps(images):
+    """Only footprints near the reference are intersected with it"""
+    refcat = Reference(square(9.98, 19.98, size=0.2))
+    overlaps = imalign.RefOverlaps()
+
+    areas = overlaps.areas(refcat, images)
+    # images 0, 1 and the first member of the group are near the reference
+    assert refcat.calls == 3
+    assert np.count_nonzero(areas) == 3
+    expected = [footprint_overlap(refcat, image) for image in images]
+    np.testing.assert_allclose(areas, expected, rtol=1e-8, atol=0.)
+
+    # a grown reference: covered footprints are not intersected again
+    refcat = Reference(square(9.98, 19.98, size=0.5))
+    areas = overlaps.areas(refcat, images)
+    assert refcat.calls == 2
+    expected = [footprint_overlap(refcat, image) for image in images]
+    np.testing.assert_allclose(areas, expected, rtol=1e-8, atol=0.)
+
+
+def test_max_overlap_image(images):
+    refcat = Reference(square(10.29, 20.04, size=0.1))
+    image = imalign.max_overlap_image(refcat, images,
+                                      enforce_user_order=False,
+                                      overlaps=imalign.RefOverlaps())
+    assert len(images) == 6
+    assert isinstance(image, WCSGroupCatalog)
@@ -0,0 +1,99 @@
+"""Test the KD-tree source matching"""
+import numpy as np
+import pytest
+
+from .. import matchutils
+
+
+def arrxyzero(imgxy, refxy, searchrad):
+    """The offset histogram of all pairs of sources, as chelp.arrxyzero"""
+    size = int(searchrad * 2) + 1
+    zpmat = np.zeros((size, size), dtype=np.float64)
+    imgxy = np.asarray(imgxy, dtype=np.float32)
+    refxy = np.asarray(refxy, dtype=np.float32)
+    for x, y in imgxy:
+        for rx, ry in refxy:
+            dx = float(x - rx)
+            dy = float(y - ry)
+            if abs(dx) < searchrad and abs(dy) < searchrad:
+                zpmat[int(dy + searchrad), int(dx + searchrad)] += 1
+    return zpmat
+
+
+@pytest.fixture
+def sources():
+    """Reference sources, and input sources shifted by (2.6, -1.3)"""
+    rng = np.random.RandomState(3)
+    refxy = rng.uniform(0., 100., (60, 2))
+    imgxy = refxy[:40] + [2.6, -1.3] + rng.normal(0., 0.05, (40, 2))
+    imgxy = np.vstack([imgxy, rng.uniform(0., 100., (15, 2))])
+    return imgxy, refxy
+
+
+@pytest.mark.parametrize('searchrad', [3.0, 5.5, 10.0])
+def test_xy_offset_histogram(sources, searchrad):
+    """The histogram of the offsets is that of all the pairs of sources"""
+    imgxy, refxy = sources
+    zpmat = matchutils.xy_offset_histogram(imgxy, refxy, searchrad)
+
+    expected = arrxyzero(imgxy, refxy, searchrad)
+    assert zpmat.shape == expected.shape
+    assert zpmat.sum() > 0
+    np.testing.assert_array_equal(zpmat, expected)
+
+    if matchutils.chelp is not None:
+        np.testing.assert_array_equal(
+            zpmat, matchutils.chelp.arrxyzero(imgxy.astype(np.float32),
+                                              refxy.astype(np.float32),
+                                              searchrad)
+        )
+
+
+def test_xy_offset_histogram_empty():
+    zpmat = matchutils.xy_offset_histogram(np.zeros((0, 2)),
+                                           np.ones((5, 2)), 3.0)
+    assert zpmat.shape == (7, 7)
+    assert not zpmat.any()
+
+
+def test_kdtree_match(sources):
+    """Input sources are matched to the closest reference source"""
+    imgxy, refxy = sources
+    matches = matchutils.kdtree_match(imgxy, refxy, origin=(2.6, -1.3),
+                                      tolerance=0.5)
+
+    # brute force: the nearest reference source within the tolerance, and
+    # the closest input source for each reference source
+    dist = np.hypot(*(imgxy[:, np.newaxis] - [2.6, -1.3] -
+                      refxy[np.newaxis]).T).T
+    nearest = np.argmin(dist, axis=1)
+    best = {}
+    for i, j in enumerate(nearest):
+        if dist[i, j] < 0.5 and (j not in best or
+                                 dist[i, j] < dist[best[j], j]):
+            best[j] = i
+    expected = sorted((i, j) for j, i in best.items())
+
+    assert len(matches) >= 40
+    assert list(zip(matches['input_idx'], matches['ref_idx'])) == expected
+    np.testing.assert_array_equal(matches['input_x'],
+                                  imgxy[matches['input_idx'], 0])
+    np.testing.assert_array_equal(matches['ref_y'],
+                                  refxy[matches['ref_idx'], 1])
+
+
+def test_kdtree_match_separation():
+    """Sources closer than the separation are not matched"""
+    refxy = np.array([[10., 10.], [10.5, 10.], [30., 30.], [50., 50.]])
+    imgxy = np.array([[10.1, 10.], [30.1, 30.], [50.1, 50.], [50.2, 50.1]])
+
+    matches = matchutils.kdtree_match(imgxy, refxy, tolerance=1.,
+                                      separation=1.)
+    assert matches['input_idx'].tolist() == [1]
+    assert matches['ref_idx'].tolist() == [2]
+
+    matches = matchutils.kdtree_match(imgxy, refxy, tolerance=1.)
+    assert matches['input_idx'].tolist() == [0, 1, 2]
+    assert matches['ref_idx'].tolist() == [0, 2, 3]
+
+    assert len(matchutils.kdtree_match(np.zeros((0, 2)), refxy)) == 0
@@ -45,6 +45,7 @@ class TweakRegStep(Step):
         tolerance = float(default=1.0) # Matching tolerance for xyxymatch in arcsec
         xoffset = float(default=0.0), # Initial guess for X offset in arcsec
         yoffset = float(default=0.0) # Initial guess for Y offset in arcsec
+        matcher = option('xyxymatch', 'kdtree', default='xyxymatch') # Source matching algorithm
 
         # Catalog fitting parameters:
         fitgeometry = option('shift', 'rscale', 'general', default='general') # Fitting geometry
@@ -128,6 +129,7 @@ class TweakRegStep(Step):
             tolerance=self.tolerance,
             xoffset=self.xoffset,
             yoffset=self.yoffset,
+            matcher=self.matcher,
             fitgeom=self.fitgeometry,
             nclip=self.nclip,
             sigma=self.sigma
@@ -951,9 +951,9 @@ class WCSGroupCatalog():
 
     def match2ref(self, refcat, minobj=15, searchrad=1.0,
                   separation=0.5, use2dhist=True, xoffset=0.0, yoffset=0.0,
-                  tolerance=1.0):
-        """ Uses xyxymatch to cross-match sources between this catalog and
-            a reference catalog.
+                  tolerance=1.0, matcher='xyxymatch'):
+        """ Uses xyxymatch (or KD-trees) to cross-match sources between this
+            catalog and a reference catalog.
 
         Parameters
         ----------
@@ -999,8 +999,20 @@ class WCSGroupCatalog():
             matching the object lists from each image with the reference
             image's object list.
 
+        matcher : {'xyxymatch', 'kdtree'}, optional
+            The algorithm used to match sources. ``'xyxymatch'`` uses
+            :py:func:`~stsci.stimage.xyxymatch` and, with `use2dhist`, a
+            histogram of all offsets between input and reference sources.
+            ``'kdtree'`` uses KD-trees to find only the sources within the
+            search radius (see :py:func:`matchutils.kdtree_match`), which is
+            much faster for catalogs with many sources.
+
         """
 
+        if matcher not in ['xyxymatch', 'kdtree']:
+            raise ValueError("Unsupported 'matcher'. Valid values are: "
+                             "'xyxymatch' or 'kdtree'")
+
         colnames = self._catalog.colnames
 
         if 'xtanp' not in colnames or 'ytanp' not in colnames:
@@ -1023,7 +1035,8 @@ class WCSGroupCatalog():
             zpxoff, zpyoff, flux, zpqual = matchutils.build_xy_zeropoint(
                 im_xyref,
                 refxy,
-                searchrad=searchrad
+                searchrad=searchrad,
+                use_kdtree=matcher == 'kdtree'
             )
 
             if zpqual is not None:
@@ -1033,13 +1046,22 @@ class WCSGroupCatalog():
                 # still pick up the identified matches
                 tolerance = 1.5
 
-        matches = xyxymatch(
-            im_xyref,
-            refxy,
-            origin=xyoff,
-            tolerance=tolerance,
-            separation=separation
-        )
+        if matcher == 'kdtree':
+            matches = matchutils.kdtree_match(
+                im_xyref,
+                refxy,
+                origin=xyoff,
+                tolerance=tolerance,
+                separation=separation
+            )
+        else:
+            matches = xyxymatch(
+                im_xyref,
+                refxy,
+                origin=xyoff,
+                tolerance=tolerance,
+                separation=separation
+            )
 
         nmatches = len(matches)
         self._catalog.meta['nmatches'] = nmatches
@@ -1179,7 +1201,8 @@ class WCSGroupCatalog():
 
     def align_to_ref(self, refcat, minobj=15, searchrad=1.0, separation=0.5,
                      use2dhist=True, xoffset=0.0, yoffset=0.0, tolerance=1.0,
-                     fitgeom='rscale', nclip=3, sigma=3.0):
+                     matcher='xyxymatch', fitgeom='rscale', nclip=3,
+                     sigma=3.0):
         """
         Matches sources from the image catalog to the sources in the
         reference catalog, finds the affine transformation between matched
@@ -1230,6 +1253,14 @@ class WCSGroupCatalog():
             matching the object lists from each image with the reference
             image's object list.
 
+        matcher : {'xyxymatch', 'kdtree'}, optional
+            The algorithm used to match sources. ``'xyxymatch'`` uses
+            :py:func:`~stsci.stimage.xyxymatch` and, with `use2dhist`, a
+            histogram of all offsets between input and reference sources.
+            ``'kdtree'`` uses KD-trees to find only the sources within the
+            search radius (see :py:func:`matchutils.kdtree_match`), which is
+            much faster for catalogs with many sources.
+
         fitgeom : {'shift', 'rscale', 'general'}, optional
             The fitting geometry to be used in fitting the matched object
             lists. This parameter is used in fitting the offsets, rotations
@@ -1254,7 +1285,7 @@ class WCSGroupCatalog():
         self.match2ref(refcat=refcat, minobj=minobj, searchrad=searchrad,
                        separation=separation,
                        use2dhist=use2dhist, xoffset=xoffset, yoffset=yoffset,
-                       tolerance=tolerance)
+                       tolerance=tolerance, matcher=matcher)
         fit = self.fit2ref(refcat=refcat, tanplane_wcs=tanplane_wcs,
                            fitgeom=fitgeom, nclip=nclip, sigma=sigma)
         self.apply_affine_to_wcs(